@@ -0,0 +1,33 @@
+import asyncio
+from fastapi import APIRouter, WebSocket
+
+async def send_events(websocket: WebSocket, subscriber):
+    async for message in subscriber:
+        await websocket.send_text(message)
+
+def create_event_router(hub) -> APIRouter:
+    """/ws: live device, stream quality, job and storage events as JSON text frames.
+
+    Each client gets its own bounded, coalescing queue on the hub, so a
+    slow dashboard never holds up the others. `hub` may also be a
+    function returning it.
+    """
+    get_hub = hub if callable(hub) else lambda: hub
+    router = APIRouter(tags=["Events"])
+
+    @router.websocket("/ws")
+    async def events(websocket: WebSocket):
+        await websocket.accept()
+        event_hub = get_hub()
+        subscriber = event_hub.subscribe()
+        sender = asyncio.create_task(send_events(websocket, subscriber))
+        try:
+            # Clients only listen; reading is how a disconnect is noticed
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            event_hub.unsubscribe(subscriber)
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+
+    return router
@@ -0,0 +1,60 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def quality_view(manager, stream_key: str) -> Optional[dict]:
+    quality = manager.stream_qualities.get(stream_key)
+    if quality is None:
+        return None
+    samples = manager.stream_bitrate_samples.labels(stream_key)
+    return {
+        "bitrate": quality.bitrate,
+        "fps": quality.fps,
+        "resolution": quality.resolution,
+        "acceptable": quality.is_acceptable(),
+        "bitrate_mean": samples.mean,
+        "samples": samples.count,
+        "dropped_frames": int(manager.stream_dropped.labels(stream_key).value),
+    }
+
+def create_metrics_router(manager) -> APIRouter:
+    """/metrics in the Prometheus text format, plus JSON views of the same values.
+
+    Everything is read from the manager's current values and metric
+    registry, so a scrape or a poll costs the same however much quality
+    history is kept. `manager` may also be a function returning it.
+    """
+    get_manager = manager if callable(manager) else lambda: manager
+    router = APIRouter(tags=["Metrics"])
+
+    @router.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(get_manager().metrics.expose(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    @router.get("/api/quality/{stream_key}")
+    async def stream_quality(stream_key: str):
+        view = quality_view(get_manager(), stream_key)
+        if view is None:
+            raise HTTPException(status_code=404, detail=f"No quality data for stream {stream_key}")
+        return view
+
+    @router.get("/api/streams/{stream_key}")
+    async def stream_status(stream_key: str):
+        manager = get_manager()
+        # RTMP streams are registered under their stream key
+        device = manager.devices.get(stream_key)
+        if device is None or device.stream_key != stream_key:
+            raise HTTPException(status_code=404, detail=f"Unknown stream {stream_key}")
+        return {
+            "stream_key": stream_key,
+            "id": device.id,
+            "name": device.name,
+            "status": device.status.value,
+            "address": device.address,
+            "last_seen": device.last_seen,
+            "quality": quality_view(manager, stream_key),
+        }
+
+    return router
@@ -1,15 +1,52 @@
+import asyncio
+import os
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from pydantic import BaseModel
 from app.models.base_models import VideoRequest
 from app.services.obs_manager import connect_to_obs, load_scenes, manage_scene
-from app.services.twitch.twitch_main import get_video_on_demand
-from app.services.post_processing.post_processing_main import process_video
+from app.services.device_manager.recording_catalog import RecordingCatalog
+from app.services.post_processing.models import JobStatus
+from app.services.post_processing.submodules.job_store import JobStore
+from app.services.post_processing.submodules.processing_queue import ProcessingEngine
 from app.services.post_processing.submodules.save_to_persistence import save_to_persistence
+from app.services.twitch.backfill import BackfillBatch, VODBackfill, channel_vod_ids, vod_filename
 from pathlib import Path
+from typing import List, Optional
 
 router = APIRouter()
 
 EPHEMERAL_STORAGE = "/data/ephemeral"
 PERSISTENT_STORAGE = "/data/recordings"
+JOB_DATABASE = "/data/ephemeral/processing_jobs.sqlite"
+CATALOG_DATABASE = "/data/ephemeral/recordings_catalog.sqlite"
+# Threads copying chunks of large files when persisting across filesystems
+PERSIST_WORKERS = 4
+PROCESSING_STEPS = ["auto_fix_mobile", "apply_portrait"]
+# Backfill VODs downloading at once (each fetches several segments in parallel)
+BACKFILL_DOWNLOADS = 3
+# Backfill VODs being copied to persistent storage at once
+BACKFILL_PERSISTS = 2
+# Backfill encodes queue behind interactive /fetch-and-process jobs
+BACKFILL_PRIORITY = -1
+
+processing_engine: Optional[ProcessingEngine] = None
+recording_catalog: Optional[RecordingCatalog] = None
+vod_backfill: Optional[VODBackfill] = None
+
+def get_processing_engine() -> ProcessingEngine:
+    """Shared post-processing engine, created on first use."""
+    global processing_engine
+    if processing_engine is None:
+        processing_engine = ProcessingEngine(JobStore(JOB_DATABASE))
+    return processing_engine
+
+def get_recording_catalog() -> RecordingCatalog:
+    """Recording index shared with the device manager's storage cleanup."""
+    global recording_catalog
+    if recording_catalog is None:
+        recording_catalog = RecordingCatalog(CATALOG_DATABASE, PERSISTENT_STORAGE)
+    return recording_catalog
 
 @router.get("/")
 async def root():
@@ -40,11 +77,45 @@ async def load_obs_scenes():
 async def manage_obs_scene():
     """Manage OBS scene dynamically."""
     try:
-        manage_scene()
+        await manage_scene()
         return {"status": "Scene managed successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to manage scene: {e}")
 
+def get_vod_backfill() -> VODBackfill:
+    """Backfill pipeline; encodes are bounded by the processing engine's workers."""
+    global vod_backfill
+    if vod_backfill is None:
+        vod_backfill = VODBackfill(
+            resolve=lambda vod_ids: get_vod_manager().helix.get_videos(vod_ids),
+            download=backfill_download,
+            process=backfill_process,
+            persist=backfill_persist,
+            archived=lambda vod_ids: get_recording_catalog().archived_vods(vod_ids, source="twitch"),
+            download_limit=BACKFILL_DOWNLOADS,
+            process_limit=get_processing_engine().workers,
+            persist_limit=BACKFILL_PERSISTS,
+        )
+    return vod_backfill
+
+async def close_twitch():
+    """Stop the backfill, then close the shared Helix and HLS sessions."""
+    if vod_backfill is not None:
+        await vod_backfill.close()
+    from app.services.twitch.twitch_main import close_clients
+    await close_clients()
+
+def get_vod_manager():
+    # Twitch is only imported by the first VOD request
+    from app.services.twitch.twitch_main import get_vod_manager
+    return get_vod_manager()
+
+class BackfillRequest(BaseModel):
+    vod_ids: List[str] = []
+    channel: Optional[str] = None
+    started_after: Optional[datetime] = None
+    started_before: Optional[datetime] = None
+
 @router.post("/fetch-and-process")
 async def fetch_and_process(video_request: VideoRequest, background_tasks: BackgroundTasks):
     """Fetches Twitch VOD, processes it, and saves to persistence."""
@@ -63,12 +134,114 @@ async def fetch_and_process(video_request: VideoRequest, background_tasks: Backg
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def stream_video_processing(vod_id: str, name: str, persistent_path: str):
+    """Fetch, process and save in one pass; nothing is staged in ephemeral storage.
+
+    The pass is a job of the processing engine, so it waits for a worker
+    like any other encode and shows up in /jobs.
+    """
+    from app.services.twitch.twitch_main import stream_video_on_demand
+    date = datetime.now().strftime("%Y-%m-%d")
+    output_path = str(Path(persistent_path) / date / name.replace(".mp4", "_processed.mp4"))
+
+    async def stream(stage_args, progress):
+        await stream_video_on_demand(vod_id, output_path, stage_args,
+                                     progress=lambda state: progress(state.fraction))
+
+    engine = get_processing_engine()
+    job = await engine.submit_stream(f"https://www.twitch.tv/videos/{vod_id}", output_path,
+                                     PROCESSING_STEPS, stream)
+    job = await engine.wait(job.job_id)
+    if job.status != JobStatus.COMPLETED:
+        raise RuntimeError(f"Processing job {job.job_id} {job.status.value}: {job.error or ''}")
+    get_recording_catalog().add(output_path, source="twitch", vod_id=vod_id)
+
 async def handle_video_processing(vod_id: str, ephemeral_path: str, persistent_path: str):
-    """Handles full video workflow: fetch, process, save."""
+    """Handles full video workflow: fetch, process and save in one pass."""
     try:
-        get_video_on_demand(vod_id, ephemeral_path)
-        processed_path = process_video(ephemeral_path)
-        save_to_persistence(processed_path, persistent_path)
+        await stream_video_processing(vod_id, Path(ephemeral_path).name, persistent_path)
     except Exception as e:
         print(f"Error during video processing: {e}")
-        
+
+async def backfill_download(video: dict) -> str:
+    from app.services.twitch.twitch_main import download_video
+    path = str(Path(EPHEMERAL_STORAGE) / f"twitch_{video['id']}.source.mp4")
+    if not await download_video(video, path):
+        raise RuntimeError(f"Could not download VOD {video['id']}")
+    return path
+
+async def backfill_process(video: dict, path: str) -> str:
+    engine = get_processing_engine()
+    job = await engine.submit(path, str(Path(EPHEMERAL_STORAGE) / vod_filename(video["id"])),
+                              PROCESSING_STEPS, priority=BACKFILL_PRIORITY)
+    job = await engine.wait(job.job_id)
+    if job.status != JobStatus.COMPLETED:
+        raise RuntimeError(f"Processing job {job.job_id} {job.status.value}: {job.error or ''}")
+    os.remove(path)
+    return job.output_path
+
+async def backfill_persist(video: dict, path: str) -> str:
+    saved = await asyncio.to_thread(save_to_persistence, path, str(Path(PERSISTENT_STORAGE) / "twitch"),
+                                    PERSIST_WORKERS)
+    get_recording_catalog().add(saved.path, source="twitch", size=saved.size, vod_id=video["id"])
+    return saved.path
+
+def backfill_view(batch: BackfillBatch) -> dict:
+    return {
+        "batch_id": batch.batch_id,
+        "finished": batch.finished,
+        "counts": batch.counts(),
+        "vods": [
+            {"vod_id": item.vod_id, "status": item.status.value, "title": item.title,
+             "path": item.path, "error": item.error}
+            for item in batch.items.values()
+        ],
+    }
+
+@router.post("/backfill", status_code=202)
+async def backfill(request: BackfillRequest):
+    """Archive many VODs: listed IDs and/or a channel's broadcasts in a date range."""
+    from app.services.twitch.helix import HelixError
+    vod_ids = list(request.vod_ids)
+    if request.channel:
+        try:
+            vod_ids += await channel_vod_ids(get_vod_manager().helix, request.channel,
+                                             request.started_after, request.started_before)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except HelixError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+    if not vod_ids:
+        raise HTTPException(status_code=400, detail="No VODs to backfill")
+    return backfill_view(await get_vod_backfill().submit(vod_ids))
+
+@router.get("/backfill/{batch_id}")
+async def get_backfill(batch_id: str):
+    """Progress of a backfill batch."""
+    batch = get_vod_backfill().get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown backfill batch: {batch_id}")
+    return backfill_view(batch)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a post-processing job."""
+    job = get_processing_engine().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return {
+        "job_id": job.job_id,
+        "status": job.status.value,
+        "progress": round(job.progress, 4),
+        "steps": job.steps,
+        "completed_steps": job.completed_steps,
+        "output_path": job.output_path,
+        "error": job.error,
+    }
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running post-processing job."""
+    if not await get_processing_engine().cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"No active job: {job_id}")
+    return {"status": "cancelled", "job_id": job_id}
@@ -0,0 +1,40 @@
+from urllib.parse import parse_qs
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+
+async def read_notify_form(request: Request) -> dict:
+    """Parse the x-www-form-urlencoded body nginx-rtmp notify requests send."""
+    body = (await request.body()).decode()
+    fields = {key: values[-1] for key, values in parse_qs(body).items()}
+    fields.update(request.query_params)
+    return fields
+
+def create_rtmp_callback_router(handler) -> APIRouter:
+    """Routes for the on_publish/on_publish_done/on_record_done URLs in nginx.conf.
+
+    nginx rejects a publisher on any non-2xx answer, so these always
+    return 200 once the registry has been updated. `handler` may also be
+    a function returning it, so the app can build it at startup.
+    """
+    get_handler = handler if callable(handler) else lambda: handler
+    router = APIRouter(prefix="/api", tags=["RTMP"])
+
+    @router.post("/streams/publish", response_class=PlainTextResponse)
+    async def on_publish(request: Request):
+        fields = await read_notify_form(request)
+        get_handler().on_publish(fields.get("name", ""), fields.get("addr", ""))
+        return "OK"
+
+    @router.post("/streams/publish_done", response_class=PlainTextResponse)
+    async def on_publish_done(request: Request):
+        fields = await read_notify_form(request)
+        get_handler().on_publish_done(fields.get("name", ""))
+        return "OK"
+
+    @router.post("/recordings/done", response_class=PlainTextResponse)
+    async def on_record_done(request: Request):
+        fields = await read_notify_form(request)
+        get_handler().on_record_done(fields.get("name", ""), fields.get("path", ""))
+        return "OK"
+
+    return router
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark: create_clip from the rolling segment buffer
+Feeds a live-paced test pattern into a SegmentBuffer until --clip seconds
+are buffered, then times a clip of the last --clip seconds. Pulling the
+live stream forward, as create_clip did before, takes --clip seconds of
+wall time by construction and cannot include what already happened.
+Usage: python benchmarks/bench_clip_buffer.py [--clip 30] [--segment 2] [--size 1280x720]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "device_manager"))
+
+from segment_buffer import SPARE_SEGMENTS, SegmentBuffer
+
+async def run(args):
+    source = [
+        "-re", "-f", "lavfi", "-i", f"testsrc=size={args.size}:rate=30",
+        "-f", "lavfi", "-i", "sine", "-c:v", "libx264", "-preset", "ultrafast",
+        "-g", "60", "-b:v", "6M", "-c:a", "aac",
+    ]
+    buffer_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.TemporaryDirectory(dir=buffer_dir) as segments, tempfile.TemporaryDirectory() as output:
+        segment_buffer = SegmentBuffer(segments, source, segment_seconds=args.segment,
+                                       buffer_seconds=args.clip + args.segment * 2)
+        await segment_buffer.start()
+        print(f"Buffering {args.clip}s of {args.size} (segments of {args.segment}s)...")
+        while segment_buffer.buffered_seconds < args.clip + args.segment:
+            await asyncio.sleep(0.5)
+
+        buffer_bytes = sum(os.path.getsize(path) for path in Path(segments).glob("segment_*"))
+        clip = os.path.join(output, "clip.mp4")
+        start = time.perf_counter()
+        clipped = await segment_buffer.clip(args.clip, clip)
+        elapsed = time.perf_counter() - start
+        await segment_buffer.stop()
+
+        print(f"  clip of last {args.clip}s      {elapsed * 1000:8.1f} ms  ({clipped:.1f}s, "
+              f"{os.path.getsize(clip) / 1024 / 1024:.1f} MiB)")
+        print(f"  forward recording       {args.clip * 1000:8.1f} ms  (by construction)")
+        print(f"  buffer on tmpfs         {buffer_bytes / 1024 / 1024:8.1f} MiB  "
+              f"({segment_buffer.capacity + SPARE_SEGMENTS} segment files max)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clip", type=float, default=30)
+    parser.add_argument("--segment", type=float, default=2)
+    parser.add_argument("--size", default="1280x720")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dashboard WebSocket fan-out, direct broadcast vs EventHub
+--clients WebSocket clients (in a separate process) connect to a local
+uvicorn server; --slow of them read one frame every --slow-delay
+seconds. Every --interval seconds the server publishes a stats event of
+~--payload bytes for each of --streams streams, for --rounds rounds.
+  direct  for each event, send_json to every client in turn
+  hub     EventHub.publish(); each client drains its own bounded queue
+Reports the publisher's worst lateness against that schedule, when every
+fast client had the final value of every stream (the last round is due
+(rounds - 1) * interval after the first), and server RSS growth.
+Usage: python benchmarks/bench_event_hub.py [--clients 500] [--slow 25] [--rounds 50]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "services" / "device_manager"))
+sys.path.insert(0, str(ROOT))
+
+import aiohttp
+import uvicorn
+from fastapi import FastAPI, WebSocket
+from api.events import create_event_router
+from event_hub import EventHub
+
+def build_app(mode: str, hub: EventHub, direct_clients: list) -> FastAPI:
+    app = FastAPI()
+    if mode == "hub":
+        app.include_router(create_event_router(hub))
+        return app
+
+    @app.websocket("/ws")
+    async def direct(websocket: WebSocket):
+        await websocket.accept()
+        direct_clients.append(websocket)
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            direct_clients.remove(websocket)
+    return app
+
+async def run_clients(url: str, args, conn):
+    """Client process: report 'connected', then the time the last fast client was up to date"""
+    final = args.rounds - 1
+    connected = asyncio.Event()
+    count = {"connected": 0, "finished": 0}
+    done = asyncio.Event()
+
+    async def client(session, slow: bool):
+        latest = {}
+        async with session.ws_connect(url, max_msg_size=0) as ws:
+            count["connected"] += 1
+            if count["connected"] == args.clients:
+                connected.set()
+            async for message in ws:
+                event = json.loads(message.data)
+                latest[event["stream"]] = event["seq"]
+                if slow:
+                    await asyncio.sleep(args.slow_delay)
+                elif len(latest) == args.streams and all(seq == final for seq in latest.values()):
+                    count["finished"] += 1
+                    if count["finished"] == args.clients - args.slow:
+                        done.set()
+                    # Keep reading, as a dashboard would
+                    latest.clear()
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        tasks = [asyncio.create_task(client(session, n < args.slow)) for n in range(args.clients)]
+        await connected.wait()
+        conn.send("connected")
+        try:
+            await asyncio.wait_for(done.wait(), args.timeout)
+            conn.send(time.time())
+        except asyncio.TimeoutError:
+            conn.send(None)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def clients_main(url: str, args, conn):
+    asyncio.run(run_clients(url, args, conn))
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+async def publish(mode: str, args, hub: EventHub, direct_clients: list, lateness: list):
+    started = time.monotonic()
+    for seq in range(args.rounds):
+        due = started + seq * args.interval
+        await asyncio.sleep(max(0, due - time.monotonic()))
+        lateness.append(time.monotonic() - due)
+        for stream in range(args.streams):
+            event = {"stream": f"cam_{stream}", "seq": seq, "bitrate": 4500000, "fps": 30,
+                     "detail": "x" * args.payload}
+            if mode == "hub":
+                hub.publish("stats", event, key=event["stream"])
+            else:
+                for websocket in list(direct_clients):
+                    await websocket.send_json({"type": "stats", **event})
+
+async def measure(mode: str, args):
+    hub = EventHub(queue_size=args.queue_size)
+    direct_clients = []
+    config = uvicorn.Config(build_app(mode, hub, direct_clients), host="127.0.0.1", port=0,
+                            log_level="critical", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    url = f"ws://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}/ws"
+
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=clients_main, args=(url, args, child))
+    process.start()
+    await asyncio.to_thread(parent.recv)
+    while len(hub.subscribers if mode == "hub" else direct_clients) < args.clients:
+        await asyncio.sleep(0.01)
+
+    rss = rss_bytes()
+    lateness = []
+    started = time.time()
+    try:
+        await asyncio.wait_for(publish(mode, args, hub, direct_clients, lateness), args.timeout)
+        last_round = time.time()
+    except asyncio.TimeoutError:
+        last_round = None
+    grown = (rss_bytes() - rss) / 2 ** 20
+    finished_at = await asyncio.to_thread(parent.recv)
+    if last_round is None:
+        delivered = f"never (publisher still busy after {args.timeout:.0f} s)"
+    elif finished_at is None:
+        delivered = "never (timed out)"
+    else:
+        delivered = f"{finished_at - started:6.2f} s after the first round"
+    await asyncio.to_thread(process.join)
+    hub.close()
+    server.should_exit = True
+    await serving
+    print(f"  {mode:<7} worst lateness {max(lateness) * 1000:7.0f} ms   RSS +{grown:5.1f} MiB   "
+          f"fast clients up to date {delivered}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--slow", type=int, default=25)
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--payload", type=int, default=2000)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    print(f"{args.clients} clients ({args.slow} slow), {args.rounds} rounds of {args.streams} events "
+          f"every {args.interval * 1000:.0f} ms")
+    for mode in ("direct", "hub"):
+        await measure(mode, args)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: byte-budget eviction planning over a synthetic recording catalog
+Fills a catalog with --files rows (no files on disk) across sources, raw FLV,
+processed MP4 and clips, then times planning for each policy to free
+--free-percent of the indexed bytes. A second pass deletes --delete real
+files with the previous loop (unlink + disk usage query per file) and with
+execute_plan (one batch, one catalog transaction).
+Usage: python benchmarks/bench_eviction.py [--files 100000] [--free-percent 10] [--delete 2000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "device_manager"))
+
+from eviction import POLICIES, execute_plan, format_size, plan_eviction
+from recording_catalog import RecordingCatalog
+
+SOURCES = ["ios_main", "ios_secondary", "main_camera", "twitch"]
+
+def fill_catalog(catalog: RecordingCatalog, files: int):
+    random.seed(7)
+    rows = []
+    for index in range(files):
+        source = SOURCES[index % len(SOURCES)]
+        kind = random.random()
+        if kind < 0.5:
+            path = f"/data/recordings/{source}_{index}.flv"
+        elif kind < 0.9:
+            path = f"/data/recordings/2024-01-01/{source}/recording_{index}.mp4"
+        else:
+            path = f"/data/recordings/clips/{source}/clip_{index}.mp4"
+        rows.append((path, os.path.dirname(path), random.randint(50, 4000) * 1024 * 1024,
+                     1_700_000_000 + index * 60, source))
+    with catalog.conn:
+        catalog.conn.executemany(
+            "INSERT INTO recordings (path, directory, size, mtime, source) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+def bench_planning(tmp: str, files: int, free_percent: float):
+    catalog = RecordingCatalog(os.path.join(tmp, "catalog.sqlite"), "/data/recordings")
+    fill_catalog(catalog, files)
+    bytes_needed = int(catalog.total_size() * free_percent / 100)
+    quotas = {source: catalog.usage_by_source()[source] // 2 for source in SOURCES[:2]}
+    print(f"{files} indexed recordings, {format_size(catalog.total_size())}; "
+          f"planning to free {format_size(bytes_needed)}")
+    for policy in POLICIES:
+        start = time.perf_counter()
+        plan = plan_eviction(catalog, bytes_needed, policy, quotas)
+        elapsed = time.perf_counter() - start
+        print(f"  {policy:10} {elapsed * 1000:8.1f} ms  {len(plan.victims):6} victims  "
+              f"{format_size(plan.bytes_planned)}")
+    print("\n".join("  " + line for line in plan.describe(limit=3)))
+    catalog.close()
+
+def make_files(directory: str, count: int, catalog: RecordingCatalog):
+    os.makedirs(directory)
+    for index in range(count):
+        path = os.path.join(directory, f"r{index}.flv")
+        open(path, "wb").close()
+        catalog.add(path, size=1024, mtime=1000 + index)
+
+def bench_deletes(tmp: str, count: int):
+    catalog = RecordingCatalog(os.path.join(tmp, "delete.sqlite"), tmp)
+    make_files(os.path.join(tmp, "loop"), count, catalog)
+    start = time.perf_counter()
+    for recording in list(catalog.oldest()):
+        shutil.disk_usage(tmp)
+        os.unlink(recording.path)
+        catalog.remove(recording.path)
+    loop = time.perf_counter() - start
+
+    make_files(os.path.join(tmp, "batch"), count, catalog)
+    start = time.perf_counter()
+    shutil.disk_usage(tmp)
+    execute_plan(plan_eviction(catalog, count * 1024), catalog)
+    batch = time.perf_counter() - start
+    print(f"Deleting {count} files")
+    print(f"  per-file usage check + commit  {loop * 1000:8.1f} ms  ({count} usage queries, {count} commits)")
+    print(f"  planned batch                  {batch * 1000:8.1f} ms  (1 usage query, 1 commit)")
+    catalog.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--free-percent", type=float, default=10)
+    parser.add_argument("--delete", type=int, default=2000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_planning(tmp, args.files, args.free_percent)
+        bench_deletes(tmp, args.delete)
+
+if __name__ == "__main__":
+    main()
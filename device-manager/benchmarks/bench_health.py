@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: device health checks, sequential sweep vs HealthScheduler
+--devices devices are checked every --interval seconds; each check takes
+--probe seconds, and --hung of them never answer. Reports, for the
+healthy devices, how many checks ran in --duration seconds and the
+longest gap between two checks of the same device.
+  sweep      the previous loop: await every device in turn, then sleep
+  scheduler  HealthScheduler with --concurrency and a --timeout per check
+Usage: python benchmarks/bench_health.py [--devices 300] [--hung 3] [--duration 5]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "device_manager"))
+
+from health_scheduler import HealthScheduler
+
+class Probe:
+    def __init__(self, args):
+        self.args = args
+        self.last = {}
+        self.worst_gap = 0.0
+        self.checks = 0
+
+    async def __call__(self, device_id: str):
+        if device_id.startswith("hung"):
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.args.probe)
+        now = time.monotonic()
+        if device_id in self.last:
+            self.worst_gap = max(self.worst_gap, now - self.last[device_id])
+        self.last[device_id] = now
+        self.checks += 1
+        return self.args.interval
+
+def device_ids(args):
+    return [f"hung_{n}" for n in range(args.hung)] + [f"cam_{n}" for n in range(args.devices - args.hung)]
+
+async def sweep(args, probe: Probe):
+    while True:
+        for device_id in device_ids(args):
+            # The old loop had no timeout; cap hung probes so the run ends
+            try:
+                await asyncio.wait_for(probe(device_id), args.duration)
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.sleep(args.interval)
+
+async def scheduled(args, probe: Probe):
+    scheduler = HealthScheduler(probe, interval=args.interval, timeout=args.timeout,
+                                concurrency=args.concurrency)
+    for device_id in device_ids(args):
+        scheduler.schedule(device_id)
+    await scheduler.run()
+
+async def measure(name, runner, args):
+    probe = Probe(args)
+    task = asyncio.create_task(runner(args, probe))
+    await asyncio.sleep(args.duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    never = args.devices - args.hung - len(probe.last)
+    print(f"  {name:<10} {probe.checks:6d} checks   worst gap {probe.worst_gap:6.2f} s"
+          f"   never checked {never}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=300)
+    parser.add_argument("--hung", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=1)
+    parser.add_argument("--probe", type=float, default=0.005)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+    # Every timed-out check of a hung device logs a warning
+    logging.disable(logging.WARNING)
+
+    print(f"{args.devices} devices ({args.hung} hung), {args.interval} s interval, "
+          f"{args.probe * 1000:.0f} ms per check, {args.duration} s run")
+    await measure("sweep", sweep, args)
+    await measure("scheduler", scheduled, args)
+
+if __name__ == "__main__":
+    asyncio.run(main())
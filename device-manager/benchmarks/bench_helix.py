@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: looking up a backfill of Twitch VODs, one Helix call per VOD vs batched
+Runs the stand-in Helix server (tests/helix_fixtures.py) in its own thread
+with --latency seconds per request, then resolves --vods VOD URLs:
+  blocking  one synchronous requests.get per VOD on the event loop, as the
+            twitchAPI-based manager did
+  per-vod   one awaited Helix request per VOD, all started at once
+  batched   HelixClient.get_vod_url for every VOD at once (coalesced into
+            batches of 100 under one cached token)
+  cached    the same lookups again, answered from the TTL cache
+While each runs, a ticker task measures the longest event-loop stall.
+Usage: python benchmarks/bench_helix.py [--vods 1000] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "services" / "twitch"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from helix import HelixClient
+from helix_fixtures import CLIENT_ID, CLIENT_SECRET, HelixServer
+
+def run_server(server: HelixServer) -> str:
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    base_url = []
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        base_url.append(loop.run_until_complete(server.start()))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    started.wait()
+    return base_url[0]
+
+async def ticker(stalls: list, stop: asyncio.Event, interval: float = 0.001):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        stalls.append(now - last - interval)
+        last = now
+
+async def blocking(base_url: str, vod_ids: list) -> int:
+    session = requests.Session()
+    token = session.post(f"{base_url}/oauth2/token", data={
+        "client_id": CLIENT_ID, "client_secret": CLIENT_SECRET, "grant_type": "client_credentials"}).json()
+    headers = {"Client-Id": CLIENT_ID, "Authorization": f"Bearer {token['access_token']}"}
+    for vod_id in vod_ids:
+        session.get(f"{base_url}/helix/videos", params={"id": vod_id}, headers=headers)
+    return len(vod_ids) + 1
+
+async def per_vod(client: HelixClient, vod_ids: list) -> int:
+    await asyncio.gather(*(client.get("videos", [("id", vod_id)]) for vod_id in vod_ids))
+    return client.requests + client.token_requests
+
+async def batched(client: HelixClient, vod_ids: list) -> int:
+    before = client.requests + client.token_requests
+    await asyncio.gather(*(client.get_vod_url(vod_id) for vod_id in vod_ids))
+    return client.requests + client.token_requests - before
+
+async def measure(name: str, lookup) -> None:
+    stalls = []
+    stop = asyncio.Event()
+    ticking = asyncio.create_task(ticker(stalls, stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    calls = await lookup
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticking
+    print(f"{name:>9}: {elapsed * 1000:8.1f} ms  {calls:5d} API calls  "
+          f"longest loop stall {max(stalls, default=0) * 1000:7.1f} ms")
+
+async def main(vods: int, latency: float):
+    server = HelixServer(video_ids=range(vods), delay=latency)
+    base_url = run_server(server)
+    options = {"base_url": f"{base_url}/helix", "token_url": f"{base_url}/oauth2/token"}
+    vod_ids = [str(number) for number in range(vods)]
+    print(f"{vods} VODs, {latency * 1000:.0f} ms per Helix request")
+
+    await measure("blocking", blocking(base_url, vod_ids))
+    async with HelixClient(CLIENT_ID, CLIENT_SECRET, **options) as client:
+        await measure("per-vod", per_vod(client, vod_ids))
+    async with HelixClient(CLIENT_ID, CLIENT_SECRET, **options) as client:
+        await measure("batched", batched(client, vod_ids))
+        await measure("cached", batched(client, vod_ids))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vods", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.vods, args.latency))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OBS scene changes, per-source blocking calls vs batched and diffed updates
+Runs a fake OBS WebSocket v5 server (tests/obs_fixtures.py) in its own thread
+with --latency seconds of round-trip delay, then applies a scene change to
+--sources sources several ways:
+  blocking  one request per source, each waited for synchronously on the
+            event loop (what obsws.call does inside a coroutine)
+  awaited   one awaited request per source, in sequence
+  batched   OBSClient.set_visibility_many (one RequestBatch)
+  diffed    SceneState.set_visibility, changing one source per round
+  unchanged SceneState.set_visibility re-applying the current state,
+            as on device churn that changes nothing
+While each runs, a ticker task measures the longest event-loop stall.
+Usage: python benchmarks/bench_obs_client.py [--sources 4] [--latency 0.005] [--rounds 20]
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "services" / "device_manager"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from obs_client import OBSClient
+from obs_fixtures import FakeOBSServer
+from scene_state import SceneState
+
+SCENE = "Main Scene"
+
+def run_server(server: FakeOBSServer) -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    started.wait()
+    return loop
+
+async def ticker(stalls: list, stop: asyncio.Event, interval: float = 0.001):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        stalls.append(now - last - interval)
+        last = now
+
+def blocking_client(port: int) -> tuple:
+    """An OBSClient on its own loop, called synchronously like obsws"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    client = OBSClient("127.0.0.1", port)
+    asyncio.run_coroutine_threadsafe(client.start(), loop).result()
+    asyncio.run_coroutine_threadsafe(client.wait_connected(5), loop).result()
+    return client, loop
+
+async def measure(name: str, change, rounds: int, sources: int):
+    stalls, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(stalls, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for index in range(rounds):
+        await change(index % 2 == 0)
+    elapsed = (time.perf_counter() - start) / rounds
+    stop.set()
+    await tick
+    print(f"  {name:9} {elapsed * 1000:8.2f} ms/scene change  "
+          f"max loop stall {max(stalls) * 1000:7.2f} ms")
+
+async def bench(sources: int, latency: float, rounds: int):
+    names = [f"Source {index}" for index in range(sources)]
+    server = FakeOBSServer(scenes={SCENE: {name: False for name in names}}, latency=latency)
+    server_loop = run_server(server)
+
+    client = OBSClient("127.0.0.1", server.port)
+    state = SceneState(client)
+    await client.start()
+    await client.wait_connected(5)
+    ids = await client.scene_item_ids(SCENE, names)
+    sync_client, sync_loop = blocking_client(server.port)
+
+    async def blocking(visible: bool):
+        for name in names:
+            asyncio.run_coroutine_threadsafe(sync_client.call("SetSceneItemEnabled", {
+                "sceneName": SCENE, "sceneItemId": ids[name], "sceneItemEnabled": visible
+            }), sync_loop).result()
+
+    async def awaited(visible: bool):
+        for name in names:
+            await client.call("SetSceneItemEnabled", {
+                "sceneName": SCENE, "sceneItemId": ids[name], "sceneItemEnabled": visible
+            })
+
+    async def batched(visible: bool):
+        await client.set_visibility_many(SCENE, {name: visible for name in names})
+
+    async def diffed(visible: bool):
+        await state.set_visibility(SCENE, {name: visible and index == 0 for index, name in enumerate(names)})
+
+    async def unchanged(visible: bool):
+        await state.set_visibility(SCENE, {name: False for name in names})
+
+    await state.visibility(SCENE)
+    print(f"{sources} sources, {latency * 1000:.1f} ms simulated OBS latency, {rounds} scene changes")
+    for name, change in (("blocking", blocking), ("awaited", awaited), ("batched", batched),
+                         ("diffed", diffed), ("unchanged", unchanged)):
+        sent = client.requests_sent + sync_client.requests_sent
+        await measure(name, change, rounds, sources)
+        messages = (client.requests_sent + sync_client.requests_sent - sent) / rounds
+        print(f"  {'':9} {messages:8.0f} messages/scene change")
+
+    await client.close()
+    asyncio.run_coroutine_threadsafe(sync_client.close(), sync_loop).result()
+    asyncio.run_coroutine_threadsafe(server.stop(), server_loop).result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(bench(args.sources, args.latency, args.rounds))
+
+if __name__ == "__main__":
+    main()
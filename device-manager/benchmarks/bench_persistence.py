@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark: save_to_persistence throughput, rename vs. cross-filesystem copy
+Writes a file into --src-dir and persists it into --dst-dir. Point the two at
+the same filesystem to measure a rename, or at different ones (tmpfs, a
+loop-mounted image, a NAS mount) to measure the atomic checksummed copy.
+Usage: python benchmarks/bench_persistence.py [--size-mb 1024] [--workers 1 4]
+       [--src-dir /dev/shm] [--dst-dir /tmp]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "post_processing"))
+
+from submodules.save_to_persistence import save_to_persistence
+
+def make_file(directory: str, size: int) -> str:
+    path = os.path.join(directory, "bench_processed.mp4")
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+    return path
+
+def run(src_dir: str, dst_dir: str, size: int, workers: int, checksum: bool) -> dict:
+    with tempfile.TemporaryDirectory(dir=src_dir) as src, tempfile.TemporaryDirectory(dir=dst_dir) as dst:
+        source = make_file(src, size)
+        start = time.perf_counter()
+        result = save_to_persistence(source, dst, workers=workers, parallel_threshold=0, checksum=checksum)
+        elapsed = time.perf_counter() - start
+    return {"method": result.method, "seconds": elapsed, "mb_per_s": size / 1024 / 1024 / elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--src-dir", default="/dev/shm")
+    parser.add_argument("--dst-dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    print(f"{args.size_mb} MiB, {args.src_dir} -> {args.dst_dir}")
+    same = run(args.src_dir, args.src_dir, size, 1, True)
+    print(f"  same filesystem       {same['method']:7} {same['seconds'] * 1000:9.2f} ms")
+    for workers in args.workers:
+        for checksum in (False, True):
+            result = run(args.src_dir, args.dst_dir, size, workers, checksum)
+            label = f"workers={workers}{' +sha256' if checksum else ''}"
+            print(f"  {label:21} {result['method']:7} {result['seconds'] * 1000:9.2f} ms"
+                  f"  {result['mb_per_s']:8.0f} MiB/s")
+
+if __name__ == "__main__":
+    main()
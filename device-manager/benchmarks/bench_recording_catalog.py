@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: glob('**/*.mp4') + stat + sort vs. the recording catalog
+Builds a {date}/{source}/ tree of empty recordings, then times the previous
+cleanup scan against a full catalog build, a steady-state reconcile with one
+changed directory, and reading the oldest recordings from the index.
+Over SMB every stat/listing is a network round trip, so the stat and
+listing counts matter more than local wall time.
+Usage: python benchmarks/bench_recording_catalog.py [--files 20000] [--days 90] [--sources 4]
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "device_manager"))
+
+from recording_catalog import RecordingCatalog
+
+def build_tree(root: str, files: int, days: int, sources: int):
+    directories = [os.path.join(root, f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}", f"source_{source}")
+                   for day in range(days) for source in range(sources)]
+    for directory in directories:
+        os.makedirs(directory)
+    for index, directory in zip(range(files), itertools.cycle(directories)):
+        path = os.path.join(directory, f"recording_{index}.mp4")
+        open(path, "wb").close()
+        os.utime(path, (1_700_000_000 + index, 1_700_000_000 + index))
+    return directories
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--sources", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "recordings")
+        directories = build_tree(root, args.files, args.days, args.sources)
+        print(f"{args.files} recordings in {len(directories)} source directories")
+
+        elapsed, oldest = timed(lambda: sorted(Path(root).glob("**/*.mp4"), key=lambda p: p.stat().st_mtime)[:100])
+        print(f"  glob + stat + sort          {elapsed * 1000:9.1f} ms  ({args.files} stats)")
+
+        catalog = RecordingCatalog(os.path.join(tmp, "catalog.sqlite"), root, racy_window=0)
+        elapsed, listed = timed(catalog.reconcile)
+        print(f"  catalog build (first run)   {elapsed * 1000:9.1f} ms  ({listed} directories listed)")
+
+        elapsed, listed = timed(catalog.reconcile)
+        print(f"  reconcile, nothing changed  {elapsed * 1000:9.1f} ms  ({listed} listed, "
+              f"{len(directories) + args.days + 1} directory stats)")
+
+        open(os.path.join(directories[-1], "new_recording.mp4"), "wb").close()
+        elapsed, listed = timed(catalog.reconcile)
+        print(f"  reconcile, one new file     {elapsed * 1000:9.1f} ms  ({listed} listed)")
+
+        elapsed, first = timed(lambda: list(itertools.islice(catalog.oldest(), 100)))
+        print(f"  oldest 100 from the index   {elapsed * 1000:9.1f} ms")
+        assert [r.path for r in first] == [str(p) for p in oldest]
+        catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental /stat parser vs. ElementTree DOM path
+Usage: python benchmarks/bench_rtmp_stats.py
+"""
+
+import sys
+import timeit
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "services" / "device_manager"), str(ROOT / "tests")]
+
+from rtmp_stats import parse_rtmp_stats
+from rtmp_fixtures import make_stat_xml
+
+def dom_parse(data: bytes):
+    """Previous process_rtmp_stats path: full tree plus find() per field"""
+    root = ET.fromstring(data)
+    result = []
+    for stream in root.findall(".//stream"):
+        video = stream.find("meta/video")
+        result.append((
+            stream.find("name").text,
+            stream.find("bw_in").text,
+            stream.find("bw_video").text,
+            stream.find("nclients").text,
+            video.find("width").text if video is not None else None,
+            video.find("height").text if video is not None else None,
+            video.find("frame_rate").text if video is not None else None,
+        ))
+    return result
+
+def peak_memory(func, data: bytes) -> int:
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    print(f"{'streams':>8} {'size KB':>9} {'dom ms':>9} {'pull ms':>9} {'dom peak KB':>12} {'pull peak KB':>13}")
+    for count in (10, 50, 100, 500, 1000):
+        data = make_stat_xml(count=count).encode()
+        assert len(parse_rtmp_stats(data)) == len(dom_parse(data)) == count
+        number = max(3, 2000 // count)
+        dom = min(timeit.repeat(lambda: dom_parse(data), number=number, repeat=5)) / number
+        pull = min(timeit.repeat(lambda: parse_rtmp_stats(data), number=number, repeat=5)) / number
+        print(f"{count:>8} {len(data) / 1024:>9.1f} {dom * 1000:>9.2f} {pull * 1000:>9.2f} "
+              f"{peak_memory(dom_parse, data) / 1024:>12.0f} {peak_memory(parse_rtmp_stats, data) / 1024:>13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: matching devices against --sources configured sources
+Compares the previous linear scans of config['sources'] with SourceIndex
+for USB matching (udev vendor/product) and RTMP stream key lookups, and
+times RTMPCallbackHandler.reconcile over a registry of that size.
+Usage: python benchmarks/bench_source_index.py [--sources 1000] [--lookups 100000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "device_manager"))
+
+from rtmp_callbacks import RTMPCallbackHandler
+from source_index import SourceIndex
+
+def make_sources(count: int) -> dict:
+    sources = {}
+    for index in range(count):
+        if index % 2:
+            sources[f"usb_{index}"] = {"type": "usb", "vendor_id": f"{index:04x}", "product_id": "0001"}
+        else:
+            sources[f"rtmp_{index}"] = {"type": "rtmp", "stream_key": f"stream_{index}"}
+    return sources
+
+def linear_usb(sources: dict, device: dict) -> list:
+    return [source_id for source_id, config in sources.items()
+            if config.get("type") == "usb"
+            and config.get("vendor_id") == device.get("ID_VENDOR_ID")
+            and config.get("product_id") == device.get("ID_MODEL_ID")]
+
+def linear_rtmp(sources: dict, stream_key: str) -> dict:
+    for config in sources.values():
+        if config.get("type") == "rtmp" and config.get("stream_key") == stream_key:
+            return config
+    return {}
+
+def timed(function, items, lookups: int) -> float:
+    start = time.perf_counter()
+    for index in range(lookups):
+        function(items[index % len(items)])
+    return (time.perf_counter() - start) / lookups * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    sources = make_sources(args.sources)
+    start = time.perf_counter()
+    index = SourceIndex(sources)
+    print(f"{args.sources} sources, index built in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # The last-configured devices are the worst case for a scan
+    devices = [{"ID_VENDOR_ID": f"{n:04x}", "ID_MODEL_ID": "0001"} for n in range(args.sources - 1, 0, -2)][:50]
+    stream_keys = [f"stream_{n}" for n in range(args.sources - 2, -1, -2)][:50]
+    print(f"  USB match     linear {timed(lambda d: linear_usb(sources, d), devices, args.lookups):8.2f} us"
+          f"   index {timed(index.match_usb, devices, args.lookups):6.2f} us")
+    print(f"  stream key    linear {timed(lambda k: linear_rtmp(sources, k), stream_keys, args.lookups):8.2f} us"
+          f"   index {timed(lambda k: index.source(index.rtmp_source(k)), stream_keys, args.lookups):6.2f} us")
+
+    handler = RTMPCallbackHandler({}, index)
+    for key in index.by_stream_key:
+        handler.on_publish(key)
+        handler.on_publish_done(key)
+    live = stream_keys[:5]
+    for key in live:
+        handler.on_publish(key)
+    rounds = max(1, args.lookups // 100)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        handler.reconcile(live, 0)
+    print(f"  reconcile of {len(handler.devices)} registered streams, {len(live)} live: "
+          f"{(time.perf_counter() - start) / rounds * 1e6:.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start import cost of the service modules
+Imports each module in a fresh interpreter under `python -X importtime`,
+--runs times, and reports the median cumulative import time plus the
+heaviest dependencies it pulled in. Optional subsystems (pyudev, zeroconf,
+obswebsocket, twitchAPI, v4l2) are flagged if they were imported eagerly.
+  device_manager  services/device_manager/device_manager.py
+  obs_streamer    obs_websocket/obs_streamer.py (the single-file service)
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 8]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = {
+    "device_manager": ROOT / "services" / "device_manager",
+    "obs_streamer": ROOT.parent / "obs_websocket",
+}
+OPTIONAL = ("pyudev", "zeroconf", "obswebsocket", "twitchAPI", "v4l2")
+
+def import_times(module: str, directory: Path) -> Dict[str, Tuple[int, int]]:
+    """Top-level package -> (self, cumulative) microseconds for one cold import"""
+    env = dict(os.environ, PYTHONPATH=str(directory), PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=directory, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        # Only count a package once, at its outermost import
+        if not name.startswith("  ") or name.strip() not in times:
+            times.setdefault(name.strip(), (int(own), int(cumulative)))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    for module, directory in MODULES.items():
+        runs: List[Dict[str, Tuple[int, int]]] = [import_times(module, directory) for _ in range(args.runs)]
+        total = statistics.median(run[module][1] for run in runs)
+        print(f"{module}: {total / 1000:.1f} ms cold import (median of {args.runs})")
+        last = runs[-1]
+        heaviest = sorted(((cumulative, name) for name, (_, cumulative) in last.items()
+                           if "." not in name and name != module), reverse=True)[:args.top]
+        for cumulative, name in heaviest:
+            print(f"  {name:<24} {cumulative / 1000:8.1f} ms")
+        eager = [name for name in OPTIONAL if name in last]
+        print(f"  optional subsystems imported: {', '.join(eager) or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-stream quality history, 100 streams sampled at 1 Hz for 24 h
+Usage: python benchmarks/bench_stream_quality.py [--streams 100] [--hours 24]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "services" / "device_manager"))
+
+from stream_quality import StreamQuality
+
+THRESHOLDS = {"bitrate_min": 2000000, "framerate_min": 24, "resolution_min": "1920x1080"}
+
+def history_bytes(qualities) -> int:
+    """Bytes held by the ring buffers"""
+    history = (quality.history for quality in qualities)
+    return sum(sys.getsizeof(h.timestamps) + sys.getsizeof(h.bitrates)
+               + sys.getsizeof(h.fps) + sys.getsizeof(h.dropped) for h in history)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=100)
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--window-minutes", type=float, default=10)
+    args = parser.parse_args()
+
+    qualities = [StreamQuality(THRESHOLDS, {"minutes": args.window_minutes}) for _ in range(args.streams)]
+    after_alloc = history_bytes(qualities)
+
+    seconds = int(args.hours * 3600)
+    rng = random.Random(42)
+    jitter = [rng.uniform(0.7, 1.3) for _ in range(997)]
+    started = time.perf_counter()
+    checkpoints = {seconds // 4, seconds // 2, seconds - 1}
+    for second in range(seconds):
+        for index, quality in enumerate(qualities):
+            quality.update(int(6000000 * jitter[(second + index) % 997]), 30, "1920x1080",
+                           second // 60, second)
+        if second in checkpoints:
+            print(f"  t={second / 3600:5.1f} h  ring buffers {history_bytes(qualities) / 1024:8.0f} KB")
+    elapsed = time.perf_counter() - started
+    samples = seconds * args.streams
+    current = history_bytes(qualities)
+
+    started = time.perf_counter()
+    for quality in qualities:
+        quality.stats(now=seconds - 1)
+    stats_elapsed = time.perf_counter() - started
+
+    print(f"{args.streams} streams x {seconds} s = {samples:,} samples")
+    print(f"append: {elapsed:.1f} s total, {elapsed / samples * 1e6:.2f} us/sample (incl. hysteresis)")
+    print(f"memory: {after_alloc / 1024:.0f} KB after allocation, {current / 1024:.0f} KB at end")
+    print(f"window stats ({args.window_minutes:g} min): {stats_elapsed / args.streams * 1000:.3f} ms/stream")
+
+if __name__ == "__main__":
+    main()
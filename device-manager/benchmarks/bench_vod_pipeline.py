@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Twitch VOD processing, three stages vs a single streamed pass
+Encodes a synthetic --duration second VOD as fMP4 HLS and serves it locally
+with --latency seconds per request, then processes it with --steps:
+  staged     HLSDownloader.download into ephemeral storage, one FFmpeg pass
+             per build_pipeline stage, then save_to_persistence
+  streamed   stream_vod: segments piped into FFmpeg's stdin and the output
+             written straight into persistent storage under a temporary name
+Directory sizes are sampled while each runs to find the peak ephemeral disk.
+Put --persistent-dir on another filesystem to include the persist copy.
+Usage: python benchmarks/bench_vod_pipeline.py [--duration 30] [--latency 0.05]
+       [--steps auto_fix_mobile apply_portrait] [--persistent-dir /dev/shm]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "services" / "post_processing"))
+sys.path.insert(0, str(ROOT / "services" / "twitch"))
+
+from hls_download import HLSDownloader
+from submodules.pipeline import build_pipeline
+from submodules.save_to_persistence import save_to_persistence
+from vod_stream import stream_vod
+
+def make_vod(directory: str, duration: int, size: str):
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "lavfi", "-i", f"testsrc=size={size}:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440", "-t", str(duration),
+        # Noise keeps the bitrate near a real stream's rather than a few kbit/s
+        "-vf", "noise=alls=20:allf=t", "-b:v", "4M",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", "60", "-c:a", "aac",
+        "-f", "hls", "-hls_time", "2", "-hls_playlist_type", "vod", "-hls_segment_type", "fmp4",
+        os.path.join(directory, "index.m3u8"),
+    ], check=True)
+
+async def serve(directory: str, latency: float) -> web.AppRunner:
+    @web.middleware
+    async def slow(request, handler):
+        await asyncio.sleep(latency)
+        return await handler(request)
+
+    app = web.Application(middlewares=[slow])
+    app.router.add_static("/vod", directory)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+def disk_usage(directory: str) -> int:
+    total = 0
+    for parent, _, names in os.walk(directory):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(parent, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+async def sampler(directory: str, peak: list, stop: asyncio.Event, interval: float = 0.02):
+    while not stop.is_set():
+        peak[0] = max(peak[0], await asyncio.to_thread(disk_usage, directory))
+        await asyncio.sleep(interval)
+
+async def run_ffmpeg(args: list):
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-loglevel", "error", *args, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode(errors="replace"))
+
+async def staged(url: str, ephemeral: str, persistent: str, steps: list) -> str:
+    path = os.path.join(ephemeral, "twitch_bench.mp4")
+    async with HLSDownloader() as downloader:
+        await downloader.download(url, path)
+    for number, stage in enumerate(build_pipeline(steps)):
+        output = path.replace(".mp4", f"_{number}.mp4")
+        await run_ffmpeg(stage.ffmpeg_args(path, output))
+        os.remove(path)
+        path = output
+    processed = os.path.join(ephemeral, "twitch_bench_processed.mp4")
+    os.replace(path, processed)
+    return (await asyncio.to_thread(save_to_persistence, processed, persistent)).path
+
+async def streamed(url: str, ephemeral: str, persistent: str, steps: list) -> str:
+    (stage,) = build_pipeline(steps)
+    output = os.path.join(persistent, datetime.now().strftime("%Y-%m-%d"), "twitch_bench_processed.mp4")
+    return (await stream_vod(url, output, stage.ffmpeg_args)).path
+
+async def measure(name: str, mode, url: str, steps: list, persistent_dir: str):
+    with tempfile.TemporaryDirectory() as ephemeral, \
+            tempfile.TemporaryDirectory(dir=persistent_dir) as persistent:
+        peak, stop = [0], asyncio.Event()
+        sampling = asyncio.create_task(sampler(ephemeral, peak, stop))
+        started = time.perf_counter()
+        path = await mode(url, ephemeral, persistent, steps)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampling
+        print(f"{name:>9}: {elapsed:7.2f} s  peak ephemeral {peak[0] / 1e6:8.2f} MB  "
+              f"output {os.path.getsize(path) / 1e6:6.2f} MB")
+
+async def main(duration: int, size: str, latency: float, steps: list, persistent_dir: str, repeat: int):
+    with tempfile.TemporaryDirectory() as source:
+        make_vod(source, duration, size)
+        segments = len([name for name in os.listdir(source) if name.endswith(".m4s")])
+        print(f"{duration} s {size} VOD in {segments} segments, {latency * 1000:.0f} ms per request, "
+              f"steps {steps}")
+        runner = await serve(source, latency)
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/vod/index.m3u8"
+        try:
+            for _ in range(repeat):
+                await measure("staged", staged, url, steps, persistent_dir)
+                await measure("streamed", streamed, url, steps, persistent_dir)
+        finally:
+            await runner.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=int, default=30)
+    parser.add_argument("--size", default="640x360")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--steps", nargs="+", default=["auto_fix_mobile", "apply_portrait"])
+    parser.add_argument("--persistent-dir", default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.duration, args.size, args.latency, args.steps, args.persistent_dir, args.repeat))
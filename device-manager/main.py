@@ -1,14 +1,57 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI
-from app.api.routes import router as api_router
+from app.api.routes import router as api_router, close_twitch, get_processing_engine
+from app.api.events import create_event_router
+from app.api.metrics import create_metrics_router
+from app.api.rtmp_callbacks import create_rtmp_callback_router
+from app.services.device_manager.device_manager import EnhancedDeviceManager
+
+logger = logging.getLogger("StreamingServiceManager")
+
+device_manager: Optional[EnhancedDeviceManager] = None
+
+def get_device_manager() -> EnhancedDeviceManager:
+    """Device manager, built at startup rather than on import."""
+    global device_manager
+    if device_manager is None:
+        device_manager = EnhancedDeviceManager()
+    return device_manager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    # Both only touch local files; start them side by side
+    manager, _ = await asyncio.gather(
+        asyncio.to_thread(get_device_manager),
+        get_processing_engine().start()
+    )
+    # Job run times go to /metrics, progress to /ws
+    get_processing_engine().on_update = manager.job_updated
+    # Runs for the life of the app; OBS, udev and zeroconf come up inside it
+    app.state.device_manager_task = asyncio.create_task(manager.start())
+    logger.info(f"Started in {(loop.time() - started) * 1000:.0f} ms")
+    yield
+    app.state.device_manager_task.cancel()
+    await asyncio.gather(app.state.device_manager_task, return_exceptions=True)
+    await close_twitch()
+    await asyncio.gather(manager.close(), get_processing_engine().stop())
 
 app = FastAPI(
     title="Streaming Service Manager",
     version="1.0",
-    description="A service for managing Twitch VODs and OBS scenes."
+    description="A service for managing Twitch VODs and OBS scenes.",
+    lifespan=lifespan
 )
 
 app.include_router(api_router)
+app.include_router(create_rtmp_callback_router(lambda: get_device_manager().rtmp_callbacks))
+app.include_router(create_metrics_router(get_device_manager))
+app.include_router(create_event_router(lambda: get_device_manager().events))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,372 @@
+"""
+Hot-reloadable streams.yaml
+Parses the config into a validated, immutable snapshot and watches the
+file with inotify; on change only the subtrees that differ are swapped
+in and their subscribers notified, so nothing has to restart
+Author: @Cdaprod
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import dataclasses
+import logging
+import os
+import re
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Set, Union
+import yaml
+from eviction import POLICIES, parse_size
+from source_index import SourceIndex
+
+SUBTREES = ('sources', 'monitoring', 'storage', 'obs', 'other')
+
+SOURCE_TYPES = {'usb', 'rtmp', 'network'}
+USB_KEYS = ('serial', 'id_path', 'vendor_id', 'product_id', 'device_name')
+# Optional parts of the device manager, toggled under monitoring.subsystems
+SUBSYSTEMS = ('obs', 'usb', 'network_discovery')
+
+class ConfigError(ValueError):
+    """streams.yaml is unreadable or invalid; carries every problem found"""
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__("; ".join(problems))
+
+def freeze(value):
+    """Read-only copy: dicts become mapping proxies, lists tuples"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+EMPTY = freeze({})
+
+def _empty() -> Mapping:
+    return EMPTY
+
+@dataclass(frozen=True, slots=True)
+class StreamsConfig:
+    """One immutable snapshot of streams.yaml
+
+    Subtrees are read-only mappings; `get()` gives the same top-level
+    access as the raw dict. `source_index` is compiled from `sources`.
+    """
+    sources: Mapping[str, Mapping[str, Any]] = dataclasses.field(default_factory=_empty)
+    monitoring: Mapping[str, Any] = dataclasses.field(default_factory=_empty)
+    storage: Mapping[str, Any] = dataclasses.field(default_factory=_empty)
+    obs: Mapping[str, Any] = dataclasses.field(default_factory=_empty)
+    other: Mapping[str, Any] = dataclasses.field(default_factory=_empty)
+    source_index: SourceIndex = dataclasses.field(default_factory=SourceIndex, compare=False)
+
+    def get(self, key: str, default=None):
+        if key in SUBTREES and key != 'other':
+            return getattr(self, key)
+        return self.other.get(key, default)
+
+    def enabled(self, subsystem: str) -> bool:
+        """Subsystems are on unless monitoring.subsystems turns them off"""
+        return self.monitoring.get('subsystems', EMPTY).get(subsystem, True)
+
+def _number(problems: List[str], section: Mapping, key: str, path: str,
+            minimum: float = 0, integer: bool = False):
+    value = section.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (integer and not isinstance(value, int)):
+        problems.append(f"{path}.{key} must be a{'n integer' if integer else ' number'}, got {value!r}")
+        return None
+    if value < minimum:
+        problems.append(f"{path}.{key} must be at least {minimum}, got {value!r}")
+        return None
+    return value
+
+def _section(problems: List[str], parent: Mapping, key: str, path: str) -> Mapping:
+    value = parent.get(key)
+    if value is None:
+        return {}
+    if not isinstance(value, Mapping):
+        problems.append(f"{path}.{key} must be a mapping")
+        return {}
+    return value
+
+def _size(problems: List[str], value, path: str):
+    try:
+        parse_size(value)
+    except ValueError:
+        problems.append(f"{path} is not a size: {value!r}")
+
+def validate(raw: Mapping) -> List[str]:
+    """Every problem found in a parsed streams.yaml, empty if it is valid"""
+    problems: List[str] = []
+    sources = _section(problems, raw, 'sources', 'config')
+    stream_keys: Dict[str, str] = {}
+    for name, source in sources.items():
+        path = f"sources.{name}"
+        if not isinstance(source, Mapping):
+            problems.append(f"{path} must be a mapping")
+            continue
+        source_type = source.get('type')
+        if source_type not in SOURCE_TYPES:
+            problems.append(f"{path}.type must be one of {sorted(SOURCE_TYPES)}, got {source_type!r}")
+        if source_type == 'rtmp':
+            stream_key = source.get('stream_key')
+            if not isinstance(stream_key, str) or not stream_key:
+                problems.append(f"{path}.stream_key is required for rtmp sources")
+            elif stream_key in stream_keys:
+                problems.append(f"{path}.stream_key {stream_key!r} is already used by {stream_keys[stream_key]}")
+            else:
+                stream_keys[stream_key] = name
+        if source_type == 'usb' and not any(source.get(key) for key in USB_KEYS):
+            problems.append(f"{path} needs one of {', '.join(USB_KEYS)} to be matched")
+        if source_type == 'network' and not source.get('service_name'):
+            problems.append(f"{path}.service_name is required for network sources")
+        recording = _section(problems, source, 'recording', path)
+        if recording.get('quota') is not None:
+            _size(problems, recording['quota'], f"{path}.recording.quota")
+
+    monitoring = _section(problems, raw, 'monitoring', 'config')
+    thresholds = _section(problems, monitoring, 'quality_thresholds', 'monitoring')
+    _number(problems, thresholds, 'bitrate_min', 'monitoring.quality_thresholds')
+    _number(problems, thresholds, 'framerate_min', 'monitoring.quality_thresholds')
+    resolution = thresholds.get('resolution_min')
+    if resolution is not None and not re.fullmatch(r'\d+x\d+', str(resolution)):
+        problems.append(f"monitoring.quality_thresholds.resolution_min must look like 1920x1080, got {resolution!r}")
+    history = _section(problems, monitoring, 'quality_history', 'monitoring')
+    _number(problems, history, 'minutes', 'monitoring.quality_history', minimum=0.1)
+    _number(problems, history, 'sample_interval', 'monitoring.quality_history', minimum=0.1)
+    for key in ('fail_after', 'recover_after'):
+        _number(problems, history, key, 'monitoring.quality_history', minimum=1, integer=True)
+    for name, low_key, high_key in (('rtmp_stats', 'min_interval', 'max_interval'),
+                                    ('hotplug', 'debounce', 'max_delay')):
+        section = _section(problems, monitoring, name, 'monitoring')
+        low = _number(problems, section, low_key, f"monitoring.{name}")
+        high = _number(problems, section, high_key, f"monitoring.{name}")
+        if low is not None and high is not None and low > high:
+            problems.append(f"monitoring.{name}.{low_key} must not exceed {high_key}")
+
+    storage = _section(problems, raw, 'storage', 'config')
+    cleanup = _section(problems, storage, 'cleanup', 'storage')
+    low = _number(problems, cleanup, 'low_water', 'storage.cleanup')
+    high = _number(problems, cleanup, 'high_water', 'storage.cleanup')
+    if high is not None and high > 100:
+        problems.append("storage.cleanup.high_water is a percentage and must not exceed 100")
+    if low is not None and high is not None and low >= high:
+        problems.append("storage.cleanup.low_water must be below high_water")
+    if cleanup.get('policy') is not None and cleanup['policy'] not in POLICIES:
+        problems.append(f"storage.cleanup.policy must be one of {sorted(POLICIES)}, got {cleanup['policy']!r}")
+    for source, quota in _section(problems, cleanup, 'quotas', 'storage.cleanup').items():
+        _size(problems, quota, f"storage.cleanup.quotas.{source}")
+    clip_buffer = _section(problems, storage, 'clip_buffer', 'storage')
+    _number(problems, clip_buffer, 'segment_seconds', 'storage.clip_buffer', minimum=0.1)
+    _number(problems, clip_buffer, 'buffer_minutes', 'storage.clip_buffer', minimum=0.1)
+    catalog = _section(problems, storage, 'catalog', 'storage')
+    _number(problems, catalog, 'reconcile_interval', 'storage.catalog', minimum=1)
+
+    discovery = _section(problems, monitoring, 'network_discovery', 'monitoring')
+    _number(problems, discovery, 'batch_delay', 'monitoring.network_discovery')
+    service_types = discovery.get('service_types', [])
+    if not isinstance(service_types, (list, tuple)) or not all(
+            isinstance(service_type, str) and service_type.endswith('.local.') for service_type in service_types):
+        problems.append("monitoring.network_discovery.service_types must be a list like ['_rtsp._tcp.local.']")
+    health = _section(problems, monitoring, 'health', 'monitoring')
+    for key in ('interval', 'timeout', 'reconnect_after', 'backoff_max'):
+        _number(problems, health, key, 'monitoring.health', minimum=0.01)
+    _number(problems, health, 'concurrency', 'monitoring.health', minimum=1, integer=True)
+    for subsystem, enabled in _section(problems, monitoring, 'subsystems', 'monitoring').items():
+        if subsystem not in SUBSYSTEMS:
+            problems.append(f"monitoring.subsystems.{subsystem} is not one of {list(SUBSYSTEMS)}")
+        elif not isinstance(enabled, bool):
+            problems.append(f"monitoring.subsystems.{subsystem} must be true or false, got {enabled!r}")
+
+    obs = _section(problems, raw, 'obs', 'config')
+    _number(problems, obs, 'port', 'obs', minimum=1, integer=True)
+    master_scene = _section(problems, obs, 'master_scene', 'obs')
+    if 'sources' in master_scene:
+        scene_sources = master_scene['sources']
+        if not isinstance(scene_sources, list) or not all(
+                isinstance(source, Mapping) and source.get('name') for source in scene_sources):
+            problems.append("obs.master_scene.sources must be a list of sources with names")
+
+    twitch = _section(problems, raw, 'twitch', 'config')
+    stream_processing = twitch.get('stream_processing', True)
+    if not isinstance(stream_processing, bool):
+        problems.append(f"twitch.stream_processing must be true or false, got {stream_processing!r}")
+    return problems
+
+def parse_config(raw: Optional[Mapping]) -> StreamsConfig:
+    """Validate and freeze a parsed streams.yaml; raises ConfigError"""
+    raw = raw or {}
+    if not isinstance(raw, Mapping):
+        raise ConfigError(["config must be a mapping"])
+    problems = validate(raw)
+    if problems:
+        raise ConfigError(problems)
+    frozen = freeze(raw)
+    return StreamsConfig(
+        sources=frozen.get('sources') or EMPTY,
+        monitoring=frozen.get('monitoring') or EMPTY,
+        storage=frozen.get('storage') or EMPTY,
+        obs=frozen.get('obs') or EMPTY,
+        other=freeze({key: value for key, value in frozen.items() if key not in SUBTREES}),
+        source_index=SourceIndex(frozen.get('sources') or EMPTY)
+    )
+
+def load_config(path: Union[str, Path]) -> StreamsConfig:
+    try:
+        with open(path) as f:
+            raw = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise ConfigError([f"cannot read {path}: {e}"]) from e
+    return parse_config(raw)
+
+class _Inotify:
+    """Minimal inotify on a directory through libc; Linux only"""
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read_names(self) -> List[str]:
+        names = []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+Subscriber = Callable[[StreamsConfig, StreamsConfig], Optional[Awaitable[None]]]
+
+class ConfigWatcher:
+    """Current streams.yaml snapshot, reloaded when the file changes
+
+    The directory is watched (editors and ConfigMaps replace the file
+    rather than writing it in place), and a slow stat poll covers
+    filesystems that do not deliver inotify events, such as some bind
+    mounts. An invalid edit is logged and the previous config kept.
+    Subscribers registered for a subtree are called with (old, new)
+    snapshots after it changed; unchanged subtrees keep their identity.
+    """
+    def __init__(self, path: Union[str, Path], debounce: float = 0.2, poll_interval: float = 30):
+        self.logger = logging.getLogger('ConfigWatcher')
+        self.path = Path(path)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self._subscribers: Dict[str, List[Subscriber]] = {subtree: [] for subtree in SUBTREES}
+        self._signature = self._stat()
+        try:
+            self.current = load_config(self.path)
+            self.logger.info("Successfully loaded configuration")
+        except ConfigError as e:
+            self.logger.error(f"Failed to load config from {self.path}: {e}")
+            self.current = StreamsConfig()
+
+    def subscribe(self, subtree: str, callback: Subscriber):
+        if subtree not in self._subscribers:
+            raise ValueError(f"Unknown config subtree: {subtree}")
+        self._subscribers[subtree].append(callback)
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def reload(self) -> Set[str]:
+        """Swap in a fresh snapshot; returns the subtrees that changed"""
+        self._signature = self._stat()
+        try:
+            loaded = load_config(self.path)
+        except ConfigError as e:
+            self.logger.error(f"Keeping previous config, {self.path} is invalid: {e}")
+            return set()
+        old = self.current
+        changed = {subtree for subtree in SUBTREES if getattr(loaded, subtree) != getattr(old, subtree)}
+        if not changed:
+            return changed
+        replacements = {subtree: getattr(loaded, subtree) for subtree in changed}
+        if 'sources' in changed:
+            replacements['source_index'] = loaded.source_index
+        # A single reference assignment: readers see the old or the new snapshot, never a mix
+        self.current = dataclasses.replace(old, **replacements)
+        self.reloads += 1
+        self.logger.info(f"Reloaded configuration: {', '.join(sorted(changed))} changed")
+        return changed
+
+    async def apply(self) -> Set[str]:
+        """Reload and notify subscribers of the changed subtrees"""
+        old = self.current
+        changed = self.reload()
+        new = self.current
+        for subtree in SUBTREES:
+            if subtree not in changed:
+                continue
+            for callback in self._subscribers[subtree]:
+                try:
+                    result = callback(old, new)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    self.logger.error(f"Error applying {subtree} config change: {e}")
+        return changed
+
+    async def watch(self):
+        """Reload whenever the file changes; runs until cancelled"""
+        changes = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        inotify = None
+        try:
+            inotify = _Inotify(str(self.path.parent))
+        except (OSError, AttributeError) as e:
+            self.logger.warning(f"inotify unavailable ({e}); polling {self.path} every {self.poll_interval}s")
+
+        def on_readable():
+            names = inotify.read_names()
+            if self.path.name in names or any(name.startswith('..') for name in names):
+                changes.set()
+
+        if inotify is not None:
+            loop.add_reader(inotify.fd, on_readable)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(changes.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                # Let a burst of writes (truncate, write, rename) settle
+                while changes.is_set():
+                    changes.clear()
+                    await asyncio.sleep(self.debounce)
+                if self._stat() != self._signature:
+                    await self.apply()
+        finally:
+            if inotify is not None:
+                loop.remove_reader(inotify.fd)
+                inotify.close()
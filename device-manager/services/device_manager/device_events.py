@@ -0,0 +1,114 @@
+"""
+Debounced device event pipeline
+Carries pyudev events from the observer thread into asyncio and hands
+them on in bursts, one final state per device, so a hub re-plug costs
+one round of OBS updates instead of one per node and event
+Author: @Cdaprod
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+@dataclass
+class DeviceEvent:
+    action: str          # 'add', 'remove', 'change', ...
+    device: Any          # pyudev.Device (or anything with the same attributes)
+    key: str
+    events: int = 1      # Raw udev events coalesced into this one
+
+def net_action(previous: Optional[str], action: str) -> str:
+    """Action a device's burst comes down to, given the one so far
+
+    Once a burst has added or removed a device, only whether it ends up
+    present ('add') or absent ('remove') matters: an add followed by a
+    change or bind is still an add. change/bind on their own pass through.
+    """
+    if action == 'remove':
+        return 'remove'
+    if action == 'add' or previous in ('add', 'remove'):
+        return 'add'
+    return action
+
+def device_key(device) -> str:
+    """Stable identity of a device node across add/remove"""
+    return getattr(device, 'device_node', None) or device.sys_path
+
+class DeviceEventBridge:
+    """Thread-safe, debounced, coalescing bridge from udev to a coroutine
+
+    push() may be called from any thread (pyudev's MonitorObserver calls
+    it from its own); events are moved onto the loop with
+    call_soon_threadsafe. run() waits for a burst to go quiet for
+    `debounce` seconds (or until `max_delay` after its first event, so a
+    device that never settles still gets through), coalesces each
+    device's events into its net action (see net_action) and awaits
+    handler(events) once for the burst.
+    """
+    def __init__(self, handler: Callable[[List[DeviceEvent]], Awaitable[Any]],
+                 debounce: float = 0.5, max_delay: float = 2.0):
+        self.logger = logging.getLogger('DeviceEventBridge')
+        self.handler = handler
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.bursts = 0
+        self.events_received = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Attach to the loop run() will run on; call from that loop before pushing"""
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def push(self, action: str, device):
+        """Queue a udev event; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.logger.warning(f"Dropping {action} for {device_key(device)}: event loop not running")
+            return
+        try:
+            loop.call_soon_threadsafe(self._queue.put_nowait, (action, device))
+        except RuntimeError:
+            # The loop closed between the check and the call
+            pass
+
+    def observe(self, device):
+        """pyudev MonitorObserver callback"""
+        self.push(device.action, device)
+
+    async def next_burst(self) -> List[DeviceEvent]:
+        """Wait for the next burst; returns one net event per device, ordered by its last event"""
+        action, device = await self._queue.get()
+        deadline = time.monotonic() + self.max_delay
+        burst: Dict[str, DeviceEvent] = {}
+        while True:
+            self.events_received += 1
+            key = device_key(device)
+            previous = burst.pop(key, None)
+            # Re-insert so the order reflects each device's latest event
+            if previous is None:
+                burst[key] = DeviceEvent(action, device, key)
+            else:
+                burst[key] = DeviceEvent(net_action(previous.action, action), device, key, previous.events + 1)
+            timeout = min(self.debounce, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                action, device = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+        self.bursts += 1
+        return list(burst.values())
+
+    async def run(self):
+        if self._queue is None:
+            self.bind()
+        while True:
+            events = await self.next_burst()
+            try:
+                await self.handler(events)
+            except Exception as e:
+                self.logger.error(f"Error handling device events: {e}")
@@ -0,0 +1,36 @@
+"""
+Device registry types shared by the device manager services
+Author: @Cdaprod
+"""
+
+from typing import Dict, Optional, Any
+from dataclasses import dataclass
+from enum import Enum
+
+class StreamType(Enum):
+    """Enumeration of supported stream types"""
+    RTMP = "rtmp"
+    USB = "usb"
+    NETWORK = "network"
+
+class DeviceStatus(Enum):
+    """Enumeration of possible device statuses"""
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    ERROR = "error"
+    STREAMING = "streaming"
+
+@dataclass
+class DeviceInfo:
+    """Data class for storing device information"""
+    id: str
+    type: StreamType
+    name: str
+    status: DeviceStatus
+    address: str
+    stream_key: Optional[str] = None
+    last_seen: float = 0
+    reconnect_attempts: int = 0
+    settings: Dict[str, Any] = None
+    error_message: Optional[str] = None
@@ -7,71 +7,28 @@ Author: @Cdaprod
 
 import asyncio
 import logging
-import json
-import aiohttp
-import pyudev
-import v4l2
-import fcntl
+import os
+import shutil
 import time
-import yaml
-import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
-from enum import Enum
-from concurrent.futures import ThreadPoolExecutor
-from zeroconf import ServiceBrowser, Zeroconf
-from obswebsocket import obsws, requests as obsrequests
+from typing import Deque, Dict, List, Optional, Any
+from collections import deque
 from pathlib import Path
-
-class StreamType(Enum):
-    """Enumeration of supported stream types"""
-    RTMP = "rtmp"
-    USB = "usb"
-    NETWORK = "network"
-
-class DeviceStatus(Enum):
-    """Enumeration of possible device statuses"""
-    DISCONNECTED = "disconnected"
-    CONNECTING = "connecting"
-    CONNECTED = "connected"
-    ERROR = "error"
-    STREAMING = "streaming"
-
-@dataclass
-class DeviceInfo:
-    """Data class for storing device information"""
-    id: str
-    type: StreamType
-    name: str
-    status: DeviceStatus
-    address: str
-    stream_key: Optional[str] = None
-    last_seen: float = 0
-    reconnect_attempts: int = 0
-    settings: Dict[str, Any] = None
-    error_message: Optional[str] = None
-
-class StreamQuality:
-    """Stream quality metrics and thresholds"""
-    def __init__(self, config: dict):
-        self.bitrate: int = 0
-        self.fps: float = 0
-        self.resolution: str = ""
-        self.min_bitrate = config.get('bitrate_min', 2000000)
-        self.min_fps = config.get('framerate_min', 24)
-        self.min_resolution = config.get('resolution_min', '1920x1080')
-
-    def is_acceptable(self) -> bool:
-        """Check if current quality meets minimum thresholds"""
-        if self.bitrate < self.min_bitrate:
-            return False
-        if self.fps < self.min_fps:
-            return False
-        width, height = map(int, self.resolution.split('x'))
-        min_width, min_height = map(int, self.min_resolution.split('x'))
-        if width < min_width or height < min_height:
-            return False
-        return True
+from config_loader import ConfigWatcher, StreamsConfig
+from device_events import DeviceEvent, DeviceEventBridge
+from device_info import DeviceInfo, DeviceStatus, StreamType
+from event_hub import EventHub
+from eviction import EvictionPlan, bytes_to_free, execute_plan, format_size, plan_eviction, quotas_from_config
+from health_scheduler import HealthScheduler, backoff
+from metrics import MetricsRegistry, job_timer
+from obs_client import OBSClient
+from recording_catalog import RecordingCatalog, probe_recording
+from rtmp_callbacks import LIVE_APPLICATION, RTMPCallbackHandler
+from rtmp_stats import RTMPStatsClient, StreamStats
+from scene_state import SceneState
+from segment_buffer import SegmentBuffer
+from source_index import SourceIndex
+from stream_quality import StreamQuality
+from v4l2_probe import CapabilityCache, CaptureMode, best_mode, capability_key, parse_resolution, usb_budget, usb_speed
 
 class EnhancedDeviceManager:
     """Main device manager class"""
@@ -79,64 +36,287 @@ class EnhancedDeviceManager:
         self.logger = logging.getLogger('EnhancedDeviceManager')
         self.devices: Dict[str, DeviceInfo] = {}
         self.stream_qualities: Dict[str, StreamQuality] = {}
+        # Device node -> ids of the USB devices registered on it
+        self.usb_nodes: Dict[str, List[str]] = {}
+        # V4L2 modes, probed once per physical device, and the one picked per USB source
+        self.capabilities = CapabilityCache()
+        self.capture_modes: Dict[str, CaptureMode] = {}
         
-        # Load configuration
-        self.config = self.load_config(config_path)
+        # Load configuration (validated, immutable, reloaded when the file changes)
+        self.config_watcher = ConfigWatcher(config_path)
         
-        # Set up device monitoring
-        self.context = pyudev.Context()
-        self.monitor = pyudev.Monitor.from_netlink(self.context)
-        self.monitor.filter_by(subsystem='video4linux')
+        # Device monitoring; pyudev is imported when USB monitoring starts
+        self.context = None
+        self.observer = None
+        self.device_events = DeviceEventBridge(self.handle_device_events)
+        
+        # Per-device health checks, each on its own timer
+        self.health = HealthScheduler(self.check_device, self.device_check_failed)
         
-        # Set up network discovery
-        self.zeroconf = Zeroconf()
+        # Network discovery; zeroconf is imported when discovery starts
+        self.network_discovery = None
+        # mDNS service name -> id of the device registered for it
+        self.network_services: Dict[str, str] = {}
         
         # Set up OBS WebSocket connection
         self.obs_ws = None
-        self.obs_config = self.config.get('obs', {})
+        self.scene_state = None
+        # OBS messages sent while handling each hotplug/publish event, newest last
+        self.hotplug_obs_requests: Deque[int] = deque(maxlen=100)
+        
+        # Counters, gauges and histograms served at /metrics; the JSON views read them too
+        self.metrics = MetricsRegistry()
+        self.register_metrics()
+        # Live events pushed to dashboard WebSocket clients
+        self.events = EventHub()
+        
+        # Set up pooled nginx-rtmp /stat client
+        self.rtmp_stats = RTMPStatsClient()
+        
+        # Stream state pushed from nginx-rtmp on_publish/on_publish_done
+        self.rtmp_callbacks = RTMPCallbackHandler(
+            self.devices,
+            self.source_index,
+            on_change=self.handle_stream_changed,
+            on_recording=self.handle_recording_done
+        )
         
         # Set up storage manager
-        self.storage_config = self.config.get('storage', {})
-        self.recording_path = Path(self.storage_config.get('mount_point', '/data/recordings'))
+        self.apply_storage_config(self.config)
+        
+        # Index of recordings so cleanup never has to walk the NAS
+        self.catalog = RecordingCatalog(
+            self.config.storage.get('catalog', {}).get('path', '/data/ephemeral/recordings_catalog.sqlite'),
+            str(self.recording_path)
+        )
+        
+        # Rolling tmpfs segment buffers of live RTMP streams, for instant clips
+        self.segment_buffers: Dict[str, SegmentBuffer] = {}
+        
+        self.apply_monitoring_config(self.config)
+        self.config_watcher.subscribe('sources', self.apply_sources_change)
+        self.config_watcher.subscribe('monitoring', lambda old, new: self.apply_monitoring_config(new))
+        self.config_watcher.subscribe('storage', self.apply_storage_change)
+        self.config_watcher.subscribe('obs', self.apply_obs_change)
 
-    def load_config(self, path: str) -> dict:
-        """Load configuration from YAML file"""
-        try:
-            with open(path, 'r') as f:
-                config = yaml.safe_load(f)
-                self.logger.info("Successfully loaded configuration")
-                return config
-        except Exception as e:
-            self.logger.error(f"Failed to load config from {path}: {e}")
-            return {}
+    def register_metrics(self):
+        metrics = self.metrics
+        self.stream_bitrate = metrics.gauge('stream_bitrate_bps', 'Incoming bitrate of a live stream', ['stream'])
+        self.stream_fps = metrics.gauge('stream_fps', 'Frame rate of a live stream', ['stream'])
+        self.stream_quality_ok = metrics.gauge(
+            'stream_quality_acceptable', '1 while a stream meets the quality thresholds', ['stream'])
+        self.stream_dropped = metrics.counter(
+            'stream_dropped_frames_total', 'Frames nginx-rtmp dropped from a stream', ['stream'])
+        # Bitrate distribution since the stream appeared; its mean needs no history scan
+        self.stream_bitrate_samples = metrics.histogram(
+            'stream_bitrate_samples_bps', 'Bitrate samples of a live stream', ['stream'],
+            buckets=(5e5, 1e6, 2e6, 3e6, 4.5e6, 6e6, 8e6, 1e7, 1.5e7, 2e7, 5e7))
+        self.obs_latency = metrics.histogram(
+            'obs_request_seconds', 'Round trip of OBS WebSocket requests and batches', ['kind'])
+        self.hotplug_requests = metrics.histogram(
+            'hotplug_obs_requests', 'OBS messages sent while handling one device event',
+            buckets=(0, 1, 2, 3, 5, 8, 13, 21))
+        self.devices_gauge = metrics.gauge('devices', 'Registered devices', ['type', 'status'])
+        self.storage_used = metrics.gauge('storage_used_bytes', 'Bytes used on the recordings volume')
+        self.storage_total = metrics.gauge('storage_total_bytes', 'Size of the recordings volume')
+        self.job_duration = metrics.histogram(
+            'processing_job_seconds', 'Run time of post-processing jobs', ['status'],
+            buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+        self.time_job = job_timer(self.job_duration)
+        metrics.on_collect(self.collect_metrics)
+
+    def collect_metrics(self):
+        """Refresh the gauges that are read rather than tracked, just before a scrape"""
+        counts: Dict[tuple, int] = {}
+        for device in self.devices.values():
+            key = (device.type.value, device.status.value)
+            counts[key] = counts.get(key, 0) + 1
+        self.devices_gauge.children.clear()
+        for (device_type, status), count in counts.items():
+            self.devices_gauge.labels(device_type, status).set(count)
+        usage = shutil.disk_usage(self.recording_path)
+        self.storage_used.set(usage.used)
+        self.storage_total.set(usage.total)
+
+    def forget_stream_metrics(self, stream_key: str):
+        for metric in (self.stream_bitrate, self.stream_fps, self.stream_quality_ok,
+                       self.stream_dropped, self.stream_bitrate_samples):
+            metric.remove(stream_key)
+
+    def publish_device(self, device_info: DeviceInfo):
+        """Push a device's state to dashboard clients; unchanged state is not resent"""
+        self.events.publish('device', {
+            'id': device_info.id,
+            'name': device_info.name,
+            'device_type': device_info.type.value,
+            'status': device_info.status.value,
+            'address': device_info.address,
+            'stream_key': device_info.stream_key,
+            'error': device_info.error_message,
+        }, key=device_info.id, retain=True)
+
+    def publish_device_removed(self, device_id: str):
+        self.events.forget('device', device_id)
+        self.events.publish('device', {'id': device_id, 'status': 'removed'}, key=device_id)
+
+    def publish_stream_stats(self, stream_key: str, quality: Optional[StreamQuality]):
+        live = quality is not None and stream_key in self.rtmp_callbacks.streaming
+        stats = {'stream': stream_key, 'isLive': live}
+        if quality is not None:
+            stats.update(bitrate=quality.bitrate, fps=quality.fps, resolution=quality.resolution,
+                         quality=quality.score(), acceptable=quality.is_acceptable())
+        self.events.publish('stats', stats, key=stream_key, retain=True)
+
+    def publish_alerts(self):
+        """The streams currently below their quality thresholds"""
+        self.events.publish('alerts', {'alerts': [
+            {'stream': stream_key, 'bitrate': quality.bitrate, 'fps': quality.fps,
+             'resolution': quality.resolution, 'message': 'Stream quality below threshold'}
+            for stream_key, quality in self.stream_qualities.items() if not quality.is_acceptable()
+        ]}, retain=True)
+
+    def job_updated(self, job):
+        """ProcessingEngine on_update hook: time the job and push its progress"""
+        self.time_job(job)
+        finished = job.finished
+        self.events.publish('job', {
+            'job_id': job.job_id,
+            'status': job.status.value,
+            'progress': job.progress,
+            'error': job.error,
+        }, key=job.job_id, retain=not finished)
+        if finished:
+            self.events.forget('job', job.job_id)
+
+    @property
+    def config(self) -> StreamsConfig:
+        """Current config snapshot; read it per use rather than keeping subtrees"""
+        return self.config_watcher.current
+
+    @property
+    def source_index(self) -> SourceIndex:
+        return self.config.source_index
+
+    def apply_monitoring_config(self, config: StreamsConfig):
+        """Quality thresholds, /stat polling and hotplug debounce, applied in place"""
+        self.quality_thresholds = config.monitoring.get('quality_thresholds', {})
+        self.quality_history = config.monitoring.get('quality_history', {})
+        for quality in self.stream_qualities.values():
+            quality.set_thresholds(self.quality_thresholds)
+        
+        stats_config = config.monitoring.get('rtmp_stats', {})
+        self.rtmp_stats.url = stats_config.get('url', 'http://localhost:8080/stat')
+        self.rtmp_stats.min_interval = stats_config.get('min_interval', 1)
+        self.rtmp_stats.max_interval = stats_config.get('max_interval', 10)
+        self.rtmp_stats.interval = min(max(self.rtmp_stats.interval, self.rtmp_stats.min_interval),
+                                       self.rtmp_stats.max_interval)
+        
+        hotplug_config = config.monitoring.get('hotplug', {})
+        self.device_events.debounce = hotplug_config.get('debounce', 0.5)
+        self.device_events.max_delay = hotplug_config.get('max_delay', 2)
+        
+        # concurrency takes effect on restart; the rest on the next check
+        health_config = config.monitoring.get('health', {})
+        self.health.interval = health_config.get('interval', 5)
+        self.health.timeout = health_config.get('timeout', 3)
+        self.health.concurrency = health_config.get('concurrency', 32)
+        self.reconnect_after = health_config.get('reconnect_after', 30)
+        self.reconnect_backoff_max = health_config.get('backoff_max', 60)
+
+    def apply_storage_config(self, config: StreamsConfig):
+        storage_config = config.storage
+        self.recording_path = Path(storage_config.get('mount_point', '/data/recordings'))
+        self.reconcile_interval = storage_config.get('catalog', {}).get('reconcile_interval', 600)
+        
+        # Cleanup starts above high_water and deletes down to low_water (percent used)
+        cleanup_config = storage_config.get('cleanup', {})
+        self.high_water = cleanup_config.get('high_water', 90)
+        self.low_water = cleanup_config.get('low_water', 80)
+        self.eviction_policy = cleanup_config.get('policy', 'oldest')
+        self.eviction_quotas = quotas_from_config(config)
+        
+        self.clip_buffer_config = storage_config.get('clip_buffer', {})
+
+    async def apply_storage_change(self, old: StreamsConfig, new: StreamsConfig):
+        self.apply_storage_config(new)
+        for key in ('mount_point',):
+            if old.storage.get(key) != new.storage.get(key):
+                self.logger.warning(f"storage.{key} changed; the catalog keeps its root until restart")
+        if old.storage.get('catalog', {}).get('path') != new.storage.get('catalog', {}).get('path'):
+            self.logger.warning("storage.catalog.path changed; takes effect on restart")
+        # Running buffers keep their settings; stop them if clip buffering was turned off
+        if not self.clip_buffer_config.get('enabled', True):
+            for stream_key in list(self.segment_buffers):
+                await self.stop_segment_buffer(stream_key)
+
+    async def apply_sources_change(self, old: StreamsConfig, new: StreamsConfig):
+        """Pick up added, removed or edited sources without dropping state"""
+        self.rtmp_callbacks.sources = new.source_index
+        self.eviction_quotas = quotas_from_config(new)
+        for device_id, device_info in list(self.devices.items()):
+            if device_info.type == StreamType.USB and device_id not in new.sources:
+                self._forget_usb_node(device_info.address, device_id)
+                del self.devices[device_id]
+                self.publish_device_removed(device_id)
+                self.logger.info(f"Source removed from config: {device_info.name}")
+            elif device_info.type == StreamType.RTMP:
+                source = new.source_index.source(new.source_index.rtmp_source(device_info.stream_key))
+                device_info.name = source.get('name', device_info.stream_key)
+                device_info.settings = source.get('settings', {})
+                self.publish_device(device_info)
+        # Re-match discovered services and connected USB devices against the new sources
+        if self.network_discovery:
+            await self.handle_network_changes(list(self.network_discovery.records.values()), [])
+        if self.context:
+            await self.handle_device_events([
+                DeviceEvent('add', device, device.device_node)
+                for device in self.context.list_devices(subsystem='video4linux')
+            ])
+
+    async def apply_obs_change(self, old: StreamsConfig, new: StreamsConfig):
+        if not self.obs_ws:
+            return
+        self.logger.info("OBS connection settings changed, reconnecting")
+        await self.obs_ws.close()
+        await self.connect_obs()
 
     async def connect_obs(self):
-        """Connect to OBS via WebSocket"""
-        try:
-            host = self.obs_config.get('host', 'localhost')
-            port = self.obs_config.get('port', 4444)
-            password = self.obs_config.get('password', '')
-            
-            self.obs_ws = obsws(host, port, password)
-            await self.obs_ws.connect()
-            self.logger.info("Successfully connected to OBS WebSocket")
-        except Exception as e:
-            self.logger.error(f"Failed to connect to OBS WebSocket: {e}")
+        """Connect to OBS via WebSocket
+
+        The client connects in the background and reconnects on its own, so
+        startup does not wait for (or fail without) OBS.
+        """
+        obs_config = self.config.obs
+        host = obs_config.get('host', 'localhost')
+        port = obs_config.get('port', 4444)
+        password = obs_config.get('password', '')
+
+        self.obs_ws = OBSClient(host, port, password)
+        self.obs_ws.latency_observer = lambda kind, seconds: self.obs_latency.labels(kind).observe(seconds)
+        self.scene_state = SceneState(self.obs_ws)
+        await self.obs_ws.start()
 
     async def start(self):
-        """Start all monitoring and management tasks"""
+        """Start all monitoring and management tasks
+
+        Subsystems start side by side and none waits on another: OBS
+        connects in the background, and a subsystem disabled under
+        monitoring.subsystems is never imported.
+        """
         self.logger.info("Starting enhanced device manager...")
-        
-        # Connect to OBS
-        await self.connect_obs()
-        
-        # Start monitoring tasks
         tasks = [
-            self.monitor_usb_devices(),
             self.monitor_rtmp_streams(),
-            self.check_device_health(),
-            self.monitor_storage()
+            self.health.run(),
+            self.monitor_storage(),
+            self.reconcile_recordings(),
+            self.config_watcher.watch()
         ]
+        if self.config.enabled('obs'):
+            tasks.append(self.connect_obs())
+        if self.config.enabled('usb'):
+            tasks.append(self.monitor_usb_devices())
+        if self.config.enabled('network_discovery'):
+            tasks.append(self.start_network_discovery())
         
         try:
             await asyncio.gather(*tasks)
@@ -147,140 +327,422 @@ class EnhancedDeviceManager:
     async def monitor_usb_devices(self):
         """Monitor USB video devices"""
         self.logger.info("Starting USB device monitoring...")
+        import pyudev
+        self.context = pyudev.Context()
+        monitor = pyudev.Monitor.from_netlink(self.context)
+        monitor.filter_by(subsystem='video4linux')
         
-        def handle_udev_event(device):
-            if device.action == 'add':
-                asyncio.create_task(self.handle_device_added(device))
-            elif device.action == 'remove':
-                asyncio.create_task(self.handle_device_removed(device))
+        # The observer thread only queues events; bursts are handled on the loop
+        self.device_events.bind()
+        self.observer = pyudev.MonitorObserver(monitor, self.device_events.observe)
+        self.observer.start()
+
+        # Initial device scan, handled as a single burst
+        await self.handle_device_events([
+            DeviceEvent('add', device, device.device_node)
+            for device in self.context.list_devices(subsystem='video4linux')
+        ])
+        await self.device_events.run()
 
-        observer = pyudev.MonitorObserver(self.monitor, handle_udev_event)
-        observer.start()
+    async def start_network_discovery(self):
+        """Browse mDNS for network cameras"""
+        from network_discovery import SERVICE_TYPES, NetworkDiscovery
+        discovery_config = self.config.monitoring.get('network_discovery', {})
+        self.network_discovery = NetworkDiscovery(
+            self.handle_network_changes,
+            service_types=discovery_config.get('service_types', SERVICE_TYPES),
+            batch_delay=discovery_config.get('batch_delay', 0.5)
+        )
+        await self.network_discovery.start()
+        self.logger.info(f"Network discovery started for {', '.join(self.network_discovery.service_types)}")
 
-        # Initial device scan
-        for device in self.context.list_devices(subsystem='video4linux'):
-            await self.handle_device_added(device)
+    async def close(self):
+        """Release every subsystem that was started"""
+        self.events.close()
+        if self.observer:
+            self.observer.stop()
+        if self.network_discovery:
+            await self.network_discovery.close()
+        await self.rtmp_stats.close()
+        self.catalog.close()
+        for stream_key in list(self.segment_buffers):
+            await self.stop_segment_buffer(stream_key)
+        if self.obs_ws:
+            await self.obs_ws.close()
 
     async def monitor_rtmp_streams(self):
-        """Monitor RTMP streams and their health"""
+        """Reconcile RTMP stream state and collect metrics from /stat"""
         while True:
             try:
-                async with aiohttp.ClientSession() as session:
-                    url = 'http://localhost:8080/stat'
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            stats_xml = await response.text()
-                            await self.process_rtmp_stats(stats_xml)
+                observed_at = time.time()
+                streams = await self.rtmp_stats.fetch()
+                await self.process_rtmp_stats(streams, observed_at)
             except Exception as e:
                 self.logger.error(f"Error monitoring RTMP streams: {e}")
             
-            await asyncio.sleep(5)
+            await asyncio.sleep(self.rtmp_stats.interval)
 
-    async def process_rtmp_stats(self, stats_xml: str):
-        """Process RTMP statistics from nginx-rtmp"""
+    async def process_rtmp_stats(self, streams: List[StreamStats], observed_at: float):
+        """Process parsed RTMP statistics from nginx-rtmp
+
+        Publish state is pushed by the nginx callbacks; this only repairs
+        missed callbacks and updates quality metrics.
+        """
         try:
-            root = ET.fromstring(stats_xml)
-            for stream in root.findall(".//stream"):
-                stream_key = stream.find("name").text
-                if stream_key in self.devices:
-                    device_info = self.devices[stream_key]
-                    device_info.status = DeviceStatus.STREAMING
-                    device_info.last_seen = time.time()
-                    
-                    # Update quality metrics
-                    bw_in = stream.find("bw_in")
-                    if bw_in is not None:
-                        quality = self.stream_qualities.get(stream_key, StreamQuality(self.config))
-                        quality.bitrate = int(bw_in.text)
-                        if not quality.is_acceptable():
-                            self.logger.warning(f"Stream quality below threshold: {stream_key}")
+            live = [stream for stream in streams if stream.application == LIVE_APPLICATION]
+            self.rtmp_callbacks.reconcile((stream.name for stream in live), observed_at)
+            
+            for stream in live:
+                stream_key = stream.name
+                
+                # Update quality metrics
+                quality = self.stream_qualities.get(stream_key)
+                if quality is None:
+                    quality = StreamQuality(self.quality_thresholds, self.quality_history)
+                    self.stream_qualities[stream_key] = quality
+                was_acceptable = quality.is_acceptable()
+                dropped = quality.update(stream.bw_in, stream.fps, stream.resolution, stream.dropped, observed_at)
+                self.stream_bitrate.labels(stream_key).set(stream.bw_in)
+                self.stream_fps.labels(stream_key).set(stream.fps)
+                self.stream_quality_ok.labels(stream_key).set(int(quality.is_acceptable()))
+                self.stream_dropped.labels(stream_key).inc(dropped)
+                self.stream_bitrate_samples.labels(stream_key).observe(stream.bw_in)
+                self.publish_stream_stats(stream_key, quality)
+                if was_acceptable and not quality.is_acceptable():
+                    self.logger.warning(f"Stream quality below threshold: {stream_key}")
+                    self.publish_alerts()
+                elif not was_acceptable and quality.is_acceptable():
+                    self.logger.info(f"Stream quality recovered: {stream_key}")
+                    self.publish_alerts()
+            
+            # Forget streams whose whole history window has expired
+            for stream_key, quality in list(self.stream_qualities.items()):
+                if observed_at - quality.history.latest_timestamp > quality.window_seconds:
+                    del self.stream_qualities[stream_key]
+                    self.forget_stream_metrics(stream_key)
+                    self.events.forget('stats', stream_key)
+                    if not quality.is_acceptable():
+                        self.publish_alerts()
         except Exception as e:
             self.logger.error(f"Error processing RTMP stats: {e}")
 
-    async def handle_device_added(self, device):
-        """Handle new USB video device connection"""
+    async def handle_stream_changed(self, device_info: DeviceInfo):
+        """Point OBS at an RTMP stream as soon as it is published"""
+        sent = self.obs_requests_sent()
+        if device_info.status == DeviceStatus.STREAMING:
+            await self.start_segment_buffer(device_info.stream_key)
+            await self.update_obs_source(device_info)
+            self.health.schedule(device_info.id, self.health.interval)
+        else:
+            await self.stop_segment_buffer(device_info.stream_key)
+        self.publish_device(device_info)
+        self.publish_stream_stats(device_info.stream_key, self.stream_qualities.get(device_info.stream_key))
+        self.record_hotplug(device_info.stream_key, sent)
+
+    def obs_requests_sent(self) -> int:
+        return self.obs_ws.requests_sent if self.obs_ws else 0
+
+    def record_hotplug(self, device: str, sent_before: int):
+        requests = self.obs_requests_sent() - sent_before
+        self.hotplug_obs_requests.append(requests)
+        self.hotplug_requests.observe(requests)
+        self.logger.debug(f"Device event for {device} sent {requests} OBS requests")
+
+    async def start_segment_buffer(self, stream_key: str):
+        """Keep the last few minutes of a stream on tmpfs for create_clip"""
+        if not self.clip_buffer_config.get('enabled', True) or not stream_key:
+            return
+        segment_buffer = self.segment_buffers.get(stream_key)
+        if segment_buffer is None:
+            segment_buffer = SegmentBuffer.for_rtmp(
+                f'rtmp://localhost:1935/live/{stream_key}',
+                str(Path(self.clip_buffer_config.get('path', '/dev/shm/segments')) / stream_key),
+                segment_seconds=self.clip_buffer_config.get('segment_seconds', 2),
+                buffer_seconds=self.clip_buffer_config.get('buffer_minutes', 5) * 60
+            )
+            self.segment_buffers[stream_key] = segment_buffer
         try:
-            vendor_id = device.get('ID_VENDOR_ID')
-            product_id = device.get('ID_MODEL_ID')
-            
-            # Check against known devices in config
-            for device_id, config in self.config.get('sources', {}).items():
-                if config['type'] == 'usb':
-                    if (config['vendor_id'] == vendor_id and
-                        config['product_id'] == product_id):
-                        
-                        device_info = DeviceInfo(
-                            id=device_id,
-                            type=StreamType.USB,
-                            name=config['name'],
-                            status=DeviceStatus.CONNECTED,
-                            address=device.device_node,
-                            settings=config.get('settings', {}),
-                            last_seen=time.time()
-                        )
-                        
-                        self.devices[device_id] = device_info
-                        await self.update_obs_source(device_info)
-                        self.logger.info(f"Added USB device: {device_info.name}")
-        
+            await segment_buffer.start()
         except Exception as e:
-            self.logger.error(f"Error handling device addition: {e}")
+            self.logger.error(f"Failed to start segment buffer for {stream_key}: {e}")
+
+    async def stop_segment_buffer(self, stream_key: str):
+        segment_buffer = self.segment_buffers.pop(stream_key, None)
+        if segment_buffer is not None:
+            await segment_buffer.stop()
+
+    async def handle_device_events(self, events: List[DeviceEvent]):
+        """Apply a debounced burst of udev events, then update OBS once"""
+        sent = self.obs_requests_sent()
+        updated: Dict[str, DeviceInfo] = {}
+        added = {}
+        for event in events:
+            try:
+                if event.action == 'add':
+                    for device_info in self.register_usb_device(event.device):
+                        updated[device_info.id] = device_info
+                        added[device_info.id] = event.device
+                elif event.action == 'remove':
+                    for device_info in self.unregister_usb_device(event.device):
+                        updated.pop(device_info.id, None)
+                        added.pop(device_info.id, None)
+                        self.publish_device(device_info)
+            except Exception as e:
+                self.logger.error(f"Error handling device {event.action} for {event.key}: {e}")
+        await asyncio.gather(*(self.choose_capture_mode(updated[device_id], device)
+                               for device_id, device in added.items()))
+        await self.update_obs_sources(list(updated.values()))
+        for device_id, device_info in updated.items():
+            self.health.schedule(device_id, self.health.interval)
+            self.publish_device(device_info)
+        self.record_hotplug(', '.join(event.key for event in events), sent)
+
+    def register_usb_device(self, device) -> List[DeviceInfo]:
+        """Register a new USB video device against the configured sources"""
+        added = []
+        for device_id in self.source_index.match_usb(device):
+            config = self.source_index.source(device_id)
+            device_info = DeviceInfo(
+                id=device_id,
+                type=StreamType.USB,
+                name=config.get('name') or config.get('device_name') or device_id,
+                status=DeviceStatus.CONNECTED,
+                address=device.device_node,
+                settings=config.get('settings', {}),
+                last_seen=time.time()
+            )
+            
+            previous = self.devices.get(device_id)
+            if previous is not None and previous.address != device.device_node:
+                self._forget_usb_node(previous.address, device_id)
+            self.devices[device_id] = device_info
+            node_devices = self.usb_nodes.setdefault(device.device_node, [])
+            if device_id not in node_devices:
+                node_devices.append(device_id)
+            added.append(device_info)
+            self.logger.info(f"Added USB device: {device_info.name}")
+        return added
+
+    async def choose_capture_mode(self, device_info: DeviceInfo, device):
+        """Pick the V4L2 mode that best delivers the source's resolution and framerate
+
+        Capabilities are probed (off the loop) the first time a physical
+        device is seen and served from the cache on every replug.
+        """
+        if 'capture' not in device.get('ID_V4L_CAPABILITIES', ':capture:'):
+            return
+        key = capability_key(device)
+        modes = self.capabilities.get(key)
+        if modes is None:
+            try:
+                modes = await asyncio.to_thread(self.capabilities.probe, key, device.device_node)
+            except OSError as e:
+                self.logger.warning(f"Could not probe {device.device_node}: {e}")
+                return
+        config = self.source_index.source(device_info.id)
+        width, height = parse_resolution(config.get('resolution'), (3840, 2160))
+        mode = best_mode(modes, width, height, config.get('framerate', 30), usb_budget(usb_speed(device)))
+        if mode is None:
+            self.capture_modes.pop(device_info.id, None)
+            return
+        self.capture_modes[device_info.id] = mode
+        self.logger.info(f"{device_info.name}: capturing {mode.fourcc} {mode.width}x{mode.height}@{mode.fps}")
+
+    def unregister_usb_device(self, device) -> List[DeviceInfo]:
+        """Mark USB devices on a removed node as disconnected"""
+        removed = []
+        for device_id in self.usb_nodes.pop(device.device_node, ()):
+            device_info = self.devices.get(device_id)
+            if device_info is not None and device_info.address == device.device_node:
+                device_info.status = DeviceStatus.DISCONNECTED
+                removed.append(device_info)
+                self.logger.info(f"Removed USB device: {device_info.name}")
+        return removed
+
+    async def handle_network_changes(self, changed: list, removed: List[str]):
+        """Apply a batch of discovered mDNS services, then update OBS once"""
+        sent = self.obs_requests_sent()
+        for name in removed:
+            device_info = self.devices.get(self.network_services.pop(name, None))
+            if device_info is None:
+                continue
+            self.logger.info(f"Network device gone: {device_info.name}")
+            if self.source_index.source(device_info.id):
+                device_info.status = DeviceStatus.DISCONNECTED
+                self.publish_device(device_info)
+            else:
+                # Only ever known from discovery; nothing to keep
+                del self.devices[device_info.id]
+                self.publish_device_removed(device_info.id)
+        updated = [self.register_network_device(record) for record in changed]
+        await self.update_obs_sources(updated)
+        for device_info in updated:
+            self.health.schedule(device_info.id, self.health.interval)
+            self.publish_device(device_info)
+        self.record_hotplug(', '.join([record.instance for record in changed] + removed), sent)
+
+    def register_network_device(self, record) -> DeviceInfo:
+        """Register a resolved mDNS service (network_discovery.ServiceRecord)
+
+        A network source whose service_name is the service's instance name
+        supplies its id, name and settings; other services are registered
+        under their mDNS name.
+        """
+        source_id = self.source_index.network_source(record.instance)
+        config = self.source_index.source(source_id)
+        device_info = DeviceInfo(
+            id=source_id or record.name,
+            type=StreamType.NETWORK,
+            name=config.get('name') or record.instance,
+            status=DeviceStatus.CONNECTED,
+            address=record.address,
+            settings={**record.obs_settings(), **config.get('settings', {})},
+            last_seen=time.time()
+        )
+        previous = self.network_services.get(record.name)
+        if previous is not None and previous != device_info.id:
+            self.devices.pop(previous, None)
+        self.devices[device_info.id] = device_info
+        self.network_services[record.name] = device_info.id
+        self.logger.info(f"Discovered network device: {device_info.name} at {device_info.address}")
+        return device_info
+
+    def _forget_usb_node(self, node: str, device_id: str):
+        node_devices = self.usb_nodes.get(node, [])
+        if device_id in node_devices:
+            node_devices.remove(device_id)
+        if not node_devices:
+            self.usb_nodes.pop(node, None)
+
+    def obs_source_settings(self, device_info: DeviceInfo) -> dict:
+        settings = dict(device_info.settings or {})
+        if device_info.type == StreamType.USB:
+            mode = self.capture_modes.get(device_info.id)
+            settings.update({
+                'device': device_info.address,
+                'input_format': settings.get('input_format', mode.input_format if mode else 'mjpeg'),
+                'resolution': settings.get('resolution', f"{mode.width}x{mode.height}" if mode else '3840x2160'),
+                'fps': settings.get('fps', mode.fps if mode else 30)
+            })
+        elif device_info.type == StreamType.RTMP:
+            settings.update({
+                'url': f'rtmp://localhost:1935/live/{device_info.stream_key}',
+                'reconnect': True,
+                'reconnect_delay_sec': 2
+            })
+        return settings
 
     async def update_obs_source(self, device_info: DeviceInfo):
-        """Update OBS source settings"""
-        if self.obs_ws and self.obs_ws.is_connected():
+        """Update OBS source settings; nothing is sent if OBS already has them"""
+        await self.update_obs_sources([device_info])
+
+    async def update_obs_sources(self, device_infos: List[DeviceInfo]):
+        """Update several OBS sources in one batch, skipping unchanged ones"""
+        if device_infos and self.obs_ws and self.obs_ws.is_connected():
             try:
-                settings = device_info.settings or {}
-                if device_info.type == StreamType.USB:
-                    settings.update({
-                        'device': device_info.address,
-                        'input_format': settings.get('input_format', 'mjpeg'),
-                        'resolution': settings.get('resolution', '3840x2160'),
-                        'fps': settings.get('fps', 30)
-                    })
-                elif device_info.type == StreamType.RTMP:
-                    settings.update({
-                        'url': f'rtmp://localhost:1935/live/{device_info.stream_key}',
-                        'reconnect': True,
-                        'reconnect_delay_sec': 2
-                    })
-                
-                await self.obs_ws.call(obsrequests.SetSourceSettings(
-                    sourceName=device_info.name,
-                    sourceSettings=settings
-                ))
-                self.logger.info(f"Updated OBS source: {device_info.name}")
+                updated = await self.scene_state.set_input_settings_many({
+                    device_info.name: self.obs_source_settings(device_info) for device_info in device_infos
+                })
+                for name in updated:
+                    self.logger.info(f"Updated OBS source: {name}")
                 
             except Exception as e:
                 self.logger.error(f"Failed to update OBS source: {e}")
 
-    async def check_device_health(self):
-        """Periodic health check for all devices"""
-        while True:
-            try:
-                current_time = time.time()
-                for device_id, device_info in list(self.devices.items()):
-                    if device_info.status != DeviceStatus.CONNECTED:
-                        if current_time - device_info.last_seen > 30:
-                            await self.trigger_reconnect(device_info)
-                    
-                    if device_info.status == DeviceStatus.CONNECTED:
-                        await self.verify_device_streaming(device_info)
-                        
-            except Exception as e:
-                self.logger.error(f"Error in health check: {e}")
-            
-            await asyncio.sleep(5)
+    async def check_device(self, device_id: str) -> Optional[float]:
+        """Health check of one device; returns seconds until its next one
+
+        Healthy devices are checked every interval. Devices that have
+        been down for reconnect_after seconds get a reconnect attempt,
+        retried with exponential backoff on reconnect_attempts. RTMP
+        publishers reconnect on their own, and on_publish reschedules
+        them, so they are dropped from the schedule until then.
+        """
+        device_info = self.devices.get(device_id)
+        if device_info is None:
+            return None
+        if device_info.status in (DeviceStatus.CONNECTED, DeviceStatus.STREAMING):
+            if await self.verify_device_streaming(device_info):
+                return self.health.interval
+        if device_info.type == StreamType.RTMP:
+            return None
+        if time.time() - device_info.last_seen < self.reconnect_after:
+            return self.health.interval
+        if await self.trigger_reconnect(device_info):
+            return self.health.interval
+        return backoff(device_info.reconnect_attempts, self.health.interval, self.reconnect_backoff_max)
+
+    def device_check_failed(self, device_id: str, error: BaseException) -> Optional[float]:
+        """A check raised or timed out: mark the device and back off"""
+        device_info = self.devices.get(device_id)
+        if device_info is None:
+            return None
+        device_info.status = DeviceStatus.ERROR
+        device_info.error_message = str(error)
+        device_info.reconnect_attempts += 1
+        self.publish_device(device_info)
+        return backoff(device_info.reconnect_attempts, self.health.interval, self.reconnect_backoff_max)
+
+    async def verify_device_streaming(self, device_info: DeviceInfo) -> bool:
+        """Whether a connected device is still there; marks it disconnected if not"""
+        if device_info.type == StreamType.USB:
+            healthy = os.path.exists(device_info.address)
+        elif device_info.type == StreamType.NETWORK:
+            healthy = await self.probe_network_device(device_info)
+        else:
+            # nginx-rtmp callbacks and /stat reconciliation keep this current
+            healthy = device_info.status == DeviceStatus.STREAMING
+        if healthy:
+            device_info.last_seen = time.time()
+        elif device_info.status != DeviceStatus.DISCONNECTED:
+            device_info.status = DeviceStatus.DISCONNECTED
+            self.logger.warning(f"Device stopped responding: {device_info.name}")
+            self.publish_device(device_info)
+        return healthy
+
+    async def trigger_reconnect(self, device_info: DeviceInfo) -> bool:
+        """One reconnect attempt; resets reconnect_attempts on success"""
+        device_info.status = DeviceStatus.CONNECTING
+        if device_info.type == StreamType.USB:
+            reconnected = os.path.exists(device_info.address)
+        else:
+            reconnected = await self.probe_network_device(device_info)
+        if not reconnected:
+            device_info.status = DeviceStatus.DISCONNECTED
+            device_info.reconnect_attempts += 1
+            self.logger.info(f"Reconnect attempt {device_info.reconnect_attempts} failed: {device_info.name}")
+            self.publish_device(device_info)
+            return False
+        device_info.status = DeviceStatus.CONNECTED
+        device_info.last_seen = time.time()
+        device_info.reconnect_attempts = 0
+        device_info.error_message = None
+        self.logger.info(f"Reconnected device: {device_info.name}")
+        self.publish_device(device_info)
+        await self.update_obs_source(device_info)
+        return True
+
+    async def probe_network_device(self, device_info: DeviceInfo) -> bool:
+        """TCP connect to a network device's host:port"""
+        host, _, port = device_info.address.rpartition(':')
+        try:
+            _, writer = await asyncio.open_connection(host, int(port))
+        except (OSError, ValueError) as e:
+            device_info.error_message = str(e)
+            return False
+        writer.close()
+        return True
 
     async def monitor_storage(self):
         """Monitor NAS storage space and manage recordings"""
         while True:
             try:
-                space = self.recording_path.stat().st_free
-                total = self.recording_path.stat().st_size
-                used_percent = (total - space) / total * 100
+                usage = shutil.disk_usage(self.recording_path)
+                used_percent = usage.used / usage.total * 100
+                self.events.publish('storage', {'used': usage.used, 'total': usage.total,
+                                                'used_percent': round(used_percent, 1)}, retain=True)
                 
-                if used_percent > 90:
+                if used_percent > self.high_water:
                     self.logger.warning(f"Storage space critical: {used_percent:.1f}% used")
                     await self.cleanup_old_recordings()
                     
@@ -289,25 +751,50 @@ class EnhancedDeviceManager:
             
             await asyncio.sleep(300)  # Check every 5 minutes
 
-    async def cleanup_old_recordings(self):
-        """Clean up old recordings when storage is low"""
+    async def reconcile_recordings(self):
+        """Periodically repair the recording catalog from changed directories"""
+        while True:
+            try:
+                start = time.monotonic()
+                listed = await asyncio.to_thread(self.catalog.reconcile)
+                self.logger.debug(
+                    f"Reconciled recording catalog: {listed} directories listed "
+                    f"in {time.monotonic() - start:.2f}s"
+                )
+            except Exception as e:
+                self.logger.error(f"Error reconciling recording catalog: {e}")
+            
+            await asyncio.sleep(self.reconcile_interval)
+
+    async def handle_recording_done(self, stream_key: str, path: str):
+        """Index a recording nginx has just closed"""
         try:
-            # Get all recordings sorted by modification time
-            recordings = sorted(
-                self.recording_path.glob('**/*.mp4'),
-                key=lambda p: p.stat().st_mtime
+            duration, codec = await probe_recording(path)
+            self.catalog.add(path, source=stream_key, duration=duration, codec=codec)
+        except Exception as e:
+            self.logger.error(f"Error indexing recording {path}: {e}")
+
+    async def cleanup_old_recordings(self, dry_run: bool = False) -> Optional[EvictionPlan]:
+        """Delete enough recordings to get back under the low-water mark
+        
+        The byte budget is computed once from disk usage, victims come from
+        the catalog by policy, and the deletes run as one batch in a thread.
+        """
+        try:
+            bytes_needed = bytes_to_free(str(self.recording_path), self.low_water)
+            plan = await asyncio.to_thread(
+                plan_eviction, self.catalog, bytes_needed, self.eviction_policy, self.eviction_quotas
             )
+            for line in plan.describe():
+                self.logger.info(line)
+            if dry_run:
+                return plan
             
-            # Remove oldest recordings until we're below 80% usage
-            while len(recordings) > 0:
-                space = self.recording_path.stat().st_free
-                total = self.recording_path.stat().st_size
-                if (total - space) / total * 100 < 80:
-                    break
-                    
-                oldest = recordings.pop(0)
-                oldest.unlink()
-                self.logger.info(f"Removed old recording: {oldest}")
+            freed, failed = await asyncio.to_thread(execute_plan, plan, self.catalog)
+            self.logger.info(
+                f"Removed {len(plan.victims) - len(failed)} old recordings, freed {format_size(freed)}"
+            )
+            return plan
                 
         except Exception as e:
             self.logger.error(f"Error cleaning up recordings: {e}")
@@ -330,7 +817,15 @@ class EnhancedDeviceManager:
             timestamp = time.strftime('%Y%m%d_%H%M%S')
             clip_file = clip_path / f"clip_{timestamp}.mp4"
             
-            # Create clip using ffmpeg
+            # Last `duration` seconds from the rolling buffer, no re-encode
+            segment_buffer = self.segment_buffers.get(stream_key)
+            if segment_buffer is not None and segment_buffer.segments:
+                clipped = await segment_buffer.clip(duration, str(clip_file))
+                self.catalog.add(str(clip_file), source=stream_key, duration=clipped)
+                self.logger.info(f"Created clip: {clip_file} ({clipped:.1f}s from buffer)")
+                return str(clip_file)
+            
+            # No buffer yet: record the next `duration` seconds instead
             process = await asyncio.create_subprocess_exec(
                 'ffmpeg',
                 '-i', f'rtmp://localhost:1935/live/{stream_key}',
@@ -368,9 +863,7 @@ async def main():
         while True:
             await asyncio.sleep(1)
     except KeyboardInterrupt:
-        manager.zeroconf.close()
-        if manager.obs_ws:
-            await manager.obs_ws.disconnect()
+        await manager.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
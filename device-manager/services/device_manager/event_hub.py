@@ -0,0 +1,115 @@
+"""
+Live event fan-out for dashboard WebSocket clients
+Device, stream quality, job and storage events are serialized once and
+offered to every subscriber's bounded queue; a slow client gets the
+newest value of each topic instead of a growing backlog
+Author: @Cdaprod
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+class Subscriber:
+    """Bounded queue of serialized events for one client
+
+    An event whose topic already has an undelivered event replaces it in
+    place, so a client that falls behind skips intermediate values
+    rather than queueing them. Once `maxsize` topics are waiting, the
+    oldest is dropped to make room.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.pending: 'OrderedDict[Hashable, str]' = OrderedDict()
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._sequence = itertools.count()
+
+    def offer(self, topic: Optional[Hashable], message: str):
+        if topic is None:
+            # Not coalesced: every event gets a slot of its own
+            topic = next(self._sequence)
+        elif topic in self.pending:
+            self.pending[topic] = message
+            self.coalesced += 1
+            return
+        if len(self.pending) >= self.maxsize:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[topic] = message
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        while not self.pending:
+            if self.closed:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        return self.pending.popitem(last=False)[1]
+
+class EventHub:
+    """In-process pub/sub of JSON events for many WebSocket subscribers
+
+    publish() serializes an event once and offers the same string to
+    every subscriber; it never waits on a client. Events are coalesced
+    per (type, key) topic. Retained topics keep their latest event, which
+    new subscribers receive first; republishing an unchanged retained
+    event is a no-op, so callers can publish state whenever it may have
+    changed.
+    """
+    def __init__(self, queue_size: int = 256):
+        self.logger = logging.getLogger('EventHub')
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscriber] = set()
+        self.retained: Dict[Tuple[str, Any], str] = {}
+        self.published = 0
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        for topic, message in self.retained.items():
+            subscriber.offer(topic, message)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        subscriber.close()
+
+    def publish(self, event_type: str, data: Dict[str, Any], key: Any = None,
+                retain: bool = False, coalesce: bool = True) -> bool:
+        """Send {'type': event_type, **data} to every subscriber; False if unchanged"""
+        message = json.dumps({'type': event_type, **data}, separators=(',', ':'), default=str)
+        topic = (event_type, key)
+        if retain:
+            if self.retained.get(topic) == message:
+                return False
+            self.retained[topic] = message
+        self.published += 1
+        if not coalesce:
+            topic = None
+        for subscriber in self.subscribers:
+            subscriber.offer(topic, message)
+        return True
+
+    def forget(self, event_type: str, key: Any = None):
+        """Stop retaining a topic, e.g. a stream that has ended"""
+        self.retained.pop((event_type, key), None)
+
+    def close(self):
+        for subscriber in list(self.subscribers):
+            self.unsubscribe(subscriber)
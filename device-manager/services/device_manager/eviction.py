@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Byte-budget eviction planning for recording storage
+Works out up front how many bytes must go to reach the low-water mark,
+picks victims from the recording catalog by policy, then deletes them in
+one batch
+Author: @Cdaprod
+"""
+
+import argparse
+import logging
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import yaml
+from recording_catalog import Recording, RecordingCatalog
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+logger = logging.getLogger('EvictionPlanner')
+
+def parse_size(value) -> int:
+    """Bytes from an int or a string like "500GB" / "1.5T" (binary units)"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+def bytes_to_free(path: str, low_water_percent: float) -> int:
+    """Bytes that must be deleted for usage of path's filesystem to reach the mark"""
+    usage = shutil.disk_usage(path)
+    return max(0, int(usage.used - usage.total * low_water_percent / 100))
+
+@dataclass
+class EvictionPlan:
+    policy: str
+    bytes_needed: int
+    victims: List[Recording] = field(default_factory=list)
+    bytes_planned: int = 0
+
+    @property
+    def shortfall(self) -> int:
+        """Bytes still missing if every indexed recording was already chosen"""
+        return max(0, self.bytes_needed - self.bytes_planned)
+
+    def describe(self, limit: Optional[int] = 20) -> List[str]:
+        """Human-readable plan, as printed for a dry run"""
+        lines = [
+            f"Need {format_size(self.bytes_needed)}; policy '{self.policy}' selects "
+            f"{len(self.victims)} recordings, {format_size(self.bytes_planned)}"
+        ]
+        for recording in self.victims[:limit]:
+            age = time.strftime('%Y-%m-%d %H:%M', time.localtime(recording.mtime))
+            lines.append(f"  {age}  {format_size(recording.size):>10}  {recording.source or '-':<16} {recording.path}")
+        if limit is not None and len(self.victims) > limit:
+            lines.append(f"  ... and {len(self.victims) - limit} more")
+        if self.shortfall:
+            lines.append(f"  Short by {format_size(self.shortfall)}: not enough indexed recordings")
+        return lines
+
+class _Planner:
+    """Accumulates victims until the byte budget is met"""
+    def __init__(self, bytes_needed: int):
+        self.bytes_needed = bytes_needed
+        self.victims: List[Recording] = []
+        self.chosen: Set[str] = set()
+        self.planned = 0
+
+    @property
+    def done(self) -> bool:
+        return self.planned >= self.bytes_needed
+
+    def take(self, recordings: Iterable[Recording], predicate: Optional[Callable[[Recording], bool]] = None,
+             budget: Optional[int] = None):
+        """Choose recordings in order until done, or until `budget` bytes were taken here"""
+        taken = 0
+        for recording in recordings:
+            if self.done or (budget is not None and taken >= budget):
+                return
+            if recording.path in self.chosen or (predicate and not predicate(recording)):
+                continue
+            self.victims.append(recording)
+            self.chosen.add(recording.path)
+            self.planned += recording.size
+            taken += recording.size
+
+def _oldest_first(catalog: RecordingCatalog, planner: _Planner, quotas: Dict[str, int]):
+    planner.take(catalog.oldest())
+
+def _source_quotas(catalog: RecordingCatalog, planner: _Planner, quotas: Dict[str, int]):
+    """Trim sources above their quota first, largest excess first, then oldest overall"""
+    usage = catalog.usage_by_source()
+    excess = sorted(
+        ((usage.get(source, 0) - quota, source) for source, quota in quotas.items()),
+        reverse=True
+    )
+    for over, source in excess:
+        if over <= 0:
+            break
+        planner.take(catalog.oldest(source=source), budget=over)
+    planner.take(catalog.oldest())
+
+def is_clip(recording: Recording) -> bool:
+    return 'clips' in Path(recording.path).parts
+
+def is_raw(recording: Recording) -> bool:
+    return recording.path.lower().endswith('.flv')
+
+def _raw_first(catalog: RecordingCatalog, planner: _Planner, quotas: Dict[str, int]):
+    """Raw nginx FLV recordings, then processed recordings; clips go last"""
+    planner.take(catalog.oldest(), is_raw)
+    planner.take(catalog.oldest(), lambda recording: not is_clip(recording))
+    planner.take(catalog.oldest())
+
+POLICIES: Dict[str, Callable[[RecordingCatalog, _Planner, Dict[str, int]], None]] = {
+    'oldest': _oldest_first,
+    'quota': _source_quotas,
+    'raw_first': _raw_first,
+}
+
+def plan_eviction(catalog: RecordingCatalog, bytes_needed: int, policy: str = 'oldest',
+                  quotas: Optional[Dict[str, int]] = None) -> EvictionPlan:
+    """Choose recordings to delete so that at least bytes_needed are freed"""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown eviction policy: {policy}")
+    planner = _Planner(bytes_needed)
+    if bytes_needed > 0:
+        POLICIES[policy](catalog, planner, quotas or {})
+    return EvictionPlan(policy, bytes_needed, planner.victims, planner.planned)
+
+def execute_plan(plan: EvictionPlan, catalog: RecordingCatalog) -> Tuple[int, List[str]]:
+    """Delete the planned recordings; returns (bytes freed, paths that failed)
+
+    Blocking: run it in a thread. Files already gone are dropped from the
+    catalog like deleted ones.
+    """
+    freed = 0
+    removed: List[str] = []
+    failed: List[str] = []
+    for recording in plan.victims:
+        try:
+            os.unlink(recording.path)
+            freed += recording.size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to remove {recording.path}: {e}")
+            failed.append(recording.path)
+            continue
+        removed.append(recording.path)
+    catalog.remove_many(removed)
+    return freed, failed
+
+def quotas_from_config(config: dict) -> Dict[str, int]:
+    """Per-source byte quotas keyed like catalog sources
+
+    Devices declare `recording.quota` (keyed by stream_key when they have
+    one, as nginx recordings are); other sources such as twitch are listed
+    under storage.cleanup.quotas.
+    """
+    quotas: Dict[str, int] = {}
+    for name, source in (config.get('sources') or {}).items():
+        quota = (source.get('recording') or {}).get('quota')
+        if quota is not None:
+            quotas[source.get('stream_key', name)] = parse_size(quota)
+    for source, quota in ((config.get('storage') or {}).get('cleanup', {}).get('quotas') or {}).items():
+        quotas[source] = parse_size(quota)
+    return quotas
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan (and optionally run) recording cleanup")
+    parser.add_argument('--config', default='/app/config/streams.yaml')
+    parser.add_argument('--policy', choices=sorted(POLICIES))
+    parser.add_argument('--low-water', type=float, help='Target usage percent')
+    parser.add_argument('--bytes', help='Plan for this many bytes instead of current disk usage, e.g. 200GB')
+    parser.add_argument('--execute', action='store_true', help='Delete the planned recordings (default: dry run)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f) or {}
+    storage_config = config.get('storage', {})
+    cleanup_config = storage_config.get('cleanup', {})
+    root = storage_config.get('mount_point', '/data/recordings')
+    catalog = RecordingCatalog(
+        storage_config.get('catalog', {}).get('path', '/data/ephemeral/recordings_catalog.sqlite'), root
+    )
+    catalog.reconcile()
+
+    low_water = args.low_water if args.low_water is not None else cleanup_config.get('low_water', 80)
+    bytes_needed = parse_size(args.bytes) if args.bytes else bytes_to_free(root, low_water)
+    plan = plan_eviction(catalog, bytes_needed, args.policy or cleanup_config.get('policy', 'oldest'),
+                         quotas_from_config(config))
+    print("\n".join(plan.describe(limit=None)))
+    if args.execute:
+        freed, failed = execute_plan(plan, catalog)
+        print(f"Freed {format_size(freed)}, {len(failed)} failures")
+    catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Per-device health check scheduling
+Keeps one timer per device in a heap keyed by when its next check is
+due and runs the due checks concurrently, bounded and with a timeout
+each, so a slow or hung device only ever delays itself
+Author: @Cdaprod
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# check(device_id) -> seconds until the next check, or None to stop checking it
+Check = Callable[[str], Awaitable[Optional[float]]]
+# on_failure(device_id, error) -> the same, after a check raised or timed out
+OnFailure = Callable[[str, BaseException], Optional[float]]
+
+def backoff(attempts: int, base: float, cap: float) -> float:
+    """Delay before reconnect attempt `attempts` + 1: base, 2x base, 4x base, ... up to cap"""
+    return min(cap, base * 2 ** min(attempts, 32))
+
+class HealthScheduler:
+    """Runs each device's health check when it falls due
+
+    Each device has at most one pending due time; schedule() only ever
+    moves it earlier, and stale heap entries are skipped when popped. A
+    check never overlaps with another check of the same device: if it
+    falls due again while running it is re-run as soon as it finishes.
+    At most `concurrency` checks run at once, each cut off after
+    `timeout` seconds and handed to on_failure.
+    """
+    def __init__(self, check: Check, on_failure: Optional[OnFailure] = None,
+                 interval: float = 5.0, timeout: float = 3.0, concurrency: int = 32):
+        self.logger = logging.getLogger('HealthScheduler')
+        self.check = check
+        self.on_failure = on_failure
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.heap: List[Tuple[float, int, str]] = []
+        self.due: Dict[str, float] = {}
+        self.running: Set[str] = set()
+        self.rerun: Set[str] = set()
+        self.checks = 0
+        self.timeouts = 0
+        self._order = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, device_id: str, delay: float = 0):
+        """Check device_id within `delay` seconds"""
+        at = time.monotonic() + delay
+        if self.due.get(device_id, float('inf')) <= at:
+            return
+        self.due[device_id] = at
+        heapq.heappush(self.heap, (at, next(self._order), device_id))
+        if self._wakeup is not None and self.heap[0][2] == device_id:
+            self._wakeup.set()
+
+    def remove(self, device_id: str):
+        self.due.pop(device_id, None)
+        self.rerun.discard(device_id)
+
+    def __len__(self) -> int:
+        return len(self.due.keys() | self.running)
+
+    def _start_due(self, now: float, semaphore: asyncio.Semaphore):
+        while self.heap and self.heap[0][0] <= now:
+            at, _, device_id = heapq.heappop(self.heap)
+            if self.due.get(device_id) != at:
+                continue
+            del self.due[device_id]
+            if device_id in self.running:
+                self.rerun.add(device_id)
+                continue
+            self.running.add(device_id)
+            task = asyncio.create_task(self._run_check(device_id, semaphore))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_check(self, device_id: str, semaphore: asyncio.Semaphore):
+        # Stays scheduled if run() is cancelled mid-check
+        delay = self.interval
+        try:
+            async with semaphore:
+                self.checks += 1
+                try:
+                    delay = await asyncio.wait_for(self.check(device_id), self.timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    delay = self._failed(device_id, TimeoutError(f"health check took over {self.timeout}s"))
+                except Exception as e:
+                    delay = self._failed(device_id, e)
+        except asyncio.CancelledError:
+            self.schedule(device_id, delay)
+            raise
+        finally:
+            self.running.discard(device_id)
+        if delay is None:
+            # Anything still due was scheduled while this check ran
+            self.rerun.discard(device_id)
+            return
+        if device_id in self.rerun:
+            self.rerun.discard(device_id)
+            delay = 0
+        self.schedule(device_id, delay)
+
+    def _failed(self, device_id: str, error: BaseException) -> Optional[float]:
+        self.logger.warning(f"Health check of {device_id} failed: {error}")
+        if self.on_failure is None:
+            return self.interval
+        return self.on_failure(device_id, error)
+
+    async def run(self):
+        """Run checks as they fall due until cancelled"""
+        self._wakeup = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            while True:
+                self._wakeup.clear()
+                now = time.monotonic()
+                self._start_due(now, semaphore)
+                timeout = self.heap[0][0] - now if self.heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wakeup = None
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,211 @@
+"""
+In-process metrics registry
+Counters, gauges and fixed-bucket histograms kept as plain numbers per
+label set, exported in the Prometheus text format. Recording is a dict
+lookup and an add; a scrape costs one line per series, however long the
+service has been running
+Author: @Cdaprod
+"""
+
+import logging
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Seconds; suits request round trips from ~1 ms up to timeouts
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(int(value)) if float(value).is_integer() and abs(value) < 1e15 else repr(float(value))
+
+class CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        self.value += amount
+
+class GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+class HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # counts[i] holds observations in (bound[i-1], bound[i]]; the last is +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0
+
+class Metric:
+    """A named metric and its children, one per combination of label values
+
+    Metrics without labels act as their own single child: `inc()`,
+    `set()` and `observe()` can be called on them directly.
+    """
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values, created on first use; hold on to it on hot paths"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self._new_child()
+        return child
+
+    def remove(self, *values: str):
+        """Forget a label set, e.g. a stream that is gone"""
+        self.children.pop(tuple(str(value) for value in values), None)
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self.children.items():
+            yield f"{self.name}{self._label_text(values)} {_number(child.value)}"
+
+    def __getattr__(self, attribute):
+        # Unlabelled metrics forward inc/set/observe/value/... to their only child
+        if attribute.startswith('_') or self.__dict__.get('labelnames', ('',)):
+            raise AttributeError(attribute)
+        return getattr(self.labels(), attribute)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return CounterChild()
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return GaugeChild()
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+
+    def _new_child(self):
+        return HistogramChild(self.upper_bounds)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{self._label_text(values, le)} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(values)} {_number(child.sum)}"
+            yield f"{self.name}_count{self._label_text(values)} {child.count}"
+
+class MetricsRegistry:
+    """Named metrics plus callbacks that refresh gauges just before a scrape"""
+    def __init__(self):
+        self.logger = logging.getLogger('MetricsRegistry')
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered differently")
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, collector: Callable[[], None]):
+        """Run `collector` before each export, for values cheaper to read than to track"""
+        self.collectors.append(collector)
+
+    def expose(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                self.logger.error(f"Metrics collector failed: {e}")
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            help_text = metric.documentation.replace('\\', r'\\').replace('\n', r'\n')
+            lines.append(f"# HELP {metric.name} {help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        lines.append('')
+        return '\n'.join(lines)
+
+def job_timer(histogram: Histogram) -> Callable[[object], None]:
+    """ProcessingEngine on_update hook observing each job's run time by final status"""
+    started: Dict[str, float] = {}
+
+    def on_update(job):
+        status = getattr(job.status, 'value', job.status)
+        if status == 'running':
+            started.setdefault(job.job_id, job.updated_at)
+        elif status in ('completed', 'failed', 'cancelled'):
+            start = started.pop(job.job_id, None)
+            if start is not None:
+                histogram.labels(status).observe(max(0.0, job.updated_at - start))
+    return on_update
@@ -0,0 +1,180 @@
+"""
+mDNS discovery of network cameras
+Browses for RTSP and NDI services with an async zeroconf browser,
+resolves each service once per record TTL and hands the registry its
+changes in batches rather than one service at a time
+Author: @Cdaprod
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+from zeroconf import IPVersion, ServiceStateChange, current_time_millis
+from zeroconf.asyncio import AsyncServiceBrowser, AsyncServiceInfo, AsyncZeroconf
+
+SERVICE_TYPES = ('_rtsp._tcp.local.', '_ndi._tcp.local.')
+# Used when zeroconf's cache no longer holds the records (RFC 6762 host record TTL)
+DEFAULT_TTL = 120
+
+@dataclass(frozen=True)
+class ServiceRecord:
+    """A resolved mDNS service"""
+    name: str                           # 'Cam A._rtsp._tcp.local.'
+    service_type: str                   # '_rtsp._tcp.local.'
+    server: str                         # 'cam-a.local.'
+    addresses: Tuple[str, ...]
+    port: int
+    properties: Mapping[str, str] = field(default_factory=dict, hash=False)
+    expires_at: float = field(default=0, compare=False)
+
+    @property
+    def instance(self) -> str:
+        """The human-readable part of the name: 'Cam A'"""
+        return self.name[:-len(self.service_type) - 1] if self.name.endswith(self.service_type) else self.name
+
+    @property
+    def address(self) -> str:
+        """host:port to reach the service on"""
+        host = self.addresses[0] if self.addresses else self.server.rstrip('.')
+        return f"{host}:{self.port}"
+
+    def obs_settings(self) -> Dict[str, Any]:
+        """OBS input settings that play this service"""
+        if self.service_type.startswith('_ndi.'):
+            return {'ndi_source_name': self.instance}
+        path = self.properties.get('path', '/')
+        return {'input': f"rtsp://{self.address}/{path.lstrip('/')}", 'is_local_file': False}
+
+# handler(changed, removed): resolved records that are new or changed, names that left
+Handler = Callable[[List[ServiceRecord], List[str]], Awaitable[Any]]
+
+class NetworkDiscovery:
+    """Async mDNS browser with a TTL cache of resolved services
+
+    A service the browser reports again while its record is still
+    within TTL is not resolved again; Updated events (changed TXT or
+    address records) always are. Changes are collected for
+    `batch_delay` seconds and handed to handler(changed, removed) in one
+    call, so a room of cameras powering up is one registry update.
+    """
+    def __init__(self, handler: Handler, service_types: Sequence[str] = SERVICE_TYPES,
+                 batch_delay: float = 0.5, resolve_timeout: float = 3.0):
+        self.logger = logging.getLogger('NetworkDiscovery')
+        self.handler = handler
+        self.service_types = list(service_types)
+        self.batch_delay = batch_delay
+        self.resolve_timeout = resolve_timeout
+        self.records: Dict[str, ServiceRecord] = {}
+        self.resolves = 0
+        self.batches = 0
+        self.aiozc: Optional[AsyncZeroconf] = None
+        self.browser: Optional[AsyncServiceBrowser] = None
+        self._owns_zeroconf = False
+        self._resolving: Dict[str, asyncio.Task] = {}
+        self._changed: Dict[str, ServiceRecord] = {}
+        self._removed: Set[str] = set()
+        self._flush: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self, aiozc: Optional[AsyncZeroconf] = None):
+        """Start browsing; uses `aiozc` if given, else opens (and later closes) its own"""
+        self._owns_zeroconf = aiozc is None
+        self.aiozc = aiozc or AsyncZeroconf(ip_version=IPVersion.V4Only)
+        self.browser = AsyncServiceBrowser(self.aiozc.zeroconf, self.service_types,
+                                           handlers=[self._on_service_state_change])
+
+    async def close(self):
+        if self.browser:
+            await self.browser.async_cancel()
+        if self._flush:
+            self._flush.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.aiozc and self._owns_zeroconf:
+            await self.aiozc.async_close()
+
+    def _on_service_state_change(self, zeroconf, service_type: str, name: str,
+                                 state_change: ServiceStateChange):
+        # Called on the event loop by the browser
+        if state_change is ServiceStateChange.Removed:
+            task = self._resolving.pop(name, None)
+            if task:
+                task.cancel()
+            if self.records.pop(name, None) is not None:
+                self._changed.pop(name, None)
+                self._removed.add(name)
+                self._schedule_flush()
+            return
+        cached = self.records.get(name)
+        if (state_change is ServiceStateChange.Added and cached is not None
+                and cached.expires_at > time.monotonic()):
+            return
+        if name not in self._resolving:
+            self._spawn(self._resolve(service_type, name), name)
+
+    def _spawn(self, coroutine, name: str):
+        task = asyncio.create_task(coroutine)
+        self._resolving[name] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _ttl(self, names: Sequence[str]) -> float:
+        """Seconds until the first of the cached records for `names` expires"""
+        now = current_time_millis()
+        cache = self.aiozc.zeroconf.cache
+        remaining = [record.get_remaining_ttl(now) for name in names
+                     for record in cache.async_entries_with_name(name)]
+        return min(remaining, default=DEFAULT_TTL)
+
+    async def _resolve(self, service_type: str, name: str):
+        try:
+            info = AsyncServiceInfo(service_type, name)
+            self.resolves += 1
+            if not await info.async_request(self.aiozc.zeroconf, self.resolve_timeout * 1000):
+                self.logger.warning(f"Could not resolve {name}")
+                return
+            record = ServiceRecord(
+                name=name,
+                service_type=service_type,
+                server=info.server or '',
+                addresses=tuple(info.parsed_addresses()),
+                port=info.port or 0,
+                properties={key.decode(errors='replace'): (value or b'').decode(errors='replace')
+                            for key, value in info.properties.items()},
+                expires_at=time.monotonic() + self._ttl([name, info.server or ''])
+            )
+        except Exception as e:
+            self.logger.error(f"Error resolving {name}: {e}")
+            return
+        finally:
+            if self._resolving.get(name) is asyncio.current_task():
+                del self._resolving[name]
+        previous = self.records.get(name)
+        self.records[name] = record
+        if record != previous:
+            self._removed.discard(name)
+            self._changed[name] = record
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush is None:
+            self._flush = asyncio.get_running_loop().call_later(self.batch_delay, self._start_flush)
+
+    def _start_flush(self):
+        self._flush = None
+        changed, self._changed = list(self._changed.values()), {}
+        removed, self._removed = sorted(self._removed), set()
+        if changed or removed:
+            self.batches += 1
+            task = asyncio.create_task(self._deliver(changed, removed))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, changed: List[ServiceRecord], removed: List[str]):
+        try:
+            await self.handler(changed, removed)
+        except Exception as e:
+            self.logger.error(f"Error applying discovered services: {e}")
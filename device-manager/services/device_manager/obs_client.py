@@ -0,0 +1,276 @@
+"""
+Asyncio OBS WebSocket v5 client
+One persistent connection with automatic reconnect; requests are
+pipelined over it and RequestBatch turns a scene change into a single
+round trip
+Author: @Cdaprod
+"""
+
+import asyncio
+import base64
+import hashlib
+import itertools
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import aiohttp
+
+RPC_VERSION = 1
+
+# WebSocket opcodes
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_EVENT = 5
+OP_REQUEST = 6
+OP_REQUEST_RESPONSE = 7
+OP_REQUEST_BATCH = 8
+OP_REQUEST_BATCH_RESPONSE = 9
+
+# Close code OBS sends for a wrong password; retrying cannot help
+AUTHENTICATION_FAILED = 4009
+
+class OBSRequestError(Exception):
+    """OBS rejected one or more requests"""
+    def __init__(self, failures: List[Tuple[str, int, str]]):
+        self.failures = failures
+        super().__init__("; ".join(f"{request_type} failed ({code}): {comment}"
+                                   for request_type, code, comment in failures))
+
+def authentication_string(password: str, salt: str, challenge: str) -> str:
+    secret = base64.b64encode(hashlib.sha256((password + salt).encode()).digest()).decode()
+    return base64.b64encode(hashlib.sha256((secret + challenge).encode()).digest()).decode()
+
+class OBSClient:
+    """Persistent, auto-reconnecting OBS WebSocket v5 connection
+
+    Calls made while the connection is down wait for it to come back (up
+    to request_timeout). `requests_sent` counts messages sent to OBS; a
+    batch counts once. `sessions` counts successful connections, so state
+    derived from events can tell when it may have missed some.
+    `latency_observer(kind, seconds)`, if set, is told the round trip of
+    every answered request ('request' or 'batch').
+    """
+    def __init__(self, host: str = 'localhost', port: int = 4455, password: str = '',
+                 event_subscriptions: Optional[int] = None, request_timeout: float = 5,
+                 reconnect_delay: float = 1, max_reconnect_delay: float = 30):
+        self.logger = logging.getLogger('OBSClient')
+        self.url = f'ws://{host}:{port}'
+        self.password = password
+        self.event_subscriptions = event_subscriptions
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.requests_sent = 0
+        self.sessions = 0
+        self.latency_observer: Optional[Callable[[str, float], None]] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._connected = asyncio.Event()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._request_ids = itertools.count()
+        self._handlers: Dict[str, List[Callable[[dict], Any]]] = {}
+        self._scene_items: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._handler_tasks = set()
+
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self):
+        """Connect in the background and keep reconnecting until close()"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_connected(self, timeout: Optional[float] = None):
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def on(self, event_type: str, handler: Callable[[dict], Any]):
+        """Call handler(event_data) for every `event_type` event; coroutines are awaited"""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if self._session is None:
+                    self._session = aiohttp.ClientSession()
+                async with self._session.ws_connect(self.url, protocols=('obswebsocket.json',),
+                                                    heartbeat=30) as ws:
+                    await self._identify(ws)
+                    self._ws = ws
+                    self.sessions += 1
+                    self._connected.set()
+                    delay = self.reconnect_delay
+                    self.logger.info(f"Connected to OBS WebSocket at {self.url}")
+                    await self._read(ws)
+                self.logger.warning(f"OBS WebSocket closed ({ws.close_code})")
+            except asyncio.CancelledError:
+                raise
+            except PermissionError as e:
+                self.logger.error(f"{e}; not reconnecting")
+                return
+            except Exception as e:
+                self.logger.warning(f"OBS WebSocket connection failed: {e}")
+            finally:
+                self._disconnected()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _disconnected(self):
+        self._connected.clear()
+        self._ws = None
+        # Scene item ids are only stable within a session
+        self._scene_items.clear()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("OBS WebSocket disconnected"))
+        self._pending.clear()
+
+    async def _identify(self, ws: aiohttp.ClientWebSocketResponse):
+        hello = await ws.receive_json(timeout=self.request_timeout)
+        if hello.get('op') != OP_HELLO:
+            raise ConnectionError(f"Expected Hello, got op {hello.get('op')}")
+        identify: Dict[str, Any] = {'rpcVersion': RPC_VERSION}
+        authentication = hello['d'].get('authentication')
+        if authentication:
+            identify['authentication'] = authentication_string(
+                self.password, authentication['salt'], authentication['challenge']
+            )
+        if self.event_subscriptions is not None:
+            identify['eventSubscriptions'] = self.event_subscriptions
+        await ws.send_json({'op': OP_IDENTIFY, 'd': identify})
+        identified = await ws.receive()
+        if ws.close_code == AUTHENTICATION_FAILED:
+            raise PermissionError("OBS WebSocket authentication failed")
+        if identified.type != aiohttp.WSMsgType.TEXT:
+            raise ConnectionError(f"Identify rejected ({ws.close_code})")
+        if identified.json().get('op') != OP_IDENTIFIED:
+            raise ConnectionError("Expected Identified")
+
+    async def _read(self, ws: aiohttp.ClientWebSocketResponse):
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            payload = message.json()
+            op, data = payload.get('op'), payload.get('d', {})
+            if op in (OP_REQUEST_RESPONSE, OP_REQUEST_BATCH_RESPONSE):
+                future = self._pending.pop(data.get('requestId'), None)
+                if future is not None and not future.done():
+                    future.set_result(data)
+            elif op == OP_EVENT:
+                self._dispatch(data.get('eventType'), data.get('eventData') or {})
+
+    def _dispatch(self, event_type: str, event_data: dict):
+        for handler in self._handlers.get(event_type, ()):
+            try:
+                result = handler(event_data)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(result)
+                    self._handler_tasks.add(task)
+                    task.add_done_callback(self._handler_tasks.discard)
+            except Exception as e:
+                self.logger.error(f"Error in {event_type} handler: {e}")
+
+    async def _send(self, op: int, data: dict) -> dict:
+        """Send one message and wait for the response with the same requestId"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        ws = None
+        while ws is None:
+            await asyncio.wait_for(self._connected.wait(), max(deadline - loop.time(), 0))
+            # The connection may have dropped again before this task resumed
+            ws = self._ws
+        request_id = str(next(self._request_ids))
+        future = loop.create_future()
+        self._pending[request_id] = future
+        try:
+            sent_at = loop.time()
+            await ws.send_json({'op': op, 'd': {**data, 'requestId': request_id}})
+            self.requests_sent += 1
+            response = await asyncio.wait_for(future, self.request_timeout)
+            if self.latency_observer:
+                self.latency_observer('batch' if op == OP_REQUEST_BATCH else 'request', loop.time() - sent_at)
+            return response
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def call(self, request_type: str, request_data: Optional[dict] = None) -> dict:
+        """Send one request; returns its responseData"""
+        response = await self._send(OP_REQUEST, {
+            'requestType': request_type,
+            'requestData': request_data or {},
+        })
+        status = response.get('requestStatus', {})
+        if not status.get('result'):
+            raise OBSRequestError([(request_type, status.get('code', 0), status.get('comment', ''))])
+        return response.get('responseData') or {}
+
+    async def batch(self, requests: Iterable[Tuple[str, Optional[dict]]],
+                    halt_on_failure: bool = False) -> List[dict]:
+        """Send requests as one RequestBatch, executed in order by OBS
+
+        Returns the raw per-request results (requestStatus, responseData)
+        in request order.
+        """
+        requests = [{'requestType': request_type, 'requestData': request_data or {}}
+                    for request_type, request_data in requests]
+        if not requests:
+            return []
+        response = await self._send(OP_REQUEST_BATCH, {
+            'haltOnFailure': halt_on_failure,
+            'requests': requests,
+        })
+        return response.get('results', [])
+
+    async def scene_item_ids(self, scene_name: str, source_names: Iterable[str]) -> Dict[str, int]:
+        """Scene item ids of sources in a scene; unknown sources are left out
+
+        Ids are cached for the session, so after the first lookup this costs
+        nothing.
+        """
+        source_names = list(source_names)
+        missing = [name for name in source_names if (scene_name, name) not in self._scene_items]
+        results = await self.batch(
+            ('GetSceneItemId', {'sceneName': scene_name, 'sourceName': name}) for name in missing
+        )
+        for name, result in zip(missing, results):
+            if result.get('requestStatus', {}).get('result'):
+                self._scene_items[(scene_name, name)] = result['responseData']['sceneItemId']
+        return {name: self._scene_items[(scene_name, name)]
+                for name in source_names if (scene_name, name) in self._scene_items}
+
+    def remember_scene_items(self, scene_name: str, item_ids: Dict[str, int]):
+        """Seed the id cache, e.g. from a GetSceneItemList response"""
+        for name, item_id in item_ids.items():
+            self._scene_items[(scene_name, name)] = item_id
+
+    def forget_scene_item(self, scene_name: str, source_name: str):
+        self._scene_items.pop((scene_name, source_name), None)
+
+    async def set_visibility_many(self, scene_name: str, visibility: Dict[str, bool]) -> List[str]:
+        """Show/hide many sources in one round trip; returns sources not in the scene"""
+        ids = await self.scene_item_ids(scene_name, visibility)
+        results = await self.batch(
+            ('SetSceneItemEnabled', {'sceneName': scene_name, 'sceneItemId': ids[name], 'sceneItemEnabled': visible})
+            for name, visible in visibility.items() if name in ids
+        )
+        failures = [
+            (result.get('requestType', 'SetSceneItemEnabled'), result['requestStatus'].get('code', 0),
+             result['requestStatus'].get('comment', ''))
+            for result in results if not result.get('requestStatus', {}).get('result')
+        ]
+        if failures:
+            # An item id may have gone stale (item removed and re-added)
+            for name in ids:
+                self.forget_scene_item(scene_name, name)
+            raise OBSRequestError(failures)
+        return [name for name in visibility if name not in ids]
@@ -0,0 +1,287 @@
+"""
+Persistent index of recordings on the NAS
+Cleanup reads files oldest-first from an SQLite index instead of walking
+and stat()ing the whole mount; a reconciler re-lists only directories
+whose mtime changed since they were last scanned
+Author: @Cdaprod
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+RECORDING_SUFFIXES = {'.mp4', '.flv', '.mkv', '.mov', '.ts'}
+
+# Directories modified this recently are rescanned again next time: on
+# coarse-mtime filesystems (SMB) a later write in the same tick is invisible
+RACY_WINDOW = 2.0
+
+DATE_DIRECTORY = re.compile(r'\d{4}-\d{2}-\d{2}')
+# Files archived from Twitch without an explicit VOD id: twitch_<id>[_processed].<ext>
+VOD_FILENAME = re.compile(r'twitch_(\d+)(?:_processed)?\.[^.]+')
+
+# Bound parameters per IN (...) query, under SQLite's oldest limit of 999
+QUERY_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    source TEXT,
+    duration REAL,
+    codec TEXT,
+    vod_id TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_age ON recordings (mtime, path);
+CREATE INDEX IF NOT EXISTS recordings_directory ON recordings (directory);
+CREATE INDEX IF NOT EXISTS recordings_source_age ON recordings (source, mtime, path);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER
+);
+"""
+
+COLUMNS = ("path", "size", "mtime", "source", "duration", "codec", "vod_id")
+
+@dataclass
+class Recording:
+    path: str
+    size: int
+    mtime: float
+    source: Optional[str] = None
+    duration: Optional[float] = None
+    codec: Optional[str] = None
+    vod_id: Optional[str] = None
+
+def vod_id_for(path: str) -> Optional[str]:
+    """Twitch VOD id from an archived file's name, if it follows the twitch_<id> scheme"""
+    match = VOD_FILENAME.fullmatch(os.path.basename(path))
+    return match.group(1) if match else None
+
+class RecordingCatalog:
+    """SQLite index of recording files under a root directory
+
+    Rows come from add() (nginx on_record_done, post-processing completion)
+    and from reconcile(), which repairs the index after files are added or
+    removed behind its back. The database is a cache of the filesystem:
+    if it is lost, the first reconcile rebuilds it.
+    """
+    def __init__(self, path: str, root: str, racy_window: float = RACY_WINDOW):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.root = str(root)
+        self.racy_window = racy_window
+        # reconcile() runs in a worker thread; every query holds the lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Bring a catalog written by an older version up to the current schema"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(recordings)")}
+        with self.conn:
+            if 'vod_id' not in columns:
+                self.conn.execute("ALTER TABLE recordings ADD COLUMN vod_id TEXT")
+                paths = [path for path, in self.conn.execute("SELECT path FROM recordings")]
+                self.conn.executemany("UPDATE recordings SET vod_id = ? WHERE path = ?", [
+                    (vod_id_for(path), path) for path in paths if vod_id_for(path)
+                ])
+            self.conn.execute("CREATE INDEX IF NOT EXISTS recordings_vod ON recordings (vod_id)")
+
+    def add(self, path: str, source: Optional[str] = None, duration: Optional[float] = None,
+            codec: Optional[str] = None, size: Optional[int] = None, mtime: Optional[float] = None,
+            vod_id: Optional[str] = None):
+        """Record a new or updated file; missing size/mtime are stat()ed
+
+        `vod_id` marks the file as the archive of that Twitch VOD, whatever
+        it is named; without one it is taken from a twitch_<id> file name.
+        """
+        if size is None or mtime is None:
+            stat = os.stat(path)
+            size, mtime = stat.st_size, stat.st_mtime
+        directory = os.path.dirname(path)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO recordings (path, directory, size, mtime, source, duration, codec, vod_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (path) DO UPDATE SET "
+                "size = excluded.size, mtime = excluded.mtime, "
+                "source = COALESCE(excluded.source, source), "
+                "duration = COALESCE(excluded.duration, duration), "
+                "codec = COALESCE(excluded.codec, codec), "
+                "vod_id = COALESCE(excluded.vod_id, vod_id)",
+                (path, directory, size, mtime, source, duration, codec, str(vod_id) if vod_id else vod_id_for(path))
+            )
+            # A directory we have never listed gets scanned on the next reconcile
+            self.conn.execute("INSERT OR IGNORE INTO directories (path, mtime_ns) VALUES (?, NULL)", (directory,))
+
+    def remove(self, path: str):
+        self.remove_many([path])
+
+    def remove_many(self, paths: Iterable[str]):
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM recordings WHERE path = ?", ((path,) for path in paths))
+
+    def get(self, path: str) -> Optional[Recording]:
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM recordings WHERE path = ?", (path,)
+            ).fetchone()
+        return Recording(*row) if row else None
+
+    def oldest(self, batch: int = 256, source: Optional[str] = None) -> Iterator[Recording]:
+        """Recordings by ascending mtime, read from the index in pages
+
+        Keyset pagination on (mtime, path) keeps each page an index range
+        scan, and lets callers delete the rows they have already seen.
+        With `source`, only that source's recordings are returned.
+        """
+        last: Tuple[float, str] = (float('-inf'), '')
+        source_filter = "source = ? AND " if source is not None else ""
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM recordings WHERE {source_filter}(mtime, path) > (?, ?) "
+                    "ORDER BY mtime, path LIMIT ?",
+                    (*([source] if source is not None else []), *last, batch)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield Recording(*row)
+            last = (rows[-1][2], rows[-1][0])
+
+    def archived_vods(self, vod_ids: Iterable[str], source: Optional[str] = None) -> Set[str]:
+        """Which of the Twitch VOD ids have a recording (from `source` only, if given)
+
+        Looked up through the vod_id index, so the cost depends on the
+        number of ids asked for, not on the size of the archive.
+        """
+        wanted = list(dict.fromkeys(map(str, vod_ids)))
+        source_filter = " AND source = ?" if source is not None else ""
+        found: Set[str] = set()
+        with self._lock:
+            for start in range(0, len(wanted), QUERY_CHUNK):
+                chunk = wanted[start:start + QUERY_CHUNK]
+                rows = self.conn.execute(
+                    f"SELECT DISTINCT vod_id FROM recordings WHERE vod_id IN ({', '.join('?' * len(chunk))})"
+                    f"{source_filter}", (*chunk, *([source] if source is not None else []))
+                ).fetchall()
+                found.update(vod_id for vod_id, in rows)
+        return found
+
+    def total_size(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM recordings").fetchone()[0]
+
+    def usage_by_source(self) -> Dict[Optional[str], int]:
+        with self._lock:
+            return dict(self.conn.execute("SELECT source, SUM(size) FROM recordings GROUP BY source"))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+    def reconcile(self) -> int:
+        """Bring the index in line with the filesystem; returns directories listed
+
+        Every known directory is stat()ed, but only those whose mtime
+        changed (a file or subdirectory was created, renamed or removed)
+        are listed and have their files stat()ed. Blocking: run it in a
+        thread.
+        """
+        with self._lock:
+            known: Dict[str, Optional[int]] = dict(self.conn.execute("SELECT path, mtime_ns FROM directories"))
+        known.setdefault(self.root, None)
+        pending = list(known)
+        listed = 0
+
+        while pending:
+            directory = pending.pop()
+            try:
+                stat = os.stat(directory)
+            except FileNotFoundError:
+                self._forget_directory(directory)
+                continue
+            if known.get(directory) == stat.st_mtime_ns:
+                continue
+
+            files: List[Tuple[str, int, float]] = []
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in known:
+                        known[entry.path] = None
+                        pending.append(entry.path)
+                elif (not entry.name.startswith('.')
+                      and os.path.splitext(entry.name)[1].lower() in RECORDING_SUFFIXES):
+                    entry_stat = entry.stat()
+                    files.append((entry.path, entry_stat.st_size, entry_stat.st_mtime))
+            listed += 1
+
+            racy = time.time() - stat.st_mtime < self.racy_window
+            self._replace_directory(directory, files, None if racy else stat.st_mtime_ns)
+        return listed
+
+    def _source_for(self, path: str) -> Optional[str]:
+        """First non-date directory below the root ({date}/{source}/ or twitch/{date}/)"""
+        directories = Path(os.path.relpath(path, self.root)).parts[:-1]
+        return next((part for part in directories if not DATE_DIRECTORY.fullmatch(part)), None)
+
+    def _replace_directory(self, directory: str, files: List[Tuple[str, int, float]], mtime_ns: Optional[int]):
+        with self._lock, self.conn:
+            present = {path for path, _, _ in files}
+            indexed = [row[0] for row in self.conn.execute(
+                "SELECT path FROM recordings WHERE directory = ?", (directory,))]
+            self.conn.executemany(
+                "DELETE FROM recordings WHERE path = ?",
+                [(path,) for path in indexed if path not in present]
+            )
+            # Metadata from add() (source, duration, codec, vod_id) survives a rescan
+            self.conn.executemany(
+                "INSERT INTO recordings (path, directory, size, mtime, source, vod_id) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime",
+                [(path, directory, size, mtime, self._source_for(path), vod_id_for(path))
+                 for path, size, mtime in files]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO directories (path, mtime_ns) VALUES (?, ?)", (directory, mtime_ns)
+            )
+
+    def _forget_directory(self, directory: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM recordings WHERE directory = ?", (directory,))
+            self.conn.execute("DELETE FROM directories WHERE path = ?", (directory,))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+async def probe_recording(path: str) -> Tuple[Optional[float], Optional[str]]:
+    """Duration and video codec via ffprobe, if it is installed"""
+    if not shutil.which('ffprobe'):
+        return None, None
+    process = await asyncio.create_subprocess_exec(
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'format=duration:stream=codec_name', '-of', 'json', path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    stdout, _ = await process.communicate()
+    try:
+        info = json.loads(stdout or b'{}')
+    except ValueError:
+        return None, None
+    duration = info.get('format', {}).get('duration')
+    streams = info.get('streams') or [{}]
+    return (float(duration) if duration else None), streams[0].get('codec_name')
@@ -0,0 +1,123 @@
+"""
+Push-based RTMP stream state from nginx-rtmp notify callbacks
+on_publish / on_publish_done update the device registry immediately;
+the /stat poll only reconciles missed callbacks
+Author: @Cdaprod
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Union
+from device_info import DeviceInfo, DeviceStatus, StreamType
+from source_index import SourceIndex
+
+# Only streams published to this nginx application are devices; the hls
+# application carries our own transcoded variants.
+LIVE_APPLICATION = "live"
+
+class RTMPCallbackHandler:
+    """Apply nginx-rtmp publish events to the device registry"""
+    def __init__(self, devices: Dict[str, DeviceInfo], sources: Union[dict, SourceIndex, None] = None,
+                 on_change: Optional[Callable[[DeviceInfo], Awaitable]] = None,
+                 on_recording: Optional[Callable[[str, str], Awaitable]] = None):
+        self.logger = logging.getLogger('RTMPCallbackHandler')
+        self.devices = devices
+        self.sources = SourceIndex.of(sources)
+        # Stream keys currently marked STREAMING, so reconcile need not scan every device
+        self.streaming: Set[str] = set()
+        self.on_change = on_change
+        self.on_recording = on_recording
+        self._tasks = set()
+
+    def _source_for(self, stream_key: str) -> dict:
+        return self.sources.source(self.sources.rtmp_source(stream_key))
+
+    def _register(self, stream_key: str, address: str) -> DeviceInfo:
+        config = self._source_for(stream_key)
+        device_info = DeviceInfo(
+            id=stream_key,
+            type=StreamType.RTMP,
+            name=config.get('name', stream_key),
+            status=DeviceStatus.DISCONNECTED,
+            address=address,
+            stream_key=stream_key,
+            settings=config.get('settings', {})
+        )
+        self.devices[stream_key] = device_info
+        return device_info
+
+    def _spawn(self, coroutine: Awaitable):
+        """Run a callback without holding up the nginx request"""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _notify(self, device_info: DeviceInfo):
+        if self.on_change is not None:
+            self._spawn(self.on_change(device_info))
+
+    def on_publish(self, stream_key: str, address: str = "") -> Optional[DeviceInfo]:
+        """Mark a stream as live the moment nginx accepts the publisher"""
+        if not stream_key:
+            return None
+        device_info = self.devices.get(stream_key)
+        if device_info is None:
+            device_info = self._register(stream_key, address)
+        changed = device_info.status != DeviceStatus.STREAMING
+        device_info.status = DeviceStatus.STREAMING
+        self.streaming.add(stream_key)
+        device_info.last_seen = time.time()
+        device_info.reconnect_attempts = 0
+        device_info.error_message = None
+        if address:
+            device_info.address = address
+        if changed:
+            self.logger.info(f"Stream published: {stream_key}")
+            self._notify(device_info)
+        return device_info
+
+    def on_publish_done(self, stream_key: str) -> Optional[DeviceInfo]:
+        """Mark a stream as gone the moment the publisher disconnects"""
+        device_info = self.devices.get(stream_key)
+        if device_info is None:
+            return None
+        changed = device_info.status != DeviceStatus.DISCONNECTED
+        device_info.status = DeviceStatus.DISCONNECTED
+        self.streaming.discard(stream_key)
+        device_info.last_seen = time.time()
+        if changed:
+            self.logger.info(f"Stream unpublished: {stream_key}")
+            self._notify(device_info)
+        return device_info
+
+    def on_record_done(self, stream_key: str, path: str):
+        """Hand a finished nginx recording to the catalog"""
+        self.logger.info(f"Recording finished for {stream_key}: {path}")
+        if self.on_recording is not None and path:
+            self._spawn(self.on_recording(stream_key, path))
+
+    def reconcile(self, stream_keys: Iterable[str], observed_at: float):
+        """Repair state from a /stat snapshot taken at observed_at
+
+        Devices touched by a callback after the snapshot was taken are left
+        alone, so a slow poll can never undo a newer callback.
+        """
+        live = set(stream_keys)
+        for stream_key in live:
+            device_info = self.devices.get(stream_key)
+            if device_info is None or device_info.status != DeviceStatus.STREAMING:
+                if device_info is not None and device_info.last_seen > observed_at:
+                    continue
+                self.logger.warning(f"Missed on_publish for {stream_key}, reconciling from /stat")
+                device_info = self.on_publish(stream_key)
+            device_info.last_seen = max(device_info.last_seen, observed_at)
+
+        for stream_key in self.streaming - live:
+            device_info = self.devices.get(stream_key)
+            if device_info is None:
+                self.streaming.discard(stream_key)
+            elif (device_info.status == DeviceStatus.STREAMING
+                    and device_info.last_seen <= observed_at):
+                self.logger.warning(f"Missed on_publish_done for {stream_key}, reconciling from /stat")
+                self.on_publish_done(stream_key)
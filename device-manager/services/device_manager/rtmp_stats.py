@@ -0,0 +1,286 @@
+"""
+nginx-rtmp /stat client and incremental parser
+Extracts only the per-stream fields the device manager uses
+Author: @Cdaprod
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+import xml.etree.ElementTree as ET
+import aiohttp
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Documents larger than this are parsed in a worker thread
+OFFLOAD_THRESHOLD = 256 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Counters nginx-rtmp bumps on every request even when no stream changed
+VOLATILE_FIELDS = re.compile(rb'<(uptime|time|timestamp)>\d+</\1>')
+# End of a chunk that may be the start of a volatile field: an unfinished
+# tag, possibly after an opened counter and its digits
+VOLATILE_TAIL = re.compile(rb'(?:<(?:uptime|time|timestamp)>\d*)?<[^>]*$|<(?:uptime|time|timestamp)>\d*$')
+
+@dataclass
+class StreamStats:
+    """Per-stream statistics reported by nginx-rtmp"""
+    name: str
+    application: str = ""
+    bw_in: int = 0
+    bw_video: int = 0
+    fps: float = 0
+    width: int = 0
+    height: int = 0
+    nclients: int = 0
+    dropped: int = 0
+
+    @property
+    def resolution(self) -> str:
+        return f"{self.width}x{self.height}"
+
+class RTMPStatsParser:
+    """Event-driven /stat parser fed with raw response chunks"""
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('end',))
+        self._pending: List[StreamStats] = []
+        self.streams: List[StreamStats] = []
+
+    def feed(self, chunk: bytes):
+        """Feed a chunk of the /stat document and collect finished streams"""
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self) -> List[StreamStats]:
+        """Finish parsing and return all streams found"""
+        self._parser.close()
+        self._drain()
+        self.streams.extend(self._pending)
+        self._pending = []
+        return self.streams
+
+    def _drain(self):
+        for _, elem in self._parser.read_events():
+            tag = elem.tag
+            if tag == 'stream':
+                self._emit(elem)
+                # Drop the subtree (clients, meta) as soon as it is consumed
+                elem.clear()
+            elif tag == 'application':
+                # <application><name> is only known once the application ends
+                application = elem.findtext('name') or ""
+                for stream in self._pending:
+                    stream.application = application
+                self.streams.extend(self._pending)
+                self._pending = []
+                elem.clear()
+
+    def _emit(self, elem: ET.Element):
+        name = elem.findtext('name')
+        if not name:
+            return
+        video = elem.find('meta/video')
+        if video is None:
+            video = _EMPTY
+        # Dropped frames are reported on the publishing client
+        dropped = 0
+        for client in elem.iterfind('client'):
+            if client.find('publishing') is not None:
+                dropped = _to_int(client.findtext('dropped'))
+                break
+        self._pending.append(StreamStats(
+            name=name,
+            bw_in=_to_int(elem.findtext('bw_in')),
+            bw_video=_to_int(elem.findtext('bw_video')),
+            fps=_to_float(video.findtext('frame_rate')),
+            width=_to_int(video.findtext('width')),
+            height=_to_int(video.findtext('height')),
+            nclients=_to_int(elem.findtext('nclients')),
+            dropped=dropped
+        ))
+
+_EMPTY = ET.Element('video')
+
+def _to_int(value: Optional[str]) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def _to_float(value: Optional[str]) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def parse_rtmp_stats(data: bytes) -> List[StreamStats]:
+    """Parse a complete /stat document"""
+    parser = RTMPStatsParser()
+    for offset in range(0, len(data), CHUNK_SIZE):
+        parser.feed(data[offset:offset + CHUNK_SIZE])
+    return parser.close()
+
+class StatDigest:
+    """blake2b of a /stat body without its VOLATILE_FIELDS, fed chunk by chunk
+
+    A field split across chunks is held back until its end arrives, so the
+    digest is the same however the body was chunked.
+    """
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._tail = b''
+
+    def update(self, chunk: bytes):
+        data = VOLATILE_FIELDS.sub(b'', self._tail + chunk)
+        match = VOLATILE_TAIL.search(data)
+        cut = match.start() if match else len(data)
+        self._hash.update(data[:cut])
+        self._tail = data[cut:]
+
+    def digest(self) -> bytes:
+        self._hash.update(self._tail)
+        self._tail = b''
+        return self._hash.digest()
+
+async def read_rtmp_stats(response: aiohttp.ClientResponse, previous: Optional[bytes] = None,
+                          offload_threshold: int = OFFLOAD_THRESHOLD) -> Tuple[Optional[List[StreamStats]], bytes]:
+    """Digest a /stat response as it arrives and parse it; returns (streams, digest)
+
+    Bodies up to `offload_threshold` are buffered and only parsed when
+    their digest differs from `previous`; otherwise streams is None.
+    Larger bodies are parsed as they stream in, with the remaining chunks
+    handled in a worker thread.
+    """
+    digest = StatDigest()
+    buffered: List[bytes] = []
+    parser: Optional[RTMPStatsParser] = None
+
+    def feed(chunk: bytes):
+        digest.update(chunk)
+        parser.feed(chunk)
+
+    loop = asyncio.get_running_loop()
+    received = 0
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        received += len(chunk)
+        if parser is not None:
+            await loop.run_in_executor(None, feed, chunk)
+        elif received > offload_threshold:
+            # Too large to hold back: parse what was buffered and stream the rest
+            parser = RTMPStatsParser()
+            for held in buffered:
+                parser.feed(held)
+            buffered = []
+            await loop.run_in_executor(None, feed, chunk)
+        else:
+            digest.update(chunk)
+            buffered.append(chunk)
+
+    if parser is not None:
+        return parser.close(), digest.digest()
+    body_digest = digest.digest()
+    if body_digest == previous:
+        return None, body_digest
+    return parse_rtmp_stats(b''.join(buffered)), body_digest
+
+class RTMPStatsClient:
+    """Long-lived, connection-pooled /stat poller with adaptive interval
+
+    Requests are conditional (ETag/Last-Modified). Bodies are digested
+    as they stream in; when the digest, minus nginx's uptime counters,
+    matches the previous poll, the previous result is kept and bodies up
+    to `offload_threshold` are not parsed at all. The poll interval drops
+    to min_interval while any stream's bitrate moves by more than
+    `instability` between polls and backs off towards max_interval while
+    everything is steady.
+    """
+    def __init__(self, url: str = 'http://localhost:8080/stat',
+                 min_interval: float = 1.0, max_interval: float = 10.0,
+                 instability: float = 0.2, backoff: float = 1.5,
+                 timeout: float = 5.0, offload_threshold: int = OFFLOAD_THRESHOLD):
+        self.url = url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.instability = instability
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.offload_threshold = offload_threshold
+        self.interval = min_interval
+        self.session: Optional[aiohttp.ClientSession] = None
+
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._digest: Optional[bytes] = None
+        self._streams: List[StreamStats] = []
+        self._bitrates: Dict[str, int] = {}
+
+        # Counters for tests and diagnostics
+        self.requests = 0
+        self.not_modified = 0
+        self.unchanged = 0  # 200 responses whose digest matched the previous poll
+        self.parsed = 0  # Bodies actually run through the parser
+        self.last_latency = 0.0
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=1, keepalive_timeout=max(30, self.max_interval * 3))
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def fetch(self) -> List[StreamStats]:
+        """Fetch /stat, reusing the previous result when nothing changed"""
+        session = await self._get_session()
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+
+        started = time.perf_counter()
+        self.requests += 1
+        async with session.get(self.url, headers=headers) as response:
+            if response.status == 304:
+                self.not_modified += 1
+            elif response.status == 200:
+                self._etag = response.headers.get('ETag')
+                self._last_modified = response.headers.get('Last-Modified')
+                streams, digest = await read_rtmp_stats(response, self._digest, self.offload_threshold)
+                if streams is not None:
+                    self.parsed += 1
+                if digest == self._digest:
+                    self.unchanged += 1
+                else:
+                    self._streams = streams
+                    self._digest = digest
+            else:
+                raise RuntimeError(f"Unexpected /stat response: HTTP {response.status}")
+        self.last_latency = time.perf_counter() - started
+
+        self._adapt_interval(self._streams)
+        return self._streams
+
+    def _adapt_interval(self, streams: List[StreamStats]):
+        unstable = False
+        bitrates = {}
+        for stream in streams:
+            bitrates[stream.name] = stream.bw_in
+            previous = self._bitrates.get(stream.name)
+            if previous is None:
+                unstable = True
+            elif abs(stream.bw_in - previous) > self.instability * max(previous, 1):
+                unstable = True
+        if len(bitrates) != len(self._bitrates):
+            # A stream appeared or went away
+            unstable = True
+        self._bitrates = bitrates
+
+        if unstable:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
@@ -0,0 +1,134 @@
+"""
+OBS scene state mirror
+Keeps a local copy of scene item visibility and input settings, fresh
+from OBS events, so scene management only sends what actually changed
+Author: @Cdaprod
+"""
+
+import logging
+from typing import Dict, Iterable, List
+from obs_client import OBSClient, OBSRequestError
+
+class SceneState:
+    """Scene item visibility and input settings as last seen from OBS
+
+    Scenes and inputs are loaded on first use (one GetSceneItemList per
+    scene, one batched GetInputSettings for any number of inputs) and then
+    kept current from SceneItemEnableStateChanged and InputSettingsChanged.
+    Item additions, removals and renames drop the affected entry so it is
+    reloaded; a reconnect drops everything, as events may have been missed.
+    """
+    def __init__(self, client: OBSClient):
+        self.logger = logging.getLogger('SceneState')
+        self.client = client
+        self.scenes: Dict[str, Dict[str, bool]] = {}
+        self.inputs: Dict[str, dict] = {}
+        self._item_names: Dict[str, Dict[int, str]] = {}
+        self._session = client.sessions
+        client.on('SceneItemEnableStateChanged', self._on_item_enabled)
+        client.on('InputSettingsChanged', self._on_input_settings)
+        for event_type in ('SceneItemCreated', 'SceneItemRemoved', 'SceneRemoved', 'SceneNameChanged'):
+            client.on(event_type, self._on_scene_changed)
+        for event_type in ('InputRemoved', 'InputNameChanged'):
+            client.on(event_type, self._on_input_changed)
+
+    def _check_session(self):
+        if self._session != self.client.sessions:
+            self._session = self.client.sessions
+            self.scenes.clear()
+            self.inputs.clear()
+            self._item_names.clear()
+
+    def _on_item_enabled(self, event: dict):
+        self._check_session()
+        scene = event.get('sceneName')
+        name = self._item_names.get(scene, {}).get(event.get('sceneItemId'))
+        if name is not None:
+            self.scenes[scene][name] = event.get('sceneItemEnabled')
+
+    def _on_input_settings(self, event: dict):
+        self._check_session()
+        # The event carries the input's complete settings
+        if event.get('inputName') in self.inputs:
+            self.inputs[event['inputName']] = event.get('inputSettings') or {}
+
+    def _on_scene_changed(self, event: dict):
+        for scene in (event.get('sceneName'), event.get('oldSceneName')):
+            self.scenes.pop(scene, None)
+            self._item_names.pop(scene, None)
+        # Item ids of a removed item must not be reused for a new one
+        if event.get('sourceName'):
+            self.client.forget_scene_item(event.get('sceneName'), event['sourceName'])
+
+    def _on_input_changed(self, event: dict):
+        for name in (event.get('inputName'), event.get('oldInputName')):
+            self.inputs.pop(name, None)
+
+    async def visibility(self, scene_name: str) -> Dict[str, bool]:
+        """Visibility of every source in a scene"""
+        self._check_session()
+        if scene_name not in self.scenes:
+            response = await self.client.call('GetSceneItemList', {'sceneName': scene_name})
+            items = response.get('sceneItems', [])
+            self._check_session()
+            self.scenes[scene_name] = {item['sourceName']: item['sceneItemEnabled'] for item in items}
+            self._item_names[scene_name] = {item['sceneItemId']: item['sourceName'] for item in items}
+            self.client.remember_scene_items(scene_name, {item['sourceName']: item['sceneItemId'] for item in items})
+        return self.scenes[scene_name]
+
+    async def input_settings(self, input_names: Iterable[str]) -> Dict[str, dict]:
+        """Settings of inputs, fetching unknown ones in one batch; missing inputs are left out"""
+        self._check_session()
+        input_names = list(input_names)
+        unknown = [name for name in input_names if name not in self.inputs]
+        results = await self.client.batch(('GetInputSettings', {'inputName': name}) for name in unknown)
+        self._check_session()
+        for name, result in zip(unknown, results):
+            if result.get('requestStatus', {}).get('result'):
+                self.inputs[name] = result['responseData'].get('inputSettings') or {}
+        return {name: self.inputs[name] for name in input_names if name in self.inputs}
+
+    async def set_visibility(self, scene_name: str, visibility: Dict[str, bool]) -> Dict[str, bool]:
+        """Apply visibility, sending only items that differ; returns the changes sent
+
+        Sources that are not in the scene are skipped and logged.
+        """
+        current = await self.visibility(scene_name)
+        missing = [name for name in visibility if name not in current]
+        if missing:
+            self.logger.warning(f"Sources not in {scene_name}: {', '.join(missing)}")
+        changes = {name: visible for name, visible in visibility.items()
+                   if name in current and current[name] != visible}
+        if changes:
+            await self.client.set_visibility_many(scene_name, changes)
+            current.update(changes)
+        return changes
+
+    async def set_input_settings(self, input_name: str, settings: dict) -> bool:
+        """Overlay settings onto an input unless it already has them; returns whether a request was sent"""
+        return bool(await self.set_input_settings_many({input_name: settings}))
+
+    async def set_input_settings_many(self, settings: Dict[str, dict]) -> List[str]:
+        """Overlay settings onto many inputs in one batch, skipping inputs that already have them
+
+        Returns the names of the inputs that were updated.
+        """
+        current = await self.input_settings(settings)
+        changed = {
+            name: values for name, values in settings.items()
+            if name not in current or any(current[name].get(key) != value for key, value in values.items())
+        }
+        results = await self.client.batch(
+            ('SetInputSettings', {'inputName': name, 'inputSettings': values}) for name, values in changed.items()
+        )
+        failures = []
+        for (name, values), result in zip(changed.items(), results):
+            status = result.get('requestStatus', {})
+            if status.get('result'):
+                if name in current:
+                    current[name].update(values)
+            else:
+                failures.append(('SetInputSettings', status.get('code', 0), f"{name}: {status.get('comment', '')}"))
+        if failures:
+            raise OBSRequestError(failures)
+        return list(changed)
@@ -0,0 +1,164 @@
+"""
+Rolling segment buffer for instant clips
+Keeps the last few minutes of a live stream as short stream-copied
+fragmented MP4 segments on tmpfs, so a clip of what just happened is a
+concatenation of files that already exist instead of a new recording
+Author: @Cdaprod
+"""
+
+import asyncio
+import logging
+import math
+import os
+import shutil
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, List, Optional
+
+# Extra segment names in the wrap cycle beyond the buffered ones, so FFmpeg
+# never reopens (truncates) a file that a running clip may still be reading
+SPARE_SEGMENTS = 2
+
+@dataclass
+class Segment:
+    path: str
+    start: float          # Stream time, seconds
+    end: float
+    completed_at: float   # Wall clock
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+class SegmentBuffer:
+    """Rolling buffer of a stream's last buffer_seconds as fMP4 segments
+
+    FFmpeg's segment muxer writes stream-copied segments (cut on keyframes,
+    so roughly segment_seconds each) to a fixed ring of file names and
+    reports every finished segment on stdout. Disk use is bounded by the
+    ring length, memory by the matching deque of Segment entries.
+    Each segment is a self-contained fragmented MP4, so clips need no
+    ADTS-to-MP4 audio conversion.
+    """
+    def __init__(self, directory: str, source_args: List[str], segment_seconds: float = 2,
+                 buffer_seconds: float = 300, ffmpeg: str = 'ffmpeg'):
+        self.logger = logging.getLogger('SegmentBuffer')
+        self.directory = Path(directory)
+        self.source_args = source_args
+        self.segment_seconds = segment_seconds
+        self.capacity = max(1, math.ceil(buffer_seconds / segment_seconds))
+        self.ffmpeg = ffmpeg
+        self.segments: Deque[Segment] = deque(maxlen=self.capacity)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    @classmethod
+    def for_rtmp(cls, url: str, directory: str, **kwargs) -> 'SegmentBuffer':
+        return cls(directory, ['-i', url, '-map', '0', '-c', 'copy'], **kwargs)
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def buffered_seconds(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    async def start(self):
+        if self.running:
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory.mkdir(parents=True)
+        self.segments.clear()
+        self.process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, '-nostdin', '-hide_banner', '-loglevel', 'error',
+            *self.source_args,
+            '-f', 'segment',
+            '-segment_time', str(self.segment_seconds),
+            '-segment_format', 'mp4',
+            '-segment_format_options', 'movflags=+frag_keyframe+empty_moov+default_base_moof',
+            '-segment_wrap', str(self.capacity + SPARE_SEGMENTS),
+            '-segment_list', 'pipe:1',
+            '-segment_list_type', 'csv',
+            str(self.directory / 'segment_%05d.mp4'),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        self._reader = asyncio.create_task(self._read_segments(self.process))
+
+    async def _read_segments(self, process: asyncio.subprocess.Process):
+        """Record each finished segment FFmpeg lists as `name,start,end`"""
+        stderr_task = asyncio.create_task(process.stderr.read())
+        async for line in process.stdout:
+            name, _, times = line.decode(errors='replace').strip().partition(',')
+            start, _, end = times.partition(',')
+            try:
+                segment = Segment(str(self.directory / name), float(start), float(end), time.time())
+            except ValueError:
+                continue
+            self.segments.append(segment)
+        stderr = await stderr_task
+        await process.wait()
+        if process.returncode not in (0, -9):
+            self.logger.warning(
+                f"Segment recorder for {self.directory.name} exited with {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
+
+    def select(self, seconds: float) -> List[Segment]:
+        """Newest segments covering at least `seconds`, oldest first"""
+        selected: List[Segment] = []
+        covered = 0.0
+        for segment in reversed(self.segments):
+            if covered >= seconds:
+                break
+            selected.append(segment)
+            covered += segment.duration
+        selected.reverse()
+        return selected
+
+    async def clip(self, seconds: float, output: str) -> float:
+        """Write the last `seconds` to output without re-encoding; returns its duration
+
+        The clip starts on the segment boundary (a keyframe) at or before
+        the requested point and ends with the last finished segment, at
+        most one segment behind live. It is written under a temporary
+        name and renamed into place once complete.
+        """
+        segments = self.select(seconds)
+        if not segments:
+            raise ValueError(f"No buffered segments in {self.directory}")
+        output_path = Path(output)
+        partial = output_path.with_name(f".{output_path.stem}.partial{output_path.suffix}")
+        playlist = self.directory / f".clip_{uuid.uuid4().hex}.txt"
+        playlist.write_text(''.join(f"file '{segment.path}'\n" for segment in segments))
+
+        # The concat demuxer rebases each segment's timestamps onto the previous one
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, '-y', '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-f', 'concat', '-safe', '0', '-i', str(playlist),
+            '-map', '0', '-c', 'copy', str(partial),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        playlist.unlink(missing_ok=True)
+        if process.returncode != 0:
+            partial.unlink(missing_ok=True)
+            raise RuntimeError(f"Failed to create clip: {stderr.decode(errors='replace').strip()}")
+        os.replace(partial, output_path)
+        return sum(segment.duration for segment in segments)
+
+    async def stop(self):
+        """Stop recording and release the buffer's tmpfs space"""
+        if self.running:
+            self.process.kill()
+        if self._reader is not None:
+            await self._reader
+            self._reader = None
+        self.process = None
+        self.segments.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
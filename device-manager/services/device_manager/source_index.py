@@ -0,0 +1,100 @@
+"""
+Source lookup indexes
+Compiles config['sources'] once into dictionaries keyed by what udev and
+nginx-rtmp report, so matching a device is a few hash lookups no matter
+how many sources are configured
+Author: @Cdaprod
+"""
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+WILDCARD = '*'
+
+def _normalize(value) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    return str(value).strip().lower()
+
+def _model_name(value) -> Optional[str]:
+    """udev escapes spaces in ID_MODEL as underscores"""
+    value = _normalize(value)
+    return value.replace('_', ' ') if value else None
+
+class SourceIndex:
+    """Configured sources indexed by USB identity and RTMP stream key
+
+    Each USB source is indexed under its most specific criterion only:
+    serial, then id_path (udev ID_PATH, i.e. the physical port), then
+    vendor_id/product_id (either may be '*'), then device_name (udev
+    ID_MODEL). A source pinned to a serial therefore never matches
+    another unit of the same model. Lookups try the tiers in the same
+    order and return every source of the first tier that matches.
+    Network sources are matched on their mDNS instance name.
+    """
+    def __init__(self, sources: Optional[Mapping[str, dict]] = None):
+        self.sources: Dict[str, dict] = dict(sources or {})
+        self.by_serial: Dict[str, List[str]] = {}
+        self.by_id_path: Dict[str, List[str]] = {}
+        self.by_usb_id: Dict[Tuple[str, str], List[str]] = {}
+        self.by_model: Dict[str, List[str]] = {}
+        self.by_stream_key: Dict[str, str] = {}
+        self.by_service: Dict[str, str] = {}
+        for source_id, config in self.sources.items():
+            config = config or {}
+            if config.get('type') == 'rtmp' and config.get('stream_key'):
+                self.by_stream_key.setdefault(config['stream_key'], source_id)
+            elif config.get('type') == 'usb':
+                self._index_usb(source_id, config)
+            elif config.get('type') == 'network' and _normalize(config.get('service_name')):
+                self.by_service.setdefault(_normalize(config['service_name']), source_id)
+
+    @classmethod
+    def of(cls, sources) -> 'SourceIndex':
+        return sources if isinstance(sources, cls) else cls(sources)
+
+    def _index_usb(self, source_id: str, config: dict):
+        serial = _normalize(config.get('serial'))
+        id_path = _normalize(config.get('id_path'))
+        vendor = _normalize(config.get('vendor_id'))
+        product = _normalize(config.get('product_id'))
+        model = _model_name(config.get('device_name'))
+        if serial:
+            self.by_serial.setdefault(serial, []).append(source_id)
+        elif id_path:
+            self.by_id_path.setdefault(id_path, []).append(source_id)
+        elif vendor or product:
+            key = (vendor or WILDCARD, product or WILDCARD)
+            if key != (WILDCARD, WILDCARD):
+                self.by_usb_id.setdefault(key, []).append(source_id)
+        elif model:
+            self.by_model.setdefault(model, []).append(source_id)
+
+    def match_usb(self, device) -> List[str]:
+        """Source ids for a udev device (anything with .get() for properties)"""
+        for serial in (device.get('ID_SERIAL_SHORT'), device.get('ID_SERIAL')):
+            matches = self.by_serial.get(_normalize(serial))
+            if matches:
+                return list(matches)
+        matches = self.by_id_path.get(_normalize(device.get('ID_PATH')))
+        if matches:
+            return list(matches)
+        vendor = _normalize(device.get('ID_VENDOR_ID')) or WILDCARD
+        product = _normalize(device.get('ID_MODEL_ID')) or WILDCARD
+        for key in ((vendor, product), (vendor, WILDCARD), (WILDCARD, product)):
+            matches = self.by_usb_id.get(key)
+            if matches:
+                return list(matches)
+        return list(self.by_model.get(_model_name(device.get('ID_MODEL')), ()))
+
+    def rtmp_source(self, stream_key: str) -> Optional[str]:
+        return self.by_stream_key.get(stream_key)
+
+    def network_source(self, instance: str) -> Optional[str]:
+        """Source id for an mDNS service instance name ('Cam A')"""
+        return self.by_service.get(_normalize(instance))
+
+    def source(self, source_id: Optional[str]) -> dict:
+        return self.sources.get(source_id) or {}
+
+    def __len__(self) -> int:
+        return len(self.sources)
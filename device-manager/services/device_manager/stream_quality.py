@@ -0,0 +1,184 @@
+"""
+Per-stream quality history and thresholds
+Fixed-size, array-backed ring buffers of bitrate / fps / dropped frames
+Author: @Cdaprod
+"""
+
+import time
+from array import array
+from dataclasses import dataclass
+from statistics import fmean
+from typing import Optional, Tuple
+
+@dataclass
+class WindowStats:
+    """Summary of the samples inside a time window"""
+    samples: int = 0
+    bitrate_mean: float = 0
+    bitrate_p5: float = 0
+    bitrate_p95: float = 0
+    bitrate_jitter: float = 0
+    fps_mean: float = 0
+    fps_p5: float = 0
+    dropped: int = 0
+
+def _percentile(ordered: list, fraction: float) -> float:
+    """Linear-interpolated percentile of an already sorted sequence"""
+    if not ordered:
+        return 0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class QualityHistory:
+    """Ring buffer of quality samples with O(1) append and bounded memory"""
+    __slots__ = ('capacity', 'timestamps', 'bitrates', 'fps', 'dropped', 'head', 'size')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.bitrates = array('d', bytes(8 * capacity))
+        self.fps = array('f', bytes(4 * capacity))
+        self.dropped = array('L', bytes(array('L').itemsize * capacity))
+        self.head = 0
+        self.size = 0
+
+    def append(self, timestamp: float, bitrate: float, fps: float, dropped: int = 0):
+        head = self.head
+        self.timestamps[head] = timestamp
+        self.bitrates[head] = bitrate
+        self.fps[head] = fps
+        self.dropped[head] = dropped
+        self.head = (head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def latest_timestamp(self) -> float:
+        return self.timestamps[self.head - 1] if self.size else 0
+
+    def _ordered(self, column: array) -> array:
+        """Column in chronological order (oldest first)"""
+        if self.size < self.capacity:
+            return column[:self.size]
+        return column[self.head:] + column[:self.head]
+
+    def window(self, seconds: float, now: Optional[float] = None) -> Tuple[array, array, array]:
+        """Bitrate, fps and dropped columns for samples newer than now - seconds"""
+        now = time.time() if now is None else now
+        cutoff = now - seconds
+        timestamps = self._ordered(self.timestamps)
+        # Timestamps are appended in order, so bisect for the window start
+        low, high = 0, len(timestamps)
+        while low < high:
+            middle = (low + high) // 2
+            if timestamps[middle] < cutoff:
+                low = middle + 1
+            else:
+                high = middle
+        return (self._ordered(self.bitrates)[low:],
+                self._ordered(self.fps)[low:],
+                self._ordered(self.dropped)[low:])
+
+    def stats(self, seconds: float, now: Optional[float] = None) -> WindowStats:
+        bitrates, fps, dropped = self.window(seconds, now)
+        if not bitrates:
+            return WindowStats()
+        ordered_bitrates = sorted(bitrates)
+        ordered_fps = sorted(fps)
+        # Mean absolute difference between consecutive samples
+        jitter = fmean(map(abs, map(float.__sub__, bitrates[1:], bitrates[:-1]))) if len(bitrates) > 1 else 0
+        return WindowStats(
+            samples=len(bitrates),
+            bitrate_mean=fmean(bitrates),
+            bitrate_p5=_percentile(ordered_bitrates, 0.05),
+            bitrate_p95=_percentile(ordered_bitrates, 0.95),
+            bitrate_jitter=jitter,
+            fps_mean=fmean(fps),
+            fps_p5=_percentile(ordered_fps, 0.05),
+            dropped=sum(dropped)
+        )
+
+class StreamQuality:
+    """Stream quality metrics, history and thresholds"""
+    def __init__(self, config: dict, history_config: Optional[dict] = None):
+        history_config = history_config or {}
+        self.bitrate: int = 0
+        self.fps: float = 0
+        self.resolution: str = ""
+        self.set_thresholds(config)
+
+        # Rolling history sized for the configured window at the fastest poll rate
+        self.window_seconds = history_config.get('minutes', 10) * 60
+        sample_interval = history_config.get('sample_interval', 1)
+        self.history = QualityHistory(max(1, int(self.window_seconds / sample_interval)))
+
+        # Hysteresis: consecutive bad samples before alerting, good ones before clearing
+        self.fail_after = history_config.get('fail_after', 3)
+        self.recover_after = history_config.get('recover_after', 5)
+        self.acceptable = True
+        self._streak = 0
+        self._last_dropped: Optional[int] = None
+
+    def set_thresholds(self, config: dict):
+        """Apply quality thresholds; history and hysteresis state are kept"""
+        self.min_bitrate = config.get('bitrate_min', 2000000)
+        self.min_fps = config.get('framerate_min', 24)
+        self.min_resolution = config.get('resolution_min', '1920x1080')
+
+    def update(self, bitrate: int, fps: float, resolution: str,
+               dropped: int = 0, timestamp: Optional[float] = None) -> int:
+        """Record a sample; `dropped` is nginx's cumulative dropped-frame counter
+
+        Returns the frames dropped since the previous sample.
+        """
+        self.bitrate = bitrate
+        self.fps = fps
+        self.resolution = resolution
+
+        # Store per-sample deltas; the counter restarts with the publisher
+        previous = self._last_dropped
+        delta = dropped - previous if previous is not None and dropped >= previous else 0
+        self._last_dropped = dropped
+        self.history.append(time.time() if timestamp is None else timestamp, bitrate, fps, delta)
+
+        if self.sample_is_acceptable() == self.acceptable:
+            self._streak = 0
+            return delta
+        self._streak += 1
+        if self._streak >= (self.fail_after if self.acceptable else self.recover_after):
+            self.acceptable = not self.acceptable
+            self._streak = 0
+        return delta
+
+    def sample_is_acceptable(self) -> bool:
+        """Check if the latest sample meets minimum thresholds"""
+        if self.bitrate < self.min_bitrate:
+            return False
+        if self.fps < self.min_fps:
+            return False
+        width, height = map(int, self.resolution.split('x'))
+        min_width, min_height = map(int, self.min_resolution.split('x'))
+        if width < min_width or height < min_height:
+            return False
+        return True
+
+    def score(self) -> int:
+        """Latest sample as a percentage of the bitrate and fps thresholds, capped at 100"""
+        ratios = [1.0]
+        if self.min_bitrate:
+            ratios.append(self.bitrate / self.min_bitrate)
+        if self.min_fps:
+            ratios.append(self.fps / self.min_fps)
+        return round(min(ratios) * 100)
+
+    def is_acceptable(self) -> bool:
+        """Quality state after hysteresis, so a single bad sample doesn't flap alerts"""
+        return self.acceptable
+
+    def stats(self, seconds: Optional[float] = None, now: Optional[float] = None) -> WindowStats:
+        return self.history.stats(self.window_seconds if seconds is None else seconds, now)
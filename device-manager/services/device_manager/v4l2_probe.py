@@ -0,0 +1,204 @@
+"""
+V4L2 capture capability probing
+Enumerates a capture device's formats, frame sizes and frame intervals
+with the VIDIOC_ENUM_* ioctls, once per physical device, and picks the
+mode that delivers the configured resolution and frame rate within
+what the USB bus can carry
+Author: @Cdaprod
+"""
+
+import errno
+import fcntl
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+def _iowr(nr: int, size: int) -> int:
+    """_IOWR('V', nr, size) from linux/ioctl.h"""
+    return (3 << 30) | (size << 16) | (ord('V') << 8) | nr
+
+# struct v4l2_fmtdesc, v4l2_frmsizeenum, v4l2_frmivalenum (linux/videodev2.h)
+FMTDESC = struct.Struct('<III32sII3I')
+FRMSIZEENUM = struct.Struct('<III6I2I')
+FRMIVALENUM = struct.Struct('<IIIII6I2I')
+VIDIOC_ENUM_FMT = _iowr(2, FMTDESC.size)
+VIDIOC_ENUM_FRAMESIZES = _iowr(74, FRMSIZEENUM.size)
+VIDIOC_ENUM_FRAMEINTERVALS = _iowr(75, FRMIVALENUM.size)
+
+BUF_TYPE_VIDEO_CAPTURE = 1
+DISCRETE = 1  # V4L2_FRMSIZE_TYPE_DISCRETE == V4L2_FRMIVAL_TYPE_DISCRETE
+# Sizes tried inside a stepwise/continuous range, largest first
+COMMON_SIZES = ((3840, 2160), (2560, 1440), (1920, 1080), (1280, 720), (640, 480))
+COMMON_FPS = (60, 50, 30, 25, 24, 15)
+
+# Bytes per pixel of uncompressed formats; formats missing here are compressed
+RAW_BYTES_PER_PIXEL = {'YUYV': 2, 'UYVY': 2, 'YVYU': 2, 'NV12': 1.5, 'NV21': 1.5, 'YU12': 1.5,
+                       'YV12': 1.5, 'RGB3': 3, 'BGR3': 3, 'GREY': 1}
+# FOURCC -> the input_format names the OBS source settings use
+FORMAT_NAMES = {'MJPG': 'mjpeg', 'JPEG': 'mjpeg', 'H264': 'h264', 'HEVC': 'hevc', 'YUYV': 'yuyv422',
+                'UYVY': 'uyvy422', 'NV12': 'nv12', 'YU12': 'yuv420p', 'RGB3': 'rgb24', 'BGR3': 'bgr24'}
+# Share of the link's signalling rate isochronous video actually gets:
+# ~24 MB/s on USB 2.0 (480 Mbit/s), ~250 MB/s on USB 3.0
+USB_EFFICIENCY = 0.4
+
+Ioctl = Callable[[int, int, bytearray], object]
+
+@dataclass(frozen=True, order=True)
+class CaptureMode:
+    fourcc: str
+    width: int
+    height: int
+    fps: float
+
+    @property
+    def compressed(self) -> bool:
+        return self.fourcc not in RAW_BYTES_PER_PIXEL
+
+    @property
+    def input_format(self) -> str:
+        return FORMAT_NAMES.get(self.fourcc, self.fourcc.lower())
+
+    def bandwidth(self) -> float:
+        """Bytes per second on the bus; 0 for compressed formats, which fit any link"""
+        return self.width * self.height * RAW_BYTES_PER_PIXEL.get(self.fourcc, 0) * self.fps
+
+def _fourcc(value: int) -> str:
+    return value.to_bytes(4, 'little').decode('ascii', errors='replace').strip()
+
+def pack_fourcc(fourcc: str) -> int:
+    return int.from_bytes(fourcc.ljust(4).encode('ascii'), 'little')
+
+def _enumerate(fd: int, ioctl: Ioctl, request: int, layout: struct.Struct, *fields: int) -> Iterator[tuple]:
+    """Run an ENUM ioctl with index 0, 1, ... until the driver answers EINVAL
+
+    `fields` fill the u32 members after index; the rest start zeroed.
+    """
+    index = 0
+    while True:
+        buffer = bytearray(layout.size)
+        struct.pack_into(f'<{1 + len(fields)}I', buffer, 0, index, *fields)
+        try:
+            ioctl(fd, request, buffer)
+        except OSError as e:
+            if e.errno == errno.EINVAL:
+                return
+            raise
+        yield layout.unpack(buffer)
+        index += 1
+
+def _frame_sizes(fd: int, ioctl: Ioctl, pixelformat: int) -> List[Tuple[int, int]]:
+    sizes = []
+    for _, _, kind, *dims, _, _ in _enumerate(fd, ioctl, VIDIOC_ENUM_FRAMESIZES, FRMSIZEENUM, pixelformat):
+        if kind == DISCRETE:
+            sizes.append((dims[0], dims[1]))
+            continue
+        min_w, max_w, step_w, min_h, max_h, step_h = dims
+        sizes.append((max_w, max_h))
+        sizes.extend((w, h) for w, h in COMMON_SIZES
+                     if min_w <= w <= max_w and min_h <= h <= max_h
+                     and (w - min_w) % max(step_w, 1) == 0 and (h - min_h) % max(step_h, 1) == 0)
+        break
+    return sizes
+
+def _frame_rates(fd: int, ioctl: Ioctl, pixelformat: int, width: int, height: int) -> List[float]:
+    rates = []
+    for _, _, _, _, kind, *fract, _, _ in _enumerate(fd, ioctl, VIDIOC_ENUM_FRAMEINTERVALS, FRMIVALENUM,
+                                                     pixelformat, width, height):
+        if kind == DISCRETE:
+            if fract[0]:
+                rates.append(float(Fraction(fract[1], fract[0])))
+            continue
+        # Stepwise/continuous: intervals from min (fastest) to max (slowest)
+        fastest = Fraction(fract[1], fract[0]) if fract[0] else Fraction(0)
+        slowest = Fraction(fract[3], fract[2]) if fract[2] else Fraction(0)
+        rates.append(float(fastest))
+        rates.extend(fps for fps in COMMON_FPS if slowest <= fps < fastest)
+        break
+    return rates
+
+def probe_modes(fd: int, ioctl: Ioctl = fcntl.ioctl) -> List[CaptureMode]:
+    """Every (format, size, frame rate) an open capture device offers"""
+    modes = []
+    for _, _, _, _, pixelformat, _, *_ in _enumerate(fd, ioctl, VIDIOC_ENUM_FMT, FMTDESC, BUF_TYPE_VIDEO_CAPTURE):
+        fourcc = _fourcc(pixelformat)
+        for width, height in _frame_sizes(fd, ioctl, pixelformat):
+            for fps in _frame_rates(fd, ioctl, pixelformat, width, height):
+                fps = round(float(fps), 3)
+                modes.append(CaptureMode(fourcc, width, height, int(fps) if fps.is_integer() else fps))
+    return sorted(set(modes), reverse=True)
+
+def parse_resolution(value, default: Tuple[int, int] = (1920, 1080)) -> Tuple[int, int]:
+    try:
+        width, height = str(value).lower().split('x')
+        return int(width), int(height)
+    except (AttributeError, ValueError):
+        return default
+
+def usb_budget(speed_mbps: Optional[float]) -> float:
+    """Bytes per second of video a USB link of `speed_mbps` sustains (USB 2.0 if unknown)"""
+    return (speed_mbps or 480) * 1e6 / 8 * USB_EFFICIENCY
+
+def best_mode(modes: List[CaptureMode], width: int, height: int, fps: float,
+              budget: float = usb_budget(None)) -> Optional[CaptureMode]:
+    """The mode delivering the most of width x height at fps that the bus can carry
+
+    Modes are ranked by delivered throughput, counting pixels and frames
+    only up to the target, so a larger or faster mode gains nothing; ties
+    go to uncompressed formats (no decode cost), then to the mode
+    closest to the target.
+    """
+    fitting = [mode for mode in modes if mode.bandwidth() <= budget]
+    if not fitting:
+        return None
+    def rank(mode: CaptureMode):
+        delivered = min(mode.width, width) * min(mode.height, height) * min(mode.fps, fps)
+        excess = mode.width * mode.height * mode.fps
+        return (delivered, not mode.compressed, -excess)
+    return max(fitting, key=rank)
+
+def usb_speed(device) -> Optional[float]:
+    """Link speed in Mbit/s of the USB device behind a pyudev video4linux device"""
+    try:
+        return float(device.find_parent('usb', 'usb_device').attributes.asstring('speed'))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+def capability_key(device) -> str:
+    """Identifies a capture interface across replugs and node renumbering"""
+    identity = (device.get('ID_SERIAL_SHORT') or device.get('ID_SERIAL')
+                or device.get('ID_PATH') or getattr(device, 'device_node', ''))
+    return f"{identity}:{device.get('ID_USB_INTERFACE_NUM') or '00'}"
+
+class CapabilityCache:
+    """Probe results per capability_key(); each device is probed once
+
+    Probing opens the node and issues a few dozen ioctls (UVC devices
+    answer some of them over the bus), so it runs in a worker thread;
+    a re-plugged device is answered from the cache.
+    """
+    def __init__(self, ioctl: Ioctl = fcntl.ioctl, opener: Optional[Callable[[str], int]] = None):
+        self.logger = logging.getLogger('CapabilityCache')
+        self.ioctl = ioctl
+        self.opener = opener or (lambda node: os.open(node, os.O_RDWR | os.O_NONBLOCK))
+        self.modes: Dict[str, List[CaptureMode]] = {}
+        self.probes = 0
+
+    def get(self, key: str) -> Optional[List[CaptureMode]]:
+        return self.modes.get(key)
+
+    def probe(self, key: str, node: str) -> List[CaptureMode]:
+        """Cached modes for `key`, probing `node` the first time"""
+        if key in self.modes:
+            return self.modes[key]
+        self.probes += 1
+        fd = self.opener(node)
+        try:
+            modes = probe_modes(fd, self.ioctl)
+        finally:
+            os.close(fd)
+        self.modes[key] = modes
+        self.logger.info(f"Probed {node}: {len(modes)} capture modes")
+        return modes
@@ -1,4 +1,5 @@
-from obswebsocket import obsws, requests, events
+from app.services.device_manager.obs_client import OBSClient
+from app.services.device_manager.scene_state import SceneState
 
 # OBS WebSocket connection details
 HOST = "localhost"
@@ -6,18 +7,33 @@ PORT = 4444
 PASSWORD = "your_password"
 
 ws = None  # Global WebSocket connection instance
+client = None  # Shared async client for scene management
+scene_state = None  # Mirror of OBS scene state, kept fresh from events
+
+SCENE = "Master Scene"
 
 def connect_to_obs():
     """Connect to OBS WebSocket."""
     global ws
     if ws is None:
+        from obswebsocket import obsws
         ws = obsws(HOST, PORT, PASSWORD)
         ws.connect()
         print("Connected to OBS WebSocket.")
     return ws
 
+async def get_scene_state():
+    """Shared OBSClient and scene mirror, started on first use"""
+    global client, scene_state
+    if client is None:
+        client = OBSClient(HOST, PORT, PASSWORD)
+        scene_state = SceneState(client)
+        await client.start()
+    return scene_state
+
 def load_scenes():
     """Load master scene configuration into OBS."""
+    from obswebsocket import requests
     ws = connect_to_obs()
     for source in MASTER_SCENE_JSON["sources"]:
         ws.call(requests.CreateSource(source["name"], source["type"], "Master Scene", source["settings"]))
@@ -36,33 +52,26 @@ def load_scenes():
         ))
     print("Scenes loaded successfully.")
 
-def manage_scene():
+async def manage_scene():
     """Manage OBS scene dynamically based on source activity."""
-    ws = connect_to_obs()
-
-    # Check if the main camera is active
-    camera_settings = ws.call(requests.GetSourceSettings("Main Camera")).getSettings()
-    camera_active = camera_settings.get("video_device") is not None
+    state = await get_scene_state()
 
-    # Check if the iPhone broadcast is active
-    iphone_settings = ws.call(requests.GetSourceSettings("iPhone ScreenBroadcast")).getSettings()
-    iphone_active = iphone_settings.get("source") is not None
+    # Check which sources are active (fetched once, then kept fresh from events)
+    settings = await state.input_settings(["Main Camera", "iPhone ScreenBroadcast"])
+    camera_active = settings.get("Main Camera", {}).get("video_device") is not None
+    iphone_active = settings.get("iPhone ScreenBroadcast", {}).get("source") is not None
 
     # Logic for managing the scene
     if iphone_active:
-        ws.call(requests.SetSceneItemProperties("iPhone ScreenBroadcast", visible=True))
-        ws.call(requests.SetSceneItemProperties("Main Camera", visible=True))
-        ws.call(requests.SetSceneItemProperties("Adjustments Overlay", visible=True))
-        ws.call(requests.SetSceneItemProperties("Default Page", visible=False))
+        visibility = {"iPhone ScreenBroadcast": True, "Main Camera": True,
+                      "Adjustments Overlay": True, "Default Page": False}
     elif camera_active:
-        ws.call(requests.SetSceneItemProperties("Main Camera", visible=True))
-        ws.call(requests.SetSceneItemProperties("iPhone ScreenBroadcast", visible=False))
-        ws.call(requests.SetSceneItemProperties("Adjustments Overlay", visible=True))
-        ws.call(requests.SetSceneItemProperties("Default Page", visible=False))
+        visibility = {"Main Camera": True, "iPhone ScreenBroadcast": False,
+                      "Adjustments Overlay": True, "Default Page": False}
     else:
-        ws.call(requests.SetSceneItemProperties("Main Camera", visible=False))
-        ws.call(requests.SetSceneItemProperties("iPhone ScreenBroadcast", visible=False))
-        ws.call(requests.SetSceneItemProperties("Adjustments Overlay", visible=False))
-        ws.call(requests.SetSceneItemProperties("Default Page", visible=True))
+        visibility = {"Main Camera": False, "iPhone ScreenBroadcast": False,
+                      "Adjustments Overlay": False, "Default Page": True}
+    # Only items whose visibility differs are sent
+    await state.set_visibility(SCENE, visibility)
 
-    print("Scene managed successfully.")
\ No newline at end of file
+    print("Scene managed successfully.")
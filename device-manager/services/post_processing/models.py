@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from enum import Enum
 from typing import Optional, List
 
 @dataclass
@@ -15,4 +16,30 @@ class ProcessingResult:
     success: bool
     message: str
     output_path: Optional[str] = None
-    errors: Optional[List[str]] = None
\ No newline at end of file
+    errors: Optional[List[str]] = None
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+@dataclass
+class ProcessingJob:
+    job_id: str
+    input_path: str
+    output_path: str
+    steps: List[str] = field(default_factory=list)
+    priority: int = 0
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    completed_steps: int = 0
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
@@ -1,28 +1,22 @@
-from submodules.auto_fix_mobile import auto_fix_mobile_portrait
-from submodules.apply_portrait import apply_portrait_in_landscape
-from submodules.processing_queue import video_processing_queue
-from models import VideoMetadata
+import asyncio
+from submodules.job_store import JobStore
+from submodules.processing_queue import ProcessingEngine
 
-def main():
+async def main():
     # Example: Video to process
-    video = VideoMetadata(
-        video_id="12345",
-        title="Test Video",
+    engine = ProcessingEngine(JobStore("/data/ephemeral/processing_jobs.sqlite"))
+    await engine.start()
+
+    job = await engine.submit(
         input_path="/path/to/video.mp4",
-        resolution="1920x1080",
+        output_path="/path/to/video_processed.mp4",
+        steps=["auto_fix_mobile", "apply_portrait"],
         duration=120.0,
     )
+    job = await engine.wait(job.job_id)
+    print(f"Processing result: {job.status.value} {job.output_path} {job.error or ''}")
 
-    # Process video
-    queue = [
-        (auto_fix_mobile_portrait, video),
-        (apply_portrait_in_landscape, video),
-    ]
-
-    results = video_processing_queue(queue)
-
-    for result in results:
-        print(f"Processing result: {result}")
+    await engine.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
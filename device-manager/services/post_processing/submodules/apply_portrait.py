@@ -1,5 +1,8 @@
 from models import VideoMetadata, ProcessingResult
 
+# Fit into a 1920x1080 frame and pillarbox the remainder
+PORTRAIT_IN_LANDSCAPE_FILTER = "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2"
+
 def apply_portrait_in_landscape(video: VideoMetadata) -> ProcessingResult:
     try:
         print(f"Applying portrait in landscape for {video.title}...")
@@ -1,5 +1,8 @@
 from models import VideoMetadata, ProcessingResult
 
+# Rotate portrait phone footage 90 degrees clockwise
+AUTO_FIX_MOBILE_FILTER = "transpose=1"
+
 def auto_fix_mobile_portrait(video: VideoMetadata) -> ProcessingResult:
     try:
         print(f"Auto-fixing mobile portrait for {video.title}...")
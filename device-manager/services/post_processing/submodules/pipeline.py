@@ -0,0 +1,48 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from submodules.apply_portrait import PORTRAIT_IN_LANDSCAPE_FILTER
+from submodules.auto_fix_mobile import AUTO_FIX_MOBILE_FILTER
+
+# Processing steps by name, as FFmpeg video filter chains (None: no filtering)
+STEP_FILTERS: Dict[str, Optional[str]] = {
+    "auto_fix_mobile": AUTO_FIX_MOBILE_FILTER,
+    "apply_portrait": PORTRAIT_IN_LANDSCAPE_FILTER,
+    "remux": None,
+}
+
+@dataclass
+class PipelineStage:
+    """One FFmpeg invocation covering one or more consecutive steps."""
+    steps: List[str] = field(default_factory=list)
+    filters: List[str] = field(default_factory=list)
+
+    @property
+    def video_filter(self) -> Optional[str]:
+        return ",".join(self.filters) or None
+
+    def ffmpeg_args(self, source: str, target: str) -> List[str]:
+        """Input/output arguments: one decode and one encode, or a stream copy."""
+        if self.video_filter is None:
+            return ["-i", source, "-c", "copy", target]
+        return ["-i", source, "-vf", self.video_filter, "-c:a", "copy", target]
+
+def build_pipeline(steps: List[str], fuse: bool = True) -> List[PipelineStage]:
+    """Group steps into FFmpeg invocations.
+
+    With fuse=True the filter chains of consecutive steps are joined into
+    a single `-vf` graph, so the whole chain is decoded and encoded once.
+    With fuse=False every step gets its own pass, as before.
+    """
+    unknown = [step for step in steps if step not in STEP_FILTERS]
+    if unknown:
+        raise ValueError(f"Unknown processing steps: {unknown}")
+
+    stages: List[PipelineStage] = []
+    for step in steps:
+        if not stages or not fuse:
+            stages.append(PipelineStage())
+        stage = stages[-1]
+        stage.steps.append(step)
+        if STEP_FILTERS[step]:
+            stage.filters.append(STEP_FILTERS[step])
+    return stages
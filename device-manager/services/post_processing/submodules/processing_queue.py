@@ -1,18 +1,342 @@
-from typing import Callable, List, Tuple
-from models import VideoMetadata, ProcessingResult
+import asyncio
+import itertools
+import logging
 import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from models import JobStatus, ProcessingJob
+from submodules.job_store import JobStore
+from submodules.pipeline import build_pipeline
+from submodules.save_to_persistence import copy_file_atomic
 
-def video_processing_queue(
-    tasks: List[Tuple[Callable[[VideoMetadata], ProcessingResult], VideoMetadata]]
-) -> List[ProcessingResult]:
-    results = []
-    for func, video in tasks:
-        print(f"Processing {video.title} with {func.__name__}...")
-        result = func(video)
-        results.append(result)
-
-        # Clean up ephemeral data
-        if result.success and video.input_path:
-            print(f"Removing ephemeral file: {video.input_path}")
-            os.remove(video.input_path)
-    return results
\ No newline at end of file
+logger = logging.getLogger("ProcessingEngine")
+
+# Persist progress at most this often per job
+PROGRESS_SAVE_INTERVAL = 1.0
+# FFmpeg already uses every core for one encode; a second worker only
+# keeps the CPU busy while the other is probing or between steps
+DEFAULT_WORKERS = 2
+# Finished jobs stay in memory this long, then are read from the store
+FINISHED_JOB_TTL = 300.0
+
+# A single-pass job's work: given the FFmpeg arguments of its fused stage,
+# stage_args(source, target), and a progress(fraction) callback, read the
+# source and write the job's output
+StreamRunner = Callable[[Callable[[str, str], List[str]], Callable[[float], None]], Awaitable[Any]]
+
+def is_stream_source(input_path: str) -> bool:
+    """Single-pass jobs read a URL rather than a local file"""
+    return "://" in input_path
+
+def step_path(output_path: str, label: str) -> str:
+    """Sibling of output_path used for intermediate and in-flight files."""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}.{label}{path.suffix}"))
+
+def parse_progress_line(line: str) -> Optional[float]:
+    """Seconds of output written, from an FFmpeg `-progress` key=value line."""
+    key, _, value = line.strip().partition("=")
+    # out_time_ms is also in microseconds in every FFmpeg release
+    if key in ("out_time_us", "out_time_ms") and value.lstrip("-").isdigit():
+        return max(int(value), 0) / 1_000_000
+    return None
+
+class ProcessingEngine:
+    """Async post-processing job engine.
+
+    Jobs run on a bounded pool of worker tasks (DEFAULT_WORKERS, at most
+    one per CPU, by default), highest priority first. Consecutive filter
+    steps are fused into one FFmpeg subprocess (see build_pipeline) whose
+    `-progress` output drives job.progress. Job state lives in a JobStore,
+    so queued jobs and jobs interrupted mid-way are picked up again on the
+    next start, continuing after the last completed step. Finished jobs
+    are dropped from memory after `finished_ttl` seconds and served from
+    the store from then on.
+    Single-pass jobs (submit_stream) share the same queue and workers
+    but do their own reading and writing; they cannot be resumed, so
+    one interrupted by a restart is marked failed.
+    """
+
+    def __init__(self, store: JobStore, workers: Optional[int] = None, ffmpeg: str = "ffmpeg",
+                 on_update: Optional[Callable[[ProcessingJob], None]] = None, fuse: bool = True,
+                 finished_ttl: float = FINISHED_JOB_TTL):
+        self.store = store
+        self.workers = workers or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+        self.finished_ttl = finished_ttl
+        self.ffmpeg = ffmpeg
+        self.fuse = fuse
+        self.on_update = on_update
+        self.jobs: Dict[str, ProcessingJob] = {}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        # Single-pass jobs: the runner while queued, its task while running
+        self._streams: Dict[str, StreamRunner] = {}
+        self._streaming: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        """Resume unfinished jobs from the store and start the workers."""
+        for job in self.store.unfinished():
+            if is_stream_source(job.input_path):
+                job.status, job.error = JobStatus.FAILED, "Interrupted by a restart; submit it again"
+                job.updated_at = time.time()
+                self.store.save(job)
+                continue
+            logger.info(f"Resuming job {job.job_id} at step {job.completed_steps}/{len(job.steps)}")
+            job.status = JobStatus.QUEUED
+            self._enqueue(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; running jobs stay resumable."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, input_path: str, output_path: str, steps: List[str],
+                     priority: int = 0, duration: Optional[float] = None) -> ProcessingJob:
+        """Queue a job; higher priority runs first, FIFO within a priority."""
+        build_pipeline(steps)  # Validates step names
+        now = time.time()
+        job = ProcessingJob(
+            job_id=uuid.uuid4().hex,
+            input_path=input_path,
+            output_path=output_path,
+            steps=list(steps),
+            priority=priority,
+            duration=duration,
+            created_at=now,
+            updated_at=now,
+        )
+        self._enqueue(job)
+        return job
+
+    async def submit_stream(self, source: str, output_path: str, steps: List[str], run: StreamRunner,
+                            priority: int = 0, duration: Optional[float] = None) -> ProcessingJob:
+        """Queue a single-pass job that `run` performs from `source` into `output_path`.
+
+        The steps must fuse into one FFmpeg stage, whose arguments are
+        handed to `run` once a worker is free; it counts against the same
+        workers and priorities as every other job.
+        """
+        if len(build_pipeline(steps, self.fuse)) != 1:
+            raise ValueError(f"Steps do not fuse into a single pass: {steps}")
+        if not is_stream_source(source):
+            raise ValueError(f"Single-pass jobs read a URL, not {source}")
+        now = time.time()
+        job = ProcessingJob(
+            job_id=uuid.uuid4().hex,
+            input_path=source,
+            output_path=output_path,
+            steps=list(steps),
+            priority=priority,
+            duration=duration,
+            created_at=now,
+            updated_at=now,
+        )
+        self._streams[job.job_id] = run
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ProcessingJob]:
+        return self.jobs.get(job_id) or self.store.get(job_id)
+
+    async def wait(self, job_id: str) -> ProcessingJob:
+        """Wait until a job completes, fails or is cancelled.
+
+        A job that finished before a restart, or long enough ago to have
+        been dropped from memory, is returned from the store at once.
+        Raises LookupError for a job this engine is not running.
+        """
+        if job_id not in self._finished:
+            job = self.store.get(job_id)
+            if job is None:
+                raise LookupError(f"Unknown processing job: {job_id}")
+            if not job.finished:
+                raise LookupError(f"Processing job {job_id} is not queued; start() resumes it")
+            return job
+        job = self.jobs[job_id]
+        await self._finished[job_id].wait()
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        process = self._processes.get(job_id)
+        streaming = self._streaming.get(job_id)
+        self._update(job, status=JobStatus.CANCELLED)
+        if process and process.returncode is None:
+            # SIGTERM makes FFmpeg drain its encoder queue; the output is discarded anyway
+            process.kill()
+        elif streaming is not None:
+            streaming.cancel()
+        elif job_id not in self._processes:
+            # Still queued: the worker drops it when it comes up
+            self._finished[job_id].set()
+        logger.info(f"Cancelled job {job_id}")
+        return True
+
+    def _enqueue(self, job: ProcessingJob):
+        self.jobs[job.job_id] = job
+        self._finished[job.job_id] = asyncio.Event()
+        self.store.save(job)
+        self._queue.put_nowait((-job.priority, next(self._sequence), job.job_id))
+
+    def _forget(self, job_id: str):
+        """Drop a finished job from memory; the store still has it."""
+        self.jobs.pop(job_id, None)
+        self._finished.pop(job_id, None)
+
+    def _update(self, job: ProcessingJob, persist: bool = True, **changes):
+        for key, value in changes.items():
+            setattr(job, key, value)
+        job.updated_at = time.time()
+        if persist:
+            self.store.save(job)
+        if self.on_update:
+            self.on_update(job)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            try:
+                stream = self._streams.pop(job_id, None)
+                if job.status == JobStatus.QUEUED:
+                    await (self._run_stream(job, stream) if stream else self._run(job))
+            except asyncio.CancelledError:
+                # Engine shutdown: leave the job as running so it resumes
+                process = self._processes.get(job_id)
+                if process and process.returncode is None:
+                    process.kill()
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                self._update(job, status=JobStatus.FAILED, error=str(e))
+            finally:
+                self._processes.pop(job_id, None)
+                if job.finished:
+                    self._finished[job_id].set()
+                    asyncio.get_running_loop().call_later(self.finished_ttl, self._forget, job_id)
+                self._queue.task_done()
+
+    async def _run(self, job: ProcessingJob):
+        self._update(job, status=JobStatus.RUNNING)
+        if job.duration is None:
+            job.duration = await self._probe_duration(job.input_path)
+
+        # An interrupted job restarts from its last completed step if that output survived
+        if job.completed_steps and not os.path.exists(step_path(job.output_path, f"step{job.completed_steps - 1}")):
+            job.completed_steps = 0
+
+        total = len(job.steps)
+        while job.completed_steps < total:
+            index = job.completed_steps
+            stage = build_pipeline(job.steps[index:], self.fuse)[0]
+            last = index + len(stage.steps) - 1
+            source = job.input_path if index == 0 else step_path(job.output_path, f"step{index - 1}")
+            target = step_path(job.output_path, f"step{last}")
+            partial = step_path(job.output_path, "part")
+
+            await self._run_ffmpeg(job, stage.ffmpeg_args(source, partial), index, len(stage.steps), total)
+            if job.status == JobStatus.CANCELLED:
+                self._remove(partial)
+                return
+            os.replace(partial, target)
+            if index > 0:
+                self._remove(source)
+            self._update(job, completed_steps=last + 1, progress=(last + 1) / total)
+
+        final = step_path(job.output_path, f"step{total - 1}") if total else job.input_path
+        if total:
+            os.replace(final, job.output_path)
+        else:
+            # Nothing to run: copy the input off the event loop, it may be several GB
+            await asyncio.to_thread(copy_file_atomic, final, job.output_path, checksum=False)
+        self._update(job, status=JobStatus.COMPLETED, progress=1.0)
+        logger.info(f"Job {job.job_id} completed: {job.output_path}")
+
+    async def _run_stream(self, job: ProcessingJob, run: StreamRunner):
+        self._update(job, status=JobStatus.RUNNING)
+        stage = build_pipeline(job.steps, self.fuse)[0]
+        last_saved = time.monotonic()
+
+        def progress(fraction: float):
+            nonlocal last_saved
+            now = time.monotonic()
+            persist = now - last_saved >= PROGRESS_SAVE_INTERVAL
+            if persist:
+                last_saved = now
+            self._update(job, persist=persist, progress=min(max(fraction, 0.0), 1.0))
+
+        task = self._streaming[job.job_id] = asyncio.create_task(run(stage.ffmpeg_args, progress))
+        try:
+            # wait() rather than await: cancel() cancelling the task must not stop this worker
+            await asyncio.wait({task})
+        finally:
+            self._streaming.pop(job.job_id, None)
+            task.cancel()
+        if task.cancelled():
+            return
+        task.result()
+        self._update(job, status=JobStatus.COMPLETED, completed_steps=len(job.steps), progress=1.0)
+        logger.info(f"Job {job.job_id} completed in one pass: {job.output_path}")
+
+    async def _run_ffmpeg(self, job: ProcessingJob, args: List[str], index: int, count: int, total: int):
+        """Run one pipeline stage covering steps index..index+count-1."""
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, "-y", "-nostdin", "-hide_banner", "-loglevel", "error",
+            "-progress", "pipe:1", "-nostats", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._processes[job.job_id] = process
+        stderr_task = asyncio.create_task(process.stderr.read())
+
+        last_saved = time.monotonic()
+        async for line in process.stdout:
+            seconds = parse_progress_line(line.decode(errors="replace"))
+            if seconds is None or not job.duration:
+                continue
+            stage_fraction = min(seconds / job.duration, 1.0)
+            now = time.monotonic()
+            persist = now - last_saved >= PROGRESS_SAVE_INTERVAL
+            if persist:
+                last_saved = now
+            self._update(job, persist=persist, progress=(index + stage_fraction * count) / total)
+
+        stderr = await stderr_task
+        await process.wait()
+        if job.status == JobStatus.CANCELLED:
+            return
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg exited with {process.returncode}: {stderr.decode(errors='replace').strip()}")
+
+    async def _probe_duration(self, path: str) -> Optional[float]:
+        """Input duration in seconds via ffprobe, if it is installed."""
+        if not shutil.which("ffprobe"):
+            return None
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await process.communicate()
+        try:
+            return float(stdout.decode().strip())
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
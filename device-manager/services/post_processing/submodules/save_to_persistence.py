@@ -1,7 +1,153 @@
+import errno
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
 
-def save_to_persistent(video: VideoMetadata, base_dir: str) -> str:
+logger = logging.getLogger("Persistence")
+
+# Unit for checksums and parallel copies
+CHUNK_SIZE = 64 * 1024 * 1024
+# Files at least this large are copied in parallel chunks when workers > 1
+PARALLEL_THRESHOLD = 512 * 1024 * 1024
+# copy_file_range errors that mean "not supported here", not "copy failed"
+FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+@dataclass
+class PersistResult:
+    path: str
+    size: int
+    method: str
+    checksum: Optional[str] = None
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int):
+    """Copy bytes [offset, offset+count) in-kernel: copy_file_range, else sendfile."""
+    copied = 0
+    use_copy_file_range = hasattr(os, "copy_file_range")
+    while copied < count:
+        position = offset + copied
+        if use_copy_file_range:
+            try:
+                sent = os.copy_file_range(src_fd, dst_fd, count - copied, position, position)
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRNOS:
+                    raise
+                use_copy_file_range = False
+                continue
+        else:
+            # sendfile writes at the destination's file offset
+            os.lseek(dst_fd, position, os.SEEK_SET)
+            sent = os.sendfile(dst_fd, src_fd, position, count - copied)
+        if sent == 0:
+            raise IOError(f"Unexpected end of file at offset {position}")
+        copied += sent
+
+def _chunk_digest(fd: int, offset: int, count: int) -> bytes:
+    """SHA-256 of bytes [offset, offset+count) of fd; just copied, so read from the page cache."""
+    digest = hashlib.sha256()
+    end = offset + count
+    while offset < end:
+        data = os.pread(fd, min(1024 * 1024, end - offset), offset)
+        if not data:
+            break
+        digest.update(data)
+        offset += len(data)
+    return digest.digest()
+
+def _copy_chunk(src_path: str, dst_path: str, offset: int, count: int, checksum: bool) -> Optional[bytes]:
+    src_fd = os.open(src_path, os.O_RDONLY)
+    dst_fd = os.open(dst_path, os.O_RDWR)
+    try:
+        _copy_range(src_fd, dst_fd, offset, count)
+        if not checksum:
+            return None
+        digest = _chunk_digest(src_fd, offset, count)
+        if _chunk_digest(dst_fd, offset, count) != digest:
+            raise IOError(f"Checksum mismatch copying {src_path} at offset {offset}")
+        return digest
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def copy_file_atomic(src: str, dest: str, workers: int = 1,
+                     parallel_threshold: int = PARALLEL_THRESHOLD, checksum: bool = True) -> Optional[str]:
+    """Copy src to dest through a temporary name, fsync, then rename into place.
+
+    Data moves in-kernel (copy_file_range, or sendfile where that is not
+    supported across the two filesystems). Large files are split into
+    CHUNK_SIZE ranges copied by `workers` threads. With checksum=True each
+    chunk is read back from the destination and compared with the source,
+    and a mismatch fails the copy. The checksum is SHA-256 over the
+    per-chunk SHA-256 digests, so it does not depend on how many workers
+    were used.
+    """
+    dest_path = Path(dest)
+    tmp_path = dest_path.with_name(f".{dest_path.name}.partial")
+    size = os.path.getsize(src)
+    ranges = [(offset, min(CHUNK_SIZE, size - offset)) for offset in range(0, size, CHUNK_SIZE)]
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        parallel = workers > 1 and size >= parallel_threshold
+        try:
+            if parallel:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    digests: List[Optional[bytes]] = list(pool.map(
+                        lambda r: _copy_chunk(src, str(tmp_path), r[0], r[1], checksum), ranges
+                    ))
+            else:
+                digests = [_copy_chunk(src, str(tmp_path), offset, count, checksum) for offset, count in ranges]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, dest_path)
+        _fsync_dir(dest_path.parent)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    if not checksum:
+        return None
+    return hashlib.sha256(b"".join(digests)).hexdigest()
+
+def save_to_persistence(processed_path: str, persistent_path: str, workers: int = 1,
+                        parallel_threshold: int = PARALLEL_THRESHOLD, checksum: bool = True) -> PersistResult:
+    """Move a processed video into persistent_path/<date>/.
+
+    On the same filesystem this is a single rename. Across filesystems
+    (e.g. ephemeral disk to a NAS mount) the file is copied atomically with
+    a checksum and the source is removed afterwards.
+    """
+    video_file = Path(processed_path)
     date = datetime.now().strftime("%Y-%m-%d")
-    output_path = Path(base_dir) / date / video.title
-    output_path.mkdir(parents=True, exist_ok=True)
-    return str(output_path / f"{video.video_id}.mp4")
\ No newline at end of file
+    dest_dir = Path(persistent_path) / date
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    dest_path = dest_dir / video_file.name
+    size = video_file.stat().st_size
+
+    if video_file.stat().st_dev == dest_dir.stat().st_dev:
+        try:
+            os.rename(video_file, dest_path)
+            logger.info(f"Saved processed video to {dest_path} (rename)")
+            return PersistResult(path=str(dest_path), size=size, method="rename")
+        except OSError as e:
+            # Bind mounts share st_dev with their source but still refuse rename
+            if e.errno != errno.EXDEV:
+                raise
+
+    digest = copy_file_atomic(str(video_file), str(dest_path), workers, parallel_threshold, checksum)
+    video_file.unlink()
+    logger.info(f"Saved processed video to {dest_path} (copy, sha256 chunks {digest})")
+    return PersistResult(path=str(dest_path), size=size, method="copy", checksum=digest)
@@ -0,0 +1,222 @@
+"""
+Bulk Twitch VOD backfill
+A batch of VOD IDs is deduplicated, resolved through Helix in bulk and
+pushed through download -> process -> persist, with a separate
+concurrency limit per stage so one VOD can download while another is
+being encoded and a third is copied to the NAS
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger("VODBackfill")
+
+class VODStatus(Enum):
+    QUEUED = "queued"
+    DOWNLOADING = "downloading"
+    PROCESSING = "processing"
+    PERSISTING = "persisting"
+    DONE = "done"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+FINISHED = (VODStatus.DONE, VODStatus.SKIPPED, VODStatus.FAILED)
+
+def vod_filename(vod_id: str) -> str:
+    """Name a backfilled VOD is archived under"""
+    return f"twitch_{vod_id}.mp4"
+
+@dataclass
+class BackfillItem:
+    vod_id: str
+    status: VODStatus = VODStatus.QUEUED
+    title: Optional[str] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+    updated_at: float = 0.0
+
+@dataclass
+class BackfillBatch:
+    batch_id: str
+    items: Dict[str, BackfillItem] = field(default_factory=dict)
+    created_at: float = 0.0
+
+    def counts(self) -> Dict[str, int]:
+        counts = {status.value: 0 for status in VODStatus}
+        for item in self.items.values():
+            counts[item.status.value] += 1
+        return counts
+
+    @property
+    def finished(self) -> bool:
+        return all(item.status in FINISHED for item in self.items.values())
+
+# Stage signatures: each takes the Helix video object and the previous stage's path
+Resolve = Callable[[List[str]], Awaitable[Dict[str, Optional[dict]]]]
+Download = Callable[[dict], Awaitable[str]]
+Stage = Callable[[dict, str], Awaitable[str]]
+
+class VODBackfill:
+    """Runs backfill batches through bounded download, process and persist stages
+
+    `download_limit` bounds network transfers, `process_limit` CPU-bound
+    encodes and `persist_limit` copies to persistent storage. At most
+    `max_staged` VODs are between the start of their download and the end
+    of their persist, which caps the ephemeral disk a backfill can fill
+    when downloads outrun encoding. `archived(vod_ids)` returns which of
+    the given VOD IDs are already in the archive, under any file name;
+    those VODs, and VODs already queued by an earlier batch, are skipped.
+    Finished batches beyond the newest `keep_batches` are forgotten.
+    close() fails the VODs still in flight and removes their staged files.
+    """
+    def __init__(self, resolve: Resolve, download: Download, process: Stage, persist: Stage,
+                 archived: Callable[[Iterable[str]], Set[str]], download_limit: int = 3,
+                 process_limit: int = 1, persist_limit: int = 2, max_staged: Optional[int] = None,
+                 keep_batches: int = 100, on_update: Optional[Callable[[BackfillBatch, BackfillItem], None]] = None):
+        self.resolve = resolve
+        self.download = download
+        self.process = process
+        self.persist = persist
+        self.archived = archived
+        self.download_limit = asyncio.Semaphore(download_limit)
+        self.process_limit = asyncio.Semaphore(process_limit)
+        self.persist_limit = asyncio.Semaphore(persist_limit)
+        self.staged = asyncio.Semaphore(max_staged or download_limit + process_limit + persist_limit)
+        self.keep_batches = keep_batches
+        self.on_update = on_update
+        self.batches: Dict[str, BackfillBatch] = {}
+        # VOD ID -> batch that owns it, while it is being worked on
+        self.active: Dict[str, str] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, vod_ids: Iterable[str]) -> BackfillBatch:
+        """Queue a batch and return at once; poll get(batch.batch_id) for progress"""
+        now = time.time()
+        batch = BackfillBatch(uuid.uuid4().hex, created_at=now)
+        vod_ids = list(dict.fromkeys(str(vod_id) for vod_id in vod_ids))
+        archived = await asyncio.to_thread(self.archived, vod_ids)
+        pending = []
+        for vod_id in vod_ids:
+            item = batch.items[vod_id] = BackfillItem(vod_id, updated_at=now)
+            if vod_id in archived:
+                item.status, item.error = VODStatus.SKIPPED, "already archived"
+            elif vod_id in self.active:
+                item.status, item.error = VODStatus.SKIPPED, f"already queued in batch {self.active[vod_id]}"
+            else:
+                self.active[vod_id] = batch.batch_id
+                pending.append(vod_id)
+        self.batches[batch.batch_id] = batch
+        self._forget_old_batches()
+        logger.info(f"Backfill batch {batch.batch_id}: {len(pending)} VODs queued, "
+                    f"{len(vod_ids) - len(pending)} skipped")
+        if pending:
+            self._spawn(self._run_batch(batch, pending))
+        return batch
+
+    def get(self, batch_id: str) -> Optional[BackfillBatch]:
+        return self.batches.get(batch_id)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run_batch(self, batch: BackfillBatch, vod_ids: List[str]):
+        try:
+            videos = await self.resolve(vod_ids)
+        except asyncio.CancelledError:
+            for vod_id in vod_ids:
+                self._fail(batch, batch.items[vod_id], "backfill stopped")
+            raise
+        except Exception as e:
+            for vod_id in vod_ids:
+                self._fail(batch, batch.items[vod_id], f"lookup failed: {e}")
+            return
+        for vod_id in vod_ids:
+            video = videos.get(vod_id)
+            if video is None:
+                self._fail(batch, batch.items[vod_id], "not found on Twitch")
+            else:
+                batch.items[vod_id].title = video.get("title")
+                self._spawn(self._run_vod(batch, batch.items[vod_id], video))
+
+    async def _run_vod(self, batch: BackfillBatch, item: BackfillItem, video: dict):
+        # Files this VOD left in ephemeral storage, removed if a later stage fails
+        leftovers: List[str] = []
+        try:
+            async with self.staged:
+                async with self.download_limit:
+                    self._update(batch, item, VODStatus.DOWNLOADING)
+                    path = await self.download(video)
+                leftovers.append(path)
+                async with self.process_limit:
+                    self._update(batch, item, VODStatus.PROCESSING)
+                    path = await self.process(video, path)
+                leftovers.append(path)
+                async with self.persist_limit:
+                    self._update(batch, item, VODStatus.PERSISTING)
+                    item.path = await self.persist(video, path)
+            self._update(batch, item, VODStatus.DONE)
+        except asyncio.CancelledError:
+            # close(): nothing will pick this VOD up again, so do not leave it staged or in flight
+            _remove_files(leftovers)
+            self._fail(batch, item, "backfill stopped")
+            raise
+        except Exception as e:
+            logger.error(f"Backfill of VOD {item.vod_id} failed: {e}")
+            await asyncio.to_thread(_remove_files, leftovers)
+            self._fail(batch, item, str(e))
+        finally:
+            self.active.pop(item.vod_id, None)
+
+    def _fail(self, batch: BackfillBatch, item: BackfillItem, error: str):
+        item.error = error
+        self.active.pop(item.vod_id, None)
+        self._update(batch, item, VODStatus.FAILED)
+
+    def _update(self, batch: BackfillBatch, item: BackfillItem, status: VODStatus):
+        item.status = status
+        item.updated_at = time.time()
+        if self.on_update:
+            self.on_update(batch, item)
+
+    def _forget_old_batches(self):
+        finished = [batch_id for batch_id, batch in self.batches.items() if batch.finished]
+        for batch_id in finished[:max(len(self.batches) - self.keep_batches, 0)]:
+            del self.batches[batch_id]
+
+async def channel_vod_ids(helix, channel: str, started_after: Optional[datetime] = None,
+                          started_before: Optional[datetime] = None) -> List[str]:
+    """IDs of a channel's archived broadcasts started in [started_after, started_before)
+
+    `helix` is a helix.HelixClient. Dates without a timezone are taken as
+    UTC, as Helix reports them. Raises LookupError for an unknown channel.
+    """
+    started_after, started_before = (
+        moment.replace(tzinfo=timezone.utc) if moment and moment.tzinfo is None else moment
+        for moment in (started_after, started_before)
+    )
+    user_id = await helix.get_user_id(channel)
+    if user_id is None:
+        raise LookupError(f"Unknown channel: {channel}")
+    return [video["id"] for video in await helix.get_channel_videos(user_id, started_after, started_before)]
+
+def _remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,15 +1,22 @@
 import asyncio
-from pathlib import Path
 import subprocess
+from hls_download import HLSDownloader, HLSError
 
-def download_vod(vod_url: str, output_path: str) -> bool:
+def is_hls_playlist(vod_url: str) -> bool:
+    return vod_url.split("?", 1)[0].endswith(".m3u8")
+
+async def download_vod(vod_url: str, output_path: str, downloader: HLSDownloader) -> bool:
     try:
         print(f"Downloading VOD from {vod_url} to {output_path}")
-        subprocess.run(
-            ["ffmpeg", "-i", vod_url, "-c", "copy", output_path],
-            check=True
-        )
+        if is_hls_playlist(vod_url):
+            # Segments are fetched in parallel; a rerun resumes a partial download
+            progress = await downloader.download(vod_url, output_path)
+            print(f"Downloaded {progress.segments_done} segments ({progress.bytes_written} bytes)")
+        else:
+            process = await asyncio.create_subprocess_exec("ffmpeg", "-i", vod_url, "-c", "copy", output_path)
+            if await process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, "ffmpeg")
         return True
-    except subprocess.CalledProcessError as e:
+    except (HLSError, OSError, subprocess.CalledProcessError) as e:
         print(f"Error during download: {e}")
-        return False
\ No newline at end of file
+        return False
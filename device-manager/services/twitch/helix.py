@@ -0,0 +1,299 @@
+"""
+Async Twitch Helix client
+Requests an app access token once and reuses it until shortly before it
+expires; video lookups made at the same time are merged into batches of
+up to 100 IDs per call, a lookup already in flight is shared instead of
+repeated, and answers are cached for a while. Helix only gives a VOD's
+page URL; its HLS playlist comes from a playback access token and usher
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+import aiohttp
+
+logger = logging.getLogger("HelixClient")
+
+HELIX_URL = "https://api.twitch.tv/helix"
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+# Helix accepts at most 100 `id` parameters per request
+MAX_IDS = 100
+# A token this close to expiring is replaced before use
+TOKEN_MARGIN = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+GQL_URL = "https://gql.twitch.tv/gql"
+USHER_URL = "https://usher.ttvnw.net/vod"
+# Playback access tokens are only handed to Twitch's own web player client
+PLAYER_CLIENT_ID = "kimne78kx3ncx6brgo4mv6wki5h1ko"
+PLAYBACK_TOKEN_QUERY = """
+query PlaybackAccessToken($vodID: ID!) {
+  videoPlaybackAccessToken(id: $vodID, params: {platform: "web", playerBackend: "mediaplayer", playerType: "site"}) {
+    value
+    signature
+  }
+}
+"""
+
+class HelixError(Exception):
+    """A Helix or token request failed"""
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class HelixClient:
+    """App-authenticated Helix client; nothing is requested until first use
+
+    `get_videos` answers from a cache of entries younger than `cache_ttl`
+    seconds (unknown IDs are cached as None too). The rest are queued and
+    sent after `batch_delay` seconds, so lookups started together share
+    requests of up to 100 IDs. `requests` and `token_requests` count the
+    calls made. `get_playlist_url` resolves a VOD to its HLS master
+    playlist through Twitch's GQL API and usher.
+    """
+    def __init__(self, client_id: str, client_secret: str, session: Optional[aiohttp.ClientSession] = None,
+                 base_url: str = HELIX_URL, token_url: str = TOKEN_URL, cache_ttl: float = 300,
+                 cache_size: int = 10000, batch_delay: float = 0.01, retries: int = 3, timeout: float = 15,
+                 gql_url: str = GQL_URL, usher_url: str = USHER_URL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.session = session
+        self._owns_session = session is None
+        self.base_url = base_url.rstrip("/")
+        self.token_url = token_url
+        self.gql_url = gql_url
+        self.usher_url = usher_url.rstrip("/")
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.batch_delay = batch_delay
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.requests = 0
+        self.token_requests = 0
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+        # video ID -> (expires, video or None)
+        self._cache: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._queued: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "HelixClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        for future in self._in_flight.values():
+            if not future.done():
+                future.set_exception(HelixError("Client closed"))
+        self._in_flight.clear()
+        self._queued.clear()
+        if self.session is not None and self._owns_session:
+            await self.session.close()
+            self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+        return self.session
+
+    async def token(self) -> str:
+        """The app access token, requested again only when close to expiry"""
+        if self._token and self._token_expires - TOKEN_MARGIN > time.monotonic():
+            return self._token
+        async with self._token_lock:
+            # Whoever held the lock may just have fetched one
+            if self._token and self._token_expires - TOKEN_MARGIN > time.monotonic():
+                return self._token
+            self.token_requests += 1
+            data = {"client_id": self.client_id, "client_secret": self.client_secret,
+                    "grant_type": "client_credentials"}
+            try:
+                async with self._session().post(self.token_url, data=data) as response:
+                    if response.status != 200:
+                        raise HelixError(f"Token request failed: {response.status} {await response.text()}",
+                                         response.status)
+                    body = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise HelixError(f"Token request failed: {e!r}") from e
+            self._token = body["access_token"]
+            self._token_expires = time.monotonic() + float(body.get("expires_in", 0))
+            logger.info(f"Authenticated with Twitch API, token valid for {body.get('expires_in')}s")
+            return self._token
+
+    def invalidate_token(self):
+        self._token = None
+
+    async def get(self, endpoint: str, params: Iterable[Tuple[str, str]]) -> dict:
+        """GET a Helix endpoint; a revoked token is replaced once, rate limits are waited out"""
+        params = list(params)
+        refreshed = False
+        for attempt in range(self.retries + 1):
+            headers = {"Client-Id": self.client_id, "Authorization": f"Bearer {await self.token()}"}
+            self.requests += 1
+            try:
+                async with self._session().get(f"{self.base_url}/{endpoint}", params=params,
+                                               headers=headers) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    if response.status == 401 and not refreshed:
+                        self.invalidate_token()
+                        refreshed = True
+                        continue
+                    if response.status not in RETRY_STATUSES or attempt == self.retries:
+                        raise HelixError(f"GET {endpoint} failed: {response.status} {await response.text()}",
+                                         response.status)
+                    delay = self._retry_delay(response, attempt)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise HelixError(f"GET {endpoint} failed: {e!r}") from e
+                delay = 0.5 * 2 ** attempt
+            logger.warning(f"Retrying GET {endpoint} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        raise HelixError(f"GET {endpoint} failed after {self.retries + 1} attempts")
+
+    @staticmethod
+    def _retry_delay(response: aiohttp.ClientResponse, attempt: int) -> float:
+        """Until the rate-limit bucket refills when Helix says so, else exponential backoff"""
+        reset = response.headers.get("Ratelimit-Reset")
+        if response.status == 429 and reset and reset.isdigit():
+            return min(max(int(reset) - time.time(), 0.1), 60)
+        return 0.5 * 2 ** attempt
+
+    async def get_videos(self, video_ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Helix video objects by ID; None for IDs Twitch does not know"""
+        now = time.monotonic()
+        loop = asyncio.get_running_loop()
+        videos: Dict[str, Optional[dict]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        for video_id in dict.fromkeys(map(str, video_ids)):
+            cached = self._cache.get(video_id)
+            if cached is not None and cached[0] > now:
+                videos[video_id] = cached[1]
+                continue
+            future = self._in_flight.get(video_id)
+            if future is None:
+                future = self._in_flight[video_id] = loop.create_future()
+                self._queued.append(video_id)
+            waiting[video_id] = future
+        if self._queued and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        for video_id, future in waiting.items():
+            # Shielded: one caller giving up does not cancel the lookup for the others
+            videos[video_id] = await asyncio.shield(future)
+        return videos
+
+    async def get_video(self, video_id: str) -> Optional[dict]:
+        return (await self.get_videos([video_id]))[str(video_id)]
+
+    async def get_vod_url(self, video_id: str) -> Optional[str]:
+        video = await self.get_video(video_id)
+        return video["url"] if video else None
+
+    async def get_playlist_url(self, video_id: str) -> Optional[str]:
+        """HLS master playlist of a VOD; None when Twitch will not play it (deleted, subscriber-only)
+
+        The URL carries a playback access token, valid for several hours,
+        so resolve it right before downloading.
+        """
+        payload = {"operationName": "PlaybackAccessToken", "query": PLAYBACK_TOKEN_QUERY,
+                   "variables": {"vodID": str(video_id)}}
+        try:
+            async with self._session().post(self.gql_url, json=payload,
+                                            headers={"Client-Id": PLAYER_CLIENT_ID}) as response:
+                if response.status != 200:
+                    raise HelixError(f"Playback token request failed: {response.status} {await response.text()}",
+                                     response.status)
+                body = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise HelixError(f"Playback token request failed: {e!r}") from e
+        token = (body.get("data") or {}).get("videoPlaybackAccessToken")
+        if not token:
+            return None
+        params = {"sig": token["signature"], "token": token["value"], "allow_source": "true",
+                  "allow_audio_only": "true", "player": "twitchweb", "playlist_include_framerate": "true",
+                  "p": random.randint(0, 999999)}
+        return f"{self.usher_url}/{video_id}.m3u8?{urlencode(params)}"
+
+    async def get_user_id(self, login: str) -> Optional[str]:
+        body = await self.get("users", [("login", login.lower())])
+        return body["data"][0]["id"] if body.get("data") else None
+
+    async def get_channel_videos(self, user_id: str, started_after: Optional[datetime] = None,
+                                 started_before: Optional[datetime] = None) -> List[dict]:
+        """Archived broadcasts of a channel created in [started_after, started_before), newest first
+
+        Helix lists them newest first 100 per page; paging stops at the
+        first one older than `started_after`. The videos are cached, so
+        looking them up by ID afterwards costs nothing.
+        """
+        videos: List[dict] = []
+        cursor = None
+        while True:
+            params = [("user_id", user_id), ("type", "archive"), ("first", str(MAX_IDS))]
+            body = await self.get("videos", params + ([("after", cursor)] if cursor else []))
+            for video in body.get("data", []):
+                created = datetime.fromisoformat(video["created_at"].replace("Z", "+00:00"))
+                if started_after is not None and created < started_after:
+                    return self._remember(videos)
+                if started_before is None or created < started_before:
+                    videos.append(video)
+            cursor = body.get("pagination", {}).get("cursor")
+            if not cursor or not body.get("data"):
+                return self._remember(videos)
+
+    def _remember(self, videos: List[dict]) -> List[dict]:
+        expires = time.monotonic() + self.cache_ttl
+        for video in videos:
+            self._cache.pop(video["id"], None)
+            self._cache[video["id"]] = (expires, video)
+        self._prune_cache()
+        return videos
+
+    async def _flush(self):
+        # Lookups started in the meantime join this round
+        await asyncio.sleep(self.batch_delay)
+        self._flush_task = None
+        queued, self._queued = self._queued, []
+        await asyncio.gather(*(self._fetch_batch(queued[start:start + MAX_IDS])
+                               for start in range(0, len(queued), MAX_IDS)))
+
+    async def _fetch_batch(self, video_ids: List[str]):
+        try:
+            body = await self.get("videos", [("id", video_id) for video_id in video_ids])
+            found = {video["id"]: video for video in body.get("data", [])}
+        except HelixError as e:
+            # 404 means none of the IDs exist; unknown IDs are otherwise just left out
+            if e.status != 404:
+                for video_id in video_ids:
+                    future = self._in_flight.pop(video_id, None)
+                    if future is not None:
+                        future.set_exception(e)
+                return
+            found = {}
+        expires = time.monotonic() + self.cache_ttl
+        for video_id in video_ids:
+            self._cache.pop(video_id, None)
+            self._cache[video_id] = (expires, found.get(video_id))
+            future = self._in_flight.pop(video_id, None)
+            if future is not None:
+                future.set_result(found.get(video_id))
+        self._prune_cache()
+
+    def _prune_cache(self):
+        if len(self._cache) <= self.cache_size:
+            return
+        now = time.monotonic()
+        for video_id in [key for key, (expires, _) in self._cache.items() if expires <= now]:
+            del self._cache[video_id]
+        # Entries are kept in the order they were stored: the oldest go first
+        while len(self._cache) > self.cache_size:
+            del self._cache[next(iter(self._cache))]
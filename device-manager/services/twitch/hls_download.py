@@ -0,0 +1,304 @@
+"""
+Parallel HLS VOD downloader
+Fetches the segments of an HLS playlist several at a time over one
+pooled aiohttp session and appends them to a single file in playlist
+order; an interrupted download resumes after the last segment written,
+and the file is remuxed once at the end
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Deque, List, Optional, Tuple
+from urllib.parse import urljoin
+import aiohttp
+
+logger = logging.getLogger("HLSDownloader")
+
+# Worth another try: the CDN is busy or briefly unavailable
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Containers the concatenated MPEG-TS segments are written as, without remuxing
+TS_SUFFIXES = {".ts", ".m2ts"}
+ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+class HLSError(Exception):
+    """The playlist cannot be downloaded as asked"""
+
+@dataclass(frozen=True)
+class Segment:
+    url: str
+    duration: float = 0
+
+@dataclass
+class Playlist:
+    """A media playlist: its segments in order, an EXT-X-MAP init section first"""
+    url: str
+    segments: List[Segment] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    def fingerprint(self) -> str:
+        """Identifies the segment list, so a resume never mixes two playlists"""
+        digest = hashlib.sha1()
+        for segment in self.segments:
+            digest.update(segment.url.split("?", 1)[0].encode())
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+@dataclass
+class DownloadProgress:
+    segments_done: int
+    segments_total: int
+    bytes_written: int
+    seconds_done: float
+    seconds_total: float
+    resumed_from: int = 0
+
+    def advance(self, segment: Segment, size: int):
+        self.segments_done += 1
+        self.bytes_written += size
+        self.seconds_done += segment.duration
+
+    @property
+    def fraction(self) -> float:
+        return self.segments_done / self.segments_total if self.segments_total else 1.0
+
+def _attributes(line: str) -> dict:
+    return {key: value.strip('"') for key, value in ATTRIBUTE.findall(line.split(":", 1)[1])}
+
+def parse_variants(text: str, base_url: str) -> List[Tuple[int, str]]:
+    """(bandwidth, url) of each variant in a master playlist"""
+    variants = []
+    bandwidth = None
+    for line in map(str.strip, text.splitlines()):
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            bandwidth = int(_attributes(line).get("BANDWIDTH", 0) or 0)
+        elif line and not line.startswith("#") and bandwidth is not None:
+            variants.append((bandwidth, urljoin(base_url, line)))
+            bandwidth = None
+    return variants
+
+def parse_media_playlist(text: str, base_url: str) -> Playlist:
+    """Segments of a media playlist; encrypted and byte-range playlists are refused"""
+    lines = [line.strip() for line in text.splitlines()]
+    if not lines or lines[0] != "#EXTM3U":
+        raise HLSError(f"Not an HLS playlist: {base_url}")
+    playlist = Playlist(base_url)
+    duration = 0.0
+    for line in lines[1:]:
+        if line.startswith("#EXTINF:"):
+            duration = float(line[8:].split(",", 1)[0] or 0)
+        elif line.startswith("#EXT-X-MAP:"):
+            playlist.segments.append(Segment(urljoin(base_url, _attributes(line)["URI"])))
+        elif line.startswith("#EXT-X-KEY:") and _attributes(line).get("METHOD", "NONE") != "NONE":
+            raise HLSError("Encrypted HLS playlists are not supported")
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            raise HLSError("Byte-range HLS playlists are not supported")
+        elif line and not line.startswith("#"):
+            playlist.segments.append(Segment(urljoin(base_url, line), duration))
+            duration = 0.0
+    if not playlist.segments:
+        raise HLSError(f"Playlist has no segments: {base_url}")
+    return playlist
+
+class HLSDownloader:
+    """Downloads HLS VODs with up to `concurrency` segment requests in flight
+
+    Segments complete in any order but are written strictly in playlist
+    order, so at most `concurrency` of them are held in memory. Each is
+    retried `retries` times with exponential backoff on connection
+    errors, timeouts and 408/429/5xx answers. Progress is recorded in
+    `<output>.part.idx` next to the `<output>.part` data file; running
+    the same download again continues after the last segment written.
+    """
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, concurrency: int = 8,
+                 retries: int = 4, retry_delay: float = 0.5, timeout: float = 30):
+        self.session = session
+        self._owns_session = session is None
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.requests = 0
+
+    async def __aenter__(self) -> "HLSDownloader":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None and self._owns_session:
+            await self.session.close()
+            self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def fetch(self, url: str) -> bytes:
+        """GET `url`, retrying transient failures"""
+        for attempt in range(self.retries + 1):
+            try:
+                self.requests += 1
+                async with self._session().get(url, timeout=self.timeout) as response:
+                    if response.status in RETRY_STATUSES:
+                        raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                          status=response.status, message=response.reason)
+                    response.raise_for_status()
+                    return await response.read()
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUSES or attempt == self.retries:
+                    raise HLSError(f"GET {url} failed: {e.status} {e.message}") from e
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise HLSError(f"GET {url} failed after {attempt + 1} attempts: {e!r}") from e
+                error = e
+            delay = min(self.retry_delay * 2 ** attempt, 30)
+            logger.warning(f"Retrying {url} in {delay:.1f}s: {error!r}")
+            await asyncio.sleep(delay)
+
+    async def playlist(self, url: str) -> Playlist:
+        """The media playlist at `url`; for a master playlist, its highest-bandwidth variant"""
+        text = (await self.fetch(url)).decode("utf-8", errors="replace")
+        if "#EXT-X-STREAM-INF" in text:
+            variants = parse_variants(text, url)
+            if not variants:
+                raise HLSError(f"Master playlist has no variants: {url}")
+            url = max(variants)[1]
+            text = (await self.fetch(url)).decode("utf-8", errors="replace")
+        return parse_media_playlist(text, url)
+
+    async def segments(self, playlist: Playlist, start: int = 0) -> AsyncIterator[Tuple[int, bytes]]:
+        """(number, data) of each segment from `start` on, in playlist order
+
+        Up to `concurrency` segments are requested ahead of the one being
+        consumed; a slow consumer holds the window back rather than
+        letting fetched data pile up. Close the iterator (aclosing) when
+        stopping early, so requests still in flight are cancelled.
+        """
+        segments = playlist.segments
+        in_flight: Deque[asyncio.Task] = deque()
+        following = start
+        try:
+            while following < len(segments) and len(in_flight) < self.concurrency:
+                in_flight.append(asyncio.create_task(self.fetch(segments[following].url)))
+                following += 1
+            for number in range(start, len(segments)):
+                data = await in_flight.popleft()
+                if following < len(segments):
+                    in_flight.append(asyncio.create_task(self.fetch(segments[following].url)))
+                    following += 1
+                yield number, data
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def download(self, url: str, output_path: str,
+                       progress: Optional[Callable[[DownloadProgress], None]] = None) -> DownloadProgress:
+        """Download the VOD at playlist `url` to `output_path`; returns the final progress"""
+        playlist = await self.playlist(url)
+        part_path, index_path = f"{output_path}.part", f"{output_path}.part.idx"
+        start, offset = await asyncio.to_thread(_resume_point, index_path, part_path, playlist)
+        if start:
+            logger.info(f"Resuming {output_path} at segment {start}/{len(playlist.segments)}")
+
+        segments = playlist.segments
+        state = DownloadProgress(start, len(segments), offset,
+                                 sum(segment.duration for segment in segments[:start]),
+                                 playlist.duration, resumed_from=start)
+        data_file = await asyncio.to_thread(_open_part, part_path, offset)
+        index_file = await asyncio.to_thread(_open_index, index_path, playlist, start)
+        try:
+            async with aclosing(self.segments(playlist, start)) as fetched:
+                async for number, data in fetched:
+                    await asyncio.to_thread(_append, data_file, index_file, number, data)
+                    state.advance(segments[number], len(data))
+                    if progress:
+                        progress(state)
+        finally:
+            data_file.close()
+            index_file.close()
+
+        await _finish(part_path, output_path)
+        os.remove(index_path)
+        logger.info(f"Downloaded {output_path}: {len(segments)} segments, {state.bytes_written} bytes")
+        return state
+
+def _resume_point(index_path: str, part_path: str, playlist: Playlist) -> Tuple[int, int]:
+    """(next segment, bytes to keep) from an earlier attempt at the same playlist"""
+    try:
+        with open(index_path) as f:
+            lines = f.read().split("\n")
+        size = os.path.getsize(part_path)
+    except OSError:
+        return 0, 0
+    if lines[0] != playlist.fingerprint():
+        return 0, 0
+    start = offset = 0
+    # The last line may be cut short; only complete lines that the data file covers count
+    for line in lines[1:-1]:
+        try:
+            number, end = map(int, line.split())
+        except ValueError:
+            break
+        if end > size:
+            break
+        start, offset = number + 1, end
+    return start, offset
+
+def _open_part(part_path: str, offset: int):
+    data_file = open(part_path, "r+b" if offset else "wb")
+    data_file.truncate(offset)
+    data_file.seek(offset)
+    return data_file
+
+def _open_index(index_path: str, playlist: Playlist, start: int):
+    if start:
+        return open(index_path, "a")
+    index_file = open(index_path, "w")
+    index_file.write(playlist.fingerprint() + "\n")
+    return index_file
+
+def _append(data_file, index_file, number: int, data: bytes):
+    data_file.write(data)
+    # Data first, so the index never points past what is in the file
+    data_file.flush()
+    index_file.write(f"{number} {data_file.tell()}\n")
+    index_file.flush()
+
+async def _finish(part_path: str, output_path: str):
+    """Move the concatenated segments into place, remuxing once if the output is not TS
+
+    The input format is probed: Twitch serves MPEG-TS, but a playlist with
+    an EXT-X-MAP init section concatenates to fragmented MP4.
+    """
+    if os.path.splitext(output_path)[1].lower() in TS_SUFFIXES:
+        os.replace(part_path, output_path)
+        return
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-v", "error", "-i", part_path,
+        "-c", "copy", "-bsf:a", "aac_adtstoasc", output_path,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise HLSError(f"Remuxing {part_path} failed: {stderr.decode(errors='replace').strip()}")
+    os.remove(part_path)
+
+async def download_hls(url: str, output_path: str, concurrency: int = 8,
+                       progress: Optional[Callable[[DownloadProgress], None]] = None) -> DownloadProgress:
+    """Download one VOD with a downloader of its own"""
+    async with HLSDownloader(concurrency=concurrency) as downloader:
+        return await downloader.download(url, output_path, progress)
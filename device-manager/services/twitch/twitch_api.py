@@ -1,15 +1,22 @@
-from twitchAPI.twitch import Twitch
-from typing import Optional
+from typing import Dict, Iterable, Optional
+from helix import HelixClient, HelixError
 
 class TwitchVODManager:
-    def __init__(self, client_id: str, client_secret: str):
-        self.twitch = Twitch(client_id, client_secret)
-        self.twitch.authenticate_app([])
+    """VOD lookups over the async Helix client; authenticates on the first request"""
+    def __init__(self, client_id: str, client_secret: str, **client_options):
+        self.helix = HelixClient(client_id, client_secret, **client_options)
 
-    def get_vod_url(self, vod_id: str) -> Optional[str]:
+    async def get_vod_url(self, vod_id: str) -> Optional[str]:
         try:
-            vod = self.twitch.get_videos(video_id=vod_id)
-            return vod['data'][0]['url'] if 'data' in vod else None
-        except Exception as e:
+            return await self.helix.get_vod_url(vod_id)
+        except HelixError as e:
             print(f"Error fetching VOD URL: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    async def get_vod_urls(self, vod_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """URLs of many VODs, looked up 100 per request"""
+        videos = await self.helix.get_videos(vod_ids)
+        return {vod_id: video["url"] if video else None for vod_id, video in videos.items()}
+
+    async def close(self):
+        await self.helix.close()
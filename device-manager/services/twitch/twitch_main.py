@@ -0,0 +1,71 @@
+import os
+from typing import Callable, Optional
+from download_vod import download_vod
+from helix import HelixError
+from hls_download import DownloadProgress, HLSDownloader
+from twitch_api import TwitchVODManager
+from vod_stream import StageArgs, StreamResult, stream_vod
+
+vod_manager: Optional[TwitchVODManager] = None
+downloader: Optional[HLSDownloader] = None
+
+def get_vod_manager() -> TwitchVODManager:
+    """Shared VOD manager, so every request reuses one token and one lookup cache"""
+    global vod_manager
+    if vod_manager is None:
+        vod_manager = TwitchVODManager(os.getenv("TWITCH_CLIENT_ID", ""), os.getenv("TWITCH_CLIENT_SECRET", ""))
+    return vod_manager
+
+def get_downloader() -> HLSDownloader:
+    """Shared HLS downloader, so every download reuses one pooled session"""
+    global downloader
+    if downloader is None:
+        downloader = HLSDownloader()
+    return downloader
+
+async def close_clients():
+    """Close the shared Twitch clients, if they were ever used"""
+    global vod_manager, downloader
+    if vod_manager is not None:
+        await vod_manager.close()
+        vod_manager = None
+    if downloader is not None:
+        await downloader.close()
+        downloader = None
+
+async def playlist_url(video: dict) -> str:
+    """HLS playlist of a VOD looked up through Helix, whose `url` is only its page"""
+    url = await get_vod_manager().helix.get_playlist_url(video["id"])
+    if url is None:
+        raise LookupError(f"VOD {video['id']} has no playable HLS stream")
+    return url
+
+async def download_video(video: dict, output_path: str) -> bool:
+    """Download a VOD already looked up through Helix"""
+    try:
+        url = await playlist_url(video)
+    except (HelixError, LookupError) as e:
+        print(f"Error resolving VOD playlist: {e}")
+        return False
+    return await download_vod(url, output_path, get_downloader())
+
+async def get_video_on_demand(vod_id: str, output_path: str) -> bool:
+    """Look up VOD `vod_id` and download it to `output_path`"""
+    try:
+        video = await get_vod_manager().helix.get_video(vod_id)
+    except HelixError as e:
+        print(f"Error fetching VOD URL: {e}")
+        return False
+    if video is None:
+        print(f"No VOD found for ID: {vod_id}")
+        return False
+    return await download_video(video, output_path)
+
+async def stream_video_on_demand(vod_id: str, output_path: str, stage_args: StageArgs,
+                                 progress: Optional[Callable[[DownloadProgress], None]] = None) -> StreamResult:
+    """Look up VOD `vod_id` and process it straight into `output_path` in one pass"""
+    video = await get_vod_manager().helix.get_video(vod_id)
+    if video is None:
+        raise LookupError(f"No VOD found for ID: {vod_id}")
+    return await stream_vod(await playlist_url(video), output_path, stage_args,
+                            downloader=get_downloader(), progress=progress)
@@ -0,0 +1,122 @@
+"""
+Single-pass VOD processing
+Pipes a VOD into one FFmpeg process and writes the result straight into
+persistent storage under a temporary name, renamed into place once it is
+complete: no full download or intermediate file in ephemeral storage,
+and every byte is read and written once
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+from hls_download import DownloadProgress, HLSDownloader
+
+logger = logging.getLogger("VODStream")
+
+# FFmpeg stage arguments for (source, target); stream copy unless given a filter stage
+StageArgs = Callable[[str, str], List[str]]
+
+def copy_args(source: str, target: str) -> List[str]:
+    return ["-i", source, "-c", "copy", target]
+
+class StreamError(Exception):
+    """FFmpeg could not process the streamed VOD"""
+
+@dataclass
+class StreamResult:
+    path: str
+    size: int
+    seconds: float
+    # Segments piped in; 0 when FFmpeg read a non-HLS source itself
+    segments: int = 0
+    bytes_in: int = 0
+
+def partial_path(output_path: str) -> Path:
+    """In-progress name next to the output; dot files are ignored by the recording catalog"""
+    path = Path(output_path)
+    return path.with_name(f".{path.stem}.partial{path.suffix}")
+
+async def stream_vod(url: str, output_path: str, stage_args: StageArgs = copy_args,
+                     downloader: Optional[HLSDownloader] = None, ffmpeg: str = "ffmpeg",
+                     progress: Optional[Callable[[DownloadProgress], None]] = None) -> StreamResult:
+    """Process the VOD at `url` into `output_path` in a single pass
+
+    HLS playlists are fetched by `downloader` (segments in parallel, in
+    order) and written to FFmpeg's stdin as they arrive; when FFmpeg
+    falls behind, the writes wait and so does fetching, so memory stays
+    at a window of segments. Other URLs are read by FFmpeg directly.
+    FFmpeg writes `.<name>.partial<suffix>` next to the output, which is
+    fsynced and renamed over `output_path` only if everything succeeded.
+    """
+    started = time.monotonic()
+    partial = partial_path(output_path)
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    hls = url.split("?", 1)[0].endswith(".m3u8")
+    own_downloader = hls and downloader is None
+    if own_downloader:
+        downloader = HLSDownloader()
+    process = None
+    try:
+        playlist = await downloader.playlist(url) if hls else None
+        process = await asyncio.create_subprocess_exec(
+            ffmpeg, "-y", "-hide_banner", "-loglevel", "error",
+            *stage_args("pipe:0" if hls else url, str(partial)),
+            stdin=asyncio.subprocess.PIPE if hls else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        stderr_task = asyncio.create_task(process.stderr.read())
+        state = None
+        if hls:
+            state = DownloadProgress(0, len(playlist.segments), 0, 0, playlist.duration)
+            try:
+                async with aclosing(downloader.segments(playlist)) as fetched:
+                    async for number, data in fetched:
+                        process.stdin.write(data)
+                        await process.stdin.drain()
+                        state.advance(playlist.segments[number], len(data))
+                        if progress:
+                            progress(state)
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                # FFmpeg gave up on the input; its exit status says why
+                pass
+        stderr = await stderr_task
+        await process.wait()
+        if process.returncode != 0:
+            raise StreamError(f"FFmpeg exited with {process.returncode}: {stderr.decode(errors='replace').strip()}")
+        size = await asyncio.to_thread(_commit, partial, output_path)
+    except BaseException:
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        if own_downloader:
+            await downloader.close()
+
+    result = StreamResult(output_path, size, time.monotonic() - started,
+                          state.segments_done if state else 0, state.bytes_written if state else 0)
+    logger.info(f"Processed {url} into {output_path} in one pass: {size} bytes in {result.seconds:.1f}s")
+    return result
+
+def _commit(partial: Path, output_path: str) -> int:
+    """fsync the finished file, rename it into place and persist the rename"""
+    fd = os.open(partial, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    os.replace(partial, output_path)
+    directory = os.open(os.path.dirname(os.path.abspath(output_path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+    return size
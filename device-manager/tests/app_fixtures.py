@@ -0,0 +1,25 @@
+# device-manager/tests/app_fixtures.py
+"""Run a FastAPI app on an ephemeral local port for tests"""
+
+import asyncio
+import uvicorn
+
+class AppServer:
+    """uvicorn serving `app` on 127.0.0.1 with a random free port"""
+    def __init__(self, app):
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.base_url = None
+        self._task = None
+
+    async def start(self) -> str:
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        self.server.should_exit = True
+        await self._task
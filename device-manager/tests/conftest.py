@@ -0,0 +1,12 @@
+# device-manager/tests/conftest.py
+import sys
+from pathlib import Path
+
+# Service modules use flat imports relative to their own directory;
+# the api package is imported from the device-manager root.
+TESTS = Path(__file__).resolve().parent
+ROOT = TESTS.parent
+SERVICES = ROOT / "services"
+for path in (ROOT, SERVICES / "post_processing", SERVICES / "device_manager", SERVICES / "twitch", TESTS):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,134 @@
+import asyncio
+import dataclasses
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+import yaml
+from config_loader import ConfigError, ConfigWatcher, load_config, parse_config
+
+STREAMS_YAML = Path(__file__).resolve().parent.parent / "services" / "device_manager" / "config" / "streams.yaml"
+OBS_CONFIG = Path(__file__).resolve().parent.parent.parent / "obs_websocket" / "config.yaml"
+
+class TestParseConfig(unittest.TestCase):
+    def test_repo_config_is_valid_and_immutable(self):
+        config = load_config(STREAMS_YAML)
+        self.assertEqual(config.storage["cleanup"]["policy"], "oldest")
+        self.assertEqual(config.source_index.rtmp_source("ios_main"), "iphone_main")
+        self.assertFalse(hasattr(config, "__dict__"))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            config.sources = {}
+        with self.assertRaises(TypeError):
+            config.storage["cleanup"]["policy"] = "quota"
+        with self.assertRaises(AttributeError):
+            config.monitoring["alerts"]["notify_on"].append("x")
+
+    def test_every_problem_is_reported(self):
+        with self.assertRaises(ConfigError) as raised:
+            parse_config({
+                "sources": {
+                    "a": {"type": "rtmp"},
+                    "b": {"type": "usb"},
+                    "c": {"type": "rtmp", "stream_key": "k", "recording": {"quota": "lots"}},
+                    "d": {"type": "rtmp", "stream_key": "k"},
+                },
+                "storage": {"cleanup": {"high_water": 80, "low_water": 90, "policy": "random"}},
+                "monitoring": {"rtmp_stats": {"min_interval": 20, "max_interval": 10}},
+            })
+        self.assertEqual(len(raised.exception.problems), 7)
+
+    def test_master_scene_sources_need_names(self):
+        with open(OBS_CONFIG) as f:
+            raw = yaml.safe_load(f)
+        self.assertEqual(parse_config(raw).get("twitch")["client_id"], "your_twitch_client_id")
+        raw["obs"]["master_scene"]["sources"].append({"type": "image_source"})
+        with self.assertRaises(ConfigError) as raised:
+            parse_config(raw)
+        self.assertEqual(raised.exception.problems, ["obs.master_scene.sources must be a list of sources with names"])
+
+    def test_stream_processing_is_a_switch(self):
+        with open(OBS_CONFIG) as f:
+            raw = yaml.safe_load(f)
+        self.assertIs(parse_config(raw).get("twitch")["stream_processing"], True)
+        raw["twitch"]["stream_processing"] = "yes"
+        with self.assertRaises(ConfigError) as raised:
+            parse_config(raw)
+        self.assertEqual(raised.exception.problems, ["twitch.stream_processing must be true or false, got 'yes'"])
+
+class TestConfigWatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "streams.yaml")
+        with open(STREAMS_YAML) as f:
+            self.raw = yaml.safe_load(f)
+        self.write(self.raw)
+        self.watcher = ConfigWatcher(self.path, debounce=0.05, poll_interval=5)
+
+    async def asyncTearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, raw: dict):
+        """Replace the file the way editors and ConfigMaps do"""
+        partial = self.path + ".partial"
+        with open(partial, "w") as f:
+            yaml.safe_dump(raw, f)
+        os.replace(partial, self.path)
+
+    async def test_only_changed_subtrees_are_swapped(self):
+        calls = []
+        for subtree in ("sources", "monitoring", "storage", "obs"):
+            self.watcher.subscribe(subtree, lambda old, new, subtree=subtree: calls.append(subtree))
+        before = self.watcher.current
+        self.raw["monitoring"]["quality_thresholds"]["bitrate_min"] = 3000000
+        self.write(self.raw)
+
+        self.assertEqual(await self.watcher.apply(), {"monitoring"})
+        after = self.watcher.current
+        self.assertEqual(calls, ["monitoring"])
+        self.assertEqual(after.monitoring["quality_thresholds"]["bitrate_min"], 3000000)
+        self.assertIs(after.sources, before.sources)
+        self.assertIs(after.storage, before.storage)
+        self.assertIs(after.source_index, before.source_index)
+        # The previous snapshot is untouched
+        self.assertEqual(before.monitoring["quality_thresholds"]["bitrate_min"], 2000000)
+
+    async def test_invalid_edit_keeps_previous_config(self):
+        before = self.watcher.current
+        self.raw["storage"]["cleanup"]["low_water"] = 95
+        self.write(self.raw)
+        self.assertEqual(await self.watcher.apply(), set())
+        self.assertIs(self.watcher.current, before)
+
+    async def test_watch_reloads_on_file_change_while_tasks_run(self):
+        reloaded = asyncio.Event()
+        self.watcher.subscribe("sources", lambda old, new: reloaded.set())
+        ticks = 0
+
+        async def monitoring_task():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(self.watcher.watch()), asyncio.create_task(monitoring_task())]
+        try:
+            await asyncio.sleep(0.1)
+            self.raw["sources"]["iphone_third"] = {"type": "rtmp", "name": "iOS Third", "stream_key": "ios_third"}
+            started = time.monotonic()
+            self.write(self.raw)
+            # Well inside poll_interval, so inotify delivered it
+            await asyncio.wait_for(reloaded.wait(), 2)
+            self.assertLess(time.monotonic() - started, 2)
+            ticks_at_reload = ticks
+            await asyncio.sleep(0.05)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertEqual(self.watcher.current.source_index.rtmp_source("ios_third"), "iphone_third")
+        self.assertGreater(ticks, ticks_at_reload)
+
+if __name__ == "__main__":
+    unittest.main()
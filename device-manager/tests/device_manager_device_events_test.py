@@ -0,0 +1,172 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+import yaml
+from device_events import DeviceEvent, DeviceEventBridge, net_action
+from obs_client import OBSClient
+from obs_fixtures import FakeOBSServer
+from scene_state import SceneState
+
+class FakeDevice:
+    """The parts of pyudev.Device the pipeline reads"""
+    def __init__(self, action: str, node: str, model: str = "Camera"):
+        self.action = action
+        self.device_node = node
+        self.sys_path = f"/sys/class/video4linux/{node.rsplit('/', 1)[-1]}"
+        # Each node is its own USB port; no capture capability, so nothing is probed
+        self.properties = {"ID_MODEL": model, "ID_PATH": f"usb-0:{node[len('/dev/video'):]}",
+                           "ID_V4L_CAPABILITIES": ":"}
+
+    def get(self, key, default=None):
+        return self.properties.get(key, default)
+
+def hub_replug(nodes: int, flaps: int = 3) -> list:
+    """udev events for re-plugging a hub: each node flaps, then settles on add"""
+    events = []
+    for _ in range(flaps):
+        events += [FakeDevice("remove", f"/dev/video{index}") for index in range(nodes)]
+        events += [FakeDevice("add", f"/dev/video{index}") for index in range(nodes)]
+    return events
+
+class TestDeviceEventBridge(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bursts = []
+        self.handled = asyncio.Event()
+
+        async def handler(events):
+            self.bursts.append(events)
+            self.handled.set()
+
+        self.bridge = DeviceEventBridge(handler, debounce=0.1, max_delay=1)
+        self.bridge.bind()
+        self.runner = asyncio.create_task(self.bridge.run())
+
+    async def asyncTearDown(self):
+        self.runner.cancel()
+        await asyncio.gather(self.runner, return_exceptions=True)
+
+    def push_from_thread(self, devices: list, interval: float = 0):
+        """Deliver events from another thread, like pyudev's MonitorObserver"""
+        def observer():
+            for device in devices:
+                self.bridge.observe(device)
+                if interval:
+                    time.sleep(interval)
+        thread = threading.Thread(target=observer)
+        thread.start()
+        return thread
+
+    async def wait_for_bursts(self, count: int):
+        while len(self.bursts) < count:
+            self.handled.clear()
+            await asyncio.wait_for(self.handled.wait(), 3)
+
+    async def test_burst_coalesces_to_final_state(self):
+        events = hub_replug(nodes=4)
+        self.push_from_thread(events).join()
+        await self.wait_for_bursts(1)
+        await asyncio.sleep(0.2)
+
+        self.assertEqual(len(self.bursts), 1)
+        burst = self.bursts[0]
+        self.assertEqual([event.key for event in burst], [f"/dev/video{index}" for index in range(4)])
+        self.assertTrue(all(event.action == "add" for event in burst))
+        self.assertEqual(sum(event.events for event in burst), len(events))
+        self.assertEqual(self.bridge.events_received, len(events))
+
+    async def test_unplug_within_burst_ends_removed(self):
+        self.push_from_thread([FakeDevice("add", "/dev/video0"), FakeDevice("remove", "/dev/video0")]).join()
+        await self.wait_for_bursts(1)
+        self.assertEqual([(event.action, event.events) for event in self.bursts[0]], [("remove", 2)])
+
+    async def test_add_then_change_within_burst_ends_added(self):
+        self.push_from_thread([FakeDevice("add", "/dev/video0"), FakeDevice("change", "/dev/video0"),
+                               FakeDevice("add", "/dev/video1"), FakeDevice("bind", "/dev/video1"),
+                               FakeDevice("change", "/dev/video2")]).join()
+        await self.wait_for_bursts(1)
+        self.assertEqual([(event.key, event.action, event.events) for event in self.bursts[0]],
+                         [("/dev/video0", "add", 2), ("/dev/video1", "add", 2), ("/dev/video2", "change", 1)])
+
+    async def test_quiet_gap_separates_bursts(self):
+        self.push_from_thread(hub_replug(nodes=2)).join()
+        await self.wait_for_bursts(1)
+        self.push_from_thread([FakeDevice("remove", "/dev/video1")]).join()
+        await self.wait_for_bursts(2)
+        self.assertEqual([event.action for event in self.bursts[1]], ["remove"])
+
+    async def test_max_delay_bounds_a_never_ending_burst(self):
+        self.bridge.max_delay = 0.3
+        # A new event every 50 ms never leaves the 100 ms debounce window quiet
+        thread = self.push_from_thread([FakeDevice("change", "/dev/video0") for _ in range(20)], interval=0.05)
+        await self.wait_for_bursts(2)
+        # The first burst was cut off while events were still arriving
+        self.assertLess(self.bursts[0][0].events, 20)
+        await asyncio.to_thread(thread.join)
+
+    def test_push_without_loop_is_dropped(self):
+        bridge = DeviceEventBridge(lambda events: None)
+        with self.assertLogs("DeviceEventBridge", "WARNING"):
+            bridge.observe(FakeDevice("add", "/dev/video0"))
+        self.assertIsNone(bridge._queue)
+        self.assertEqual(bridge.events_received, 0)
+
+class TestHotplugOBSUpdates(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from device_manager import EnhancedDeviceManager
+        self.tmp = tempfile.TemporaryDirectory()
+        self.names = [f"Camera {index}" for index in range(4)]
+        config_path = os.path.join(self.tmp.name, "streams.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump({
+                "sources": {f"camera_{index}": {"type": "usb", "name": name, "id_path": f"usb-0:{index}"}
+                            for index, name in enumerate(self.names)},
+                "storage": {"mount_point": self.tmp.name, "clip_buffer": {"enabled": False},
+                            "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+            }, f)
+        self.server = FakeOBSServer(inputs={name: {} for name in self.names})
+        port = await self.server.start()
+        self.manager = EnhancedDeviceManager(config_path)
+        self.manager.obs_ws = OBSClient("127.0.0.1", port, request_timeout=2)
+        self.manager.scene_state = SceneState(self.manager.obs_ws)
+        await self.manager.obs_ws.start()
+        await self.manager.scene_state.input_settings(self.names)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        await self.server.stop()
+        self.tmp.cleanup()
+
+    async def wait_for_hotplugs(self, count: int):
+        while len(self.manager.hotplug_obs_requests) < count:
+            await asyncio.sleep(0.05)
+
+    async def test_one_obs_update_per_burst(self):
+        bridge = self.manager.device_events
+        bridge.debounce = 0.1
+        bridge.bind()
+        runner = asyncio.create_task(bridge.run())
+        try:
+            for burst in range(1, 3):
+                for device in hub_replug(nodes=4):
+                    bridge.observe(device)
+                await asyncio.wait_for(self.wait_for_hotplugs(burst), 3)
+        finally:
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+
+        # 24 udev events: one batch the first time, nothing once OBS is already there
+        self.assertEqual(list(self.manager.hotplug_obs_requests), [1, 0])
+        self.assertEqual(bridge.bursts, 2)
+        self.assertEqual(sorted(self.manager.usb_nodes), [f"/dev/video{index}" for index in range(4)])
+        self.assertTrue(all(self.server.inputs[name]["device"].startswith("/dev/video") for name in self.names))
+
+    async def test_add_then_change_registers_device(self):
+        await self.manager.handle_device_events(
+            [DeviceEvent(net_action("add", "change"), FakeDevice("change", "/dev/video0"), "/dev/video0", 2)])
+        self.assertEqual(list(self.manager.usb_nodes), ["/dev/video0"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+import aiohttp
+import yaml
+from fastapi import FastAPI
+from app_fixtures import AppServer
+from api.events import create_event_router
+from event_hub import EventHub, Subscriber
+from rtmp_stats import StreamStats
+
+def drain(subscriber: Subscriber) -> list:
+    messages = [json.loads(message) for message in subscriber.pending.values()]
+    subscriber.pending.clear()
+    return messages
+
+class TestSubscriber(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesces_per_topic_and_drops_oldest(self):
+        subscriber = Subscriber(maxsize=3)
+        subscriber.offer(("stats", "a"), "a1")
+        subscriber.offer(("stats", "b"), "b1")
+        subscriber.offer(("stats", "a"), "a2")
+        # Replaced in place: 'a' keeps its turn
+        self.assertEqual(list(subscriber.pending.values()), ["a2", "b1"])
+        subscriber.offer(None, "x")
+        subscriber.offer(None, "y")
+        self.assertEqual(list(subscriber.pending.values()), ["b1", "x", "y"])
+        self.assertEqual((subscriber.coalesced, subscriber.dropped), (1, 1))
+
+    async def test_iteration_waits_and_ends_on_close(self):
+        subscriber = Subscriber()
+        received = []
+
+        async def consume():
+            async for message in subscriber:
+                received.append(message)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        subscriber.offer(None, "one")
+        subscriber.offer(None, "two")
+        subscriber.close()
+        await asyncio.wait_for(consumer, 1)
+        self.assertEqual(received, ["one", "two"])
+
+class TestEventHub(unittest.IsolatedAsyncioTestCase):
+    async def test_serialized_once_for_all_subscribers(self):
+        hub = EventHub()
+        subscribers = [hub.subscribe() for _ in range(500)]
+        hub.publish("stats", {"stream": "ios_main", "bitrate": 4500000}, key="ios_main")
+        messages = [next(iter(subscriber.pending.values())) for subscriber in subscribers]
+        self.assertTrue(all(message is messages[0] for message in messages))
+        self.assertEqual(json.loads(messages[0]), {"type": "stats", "stream": "ios_main", "bitrate": 4500000})
+
+    async def test_retained_topics(self):
+        hub = EventHub()
+        self.assertTrue(hub.publish("storage", {"used_percent": 40.0}, retain=True))
+        self.assertTrue(hub.publish("storage", {"used_percent": 41.0}, retain=True))
+        self.assertFalse(hub.publish("storage", {"used_percent": 41.0}, retain=True))
+        hub.publish("job", {"job_id": "j1", "progress": 0.5}, key="j1")
+        # Newcomers start from the latest retained state, not the history
+        self.assertEqual(drain(hub.subscribe()), [{"type": "storage", "used_percent": 41.0}])
+        hub.forget("storage")
+        self.assertEqual(drain(hub.subscribe()), [])
+
+    async def test_slow_clients_stay_bounded(self):
+        hub = EventHub(queue_size=16)
+        fast = [hub.subscribe() for _ in range(450)]
+        slow = [hub.subscribe() for _ in range(50)]
+        received = [0] * len(fast)
+        latest = [{} for _ in fast]
+
+        async def consume(index: int, subscriber: Subscriber):
+            async for message in subscriber:
+                event = json.loads(message)
+                received[index] += 1
+                latest[index][event["stream"]] = event["seq"]
+
+        consumers = [asyncio.create_task(consume(index, subscriber)) for index, subscriber in enumerate(fast)]
+        for seq in range(20):
+            for stream in range(10):
+                hub.publish("stats", {"stream": f"cam_{stream}", "seq": seq}, key=f"cam_{stream}")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        hub.close()
+        await asyncio.wait_for(asyncio.gather(*consumers), 30)
+
+        # Fast clients kept up and end on the newest value of every stream
+        self.assertTrue(all(events == {f"cam_{stream}": 19 for stream in range(10)} for events in latest))
+        self.assertEqual(min(received), 200)
+        # Clients that never read hold one event per stream, not 200
+        self.assertTrue(all(len(subscriber) == 10 for subscriber in slow))
+        self.assertEqual(hub.published, 200)
+
+class TestWebSocketEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = EventHub()
+        app = FastAPI()
+        app.include_router(create_event_router(lambda: self.hub))
+        self.server = AppServer(app)
+        self.base_url = await self.server.start()
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        self.hub.close()
+        await self.session.close()
+        await self.server.stop()
+
+    async def test_clients_receive_retained_state_then_live_events(self):
+        self.hub.publish("storage", {"used_percent": 12.5}, retain=True)
+        sockets = [await self.session.ws_connect(f"{self.base_url}/ws") for _ in range(20)]
+        for ws in sockets:
+            self.assertEqual(await ws.receive_json(timeout=5), {"type": "storage", "used_percent": 12.5})
+        while len(self.hub.subscribers) < len(sockets):
+            await asyncio.sleep(0.01)
+
+        self.hub.publish("device", {"id": "cam", "status": "connected"}, key="cam")
+        for ws in sockets:
+            self.assertEqual(await ws.receive_json(timeout=5), {"type": "device", "id": "cam", "status": "connected"})
+
+        for ws in sockets:
+            await ws.close()
+        deadline = time.monotonic() + 5
+        while self.hub.subscribers and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.hub.subscribers, set())
+
+class TestManagerEvents(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from device_manager import EnhancedDeviceManager
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = os.path.join(self.tmp.name, "streams.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump({
+                "sources": {"iphone_main": {"type": "rtmp", "name": "iOS Main Device", "stream_key": "ios_main"}},
+                "storage": {"mount_point": self.tmp.name, "clip_buffer": {"enabled": False},
+                            "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+                "monitoring": {"quality_history": {"fail_after": 1}},
+            }, f)
+        self.manager = EnhancedDeviceManager(config_path)
+        self.subscriber = self.manager.events.subscribe()
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    async def test_stream_lifecycle(self):
+        self.manager.rtmp_callbacks.on_publish("ios_main", "192.168.0.42")
+        await asyncio.sleep(0.05)
+        stats = StreamStats("ios_main", "live", bw_in=800000, fps=30, width=1920, height=1080)
+        await self.manager.process_rtmp_stats([stats], time.time())
+        events = drain(self.subscriber)
+        self.assertEqual([event["type"] for event in events], ["device", "stats", "alerts"])
+        self.assertEqual((events[0]["status"], events[0]["name"]), ("streaming", "iOS Main Device"))
+        self.assertEqual((events[1]["isLive"], events[1]["bitrate"], events[1]["quality"]), (True, 800000, 40))
+        self.assertEqual([alert["stream"] for alert in events[2]["alerts"]], ["ios_main"])
+
+        self.manager.rtmp_callbacks.on_publish_done("ios_main")
+        await asyncio.sleep(0.05)
+        events = drain(self.subscriber)
+        self.assertEqual([(event["type"], event.get("status", event.get("isLive"))) for event in events],
+                         [("device", "disconnected"), ("stats", False)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from eviction import execute_plan, parse_size, plan_eviction, quotas_from_config
+from recording_catalog import RecordingCatalog
+
+class EvictionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.catalog = RecordingCatalog(os.path.join(self.tmp.name, "catalog.sqlite"), self.tmp.name)
+        self.addCleanup(self.catalog.close)
+
+    def add(self, name: str, size: int, mtime: float, source: str = None) -> str:
+        path = os.path.join(self.tmp.name, name)
+        self.catalog.add(path, source=source, size=size, mtime=mtime)
+        return path
+
+    def names(self, plan) -> list:
+        return [os.path.relpath(recording.path, self.tmp.name) for recording in plan.victims]
+
+class TestPlanEviction(EvictionTestCase):
+    def test_oldest_first_stops_at_budget(self):
+        for index in range(10):
+            self.add(f"r{index}.mp4", 100, 1000 + index)
+        plan = plan_eviction(self.catalog, 250)
+        self.assertEqual(self.names(plan), ["r0.mp4", "r1.mp4", "r2.mp4"])
+        self.assertEqual(plan.bytes_planned, 300)
+        self.assertEqual(plan.shortfall, 0)
+
+    def test_nothing_needed(self):
+        self.add("r0.mp4", 100, 1000)
+        self.assertEqual(plan_eviction(self.catalog, 0).victims, [])
+
+    def test_shortfall_when_catalog_runs_out(self):
+        self.add("r0.mp4", 100, 1000)
+        plan = plan_eviction(self.catalog, 500)
+        self.assertEqual(plan.shortfall, 400)
+        self.assertIn("Short by", plan.describe()[-1])
+
+    def test_quota_trims_over_quota_source_first(self):
+        self.add("a0.flv", 100, 1000, "ios_main")
+        self.add("b0.flv", 100, 1001, "ios_secondary")
+        self.add("b1.flv", 100, 1002, "ios_secondary")
+        self.add("b2.flv", 100, 1003, "ios_secondary")
+        # ios_secondary is 150 bytes over quota: its two oldest go first
+        plan = plan_eviction(self.catalog, 250, "quota", {"ios_secondary": 150})
+        self.assertEqual(self.names(plan), ["b0.flv", "b1.flv", "a0.flv"])
+
+    def test_raw_first_keeps_clips_last(self):
+        self.add("clips/ios_main/clip.mp4", 100, 1000)
+        self.add("2024-01-01/ios_main/processed.mp4", 100, 1001)
+        self.add("ios_main_20240101.flv", 100, 1002)
+        plan = plan_eviction(self.catalog, 250, "raw_first")
+        self.assertEqual(self.names(plan), [
+            "ios_main_20240101.flv", "2024-01-01/ios_main/processed.mp4", "clips/ios_main/clip.mp4"
+        ])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            plan_eviction(self.catalog, 1, "largest")
+
+class TestExecutePlan(EvictionTestCase):
+    def test_deletes_in_batch_and_updates_catalog(self):
+        paths = []
+        for index in range(3):
+            path = os.path.join(self.tmp.name, f"r{index}.mp4")
+            with open(path, "wb") as f:
+                f.write(b"\0" * 10)
+            os.utime(path, (1000 + index, 1000 + index))
+            self.catalog.add(path)
+            paths.append(path)
+        os.remove(paths[1])  # Already gone: still dropped from the catalog
+
+        freed, failed = execute_plan(plan_eviction(self.catalog, 25), self.catalog)
+        self.assertEqual((freed, failed), (20, []))
+        self.assertEqual(len(self.catalog), 0)
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+class TestQuotaConfig(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size("200GB"), 200 * 1024 ** 3)
+        self.assertEqual(parse_size("1.5T"), int(1.5 * 1024 ** 4))
+        self.assertEqual(parse_size(4096), 4096)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+    def test_quotas_keyed_like_catalog_sources(self):
+        config = {
+            "sources": {
+                "iphone_main": {"type": "rtmp", "stream_key": "ios_main", "recording": {"quota": "1GB"}},
+                "main_camera": {"type": "usb", "recording": {"quota": "2GB"}},
+                "desk": {"type": "usb"},
+            },
+            "storage": {"cleanup": {"quotas": {"twitch": "3GB"}}},
+        }
+        self.assertEqual(quotas_from_config(config), {
+            "ios_main": 1024 ** 3, "main_camera": 2 * 1024 ** 3, "twitch": 3 * 1024 ** 3,
+        })
+
+if __name__ == "__main__":
+    unittest.main()
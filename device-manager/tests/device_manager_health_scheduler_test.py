@@ -0,0 +1,101 @@
+import asyncio
+import time
+import unittest
+from collections import Counter
+from health_scheduler import HealthScheduler, backoff
+
+class TestHealthScheduler(unittest.IsolatedAsyncioTestCase):
+    async def run_for(self, scheduler: HealthScheduler, seconds: float):
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(seconds)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def test_hung_device_does_not_delay_the_others(self):
+        checked = Counter()
+        failures = []
+
+        async def check(device_id):
+            checked[device_id] += 1
+            if device_id == "hung":
+                await asyncio.sleep(60)
+            return 0.05
+
+        def on_failure(device_id, error):
+            failures.append(device_id)
+            return 0.05
+
+        scheduler = HealthScheduler(check, on_failure, timeout=0.1, concurrency=4)
+        for device_id in ("hung", "cam_a", "cam_b"):
+            scheduler.schedule(device_id)
+        await self.run_for(scheduler, 0.5)
+        self.assertGreaterEqual(checked["cam_a"], 6)
+        self.assertGreaterEqual(checked["cam_b"], 6)
+        self.assertIn("hung", failures)
+        self.assertEqual(scheduler.timeouts, len(failures))
+
+    async def test_hundreds_of_devices_bounded_concurrency(self):
+        in_flight = peak = 0
+        last_checked = {}
+
+        async def check(device_id):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.02)
+            in_flight -= 1
+            last_checked[device_id] = time.monotonic()
+            return 0.2
+
+        scheduler = HealthScheduler(check, concurrency=50)
+        for index in range(500):
+            scheduler.schedule(f"device_{index}")
+        started = time.monotonic()
+        task = asyncio.create_task(scheduler.run())
+        try:
+            while len(last_checked) < 500:
+                await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        # 500 checks of 20 ms each would take 10 s one after another
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertLessEqual(peak, 50)
+        self.assertEqual(len(scheduler), 500)
+
+    async def test_schedule_only_moves_checks_earlier_and_never_overlaps(self):
+        running = Counter()
+        overlaps = []
+        calls = []
+
+        async def check(device_id):
+            calls.append(device_id)
+            running[device_id] += 1
+            if running[device_id] > 1:
+                overlaps.append(device_id)
+            await asyncio.sleep(0.1)
+            running[device_id] -= 1
+            return None if device_id == "gone" else 10
+
+        scheduler = HealthScheduler(check)
+        scheduler.schedule("cam", 10)
+        scheduler.schedule("cam", 0)
+        scheduler.schedule("cam", 5)
+        scheduler.schedule("gone")
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.05)
+        # Due again while its check is running: re-run right after it
+        scheduler.schedule("cam")
+        await asyncio.sleep(0.3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(Counter(calls), {"cam": 2, "gone": 1})
+        self.assertEqual(overlaps, [])
+        self.assertNotIn("gone", scheduler.due)
+
+    def test_backoff(self):
+        self.assertEqual([backoff(attempts, 5, 60) for attempts in range(6)], [5, 10, 20, 40, 60, 60])
+        self.assertEqual(backoff(10 ** 6, 5, 60), 60)
+
+if __name__ == "__main__":
+    unittest.main()
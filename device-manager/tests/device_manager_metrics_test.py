@@ -0,0 +1,150 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+import aiohttp
+import yaml
+from fastapi import FastAPI
+from app_fixtures import AppServer
+from api.metrics import create_metrics_router
+from metrics import MetricsRegistry, job_timer
+from rtmp_stats import StreamStats
+
+class FakeJob:
+    def __init__(self, job_id: str, status: str, updated_at: float):
+        self.job_id, self.status, self.updated_at = job_id, status, updated_at
+
+class TestRegistry(unittest.TestCase):
+    def test_exposition_format(self):
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests served")
+        bitrate = registry.gauge("bitrate_bps", "Bitrate", ["stream"])
+        latency = registry.histogram("latency_seconds", "Latency", ["kind"], buckets=(0.1, 1))
+        requests.inc()
+        requests.inc(2)
+        bitrate.labels('cam "a"\n').set(4500000)
+        for seconds in (0.05, 0.5, 0.5, 3):
+            latency.labels("request").observe(seconds)
+
+        self.assertEqual(registry.expose(), "\n".join([
+            "# HELP requests_total Requests served",
+            "# TYPE requests_total counter",
+            "requests_total 3",
+            "# HELP bitrate_bps Bitrate",
+            "# TYPE bitrate_bps gauge",
+            'bitrate_bps{stream="cam \\"a\\"\\n"} 4500000',
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{kind="request",le="0.1"} 1',
+            'latency_seconds_bucket{kind="request",le="1"} 3',
+            'latency_seconds_bucket{kind="request",le="+Inf"} 4',
+            'latency_seconds_sum{kind="request"} 4.05',
+            'latency_seconds_count{kind="request"} 4',
+            "",
+        ]))
+
+    def test_registration_and_removal(self):
+        registry = MetricsRegistry()
+        fps = registry.gauge("fps", "Frame rate", ["stream"])
+        self.assertIs(registry.gauge("fps", "Frame rate", ["stream"]), fps)
+        with self.assertRaises(ValueError):
+            registry.counter("fps", "Frame rate", ["stream"])
+        with self.assertRaises(ValueError):
+            fps.labels("a", "b")
+        with self.assertRaises(ValueError):
+            registry.counter("drops", "Drops").inc(-1)
+        fps.labels("a").set(30)
+        fps.remove("a")
+        self.assertNotIn("fps{", registry.expose())
+
+    def test_job_timer(self):
+        registry = MetricsRegistry()
+        durations = registry.histogram("job_seconds", "Job run time", ["status"], buckets=(10, 60))
+        on_update = job_timer(durations)
+        on_update(FakeJob("a", "queued", 0))
+        on_update(FakeJob("a", "running", 100))
+        on_update(FakeJob("a", "running", 130))  # progress update
+        on_update(FakeJob("a", "completed", 142))
+        on_update(FakeJob("b", "cancelled", 150))  # never started
+        self.assertEqual((durations.labels("completed").count, durations.labels("completed").sum), (1, 42))
+        self.assertNotIn(("cancelled",), durations.children)
+
+class TestMetricsEndpoints(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from device_manager import EnhancedDeviceManager
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = os.path.join(self.tmp.name, "streams.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump({
+                "sources": {"iphone_main": {"type": "rtmp", "name": "iOS Main Device", "stream_key": "ios_main"}},
+                "storage": {"mount_point": self.tmp.name, "clip_buffer": {"enabled": False},
+                            "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+                "monitoring": {"quality_history": {"minutes": 60}},
+            }, f)
+        self.manager = EnhancedDeviceManager(config_path)
+        app = FastAPI()
+        app.include_router(create_metrics_router(lambda: self.manager))
+        self.server = AppServer(app)
+        self.base_url = await self.server.start()
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.stop()
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    async def get(self, path: str):
+        async with self.session.get(f"{self.base_url}{path}") as response:
+            if response.content_type == "application/json":
+                return response.status, await response.json()
+            return response.status, await response.text()
+
+    async def publish(self, samples: int):
+        self.manager.rtmp_callbacks.on_publish("ios_main", "192.168.0.42")
+        now = time.time()
+        for n in range(samples):
+            bitrate = 4000000 if n % 2 else 6000000
+            stats = StreamStats("ios_main", "live", bw_in=bitrate, fps=30, width=1920, height=1080, dropped=n // 10)
+            await self.manager.process_rtmp_stats([stats], now - samples + n)
+        await asyncio.sleep(0)
+
+    async def test_stream_and_quality_views(self):
+        self.assertEqual((await self.get("/api/streams/ios_main"))[0], 404)
+        await self.publish(100)
+
+        status, stream = await self.get("/api/streams/ios_main")
+        self.assertEqual(status, 200)
+        self.assertEqual((stream["status"], stream["name"], stream["address"]),
+                         ("streaming", "iOS Main Device", "192.168.0.42"))
+
+        status, quality = await self.get("/api/quality/ios_main")
+        self.assertEqual(status, 200)
+        self.assertEqual(quality, stream["quality"])
+        self.assertEqual((quality["bitrate"], quality["fps"], quality["resolution"]), (4000000, 30, "1920x1080"))
+        self.assertEqual((quality["bitrate_mean"], quality["samples"], quality["dropped_frames"]), (5000000, 100, 9))
+        self.assertTrue(quality["acceptable"])
+        self.assertEqual((await self.get("/api/quality/unknown"))[0], 404)
+
+    async def test_prometheus_scrape(self):
+        await self.publish(10)
+        async with self.session.get(f"{self.base_url}/metrics") as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.headers["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+            body = await response.text()
+        lines = body.splitlines()
+        self.assertIn('stream_bitrate_bps{stream="ios_main"} 4000000', lines)
+        self.assertIn('stream_fps{stream="ios_main"} 30', lines)
+        self.assertIn('stream_bitrate_samples_bps_count{stream="ios_main"} 10', lines)
+        self.assertIn('devices{type="rtmp",status="streaming"} 1', lines)
+        # The publish callback counts as one device event
+        self.assertIn("hotplug_obs_requests_count 1", lines)
+        self.assertTrue(any(line.startswith("storage_total_bytes ") for line in lines))
+
+        # A stream whose history window has expired leaves the export
+        await self.manager.process_rtmp_stats([], time.time() + 2 * 3600)
+        self.assertNotIn('stream="ios_main"', (await self.get("/metrics"))[1])
+
+if __name__ == "__main__":
+    unittest.main()
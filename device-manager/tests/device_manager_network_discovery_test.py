@@ -0,0 +1,127 @@
+import asyncio
+import dataclasses
+import os
+import socket
+import tempfile
+import unittest
+import yaml
+from zeroconf import IPVersion, ServiceStateChange
+from zeroconf.asyncio import AsyncServiceInfo, AsyncZeroconf
+from device_info import DeviceStatus, StreamType
+from network_discovery import NetworkDiscovery, ServiceRecord
+
+RTSP = "_rtsp._tcp.local."
+
+def camera(instance: str, path: str = "/live", port: int = 8554) -> AsyncServiceInfo:
+    return AsyncServiceInfo(RTSP, f"{instance}.{RTSP}", addresses=[socket.inet_aton("127.0.0.1")],
+                            port=port, properties={"path": path},
+                            server=f"{instance.lower().replace(' ', '-')}.local.")
+
+class TestNetworkDiscovery(unittest.IsolatedAsyncioTestCase):
+    """A real zeroconf responder and browser talking over loopback in this process"""
+    async def asyncSetUp(self):
+        self.responder = AsyncZeroconf(interfaces=["127.0.0.1"], ip_version=IPVersion.V4Only)
+        self.browser_zc = AsyncZeroconf(interfaces=["127.0.0.1"], ip_version=IPVersion.V4Only)
+        self.batches = []
+        self.batch_arrived = asyncio.Event()
+        self.discovery = NetworkDiscovery(self.handler, service_types=[RTSP], batch_delay=0.2)
+
+    async def asyncTearDown(self):
+        await self.discovery.close()
+        await self.browser_zc.async_close()
+        await self.responder.async_close()
+
+    async def handler(self, changed, removed):
+        self.batches.append((changed, removed))
+        self.batch_arrived.set()
+
+    async def next_batch(self):
+        await asyncio.wait_for(self.batch_arrived.wait(), 10)
+        self.batch_arrived.clear()
+        return self.batches[-1]
+
+    async def test_startup_burst_is_one_batch(self):
+        cameras = [camera(f"Cam {n}") for n in range(5)]
+        await asyncio.gather(*(self.responder.async_register_service(info) for info in cameras))
+        await self.discovery.start(self.browser_zc)
+        changed, removed = await self.next_batch()
+        while len(self.discovery.records) < 5:
+            await self.next_batch()
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(sorted(record.instance for record in changed), [f"Cam {n}" for n in range(5)])
+        self.assertEqual(removed, [])
+        self.assertEqual(self.discovery.resolves, 5)
+        record = self.discovery.records[f"Cam 0.{RTSP}"]
+        self.assertEqual(record.address, "127.0.0.1:8554")
+        self.assertEqual(record.obs_settings()["input"], "rtsp://127.0.0.1:8554/live")
+        self.assertGreater(record.expires_at, 0)
+
+    async def test_known_services_are_not_resolved_again_within_ttl(self):
+        await self.responder.async_register_service(camera("Cam A"))
+        await self.discovery.start(self.browser_zc)
+        await self.next_batch()
+        name = f"Cam A.{RTSP}"
+        self.discovery._on_service_state_change(None, RTSP, name, ServiceStateChange.Added)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.discovery.resolves, 1)
+
+        # Once the cached record has expired the next sighting resolves it
+        self.discovery.records[name] = dataclasses.replace(self.discovery.records[name], expires_at=0)
+        self.discovery._on_service_state_change(None, RTSP, name, ServiceStateChange.Added)
+        await asyncio.sleep(0.3)
+        self.assertEqual(self.discovery.resolves, 2)
+        # Same records as before: nothing for the registry
+        self.assertEqual(len(self.batches), 1)
+
+    async def test_updates_and_removals(self):
+        info = camera("Cam A")
+        await self.responder.async_register_service(info)
+        await self.discovery.start(self.browser_zc)
+        await self.next_batch()
+
+        await self.responder.async_update_service(camera("Cam A", path="/hd"))
+        changed, removed = await self.next_batch()
+        self.assertEqual([record.obs_settings()["input"] for record in changed], ["rtsp://127.0.0.1:8554/hd"])
+
+        await self.responder.async_unregister_service(info)
+        changed, removed = await self.next_batch()
+        self.assertEqual((changed, removed), ([], [f"Cam A.{RTSP}"]))
+        self.assertEqual(self.discovery.records, {})
+
+class TestNetworkRegistry(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from device_manager import EnhancedDeviceManager
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = os.path.join(self.tmp.name, "streams.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump({
+                "sources": {"lobby": {"type": "network", "name": "Lobby Camera", "service_name": "Lobby Cam",
+                                      "settings": {"buffering_mb": 4}}},
+                "storage": {"mount_point": self.tmp.name,
+                            "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+            }, f)
+        self.manager = EnhancedDeviceManager(config_path)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    def record(self, instance: str) -> ServiceRecord:
+        return ServiceRecord(name=f"{instance}.{RTSP}", service_type=RTSP, server="cam.local.",
+                             addresses=("10.0.0.7",), port=554, properties={"path": "/stream1"})
+
+    async def test_batch_registers_devices_and_forgets_unconfigured_ones(self):
+        await self.manager.handle_network_changes([self.record("Lobby Cam"), self.record("Stage Cam")], [])
+        lobby = self.manager.devices["lobby"]
+        self.assertEqual((lobby.type, lobby.name, lobby.address), (StreamType.NETWORK, "Lobby Camera", "10.0.0.7:554"))
+        self.assertEqual(lobby.settings, {"input": "rtsp://10.0.0.7:554/stream1", "is_local_file": False,
+                                          "buffering_mb": 4})
+        self.assertEqual(self.manager.devices[f"Stage Cam.{RTSP}"].name, "Stage Cam")
+        self.assertEqual(len(self.manager.health), 2)
+
+        await self.manager.handle_network_changes([], [f"Lobby Cam.{RTSP}", f"Stage Cam.{RTSP}"])
+        self.assertEqual(list(self.manager.devices), ["lobby"])
+        self.assertEqual(lobby.status, DeviceStatus.DISCONNECTED)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from obs_client import OBSClient, OBSRequestError
+from obs_fixtures import FakeOBSServer
+
+SCENE = "Main Scene"
+
+class OBSClientTestCase(unittest.IsolatedAsyncioTestCase):
+    password = ""
+
+    async def asyncSetUp(self):
+        self.server = FakeOBSServer(
+            scenes={SCENE: {"Main Camera": True, "iPhone Main": False, "iPhone Secondary": False}},
+            inputs={"Main Camera": {"device_id": "/dev/video0"}},
+            password=self.password,
+        )
+        port = await self.server.start()
+        self.client = OBSClient("127.0.0.1", port, password=self.password,
+                                request_timeout=2, reconnect_delay=0.05)
+        await self.client.start()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+class TestOBSClient(OBSClientTestCase):
+    async def test_call_returns_response_data(self):
+        settings = await self.client.call("GetInputSettings", {"inputName": "Main Camera"})
+        self.assertEqual(settings["inputSettings"], {"device_id": "/dev/video0"})
+        with self.assertRaises(OBSRequestError):
+            await self.client.call("GetInputSettings", {"inputName": "Nope"})
+
+    async def test_concurrent_calls_share_the_connection(self):
+        self.server.latency = 0.1
+        results = await asyncio.wait_for(asyncio.gather(*(
+            self.client.call("GetInputSettings", {"inputName": "Main Camera"}) for _ in range(10)
+        )), 0.9)
+        self.assertEqual(len(results), 10)
+
+    async def test_set_visibility_many_is_one_round_trip(self):
+        visibility = {"Main Camera": False, "iPhone Main": True, "iPhone Secondary": True}
+        missing = await self.client.set_visibility_many(SCENE, visibility)
+        self.assertEqual(missing, [])
+        self.assertEqual(self.server.visible(SCENE), visibility)
+        # One batch for the item ids, one for the changes
+        self.assertEqual(len(self.server.messages), 2)
+
+        # Ids are cached: the next scene change is a single message
+        await self.client.set_visibility_many(SCENE, {"Main Camera": True})
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(self.server.messages[-1], (8, ["SetSceneItemEnabled"]))
+        self.assertTrue(self.server.visible(SCENE)["Main Camera"])
+
+    async def test_missing_source_is_reported(self):
+        missing = await self.client.set_visibility_many(SCENE, {"iPhone Main": True, "Webcam": True})
+        self.assertEqual(missing, ["Webcam"])
+        self.assertTrue(self.server.visible(SCENE)["iPhone Main"])
+
+    async def test_events_reach_handlers(self):
+        events = asyncio.Queue()
+        self.client.on("SceneItemEnableStateChanged", events.put_nowait)
+        await self.client.wait_connected(2)
+        await self.server.set_enabled(SCENE, "iPhone Main", True)
+        event = await asyncio.wait_for(events.get(), 2)
+        self.assertEqual(event["sceneItemEnabled"], True)
+
+    async def test_reconnects_and_forgets_item_ids(self):
+        await self.client.set_visibility_many(SCENE, {"iPhone Main": True})
+        await self.server.disconnect_clients()
+        await asyncio.sleep(0.2)
+        await self.client.set_visibility_many(SCENE, {"iPhone Main": False})
+        self.assertTrue(self.client.is_connected())
+        self.assertFalse(self.server.visible(SCENE)["iPhone Main"])
+        # Item ids were looked up again on the new session
+        self.assertEqual([op for op, _ in self.server.messages].count(8), 4)
+
+    async def test_call_waits_when_the_connection_drops_before_it_resumes(self):
+        await self.client.wait_connected(2)
+        ws = self.client._ws
+        self.client._connected.clear()
+        call = asyncio.create_task(self.client.call("GetSceneItemList", {"sceneName": SCENE}))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # Woken by a connection that is gone again by the time the call runs
+        self.client._connected.set()
+        self.client._disconnected()
+        await asyncio.sleep(0.05)
+        self.assertFalse(call.done())
+        self.client._ws = ws
+        self.client._connected.set()
+        response = await asyncio.wait_for(call, 2)
+        self.assertIn("sceneItems", response)
+
+class TestOBSClientAuthentication(OBSClientTestCase):
+    password = "hunter2"
+
+    async def test_authenticates(self):
+        await self.client.wait_connected(2)
+        await self.client.call("GetSceneItemList", {"sceneName": SCENE})
+
+    async def test_wrong_password_stops_reconnecting(self):
+        client = OBSClient("127.0.0.1", self.server.port, password="wrong", reconnect_delay=0.05)
+        await client.start()
+        await asyncio.wait_for(client._task, 2)
+        self.assertFalse(client.is_connected())
+        await client.close()
+
+if __name__ == "__main__":
+    unittest.main()
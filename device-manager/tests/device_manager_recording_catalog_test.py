@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import recording_catalog
+from recording_catalog import RecordingCatalog
+from rtmp_callbacks import RTMPCallbackHandler
+
+def write_recording(path: str, size: int, mtime: float) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+class TestRecordingCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, "recordings")
+        os.makedirs(self.root)
+        self.catalog = RecordingCatalog(os.path.join(self.tmp.name, "catalog.sqlite"), self.root, racy_window=0)
+        self.addCleanup(self.catalog.close)
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def test_oldest_first_across_pages(self):
+        for index, mtime in enumerate([300, 100, 200, 100]):
+            self.catalog.add(f"/nas/clip{index}.mp4", size=10, mtime=mtime)
+        order = [recording.path for recording in self.catalog.oldest(batch=2)]
+        self.assertEqual(order, ["/nas/clip1.mp4", "/nas/clip3.mp4", "/nas/clip2.mp4", "/nas/clip0.mp4"])
+        self.assertEqual(self.catalog.total_size(), 40)
+
+    def test_archived_vods(self):
+        self.catalog.add("/nas/twitch/2024-01-01/twitch_1.mp4", source="twitch", size=1, mtime=1)
+        self.catalog.add("/nas/2024-01-01/ios_main/twitch_2.mp4", source="ios_main", size=1, mtime=1)
+        # Archived by /fetch-and-process under the requested output name
+        self.catalog.add("/nas/twitch/2024-01-01/highlights_processed.mp4", source="twitch", size=1, mtime=1,
+                         vod_id="4")
+        self.catalog.add("/nas/twitch/2024-01-01/highlights_processed.mp4", size=2, mtime=2)
+        ids = ["1", "2", "3", "4"]
+        self.assertEqual(self.catalog.archived_vods(ids), {"1", "2", "4"})
+        self.assertEqual(self.catalog.archived_vods(ids, source="twitch"), {"1", "4"})
+        self.assertEqual(self.catalog.archived_vods([]), set())
+        with mock.patch.object(recording_catalog, "QUERY_CHUNK", 2):
+            self.assertEqual(self.catalog.archived_vods(ids), {"1", "2", "4"})
+
+    def test_reconcile_and_migration_record_vod_ids(self):
+        write_recording(self.path("twitch", "2024-01-01", "twitch_7_processed.mp4"), 5, 1000)
+        self.catalog.reconcile()
+        self.assertEqual(self.catalog.archived_vods(["7"]), {"7"})
+
+        legacy_path = os.path.join(self.tmp.name, "legacy.sqlite")
+        with sqlite3.connect(legacy_path) as conn:
+            conn.executescript(recording_catalog.SCHEMA.replace(",\n    vod_id TEXT", ""))
+            conn.execute("INSERT INTO recordings (path, directory, size, mtime) VALUES (?, ?, 1, 1)",
+                         ("/nas/twitch/twitch_8.mp4", "/nas/twitch"))
+        legacy = RecordingCatalog(legacy_path, self.root)
+        self.addCleanup(legacy.close)
+        self.assertEqual(legacy.archived_vods(["8"]), {"8"})
+        self.assertEqual(legacy.get("/nas/twitch/twitch_8.mp4").vod_id, "8")
+
+    def test_reconcile_indexes_tree(self):
+        write_recording(self.path("2024-01-01", "ios_main", "a.mp4"), 5, 1000)
+        write_recording(self.path("twitch", "2024-01-02", "b.mp4"), 7, 2000)
+        write_recording(self.path("ios_main_20240101_120000.flv"), 3, 500)
+        write_recording(self.path("2024-01-01", "ios_main", ".c.mp4.partial"), 1, 1000)
+        write_recording(self.path("2024-01-01", "ios_main", "notes.txt"), 1, 1000)
+
+        self.assertEqual(self.catalog.reconcile(), 5)
+        recordings = list(self.catalog.oldest())
+        self.assertEqual([os.path.basename(r.path) for r in recordings],
+                         ["ios_main_20240101_120000.flv", "a.mp4", "b.mp4"])
+        self.assertEqual([r.source for r in recordings], [None, "ios_main", "twitch"])
+
+    def test_reconcile_lists_only_changed_directories(self):
+        write_recording(self.path("2024-01-01", "ios_main", "a.mp4"), 5, 1000)
+        write_recording(self.path("2024-01-02", "ios_main", "b.mp4"), 5, 2000)
+        self.catalog.reconcile()
+        self.assertEqual(self.catalog.reconcile(), 0)
+
+        os.remove(self.path("2024-01-01", "ios_main", "a.mp4"))
+        write_recording(self.path("2024-01-02", "ios_main", "c.mp4"), 5, 3000)
+        # Only the two source directories changed
+        self.assertEqual(self.catalog.reconcile(), 2)
+        self.assertEqual([os.path.basename(r.path) for r in self.catalog.oldest()], ["b.mp4", "c.mp4"])
+
+    def test_removed_directory_is_forgotten(self):
+        write_recording(self.path("2024-01-01", "ios_main", "a.mp4"), 5, 1000)
+        self.catalog.reconcile()
+        os.remove(self.path("2024-01-01", "ios_main", "a.mp4"))
+        os.rmdir(self.path("2024-01-01", "ios_main"))
+        os.rmdir(self.path("2024-01-01"))
+        self.catalog.reconcile()
+        self.assertEqual(len(self.catalog), 0)
+
+    def test_rescan_keeps_added_metadata(self):
+        path = write_recording(self.path("ios_main_20240101_120000.flv"), 3, 500)
+        self.catalog.add(path, source="ios_main", duration=12.5, codec="h264")
+        self.catalog.reconcile()
+        recording = self.catalog.get(path)
+        self.assertEqual((recording.source, recording.duration, recording.codec), ("ios_main", 12.5, "h264"))
+
+class TestRecordDoneCallback(unittest.IsolatedAsyncioTestCase):
+    async def test_record_done_indexes_recording(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            catalog = RecordingCatalog(os.path.join(tmp, "catalog.sqlite"), tmp)
+            path = write_recording(os.path.join(tmp, "ios_main_20240101_120000.flv"), 3, 500)
+            indexed = asyncio.Event()
+
+            async def on_recording(stream_key: str, recording_path: str):
+                catalog.add(recording_path, source=stream_key)
+                indexed.set()
+
+            handler = RTMPCallbackHandler({}, on_recording=on_recording)
+            handler.on_record_done("ios_main", path)
+            await asyncio.wait_for(indexed.wait(), 1)
+            self.assertEqual(catalog.get(path).source, "ios_main")
+            catalog.close()
+
+if __name__ == "__main__":
+    unittest.main()
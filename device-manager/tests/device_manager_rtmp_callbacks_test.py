@@ -0,0 +1,118 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+import aiohttp
+import yaml
+from fastapi import FastAPI
+from app_fixtures import AppServer
+from api.rtmp_callbacks import create_rtmp_callback_router
+from device_info import DeviceStatus
+from rtmp_callbacks import RTMPCallbackHandler
+
+SOURCES = {
+    "iphone_main": {"type": "rtmp", "name": "iOS Main Device", "stream_key": "ios_main"},
+}
+
+def notify_form(call: str, name: str) -> dict:
+    """Form fields nginx-rtmp sends with on_publish/on_publish_done"""
+    return {
+        "call": call, "addr": "192.168.0.42", "clientid": "7", "app": "live",
+        "flashver": "FMLE/3.0", "tcurl": "rtmp://192.168.0.187:1935/live",
+        "name": name, "type": "live",
+    }
+
+class TestRTMPCallbackHandler(unittest.TestCase):
+    def setUp(self):
+        self.devices = {}
+        self.handler = RTMPCallbackHandler(self.devices, SOURCES)
+
+    def test_publish_registers_configured_source(self):
+        device_info = self.handler.on_publish("ios_main", "192.168.0.42")
+        self.assertEqual(device_info.name, "iOS Main Device")
+        self.assertEqual(device_info.status, DeviceStatus.STREAMING)
+        self.handler.on_publish_done("ios_main")
+        self.assertEqual(self.devices["ios_main"].status, DeviceStatus.DISCONNECTED)
+
+    def test_reconcile_repairs_missed_callbacks(self):
+        self.handler.on_publish("ios_main")
+        observed_at = time.time() + 1
+        self.handler.reconcile(["ios_secondary"], observed_at)
+        self.assertEqual(self.devices["ios_main"].status, DeviceStatus.DISCONNECTED)
+        self.assertEqual(self.devices["ios_secondary"].status, DeviceStatus.STREAMING)
+
+    def test_stale_snapshot_does_not_undo_callback(self):
+        observed_at = time.time()
+        self.handler.on_publish("ios_main")
+        self.handler.reconcile([], observed_at)
+        self.assertEqual(self.devices["ios_main"].status, DeviceStatus.STREAMING)
+
+class TestRTMPCallbackLatency(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from device_manager import EnhancedDeviceManager
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = os.path.join(self.tmp.name, "streams.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump({
+                "sources": SOURCES,
+                "storage": {"mount_point": self.tmp.name, "clip_buffer": {"enabled": False},
+                            "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+            }, f)
+        self.manager = EnhancedDeviceManager(config_path)
+        self.devices = self.manager.devices
+        app = FastAPI()
+        app.include_router(create_rtmp_callback_router(self.manager.rtmp_callbacks))
+        self.server = AppServer(app)
+        self.base_url = await self.server.start()
+        self.session = aiohttp.ClientSession()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.stop()
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    async def post(self, path: str, form: dict) -> float:
+        started = time.perf_counter()
+        async with self.session.post(f"{self.base_url}{path}", data=form) as response:
+            self.assertEqual(response.status, 200)
+        return time.perf_counter() - started
+
+    async def test_callback_bursts(self):
+        latencies = []
+        for burst in range(10):
+            keys = [f"cam_{burst}_{i}" for i in range(20)]
+            # nginx fires a burst of callbacks at once when several devices connect
+            latencies.extend(await asyncio.gather(
+                *(self.post("/api/streams/publish", notify_form("publish", key)) for key in keys)))
+            # State is visible as soon as nginx gets its answer
+            self.assertTrue(all(self.devices[key].status == DeviceStatus.STREAMING for key in keys))
+            latencies.extend(await asyncio.gather(
+                *(self.post("/api/streams/publish_done", notify_form("publish_done", key)) for key in keys)))
+            self.assertTrue(all(self.devices[key].status == DeviceStatus.DISCONNECTED for key in keys))
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95)]
+        # Queued behind up to 19 others in the same burst, still an order of
+        # magnitude under the 5 s /stat poll interval
+        self.assertLess(p95, 0.5, f"p95 callback latency {p95 * 1000:.2f} ms")
+
+    async def test_record_done_indexes_recording(self):
+        path = os.path.join(self.tmp.name, "ios_main_20240101_120000.flv")
+        with open(path, "wb") as f:
+            f.write(b"FLV" * 100)
+        form = notify_form("record_done", "ios_main")
+        form["path"] = path
+        await self.post("/api/recordings/done", form)
+        # Indexing runs after nginx has its answer
+        async def indexed():
+            while self.manager.catalog.get(path) is None:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(indexed(), 5)
+        recording = self.manager.catalog.get(path)
+        self.assertEqual(recording.source, "ios_main")
+        self.assertEqual(recording.size, 300)
+
+if __name__ == "__main__":
+    unittest.main()
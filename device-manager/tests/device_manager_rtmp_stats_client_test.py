@@ -0,0 +1,82 @@
+import hashlib
+import time
+import unittest
+from rtmp_stats import VOLATILE_FIELDS, RTMPStatsClient, StatDigest
+from rtmp_fixtures import StatServer, make_stat_xml, make_stream
+
+class TestRTMPStatsClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = StatServer(make_stat_xml([make_stream("ios_main", bw_in=6000000)]))
+        url = await self.server.start()
+        self.client = RTMPStatsClient(url, min_interval=1, max_interval=8, backoff=2)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def test_reuses_one_pooled_connection(self):
+        started = time.perf_counter()
+        for _ in range(20):
+            streams = await self.client.fetch()
+        elapsed = time.perf_counter() - started
+        self.assertEqual(streams[0].name, "ios_main")
+        self.assertEqual(len(self.server.requests), 20)
+        self.assertEqual(len(self.server.client_ports), 1)
+        self.assertLess(elapsed / 20, 0.05, f"mean /stat latency {elapsed / 20 * 1000:.1f} ms")
+
+    async def test_skips_parse_when_only_counters_change(self):
+        await self.client.fetch()
+        self.server.set_body(self.server.body.decode().replace("<uptime>3600</uptime>", "<uptime>3605</uptime>"))
+        streams = await self.client.fetch()
+        self.assertEqual(self.client.parsed, 1)
+        self.assertEqual(self.client.unchanged, 1)
+        self.assertEqual(streams[0].bw_in, 6000000)
+
+        self.server.set_body(make_stat_xml([make_stream("ios_main", bw_in=2500000)]))
+        streams = await self.client.fetch()
+        self.assertEqual(self.client.parsed, 2)
+        self.assertEqual(streams[0].bw_in, 2500000)
+
+    async def test_large_bodies_are_parsed_while_streaming(self):
+        client = RTMPStatsClient(self.server.url, offload_threshold=0)
+        self.addAsyncCleanup(client.close)
+        first = await client.fetch()
+        self.server.set_body(self.server.body.decode().replace("<uptime>3600</uptime>", "<uptime>3605</uptime>"))
+        self.assertIs(await client.fetch(), first)
+        self.assertEqual(client.parsed, 2)
+        self.assertEqual(client.unchanged, 1)
+
+    async def test_unchanged_result_is_kept(self):
+        first = await self.client.fetch()
+        self.server.set_body(self.server.body.decode().replace("<uptime>3600</uptime>", "<uptime>3605</uptime>"))
+        self.assertIs(await self.client.fetch(), first)
+
+    def test_digest_does_not_depend_on_chunking(self):
+        body = make_stat_xml([make_stream(f"stream_{i}") for i in range(3)]).encode()
+        expected = hashlib.blake2b(VOLATILE_FIELDS.sub(b"", body), digest_size=16).digest()
+        for size in (1, 5, 7, 64, len(body)):
+            digest = StatDigest()
+            for offset in range(0, len(body), size):
+                digest.update(body[offset:offset + size])
+            self.assertEqual(digest.digest(), expected, f"chunk size {size}")
+
+    async def test_conditional_request(self):
+        self.server.etag = True
+        await self.client.fetch()
+        await self.client.fetch()
+        self.assertEqual(self.client.not_modified, 1)
+        self.assertEqual(self.client.parsed, 1)
+
+    async def test_adaptive_interval(self):
+        await self.client.fetch()
+        self.assertEqual(self.client.interval, 1)  # New stream
+        for expected in (2, 4, 8, 8):
+            await self.client.fetch()
+            self.assertEqual(self.client.interval, expected)
+
+        self.server.set_body(make_stat_xml([make_stream("ios_main", bw_in=3000000)]))
+        await self.client.fetch()
+        self.assertEqual(self.client.interval, 1)
+
+if __name__ == "__main__":
+    unittest.main()
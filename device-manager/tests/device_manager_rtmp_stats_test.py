@@ -0,0 +1,40 @@
+import unittest
+from rtmp_stats import RTMPStatsParser, parse_rtmp_stats
+from rtmp_fixtures import make_stat_xml, make_stream
+
+class TestRTMPStatsParser(unittest.TestCase):
+    def test_extracts_stream_fields(self):
+        xml = make_stat_xml([
+            make_stream("ios_main", bw_in=6000000, fps=60, width=1920, height=1080, nclients=3, dropped=12),
+            make_stream("ios_secondary", bw_in=1500000, fps=29.97, width=1280, height=720, nclients=1),
+        ])
+        streams = parse_rtmp_stats(xml.encode())
+        self.assertEqual([s.name for s in streams], ["ios_main", "ios_secondary"])
+        main = streams[0]
+        self.assertEqual(main.application, "live")
+        self.assertEqual(main.bw_in, 6000000)
+        self.assertEqual(main.bw_video, 6000000 - 128000)
+        self.assertEqual(main.fps, 60)
+        self.assertEqual(main.resolution, "1920x1080")
+        self.assertEqual(main.nclients, 3)
+        self.assertEqual(main.dropped, 12)
+        self.assertAlmostEqual(streams[1].fps, 29.97)
+
+    def test_byte_at_a_time_feed(self):
+        data = make_stat_xml(count=5).encode()
+        parser = RTMPStatsParser()
+        for i in range(len(data)):
+            parser.feed(data[i:i + 1])
+        streams = parser.close()
+        self.assertEqual(len(streams), 5)
+        self.assertEqual(streams[4].bw_in, 4000004)
+
+    def test_stream_without_meta(self):
+        xml = make_stat_xml(["<stream><name>idle</name><bw_in>0</bw_in><nclients>0</nclients></stream>"])
+        stream = parse_rtmp_stats(xml.encode())[0]
+        self.assertEqual(stream.name, "idle")
+        self.assertEqual(stream.fps, 0)
+        self.assertEqual(stream.resolution, "0x0")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from obs_client import OBSClient
+from obs_fixtures import FakeOBSServer
+from scene_state import SceneState
+
+SCENE = "Master Scene"
+
+class TestSceneState(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeOBSServer(
+            scenes={SCENE: {"Main Camera": True, "iPhone Main": False, "Default Page": True}},
+            inputs={"Main Camera": {"device_id": "/dev/video0", "resolution": "3840x2160"}},
+        )
+        port = await self.server.start()
+        self.client = OBSClient("127.0.0.1", port, request_timeout=2, reconnect_delay=0.05)
+        self.state = SceneState(self.client)
+        await self.client.start()
+        await self.client.wait_connected(2)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        self.fail("condition not reached")
+
+    async def test_only_changed_items_are_sent(self):
+        changes = await self.state.set_visibility(
+            SCENE, {"Main Camera": True, "iPhone Main": True, "Default Page": False}
+        )
+        self.assertEqual(changes, {"iPhone Main": True, "Default Page": False})
+        # GetSceneItemList, then one batch holding just the two changes
+        self.assertEqual(self.server.messages, [
+            (6, "GetSceneItemList"), (8, ["SetSceneItemEnabled", "SetSceneItemEnabled"]),
+        ])
+        self.assertEqual(self.server.visible(SCENE),
+                         {"Main Camera": True, "iPhone Main": True, "Default Page": False})
+
+        sent = self.client.requests_sent
+        self.assertEqual(await self.state.set_visibility(SCENE, {"iPhone Main": True, "Default Page": False}), {})
+        self.assertEqual(self.client.requests_sent, sent)
+
+    async def test_events_keep_the_mirror_fresh(self):
+        await self.state.visibility(SCENE)
+        await self.server.set_enabled(SCENE, "Main Camera", False)
+        await self.wait_for(lambda: self.state.scenes[SCENE]["Main Camera"] is False)
+
+        # Switching it back is a real change now
+        self.assertEqual(await self.state.set_visibility(SCENE, {"Main Camera": True}), {"Main Camera": True})
+        self.assertTrue(self.server.visible(SCENE)["Main Camera"])
+
+    async def test_input_settings_are_cached_and_diffed(self):
+        settings = await self.state.input_settings(["Main Camera", "Nope"])
+        self.assertEqual(list(settings), ["Main Camera"])
+        sent = self.client.requests_sent
+        self.assertFalse(await self.state.set_input_settings("Main Camera", {"device_id": "/dev/video0"}))
+        self.assertEqual(self.client.requests_sent, sent)
+
+        self.assertTrue(await self.state.set_input_settings("Main Camera", {"device_id": "/dev/video2"}))
+        self.assertEqual(self.server.inputs["Main Camera"]["device_id"], "/dev/video2")
+        self.assertEqual(self.client.requests_sent, sent + 1)
+
+        # A change made in OBS itself arrives as InputSettingsChanged
+        self.server.inputs["Main Camera"]["device_id"] = "/dev/video4"
+        await self.server.emit("InputSettingsChanged",
+                               {"inputName": "Main Camera", "inputSettings": self.server.inputs["Main Camera"]})
+        await self.wait_for(lambda: self.state.inputs["Main Camera"]["device_id"] == "/dev/video4")
+
+    async def test_reconnect_reloads_state(self):
+        await self.state.visibility(SCENE)
+        await self.server.disconnect_clients()
+        # Changed while we were away; no event reaches us
+        self.server.scenes[SCENE]["iPhone Main"]["enabled"] = True
+        await asyncio.sleep(0.2)
+        await self.client.wait_connected(2)
+        self.assertTrue((await self.state.visibility(SCENE))["iPhone Main"])
+
+if __name__ == "__main__":
+    unittest.main()
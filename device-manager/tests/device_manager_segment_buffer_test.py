@@ -0,0 +1,81 @@
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from segment_buffer import SPARE_SEGMENTS, Segment, SegmentBuffer
+
+HAS_FFMPEG = shutil.which("ffmpeg") is not None
+
+# A live-paced test pattern standing in for the RTMP pull
+LIVE_SOURCE = [
+    "-re", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=30",
+    "-c:v", "libx264", "-preset", "ultrafast", "-g", "15",
+]
+
+def media_duration(path: str) -> float:
+    """Container duration from `ffmpeg -i` (ffprobe may not be installed)"""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-i", path], capture_output=True, text=True)
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", result.stderr).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+class TestSegmentSelection(unittest.TestCase):
+    def test_select_covers_newest_seconds(self):
+        segment_buffer = SegmentBuffer("/unused", [], segment_seconds=2, buffer_seconds=10)
+        for index in range(8):
+            segment_buffer.segments.append(Segment(f"s{index}.mp4", index * 2.0, index * 2.0 + 2, 0))
+        # Capacity is 5 segments: the three oldest were dropped
+        self.assertEqual(len(segment_buffer.segments), 5)
+        self.assertEqual([s.path for s in segment_buffer.select(5)], ["s5.mp4", "s6.mp4", "s7.mp4"])
+        self.assertEqual([s.path for s in segment_buffer.select(60)], [f"s{i}.mp4" for i in range(3, 8)])
+        self.assertEqual(segment_buffer.buffered_seconds, 10)
+
+@unittest.skipUnless(HAS_FFMPEG, "ffmpeg not installed")
+class TestSegmentBuffer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.segment_buffer = SegmentBuffer(
+            os.path.join(self.tmp, "ios_main"), LIVE_SOURCE, segment_seconds=0.5, buffer_seconds=2
+        )
+
+    async def asyncTearDown(self):
+        await self.segment_buffer.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    async def wait_for_segments(self, count: int):
+        deadline = time.monotonic() + 20
+        while len(self.segment_buffer.segments) < count:
+            self.assertLess(time.monotonic(), deadline, "segments did not appear")
+            await asyncio.sleep(0.1)
+
+    async def test_clip_from_buffer_is_immediate_and_bounded(self):
+        await self.segment_buffer.start()
+        # Run past one full wrap of the ring
+        await self.wait_for_segments(self.segment_buffer.capacity)
+        await asyncio.sleep(3)
+        self.assertLessEqual(len(os.listdir(self.segment_buffer.directory)),
+                             self.segment_buffer.capacity + SPARE_SEGMENTS)
+
+        clip = os.path.join(self.tmp, "clip.mp4")
+        started = time.perf_counter()
+        clipped = await self.segment_buffer.clip(1, clip)
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, 2)
+        self.assertGreaterEqual(clipped, 1)
+        self.assertAlmostEqual(media_duration(clip), clipped, delta=0.2)
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["clip.mp4", "ios_main"])
+
+    async def test_stop_releases_buffer(self):
+        await self.segment_buffer.start()
+        await self.wait_for_segments(1)
+        await self.segment_buffer.stop()
+        self.assertFalse(self.segment_buffer.running)
+        self.assertFalse(os.path.exists(self.segment_buffer.directory))
+        with self.assertRaises(ValueError):
+            await self.segment_buffer.clip(1, os.path.join(self.tmp, "clip.mp4"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from source_index import SourceIndex
+
+SOURCES = {
+    "main_camera": {"type": "usb", "device_name": "Nikon Z7"},
+    "capture_a": {"type": "usb", "vendor_id": "32ED", "product_id": "3200", "serial": "A1"},
+    "capture_b": {"type": "usb", "vendor_id": "32ed", "product_id": "3200", "serial": "B2"},
+    "any_elgato": {"type": "usb", "vendor_id": "0fd9", "product_id": "*"},
+    "cam_link": {"type": "usb", "vendor_id": "0fd9", "product_id": "0066"},
+    "left_port": {"type": "usb", "id_path": "pci-0000:00:14.0-usb-0:1:1.0"},
+    "iphone_main": {"type": "rtmp", "name": "iOS Main Device", "stream_key": "ios_main"},
+    "lobby": {"type": "network", "service_name": "Lobby Cam"},
+}
+
+def udev(**properties) -> dict:
+    return properties
+
+class TestSourceIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SourceIndex(SOURCES)
+
+    def test_serial_tells_identical_models_apart(self):
+        device = udev(ID_VENDOR_ID="32ed", ID_MODEL_ID="3200", ID_SERIAL_SHORT="B2")
+        self.assertEqual(self.index.match_usb(device), ["capture_b"])
+        # A third unit of that model matches neither serial-pinned source
+        self.assertEqual(self.index.match_usb(udev(ID_VENDOR_ID="32ed", ID_MODEL_ID="3200",
+                                                   ID_SERIAL_SHORT="C3")), [])
+
+    def test_exact_ids_beat_wildcards(self):
+        self.assertEqual(self.index.match_usb(udev(ID_VENDOR_ID="0fd9", ID_MODEL_ID="0066")), ["cam_link"])
+        self.assertEqual(self.index.match_usb(udev(ID_VENDOR_ID="0fd9", ID_MODEL_ID="006e")), ["any_elgato"])
+
+    def test_id_path_and_model_name(self):
+        device = udev(ID_VENDOR_ID="1234", ID_MODEL_ID="5678", ID_PATH="pci-0000:00:14.0-usb-0:1:1.0")
+        self.assertEqual(self.index.match_usb(device), ["left_port"])
+        self.assertEqual(self.index.match_usb(udev(ID_MODEL="Nikon_Z7")), ["main_camera"])
+        self.assertEqual(self.index.match_usb(udev()), [])
+
+    def test_stream_key_lookup(self):
+        self.assertEqual(self.index.rtmp_source("ios_main"), "iphone_main")
+        self.assertEqual(self.index.source(self.index.rtmp_source("unknown")), {})
+
+    def test_network_service_lookup(self):
+        self.assertEqual(self.index.network_source("lobby cam"), "lobby")
+        self.assertIsNone(self.index.network_source("Stage Cam"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+import yaml
+from config_loader import ConfigError, parse_config
+
+SERVICE = Path(__file__).resolve().parent.parent / "services" / "device_manager"
+OPTIONAL = ["pyudev", "zeroconf", "obswebsocket", "v4l2"]
+
+# Starts the manager briefly in a fresh interpreter and reports what got imported
+SCRIPT = textwrap.dedent("""
+    import asyncio, json, sys
+    import device_manager
+
+    async def run():
+        manager = device_manager.EnhancedDeviceManager(sys.argv[1])
+        task = asyncio.create_task(manager.start())
+        await asyncio.sleep(0.3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await manager.close()
+        return manager
+
+    manager = asyncio.run(run())
+    print(json.dumps({"modules": [name for name in sys.argv[2:] if name in sys.modules],
+                      "obs": manager.obs_ws is not None}))
+""")
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmp.name, "streams.yaml")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def start(self, subsystems: dict) -> dict:
+        config = {
+            "sources": {"iphone_main": {"type": "rtmp", "stream_key": "ios_main"}},
+            "monitoring": {"subsystems": subsystems, "rtmp_stats": {"url": "http://127.0.0.1:9/stat"}},
+            "storage": {"mount_point": self.tmp.name,
+                        "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+        }
+        with open(self.config_path, "w") as f:
+            yaml.safe_dump(config, f)
+        result = subprocess.run([sys.executable, "-c", SCRIPT, self.config_path, *OPTIONAL],
+                                cwd=SERVICE, env=dict(os.environ, PYTHONPATH=str(SERVICE)),
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_disabled_subsystems_are_never_imported(self):
+        started = self.start({"obs": False, "usb": False, "network_discovery": False})
+        self.assertEqual(started, {"modules": [], "obs": False})
+
+    def test_enabled_obs_starts_without_obs_running(self):
+        started = self.start({"obs": True, "usb": False, "network_discovery": False})
+        self.assertEqual(started, {"modules": [], "obs": True})
+
+    def test_unknown_subsystem_is_rejected(self):
+        with self.assertRaises(ConfigError) as raised:
+            parse_config({"monitoring": {"subsystems": {"usb": "no", "bluetooth": True}}})
+        self.assertEqual(len(raised.exception.problems), 2)
+        self.assertFalse(parse_config({"monitoring": {"subsystems": {"usb": False}}}).enabled("usb"))
+        self.assertTrue(parse_config({}).enabled("usb"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from stream_quality import QualityHistory, StreamQuality
+
+THRESHOLDS = {"bitrate_min": 2000000, "framerate_min": 24, "resolution_min": "1920x1080"}
+
+class TestQualityHistory(unittest.TestCase):
+    def test_ring_buffer_is_bounded(self):
+        history = QualityHistory(capacity=10)
+        for second in range(25):
+            history.append(second, bitrate=second * 1000, fps=30)
+        self.assertEqual(len(history), 10)
+        self.assertEqual(history.latest_timestamp, 24)
+        bitrates, _, _ = history.window(seconds=100, now=24)
+        self.assertEqual(list(bitrates), [s * 1000 for s in range(15, 25)])
+
+    def test_window_stats(self):
+        history = QualityHistory(capacity=600)
+        for second in range(100):
+            history.append(second, bitrate=6000000 if second % 2 else 4000000, fps=30, dropped=1)
+        stats = history.stats(seconds=10, now=99)
+        self.assertEqual(stats.samples, 11)
+        self.assertEqual(stats.bitrate_p5, 4000000)
+        self.assertEqual(stats.bitrate_p95, 6000000)
+        self.assertEqual(stats.bitrate_jitter, 2000000)
+        self.assertEqual(stats.fps_mean, 30)
+        self.assertEqual(stats.dropped, 11)
+
+class TestStreamQuality(unittest.TestCase):
+    def setUp(self):
+        self.quality = StreamQuality(THRESHOLDS, {"fail_after": 3, "recover_after": 2})
+
+    def test_single_bad_sample_does_not_flap(self):
+        for bitrate in (6000000, 500000, 6000000, 500000, 6000000):
+            self.quality.update(bitrate, 30, "1920x1080")
+            self.assertTrue(self.quality.is_acceptable())
+
+    def test_hysteresis(self):
+        for _ in range(2):
+            self.quality.update(500000, 30, "1920x1080")
+        self.assertTrue(self.quality.is_acceptable())
+        self.quality.update(500000, 30, "1920x1080")
+        self.assertFalse(self.quality.is_acceptable())
+
+        self.quality.update(6000000, 30, "1920x1080")
+        self.assertFalse(self.quality.is_acceptable())
+        self.quality.update(6000000, 30, "1920x1080")
+        self.assertTrue(self.quality.is_acceptable())
+
+    def test_dropped_counter_is_stored_as_deltas(self):
+        for timestamp, dropped in enumerate((5, 8, 8, 2)):
+            self.quality.update(6000000, 30, "1920x1080", dropped, timestamp)
+        _, _, deltas = self.quality.history.window(seconds=60, now=3)
+        self.assertEqual(list(deltas), [0, 3, 0, 0])
+
+if __name__ == "__main__":
+    unittest.main()
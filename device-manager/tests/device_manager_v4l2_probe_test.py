@@ -0,0 +1,143 @@
+import errno
+import os
+import struct
+import tempfile
+import unittest
+import yaml
+from device_events import DeviceEvent
+from v4l2_probe import (FMTDESC, FRMIVALENUM, FRMSIZEENUM, VIDIOC_ENUM_FMT, VIDIOC_ENUM_FRAMEINTERVALS,
+                        VIDIOC_ENUM_FRAMESIZES, CapabilityCache, CaptureMode, best_mode, pack_fourcc,
+                        probe_modes, usb_budget)
+
+# A 4K capture card: MJPEG up to 4K30, raw YUYV up to 4K30 and 1080p60
+CAPTURE_CARD = {
+    "MJPG": {(3840, 2160): [30], (1920, 1080): [60, 30]},
+    "YUYV": {(3840, 2160): [30], (1920, 1080): [60, 30]},
+}
+
+class FakeV4L2:
+    """The VIDIOC_ENUM_* ioctls of a capture device, answered from a table
+
+    `stepwise` formats report one stepwise frame size range and one
+    continuous interval range instead of discrete entries.
+    """
+    def __init__(self, formats: dict, stepwise: dict = None):
+        self.formats = formats
+        self.stepwise = stepwise or {}
+        self.calls = 0
+
+    def __call__(self, fd, request, buffer):
+        self.calls += 1
+        fourccs = list(self.formats) + list(self.stepwise)
+        if request == VIDIOC_ENUM_FMT:
+            index, buffer_type = struct.unpack_from("<II", buffer)
+            if buffer_type != 1 or index >= len(fourccs):
+                raise OSError(errno.EINVAL, "Invalid argument")
+            FMTDESC.pack_into(buffer, 0, index, 1, 0, fourccs[index].encode(), pack_fourcc(fourccs[index]), 0, 0, 0, 0)
+        elif request == VIDIOC_ENUM_FRAMESIZES:
+            index, pixelformat = struct.unpack_from("<II", buffer)
+            fourcc = pixelformat.to_bytes(4, "little").decode()
+            if fourcc in self.stepwise:
+                if index:
+                    raise OSError(errno.EINVAL, "Invalid argument")
+                (min_w, max_w, min_h, max_h), _ = self.stepwise[fourcc]
+                FRMSIZEENUM.pack_into(buffer, 0, 0, pixelformat, 3, min_w, max_w, 8, min_h, max_h, 8, 0, 0)
+                return
+            sizes = list(self.formats[fourcc])
+            if index >= len(sizes):
+                raise OSError(errno.EINVAL, "Invalid argument")
+            FRMSIZEENUM.pack_into(buffer, 0, index, pixelformat, 1, *sizes[index], 0, 0, 0, 0, 0, 0)
+        elif request == VIDIOC_ENUM_FRAMEINTERVALS:
+            index, pixelformat, width, height = struct.unpack_from("<IIII", buffer)
+            fourcc = pixelformat.to_bytes(4, "little").decode()
+            if fourcc in self.stepwise:
+                if index:
+                    raise OSError(errno.EINVAL, "Invalid argument")
+                _, (fastest, slowest) = self.stepwise[fourcc]
+                FRMIVALENUM.pack_into(buffer, 0, 0, pixelformat, width, height, 2, 1, fastest, 1, slowest, 1, 1, 0, 0)
+                return
+            rates = self.formats[fourcc][(width, height)]
+            if index >= len(rates):
+                raise OSError(errno.EINVAL, "Invalid argument")
+            FRMIVALENUM.pack_into(buffer, 0, index, pixelformat, width, height, 1, 1, rates[index], 0, 0, 0, 0, 0, 0)
+        else:
+            raise OSError(errno.ENOTTY, "Inappropriate ioctl for device")
+
+class FakeUdevDevice(dict):
+    def __init__(self, device_node: str, **properties):
+        super().__init__(properties)
+        self.device_node = device_node
+
+class TestProbe(unittest.TestCase):
+    def test_discrete_modes(self):
+        modes = probe_modes(3, FakeV4L2(CAPTURE_CARD))
+        self.assertEqual(len(modes), 6)
+        self.assertIn(CaptureMode("MJPG", 3840, 2160, 30), modes)
+        self.assertIn(CaptureMode("YUYV", 1920, 1080, 60), modes)
+
+    def test_stepwise_ranges_offer_common_modes(self):
+        modes = probe_modes(3, FakeV4L2({}, {"NV12": ((640, 1920, 480, 1080), (60, 5))}))
+        self.assertIn(CaptureMode("NV12", 1920, 1080, 60), modes)
+        self.assertIn(CaptureMode("NV12", 1280, 720, 30), modes)
+        self.assertNotIn(CaptureMode("NV12", 3840, 2160, 30), modes)
+
+    def test_best_mode_respects_the_bus(self):
+        modes = probe_modes(3, FakeV4L2(CAPTURE_CARD))
+        # Raw 4K30 is ~500 MB/s: more than USB 2.0 or even USB 3.0 isochronous carries
+        self.assertEqual(best_mode(modes, 3840, 2160, 30, usb_budget(480)), CaptureMode("MJPG", 3840, 2160, 30))
+        self.assertEqual(best_mode(modes, 3840, 2160, 30, usb_budget(5000)), CaptureMode("MJPG", 3840, 2160, 30))
+        # Raw 1080p60 (~250 MB/s) fits USB 3.0, and needs no decode
+        self.assertEqual(best_mode(modes, 1920, 1080, 60, usb_budget(5000)), CaptureMode("YUYV", 1920, 1080, 60))
+        self.assertEqual(best_mode(modes, 1920, 1080, 60, usb_budget(480)), CaptureMode("MJPG", 1920, 1080, 60))
+        # A larger mode than asked for gains nothing over the exact one
+        self.assertEqual(best_mode(modes, 1920, 1080, 30, usb_budget(480)), CaptureMode("MJPG", 1920, 1080, 30))
+        self.assertIsNone(best_mode([CaptureMode("YUYV", 3840, 2160, 30)], 3840, 2160, 30))
+
+    def test_cache_probes_each_device_once(self):
+        ioctl = FakeV4L2(CAPTURE_CARD)
+        opened = []
+        cache = CapabilityCache(ioctl, opener=lambda node: opened.append(node) or os.open(os.devnull, os.O_RDONLY))
+        first = cache.probe("A1:00", "/dev/video0")
+        calls = ioctl.calls
+        # Replugged, and renumbered by the kernel
+        self.assertIs(cache.probe("A1:00", "/dev/video2"), first)
+        self.assertEqual((opened, ioctl.calls, cache.probes), (["/dev/video0"], calls, 1))
+
+class TestManagerCaptureMode(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from device_manager import EnhancedDeviceManager
+        self.tmp = tempfile.TemporaryDirectory()
+        config_path = os.path.join(self.tmp.name, "streams.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump({
+                "sources": {"capture": {"type": "usb", "vendor_id": "0fd9", "product_id": "0066",
+                                        "resolution": "3840x2160", "framerate": 30}},
+                "storage": {"mount_point": self.tmp.name,
+                            "catalog": {"path": os.path.join(self.tmp.name, "catalog.sqlite")}},
+            }, f)
+        self.manager = EnhancedDeviceManager(config_path)
+        self.ioctl = FakeV4L2(CAPTURE_CARD)
+        self.manager.capabilities = CapabilityCache(self.ioctl, opener=lambda node: os.open(os.devnull, os.O_RDONLY))
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+        self.tmp.cleanup()
+
+    async def test_obs_settings_use_the_probed_mode(self):
+        device = FakeUdevDevice("/dev/video0", ID_VENDOR_ID="0fd9", ID_MODEL_ID="0066",
+                                ID_SERIAL="Elgato_Cam_Link_4K", ID_V4L_CAPABILITIES=":capture:")
+        await self.manager.handle_device_events([DeviceEvent("add", device, device.device_node)])
+        settings = self.manager.obs_source_settings(self.manager.devices["capture"])
+        self.assertEqual((settings["input_format"], settings["resolution"], settings["fps"]),
+                         ("mjpeg", "3840x2160", 30))
+
+        # A replug on another node is answered from the cache
+        calls = self.ioctl.calls
+        await self.manager.handle_device_events([DeviceEvent("remove", device, device.device_node)])
+        replugged = FakeUdevDevice("/dev/video4", **device)
+        await self.manager.handle_device_events([DeviceEvent("add", replugged, replugged.device_node)])
+        self.assertEqual(self.ioctl.calls, calls)
+        self.assertEqual(self.manager.obs_source_settings(self.manager.devices["capture"])["device"], "/dev/video4")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+# device-manager/tests/helix_fixtures.py
+"""A stand-in Twitch API: the app token endpoint, Helix GET /videos and /users,
+and the GQL playback token and usher playlist a VOD is played from"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+from helix import PLAYER_CLIENT_ID
+
+CLIENT_ID = "test-client"
+CLIENT_SECRET = "test-secret"
+USER_ID, USER_LOGIN = "1234", "cdaprod"
+# Video N was streamed N hours after this
+FIRST_STREAM = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def created_at(video_id) -> datetime:
+    return FIRST_STREAM + timedelta(hours=int(video_id))
+
+def video(video_id: str) -> dict:
+    return {
+        "id": video_id, "user_id": USER_ID, "user_login": USER_LOGIN, "title": f"Stream {video_id}",
+        "url": f"https://www.twitch.tv/videos/{video_id}", "type": "archive", "duration": "1h2m3s",
+        "created_at": created_at(video_id).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+class HelixServer:
+    """Knows the videos with IDs in `video_ids`
+
+    Tokens last `token_ttl` seconds as far as clients are told; `revoke()`
+    invalidates every token issued so far. `fail` holds statuses answered,
+    one per request, before /videos starts answering normally. `batches`
+    records the IDs of each lookup by ID. Every video belongs to channel
+    USER_ID, which lists them newest first. Usher answers a master
+    playlist whose source variant is `media_playlist_url`.
+    """
+    def __init__(self, video_ids=range(1000), token_ttl: float = 3600, delay: float = 0.01,
+                 media_playlist_url: str = "http://127.0.0.1:9/vod/chunked/index-dvr.m3u8"):
+        self.video_ids = set(map(str, video_ids))
+        self.media_playlist_url = media_playlist_url
+        self.token_ttl = token_ttl
+        self.delay = delay
+        self.fail = []
+        self.tokens = set()
+        self.batches = []
+        self.requests = Counter()
+        self._serial = itertools.count(1)
+        self.runner = None
+
+    def revoke(self):
+        self.tokens.clear()
+
+    async def token(self, request):
+        self.requests["token"] += 1
+        form = await request.post()
+        if (form.get("client_id"), form.get("client_secret"), form.get("grant_type")) != \
+                (CLIENT_ID, CLIENT_SECRET, "client_credentials"):
+            return web.json_response({"status": 403, "message": "invalid client secret"}, status=403)
+        token = f"token-{next(self._serial)}"
+        self.tokens.add(token)
+        return web.json_response({"access_token": token, "expires_in": self.token_ttl, "token_type": "bearer"})
+
+    async def videos(self, request):
+        self.requests["videos"] += 1
+        await asyncio.sleep(self.delay)
+        authorization = request.headers.get("Authorization", "")
+        if request.headers.get("Client-Id") != CLIENT_ID or authorization[len("Bearer "):] not in self.tokens:
+            return web.json_response({"error": "Unauthorized", "status": 401}, status=401)
+        if self.fail:
+            status = self.fail.pop(0)
+            headers = {"Ratelimit-Reset": str(int(time.time()))} if status == 429 else {}
+            return web.json_response({"status": status}, status=status, headers=headers)
+        if "user_id" in request.query:
+            return self.channel_page(request)
+        ids = request.query.getall("id", [])
+        if len(ids) > 100:
+            return web.json_response({"error": "Bad Request", "status": 400}, status=400)
+        self.batches.append(ids)
+        found = [video(video_id) for video_id in ids if video_id in self.video_ids]
+        if not found:
+            return web.json_response({"error": "Not Found", "status": 404}, status=404)
+        return web.json_response({"data": found, "pagination": {}})
+
+    def channel_page(self, request):
+        if request.query["user_id"] != USER_ID:
+            return web.json_response({"data": [], "pagination": {}})
+        newest_first = sorted(self.video_ids, key=int, reverse=True)
+        offset = int(request.query.get("after", 0))
+        first = int(request.query.get("first", 20))
+        page = newest_first[offset:offset + first]
+        pagination = {"cursor": str(offset + first)} if offset + first < len(newest_first) else {}
+        return web.json_response({"data": [video(video_id) for video_id in page], "pagination": pagination})
+
+    async def users(self, request):
+        self.requests["users"] += 1
+        logins = request.query.getall("login", [])
+        data = [{"id": USER_ID, "login": USER_LOGIN}] if USER_LOGIN in logins else []
+        return web.json_response({"data": data})
+
+    async def gql(self, request):
+        self.requests["gql"] += 1
+        body = await request.json()
+        if request.headers.get("Client-Id") != PLAYER_CLIENT_ID or body.get("operationName") != "PlaybackAccessToken":
+            return web.json_response({"error": "Bad Request", "status": 400}, status=400)
+        video_id = body["variables"]["vodID"]
+        token = None
+        if video_id in self.video_ids:
+            token = {"value": json.dumps({"vod_id": int(video_id)}), "signature": f"sig-{video_id}"}
+        return web.json_response({"data": {"videoPlaybackAccessToken": token}})
+
+    async def usher(self, request):
+        self.requests["usher"] += 1
+        video_id = request.match_info["video_id"]
+        query = request.query
+        if query.get("sig") != f"sig-{video_id}" or json.loads(query.get("token", "{}")).get("vod_id") != int(video_id):
+            return web.json_response([{"error": "Unauthorized"}], status=403)
+        return web.Response(text="\n".join([
+            "#EXTM3U",
+            '#EXT-X-STREAM-INF:BANDWIDTH=8500000,RESOLUTION=1920x1080,VIDEO="chunked"',
+            self.media_playlist_url,
+            '#EXT-X-STREAM-INF:BANDWIDTH=160000,CODECS="mp4a.40.2",VIDEO="audio_only"',
+            self.media_playlist_url.replace("chunked", "audio_only"),
+            "",
+        ]), content_type="application/vnd.apple.mpegurl")
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/oauth2/token", self.token)
+        app.router.add_get("/helix/videos", self.videos)
+        app.router.add_get("/helix/users", self.users)
+        app.router.add_post("/gql", self.gql)
+        app.router.add_get("/usher/vod/{video_id}.m3u8", self.usher)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        return f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+    async def stop(self):
+        await self.runner.cleanup()
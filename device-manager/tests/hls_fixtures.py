@@ -0,0 +1,90 @@
+# device-manager/tests/hls_fixtures.py
+"""A stand-in HLS VOD server: synthetic master/media playlists and segments"""
+
+import asyncio
+import random
+from collections import Counter
+from aiohttp import web
+
+def segment_bytes(number: int) -> bytes:
+    """Deterministic, distinct content of varying size for segment `number`"""
+    return bytes([number % 251]) * (1000 + number * 37)
+
+class HLSServer:
+    """Serves /vod/master.m3u8 -> /vod/chunked/index-dvr.m3u8 with `segments` segments
+
+    Segments answer after a random delay so they complete out of order.
+    `fail_once` segments answer 503 the first time, `broken` ones always
+    answer 404. `requests` counts requests per path and `max_in_flight`
+    records the most segment requests served at once.
+    """
+    def __init__(self, segments: int = 40, max_delay: float = 0.02):
+        self.segments = segments
+        self.max_delay = max_delay
+        self.fail_once = set()
+        self.broken = set()
+        self.requests = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.runner = None
+        self.base_url = None
+
+    def media_playlist(self) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:10",
+                 "#EXT-X-PLAYLIST-TYPE:EVENT", '#EXT-X-TWITCH-ELAPSED-SECS:0.000']
+        for number in range(self.segments):
+            lines += [f"#EXTINF:{10 if number < self.segments - 1 else 4.5:.3f},",
+                      f"{number}{'-muted' if number % 7 == 3 else ''}.ts"]
+        return "\n".join(lines + ["#EXT-X-ENDLIST", ""])
+
+    async def master(self, request):
+        self.requests[request.path] += 1
+        return web.Response(text="\n".join([
+            "#EXTM3U",
+            '#EXT-X-MEDIA:TYPE=VIDEO,GROUP-ID="720p30",NAME="720p",AUTOSELECT=YES,DEFAULT=YES',
+            '#EXT-X-STREAM-INF:BANDWIDTH=3000000,RESOLUTION=1280x720,CODECS="avc1.4D401F,mp4a.40.2",VIDEO="720p30"',
+            "720p30/index-dvr.m3u8",
+            '#EXT-X-MEDIA:TYPE=VIDEO,GROUP-ID="chunked",NAME="1080p60 (source)",AUTOSELECT=YES,DEFAULT=YES',
+            '#EXT-X-STREAM-INF:BANDWIDTH=8500000,RESOLUTION=1920x1080,CODECS="avc1.64002A,mp4a.40.2",VIDEO="chunked"',
+            "chunked/index-dvr.m3u8",
+            "",
+        ]), content_type="application/vnd.apple.mpegurl")
+
+    async def playlist(self, request):
+        self.requests[request.path] += 1
+        return web.Response(text=self.media_playlist(), content_type="application/vnd.apple.mpegurl")
+
+    async def segment(self, request):
+        self.requests[request.path] += 1
+        number = int(request.match_info["name"].split("-")[0])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(random.uniform(0, self.max_delay))
+            if number in self.broken:
+                raise web.HTTPNotFound()
+            if number in self.fail_once:
+                self.fail_once.discard(number)
+                raise web.HTTPServiceUnavailable()
+            return web.Response(body=segment_bytes(number), content_type="video/mp2t")
+        finally:
+            self.in_flight -= 1
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/vod/master.m3u8", self.master)
+        app.router.add_get("/vod/{variant}/index-dvr.m3u8", self.playlist)
+        app.router.add_get("/vod/{variant}/{name}.ts", self.segment)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def segment_requests(self) -> int:
+        return sum(count for path, count in self.requests.items() if path.endswith(".ts"))
@@ -0,0 +1,179 @@
+# device-manager/tests/obs_fixtures.py
+"""A stand-in OBS WebSocket v5 server with a tiny scene model"""
+
+import asyncio
+import base64
+import hashlib
+from aiohttp import web, WSMsgType
+
+class FakeOBSServer:
+    """Speaks enough of obs-websocket v5 for scene and input management
+
+    Scene items live in `scenes` ({scene: {source: {"id", "enabled"}}}) and
+    input settings in `inputs`. Every request is recorded in `requests`
+    (batched ones individually) and every message in `messages`, so tests
+    can count round trips. `latency` delays each response; `request_delay`
+    is added per request, as OBS executes batch entries one by one.
+    Changes emit the matching OBS events to all identified clients.
+    """
+    def __init__(self, scenes: dict = None, inputs: dict = None, password: str = "",
+                 latency: float = 0, request_delay: float = 0):
+        self.scenes = {
+            scene: {name: {"id": index + 1, "enabled": enabled} for index, (name, enabled) in enumerate(items.items())}
+            for scene, items in (scenes or {}).items()
+        }
+        self.inputs = inputs or {}
+        self.password = password
+        self.latency = latency
+        self.request_delay = request_delay
+        self.requests = []
+        self.messages = []
+        self.clients = set()
+        self.port = None
+        self._runner = None
+
+    def visible(self, scene: str) -> dict:
+        return {name: item["enabled"] for name, item in self.scenes[scene].items()}
+
+    async def emit(self, event_type: str, event_data: dict):
+        for ws in list(self.clients):
+            await ws.send_json({"op": 5, "d": {"eventType": event_type, "eventIntent": 0, "eventData": event_data}})
+
+    async def set_enabled(self, scene: str, source: str, enabled: bool):
+        """Change an item as if from the OBS UI (emits the event)"""
+        item = self.scenes[scene][source]
+        item["enabled"] = enabled
+        await self.emit("SceneItemEnableStateChanged",
+                        {"sceneName": scene, "sceneItemId": item["id"], "sceneItemEnabled": enabled})
+
+    async def disconnect_clients(self):
+        for ws in list(self.clients):
+            await ws.close()
+
+    def _execute(self, request_type: str, data: dict):
+        """Returns (ok, comment, response_data, event)"""
+        self.requests.append((request_type, data))
+        if request_type in ("GetSceneItemId", "SetSceneItemEnabled", "GetSceneItemEnabled", "GetSceneItemList"):
+            items = self.scenes.get(data.get("sceneName"))
+            if items is None:
+                return False, "No scene", None, None
+            if request_type == "GetSceneItemList":
+                return True, "", {"sceneItems": [
+                    {"sourceName": name, "sceneItemId": item["id"], "sceneItemEnabled": item["enabled"]}
+                    for name, item in items.items()
+                ]}, None
+            if request_type == "GetSceneItemId":
+                item = items.get(data.get("sourceName"))
+                return (True, "", {"sceneItemId": item["id"]}, None) if item else (False, "No source", None, None)
+            name = next((name for name, item in items.items() if item["id"] == data.get("sceneItemId")), None)
+            if name is None:
+                return False, "No scene item", None, None
+            if request_type == "GetSceneItemEnabled":
+                return True, "", {"sceneItemEnabled": items[name]["enabled"]}, None
+            items[name]["enabled"] = data["sceneItemEnabled"]
+            return True, "", None, ("SceneItemEnableStateChanged", {
+                "sceneName": data["sceneName"], "sceneItemId": items[name]["id"],
+                "sceneItemEnabled": data["sceneItemEnabled"],
+            })
+        if request_type == "GetInputSettings":
+            if data.get("inputName") not in self.inputs:
+                return False, "No input", None, None
+            return True, "", {"inputSettings": self.inputs[data["inputName"]], "inputKind": "fake"}, None
+        if request_type == "SetInputSettings":
+            if data.get("inputName") not in self.inputs:
+                return False, "No input", None, None
+            if data.get("overlay", True):
+                self.inputs[data["inputName"]].update(data["inputSettings"])
+            else:
+                self.inputs[data["inputName"]] = dict(data["inputSettings"])
+            return True, "", None, ("InputSettingsChanged", {
+                "inputName": data["inputName"], "inputSettings": self.inputs[data["inputName"]],
+            })
+        return False, "Unknown request type", None, None
+
+    def _result(self, request_type: str, data: dict, request_id=None):
+        ok, comment, response_data, event = self._execute(request_type, data)
+        result = {"requestType": request_type, "requestStatus": {"result": ok, "code": 100 if ok else 600}}
+        if request_id is not None:
+            result["requestId"] = request_id
+        if comment:
+            result["requestStatus"]["comment"] = comment
+        if response_data is not None:
+            result["responseData"] = response_data
+        return result, event
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(protocols=("obswebsocket.json",))
+        await ws.prepare(request)
+        hello = {"obsWebSocketVersion": "5.4.2", "rpcVersion": 1}
+        salt, challenge = "c2FsdA==", "Y2hhbGxlbmdl"
+        if self.password:
+            hello["authentication"] = {"salt": salt, "challenge": challenge}
+        await ws.send_json({"op": 0, "d": hello})
+
+        identify = await ws.receive_json()
+        if self.password:
+            secret = base64.b64encode(hashlib.sha256((self.password + salt).encode()).digest()).decode()
+            expected = base64.b64encode(hashlib.sha256((secret + challenge).encode()).digest()).decode()
+            if identify["d"].get("authentication") != expected:
+                await ws.close(code=4009, message=b"Authentication failed.")
+                return ws
+        await ws.send_json({"op": 2, "d": {"negotiatedRpcVersion": 1}})
+        self.clients.add(ws)
+        tasks = set()
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                # obs-websocket processes requests concurrently, not one at a time
+                task = asyncio.create_task(self._respond(ws, message.json()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self.clients.discard(ws)
+            for task in tasks:
+                task.cancel()
+        return ws
+
+    async def _respond(self, ws: web.WebSocketResponse, payload: dict):
+        op, data = payload["op"], payload["d"]
+        events = []
+        if op == 6:
+            self.messages.append((op, data["requestType"]))
+            await asyncio.sleep(self.latency + self.request_delay)
+            result, event = self._result(data["requestType"], data.get("requestData") or {}, data["requestId"])
+            events.append(event)
+            response = {"op": 7, "d": result}
+        elif op == 8:
+            self.messages.append((op, [entry["requestType"] for entry in data["requests"]]))
+            await asyncio.sleep(self.latency + self.request_delay * len(data["requests"]))
+            results = []
+            for entry in data["requests"]:
+                result, event = self._result(entry["requestType"], entry.get("requestData") or {})
+                results.append(result)
+                events.append(event)
+            response = {"op": 9, "d": {"requestId": data["requestId"], "results": results}}
+        else:
+            return
+        if ws.closed:
+            return
+        await ws.send_json(response)
+        for event in events:
+            if event:
+                await self.emit(*event)
+
+    async def start(self) -> int:
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port or 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self.port
+
+    async def stop(self):
+        if self._runner:
+            await self.disconnect_clients()
+            await self._runner.cleanup()
+            self._runner = None
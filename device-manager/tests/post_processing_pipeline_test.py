@@ -0,0 +1,28 @@
+import unittest
+from submodules.pipeline import build_pipeline
+
+class TestBuildPipeline(unittest.TestCase):
+    def test_fuses_consecutive_filters(self):
+        stages = build_pipeline(["auto_fix_mobile", "apply_portrait"])
+        self.assertEqual(len(stages), 1)
+        self.assertEqual(stages[0].steps, ["auto_fix_mobile", "apply_portrait"])
+        self.assertTrue(stages[0].video_filter.startswith("transpose=1,scale=1920:1080"))
+        args = stages[0].ffmpeg_args("in.mp4", "out.mp4")
+        self.assertEqual(args.count("-i"), 1)
+        self.assertEqual(args[args.index("-vf") + 1], stages[0].video_filter)
+
+    def test_unfused_keeps_one_pass_per_step(self):
+        stages = build_pipeline(["auto_fix_mobile", "apply_portrait"], fuse=False)
+        self.assertEqual([stage.steps for stage in stages], [["auto_fix_mobile"], ["apply_portrait"]])
+
+    def test_stream_copy_without_filters(self):
+        stage = build_pipeline(["remux"])[0]
+        self.assertIsNone(stage.video_filter)
+        self.assertEqual(stage.ffmpeg_args("in.mp4", "out.mp4"), ["-i", "in.mp4", "-c", "copy", "out.mp4"])
+
+    def test_unknown_step(self):
+        with self.assertRaises(ValueError):
+            build_pipeline(["auto_fix_mobile", "sharpen"])
+
+if __name__ == "__main__":
+    unittest.main()
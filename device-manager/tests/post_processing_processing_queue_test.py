@@ -0,0 +1,206 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from models import JobStatus, ProcessingJob
+from submodules.job_store import JobStore
+from submodules.processing_queue import ProcessingEngine, parse_progress_line, step_path
+
+HAS_FFMPEG = shutil.which("ffmpeg") is not None
+
+def make_clip(path: str, duration: int = 2, size: str = "320x240"):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc=duration={duration}:size={size}:rate=30",
+         "-c:v", "libx264", "-preset", "ultrafast", path],
+        check=True,
+    )
+
+class TestProgressParsing(unittest.TestCase):
+    def test_parse_progress_line(self):
+        self.assertEqual(parse_progress_line("out_time_us=1500000\n"), 1.5)
+        self.assertEqual(parse_progress_line("out_time_ms=2000000"), 2.0)
+        self.assertIsNone(parse_progress_line("out_time_us=N/A"))
+        self.assertIsNone(parse_progress_line("progress=continue"))
+
+@unittest.skipUnless(HAS_FFMPEG, "ffmpeg not installed")
+class TestProcessingEngine(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.clip = os.path.join(self.tmp, "clip.mp4")
+        make_clip(self.clip)
+        self.db = os.path.join(self.tmp, "jobs.sqlite")
+        self.events = []
+        self.engine = None
+
+    async def asyncTearDown(self):
+        if self.engine:
+            await self.engine.stop()
+        shutil.rmtree(self.tmp)
+
+    def make_engine(self, workers: int = 2, **kwargs) -> ProcessingEngine:
+        self.engine = ProcessingEngine(
+            JobStore(self.db), workers=workers, **kwargs,
+            on_update=lambda job: self.events.append((job.job_id, job.status, job.progress)),
+        )
+        return self.engine
+
+    async def test_runs_chained_steps(self):
+        engine = self.make_engine()
+        await engine.start()
+        output = os.path.join(self.tmp, "out.mp4")
+        job = await engine.submit(self.clip, output, ["auto_fix_mobile", "apply_portrait"], duration=2)
+        job = await engine.wait(job.job_id)
+
+        self.assertEqual(job.status, JobStatus.COMPLETED, job.error)
+        self.assertTrue(os.path.exists(output))
+        self.assertTrue(os.path.exists(self.clip))
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["clip.mp4", "jobs.sqlite", "jobs.sqlite-shm", "jobs.sqlite-wal", "out.mp4"])
+        progress = [p for _, status, p in self.events if status == JobStatus.RUNNING]
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(JobStore(self.db).get(job.job_id).status, JobStatus.COMPLETED)
+
+    async def test_priority_order_and_cancel(self):
+        engine = self.make_engine(workers=1)
+        low = await engine.submit(self.clip, os.path.join(self.tmp, "low.mp4"), ["auto_fix_mobile"], priority=0)
+        cancelled = await engine.submit(self.clip, os.path.join(self.tmp, "gone.mp4"), ["auto_fix_mobile"], priority=5)
+        high = await engine.submit(self.clip, os.path.join(self.tmp, "high.mp4"), ["auto_fix_mobile"], priority=10)
+        self.assertTrue(await engine.cancel(cancelled.job_id))
+        await engine.start()
+        await engine.wait(low.job_id)
+
+        started = [job_id for job_id, status, _ in self.events if status == JobStatus.RUNNING]
+        self.assertEqual(list(dict.fromkeys(started)), [high.job_id, low.job_id])
+        self.assertEqual(engine.get(cancelled.job_id).status, JobStatus.CANCELLED)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "gone.mp4")))
+
+    async def test_cancel_running_job(self):
+        long_clip = os.path.join(self.tmp, "long.mp4")
+        make_clip(long_clip, duration=20)
+        engine = self.make_engine()
+        await engine.start()
+        output = os.path.join(self.tmp, "long_out.mp4")
+        job = await engine.submit(long_clip, output, ["apply_portrait"], duration=20)
+        while not any(status == JobStatus.RUNNING and progress > 0 for _, status, progress in self.events):
+            await asyncio.sleep(0.01)
+        self.assertTrue(await engine.cancel(job.job_id))
+        started = time.perf_counter()
+        job = await engine.wait(job.job_id)
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertEqual(job.status, JobStatus.CANCELLED)
+        self.assertFalse(os.path.exists(output))
+        self.assertFalse(os.path.exists(step_path(output, "part")))
+
+    async def test_resumes_after_last_completed_step(self):
+        output = os.path.join(self.tmp, "resumed.mp4")
+        shutil.copyfile(self.clip, step_path(output, "step0"))
+        store = JobStore(self.db)
+        now = time.time()
+        store.save(ProcessingJob(
+            job_id="interrupted", input_path=self.clip, output_path=output,
+            steps=["auto_fix_mobile", "apply_portrait"], status=JobStatus.RUNNING,
+            completed_steps=1, progress=0.5, duration=2, created_at=now, updated_at=now,
+        ))
+        store.close()
+
+        engine = self.make_engine()
+        await engine.start()
+        job = await engine.wait("interrupted")
+        self.assertEqual(job.status, JobStatus.COMPLETED, job.error)
+        self.assertTrue(os.path.exists(output))
+        progress = [p for _, status, p in self.events if status == JobStatus.RUNNING]
+        self.assertGreaterEqual(min(progress), 0.5)
+
+    async def test_wait_after_restart(self):
+        output = os.path.join(self.tmp, "out.mp4")
+        engine = self.make_engine()
+        await engine.start()
+        job = await engine.submit(self.clip, output, ["remux"], duration=2)
+        await engine.wait(job.job_id)
+        await engine.stop()
+
+        restarted = self.make_engine()
+        finished = await restarted.wait(job.job_id)
+        self.assertEqual(finished.status, JobStatus.COMPLETED)
+        with self.assertRaisesRegex(LookupError, "Unknown processing job"):
+            await restarted.wait("missing")
+
+    async def test_finished_jobs_are_dropped_from_memory(self):
+        engine = self.make_engine(finished_ttl=0)
+        await engine.start()
+        output = os.path.join(self.tmp, "copy.mp4")
+        job = await engine.submit(self.clip, output, [])
+        self.assertEqual((await engine.wait(job.job_id)).status, JobStatus.COMPLETED)
+        with open(self.clip, "rb") as source, open(output, "rb") as copy:
+            self.assertEqual(source.read(), copy.read())
+
+        await asyncio.sleep(0.01)
+        self.assertNotIn(job.job_id, engine.jobs)
+        self.assertEqual(engine.get(job.job_id).status, JobStatus.COMPLETED)
+        self.assertEqual((await engine.wait(job.job_id)).status, JobStatus.COMPLETED)
+
+    async def test_single_pass_jobs_share_workers_and_priority(self):
+        engine = self.make_engine(workers=1)
+        running = []
+
+        async def stream(stage_args, progress):
+            running.append(engine.get(file_job.job_id).status)
+            progress(0.5)
+            process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-y", "-loglevel", "error", *stage_args(self.clip, streamed_output))
+            self.assertEqual(await process.wait(), 0)
+
+        streamed_output = os.path.join(self.tmp, "streamed.mp4")
+        streamed = await engine.submit_stream("https://vod.example/index.m3u8", streamed_output,
+                                              ["auto_fix_mobile", "apply_portrait"], stream)
+        file_job = await engine.submit(self.clip, os.path.join(self.tmp, "high.mp4"), ["remux"], priority=10)
+        await engine.start()
+        job = await engine.wait(streamed.job_id)
+
+        self.assertEqual(job.status, JobStatus.COMPLETED, job.error)
+        self.assertTrue(os.path.exists(streamed_output))
+        # The higher-priority job had the only worker to itself first
+        self.assertEqual(running, [JobStatus.COMPLETED])
+        self.assertIn((streamed.job_id, JobStatus.RUNNING, 0.5), self.events)
+        self.assertEqual(JobStore(self.db).get(streamed.job_id).status, JobStatus.COMPLETED)
+        with self.assertRaises(ValueError):
+            await engine.submit_stream(self.clip, streamed_output, ["remux"], stream)
+
+    async def test_cancel_single_pass_job(self):
+        engine = self.make_engine(workers=1)
+        started = asyncio.Event()
+
+        async def stream(stage_args, progress):
+            started.set()
+            await asyncio.sleep(60)
+
+        await engine.start()
+        job = await engine.submit_stream("https://vod.example/index.m3u8", os.path.join(self.tmp, "out.mp4"),
+                                         ["remux"], stream)
+        await asyncio.wait_for(started.wait(), 5)
+        self.assertTrue(await engine.cancel(job.job_id))
+        self.assertEqual((await engine.wait(job.job_id)).status, JobStatus.CANCELLED)
+        # The worker carries on with the next job
+        after = await engine.submit(self.clip, os.path.join(self.tmp, "after.mp4"), ["remux"])
+        self.assertEqual((await asyncio.wait_for(engine.wait(after.job_id), 30)).status, JobStatus.COMPLETED)
+
+    async def test_interrupted_single_pass_job_fails_on_restart(self):
+        store = JobStore(self.db)
+        now = time.time()
+        store.save(ProcessingJob(
+            job_id="interrupted", input_path="https://vod.example/index.m3u8",
+            output_path=os.path.join(self.tmp, "out.mp4"), steps=["remux"], status=JobStatus.RUNNING,
+            created_at=now, updated_at=now,
+        ))
+        store.close()
+
+        engine = self.make_engine()
+        await engine.start()
+        job = await engine.wait("interrupted")
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertIn("submit it again", job.error)
+
+if __name__ == "__main__":
+    unittest.main()
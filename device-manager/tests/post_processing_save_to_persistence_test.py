@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+from submodules import save_to_persistence as persistence
+from submodules.save_to_persistence import CHUNK_SIZE, copy_file_atomic, save_to_persistence
+
+SHM = "/dev/shm"
+
+def chunked_sha256(data: bytes) -> str:
+    digests = b"".join(hashlib.sha256(data[i:i + CHUNK_SIZE]).digest() for i in range(0, len(data), CHUNK_SIZE))
+    return hashlib.sha256(digests).hexdigest()
+
+class TestSaveToPersistence(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.data = os.urandom(3 * 1024 * 1024 + 17)
+
+    def write_source(self, directory: str) -> str:
+        path = os.path.join(directory, "clip_processed.mp4")
+        with open(path, "wb") as f:
+            f.write(self.data)
+        return path
+
+    def test_same_filesystem_renames(self):
+        source = self.write_source(self.tmp.name)
+        result = save_to_persistence(source, os.path.join(self.tmp.name, "recordings"))
+        self.assertEqual(result.method, "rename")
+        self.assertIsNone(result.checksum)
+        self.assertFalse(os.path.exists(source))
+        with open(result.path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    @unittest.skipUnless(os.path.isdir(SHM) and os.stat(SHM).st_dev != os.stat(tempfile.gettempdir()).st_dev,
+                         "needs /dev/shm on a separate filesystem")
+    def test_cross_filesystem_copies_with_checksum(self):
+        source_dir = tempfile.TemporaryDirectory(dir=SHM)
+        self.addCleanup(source_dir.cleanup)
+        source = self.write_source(source_dir.name)
+        result = save_to_persistence(source, self.tmp.name)
+        self.assertEqual(result.method, "copy")
+        self.assertEqual(result.size, len(self.data))
+        self.assertEqual(result.checksum, chunked_sha256(self.data))
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(os.listdir(os.path.dirname(result.path)), ["clip_processed.mp4"])
+
+    def test_parallel_chunks_match_serial_copy(self):
+        source = self.write_source(self.tmp.name)
+        with mock.patch.object(persistence, "CHUNK_SIZE", 1024 * 1024):
+            serial = copy_file_atomic(source, os.path.join(self.tmp.name, "serial.mp4"))
+            parallel = copy_file_atomic(source, os.path.join(self.tmp.name, "parallel.mp4"),
+                                        workers=3, parallel_threshold=0)
+        self.assertEqual(serial, parallel)
+        with open(os.path.join(self.tmp.name, "parallel.mp4"), "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_sendfile_fallback(self):
+        source = self.write_source(self.tmp.name)
+        target = os.path.join(self.tmp.name, "copy.mp4")
+        unsupported = OSError(18, "Invalid cross-device link")
+        with mock.patch.object(os, "copy_file_range", side_effect=unsupported, create=True):
+            checksum = copy_file_atomic(source, target)
+        self.assertEqual(checksum, chunked_sha256(self.data))
+        with open(target, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_corrupted_copy_is_detected(self):
+        source = self.write_source(self.tmp.name)
+        target = os.path.join(self.tmp.name, "copy.mp4")
+        copy_range = persistence._copy_range
+
+        def corrupting_copy(src_fd, dst_fd, offset, count):
+            copy_range(src_fd, dst_fd, offset, count)
+            # Flip one byte of the destination
+            position = offset + count // 2
+            os.pwrite(dst_fd, bytes([os.pread(src_fd, 1, position)[0] ^ 0xff]), position)
+
+        with mock.patch.object(persistence, "_copy_range", corrupting_copy):
+            with self.assertRaisesRegex(IOError, "Checksum mismatch"):
+                copy_file_atomic(source, target)
+        self.assertEqual(os.listdir(self.tmp.name), ["clip_processed.mp4"])
+
+    def test_failed_copy_leaves_no_partial(self):
+        source = self.write_source(self.tmp.name)
+        target = os.path.join(self.tmp.name, "copy.mp4")
+        with mock.patch.object(os, "copy_file_range", side_effect=OSError(5, "I/O error"), create=True):
+            with self.assertRaises(OSError):
+                copy_file_atomic(source, target)
+        self.assertEqual(os.listdir(self.tmp.name), ["clip_processed.mp4"])
+
+if __name__ == "__main__":
+    unittest.main()
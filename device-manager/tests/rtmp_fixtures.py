@@ -0,0 +1,101 @@
+# device-manager/tests/rtmp_fixtures.py
+"""Synthetic nginx-rtmp /stat documents and a stand-in /stat server"""
+
+import time
+from aiohttp import web
+
+STREAM_TEMPLATE = """
+<stream>
+<name>{name}</name>
+<time>123456</time>
+<bw_in>{bw_in}</bw_in>
+<bytes_in>98765432</bytes_in>
+<bw_out>0</bw_out>
+<bytes_out>0</bytes_out>
+<bw_audio>128000</bw_audio>
+<bw_video>{bw_video}</bw_video>
+{clients}
+<meta>
+<video><width>{width}</width><height>{height}</height><frame_rate>{fps}</frame_rate><codec>H264</codec><profile>High</profile><compat>0</compat><level>4.2</level></video>
+<audio><codec>AAC</codec><profile>LC</profile><channels>2</channels><sample_rate>48000</sample_rate></audio>
+</meta>
+<nclients>{nclients}</nclients>
+<publishing/>
+<active/>
+</stream>"""
+
+CLIENT_TEMPLATE = """<client><id>{id}</id><address>192.168.0.{id}</address><time>1000</time><flashver>FMLE/3.0</flashver><dropped>{dropped}</dropped><avsync>-3</avsync><timestamp>99000</timestamp>{publishing}<active/></client>"""
+
+def make_stream(name: str, bw_in: int = 6000000, fps: float = 30,
+                width: int = 1920, height: int = 1080, nclients: int = 2,
+                dropped: int = 0) -> str:
+    clients = "".join(
+        CLIENT_TEMPLATE.format(id=i + 1, dropped=dropped if i == 0 else 0,
+                               publishing="<publishing/>" if i == 0 else "")
+        for i in range(nclients)
+    )
+    return STREAM_TEMPLATE.format(
+        name=name, bw_in=bw_in, bw_video=bw_in - 128000, clients=clients,
+        width=width, height=height, fps=fps, nclients=nclients
+    )
+
+def make_stat_xml(streams=None, count: int = 0) -> str:
+    """Build a /stat document from stream snippets or `count` generated streams"""
+    if streams is None:
+        streams = [make_stream(f"stream_{i}", bw_in=4000000 + i) for i in range(count)]
+    return (
+        '<?xml version="1.0" encoding="utf-8" ?>\n'
+        "<rtmp><nginx_version>1.25.3</nginx_version><nginx_rtmp_version>1.1.4</nginx_rtmp_version>"
+        "<uptime>3600</uptime><naccepted>42</naccepted><bw_in>0</bw_in><bw_out>0</bw_out>"
+        "<server><application><name>live</name><live>"
+        + "".join(streams)
+        + f"<nclients>{len(streams)}</nclients></live></application></server></rtmp>"
+    )
+
+class StatServer:
+    """Local HTTP server that serves canned /stat XML
+
+    Records every request (arrival time, client port) so tests can measure
+    request rate, latency and connection reuse.
+    """
+    def __init__(self, body: str = "", etag: bool = False):
+        self.body = body.encode()
+        self.etag = etag
+        self.version = 0
+        self.requests = []
+        self.url = None
+        self._runner = None
+
+    def set_body(self, body: str):
+        self.body = body.encode()
+        self.version += 1
+
+    @property
+    def client_ports(self) -> set:
+        return {port for _, port in self.requests}
+
+    async def _handle_stat(self, request: web.Request) -> web.Response:
+        peer = request.transport.get_extra_info("peername")
+        self.requests.append((time.perf_counter(), peer[1]))
+        headers = {"Content-Type": "text/xml"}
+        if self.etag:
+            tag = f'"v{self.version}"'
+            headers["ETag"] = tag
+            if request.headers.get("If-None-Match") == tag:
+                return web.Response(status=304, headers=headers)
+        return web.Response(body=self.body, headers=headers)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/stat", self._handle_stat)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/stat"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
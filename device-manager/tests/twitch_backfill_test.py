@@ -0,0 +1,173 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from collections import Counter
+from backfill import BackfillBatch, VODBackfill, VODStatus
+
+class FakeStages:
+    """Stages that take `seconds` each and record how many ran at once"""
+    def __init__(self, directory: str, seconds: float = 0.02, known=range(100)):
+        self.directory = directory
+        self.seconds = seconds
+        self.known = set(map(str, known))
+        self.archive = set()
+        self.fail = set()
+        self.resolved = []
+        self.running = Counter()
+        self.peak = Counter()
+        # Moments when a download and an encode were running together
+        self.overlaps = 0
+
+    async def resolve(self, vod_ids):
+        self.resolved.append(list(vod_ids))
+        return {vod_id: {"id": vod_id, "title": f"Stream {vod_id}"} if vod_id in self.known else None
+                for vod_id in vod_ids}
+
+    async def stage(self, name: str, video: dict, suffix: str) -> str:
+        self.running[name] += 1
+        self.peak[name] = max(self.peak[name], self.running[name])
+        if self.running["download"] and self.running["process"]:
+            self.overlaps += 1
+        try:
+            await asyncio.sleep(self.seconds)
+            if (name, video["id"]) in self.fail:
+                raise RuntimeError(f"{name} failed")
+            path = os.path.join(self.directory, f"{video['id']}.{suffix}")
+            with open(path, "w") as f:
+                f.write(name)
+            return path
+        finally:
+            self.running[name] -= 1
+
+    async def download(self, video):
+        return await self.stage("download", video, "source.mp4")
+
+    async def process(self, video, path):
+        output = await self.stage("process", video, "mp4")
+        os.remove(path)
+        return output
+
+    async def persist(self, video, path):
+        saved = await self.stage("persist", video, "saved.mp4")
+        os.remove(path)
+        self.archive.add(video["id"])
+        return saved
+
+    def archived(self, vod_ids):
+        return self.archive & set(vod_ids)
+
+class TestVODBackfill(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stages = FakeStages(self.tmp.name)
+        self.backfill = self.make_backfill()
+
+    async def asyncTearDown(self):
+        await self.backfill.close()
+        self.tmp.cleanup()
+
+    def make_backfill(self, **options) -> VODBackfill:
+        options = {"download_limit": 3, "process_limit": 2, "persist_limit": 1, **options}
+        return VODBackfill(self.stages.resolve, self.stages.download, self.stages.process,
+                           self.stages.persist, self.stages.archived, **options)
+
+    async def wait(self, batch: BackfillBatch) -> BackfillBatch:
+        for _ in range(500):
+            if batch.finished:
+                return batch
+            await asyncio.sleep(0.01)
+        self.fail(f"batch did not finish: {batch.counts()}")
+
+    async def test_stages_overlap_within_their_limits(self):
+        batch = await self.backfill.submit([str(n) for n in range(20)])
+        # Polled by ID while it runs
+        self.assertIs(self.backfill.get(batch.batch_id), batch)
+        self.assertFalse(batch.finished)
+        await self.wait(batch)
+
+        self.assertEqual(batch.counts()["done"], 20)
+        self.assertEqual(self.stages.resolved, [[str(n) for n in range(20)]])
+        self.assertEqual(dict(self.stages.peak), {"download": 3, "process": 2, "persist": 1})
+        self.assertGreater(self.stages.overlaps, 0)
+        self.assertEqual(batch.items["4"].path, os.path.join(self.tmp.name, "4.saved.mp4"))
+        self.assertEqual(batch.items["4"].title, "Stream 4")
+        # Only archived copies are left behind
+        self.assertEqual(len(os.listdir(self.tmp.name)), 20)
+        self.assertEqual(self.backfill.active, {})
+
+    async def test_staged_vods_are_bounded(self):
+        # Encoding is the bottleneck: downloads wait rather than fill the disk
+        self.backfill = self.make_backfill(download_limit=4, process_limit=1, max_staged=3)
+        seen = []
+
+        async def counting_process(video, path):
+            seen.append(len([name for name in os.listdir(self.tmp.name) if name.endswith(".source.mp4")]))
+            return await self.stages.process(video, path)
+
+        self.backfill.process = counting_process
+        await self.wait(await self.backfill.submit([str(n) for n in range(10)]))
+        self.assertLessEqual(max(seen), 3)
+        self.assertLessEqual(self.stages.peak["download"], 3)
+
+    async def test_close_fails_vods_in_flight_and_removes_staged_files(self):
+        self.stages.seconds = 0.2
+        batch = await self.backfill.submit([str(n) for n in range(6)])
+        while not batch.counts().get("processing"):
+            await asyncio.sleep(0.01)
+        await self.backfill.close()
+
+        self.assertTrue(batch.finished)
+        self.assertEqual(batch.counts()["failed"], 6)
+        self.assertEqual({item.error for item in batch.items.values()}, {"backfill stopped"})
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        self.assertEqual(self.backfill.active, {})
+
+    async def test_duplicates_archived_and_queued_vods_are_skipped(self):
+        self.stages.archive.add("1")
+        first = await self.backfill.submit(["2", "3"])
+        second = await self.backfill.submit(["1", "2", "2", "4"])
+
+        self.assertEqual(list(second.items), ["1", "2", "4"])
+        self.assertEqual(second.items["1"].error, "already archived")
+        self.assertEqual(second.items["2"].error, f"already queued in batch {first.batch_id}")
+        self.assertEqual(second.counts()["skipped"], 2)
+        await self.wait(first)
+        await self.wait(second)
+        self.assertEqual(second.items["4"].status, VODStatus.DONE)
+        # Everything is archived now
+        again = await self.backfill.submit(["2", "3", "4"])
+        self.assertTrue(again.finished)
+        self.assertEqual(again.counts()["skipped"], 3)
+
+    async def test_failures_are_per_vod_and_clean_up(self):
+        self.stages.fail = {("process", "5"), ("download", "6")}
+        batch = await self.wait(await self.backfill.submit(["5", "6", "7", "500"]))
+
+        self.assertEqual(batch.counts()["failed"], 3)
+        self.assertEqual(batch.items["5"].error, "process failed")
+        self.assertEqual(batch.items["500"].error, "not found on Twitch")
+        self.assertEqual(batch.items["7"].status, VODStatus.DONE)
+        self.assertEqual(os.listdir(self.tmp.name), ["7.saved.mp4"])
+        # A failed VOD can be queued again
+        self.stages.fail = set()
+        retry = await self.wait(await self.backfill.submit(["5"]))
+        self.assertEqual(retry.items["5"].status, VODStatus.DONE)
+
+    async def test_lookup_failure_fails_the_batch(self):
+        async def unavailable(vod_ids):
+            raise ConnectionError("Helix is down")
+
+        self.backfill.resolve = unavailable
+        batch = await self.wait(await self.backfill.submit(["1", "2"]))
+        self.assertEqual(batch.counts()["failed"], 2)
+        self.assertIn("Helix is down", batch.items["1"].error)
+
+    async def test_old_finished_batches_are_forgotten(self):
+        self.backfill.keep_batches = 2
+        batches = [await self.wait(await self.backfill.submit([str(n)])) for n in range(4)]
+        latest = await self.backfill.submit(["10"])
+        self.assertEqual(list(self.backfill.batches), [batches[3].batch_id, latest.batch_id])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+import twitch_main
+from backfill import channel_vod_ids
+from download_vod import is_hls_playlist
+from helix import HelixClient, HelixError
+from helix_fixtures import CLIENT_ID, CLIENT_SECRET, USER_ID, HelixServer, created_at
+from hls_fixtures import HLSServer, segment_bytes
+from twitch_api import TwitchVODManager
+
+class HelixTestCase(unittest.IsolatedAsyncioTestCase):
+    server_options = {}
+
+    async def asyncSetUp(self):
+        self.server = HelixServer(**self.server_options)
+        base_url = await self.server.start()
+        self.options = {"base_url": f"{base_url}/helix", "token_url": f"{base_url}/oauth2/token",
+                        "gql_url": f"{base_url}/gql", "usher_url": f"{base_url}/usher/vod"}
+        self.client = HelixClient(CLIENT_ID, CLIENT_SECRET, retries=2, **self.options)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+class TestHelixClient(HelixTestCase):
+    async def test_backfill_is_batched_under_one_token(self):
+        # 990 known VODs and 10 Twitch has never heard of
+        vod_ids = [str(number) for number in range(10, 1010)]
+        stalls = []
+
+        async def ticker():
+            while True:
+                started = time.monotonic()
+                await asyncio.sleep(0.005)
+                stalls.append(time.monotonic() - started)
+
+        ticking = asyncio.create_task(ticker())
+        urls = await asyncio.gather(*(self.client.get_vod_url(vod_id) for vod_id in vod_ids))
+        ticking.cancel()
+
+        self.assertEqual(urls[:3], [f"https://www.twitch.tv/videos/{n}" for n in (10, 11, 12)])
+        self.assertEqual(urls[-10:], [None] * 10)
+        self.assertEqual(self.client.token_requests, 1)
+        self.assertEqual(self.client.requests, 10)
+        self.assertEqual(sorted(map(len, self.server.batches)), [100] * 10)
+        # The loop kept running while the lookups were outstanding
+        self.assertGreater(len(stalls), 3)
+
+    async def test_concurrent_lookups_of_one_vod_share_a_request(self):
+        urls = await asyncio.gather(*(self.client.get_vod_url("42") for _ in range(50)))
+        self.assertEqual(set(urls), {"https://www.twitch.tv/videos/42"})
+        self.assertEqual(self.server.batches, [["42"]])
+        # Answered from the cache, unknown IDs included
+        self.assertIsNone(await self.client.get_video("5000"))
+        self.assertIsNone(await self.client.get_video("5000"))
+        await self.client.get_video("42")
+        self.assertEqual(self.server.requests["videos"], 2)
+
+    async def test_cache_entries_expire(self):
+        self.client.cache_ttl = 0.05
+        await self.client.get_video("1")
+        await asyncio.sleep(0.1)
+        await self.client.get_video("1")
+        self.assertEqual(self.server.batches, [["1"], ["1"]])
+
+    async def test_large_lookup_is_split_into_batches_of_100(self):
+        videos = await self.client.get_videos(range(250))
+        self.assertEqual(len(videos), 250)
+        self.assertEqual(sorted(map(len, self.server.batches)), [50, 100, 100])
+
+    async def test_revoked_token_is_replaced(self):
+        await self.client.get_video("1")
+        self.server.revoke()
+        self.assertEqual((await self.client.get_video("2"))["id"], "2")
+        self.assertEqual(self.client.token_requests, 2)
+
+    async def test_rate_limit_and_server_errors_are_retried(self):
+        self.server.fail = [429, 503]
+        self.assertEqual((await self.client.get_video("7"))["id"], "7")
+        self.assertEqual(self.server.requests["videos"], 3)
+
+    async def test_failure_reaches_every_waiter_and_is_not_cached(self):
+        self.server.fail = [500, 500, 500]
+        results = await asyncio.gather(*(self.client.get_video("7") for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, HelixError) and result.status == 500 for result in results))
+        self.assertEqual((await self.client.get_video("7"))["id"], "7")
+
+    async def test_bad_credentials(self):
+        client = HelixClient(CLIENT_ID, "wrong", **self.options)
+        with self.assertRaises(HelixError):
+            await client.get_video("1")
+        await client.close()
+
+    async def test_channel_videos_in_a_date_range(self):
+        self.assertEqual(await self.client.get_user_id("CdaProd"), USER_ID)
+        self.assertIsNone(await self.client.get_user_id("nobody"))
+        # Videos 150 up to (not including) 420, found on the first 9 pages
+        videos = await self.client.get_channel_videos(USER_ID, created_at(150), created_at(420))
+        self.assertEqual([video["id"] for video in videos], [str(n) for n in range(419, 149, -1)])
+        self.assertEqual(self.server.requests["videos"], 9)
+        # Listed videos are cached for lookups by ID
+        await self.client.get_videos(["150", "419"])
+        self.assertEqual(self.server.requests["videos"], 9)
+        self.assertEqual(len(await self.client.get_channel_videos(USER_ID)), 1000)
+
+    async def test_channel_vod_ids_for_backfill(self):
+        # Naive dates are UTC, as Helix reports them
+        naive = [created_at(n).replace(tzinfo=None) for n in (150, 153)]
+        self.assertEqual(await channel_vod_ids(self.client, "CdaProd", *naive), ["152", "151", "150"])
+        with self.assertRaises(LookupError):
+            await channel_vod_ids(self.client, "nobody")
+
+    async def test_playlist_url_from_playback_token(self):
+        url = await self.client.get_playlist_url("42")
+        self.assertTrue(url.startswith(f"{self.options['usher_url']}/42.m3u8?"), url)
+        self.assertTrue(is_hls_playlist(url))
+        self.assertIsNone(await self.client.get_playlist_url("5000"))
+        self.assertEqual(self.server.requests["gql"], 2)
+
+class TestVODDownload(HelixTestCase):
+    """Helix lookup to HLS download, as the API runs it"""
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.hls = HLSServer(segments=12)
+        hls_url = await self.hls.start()
+        self.server.media_playlist_url = f"{hls_url}/vod/chunked/index-dvr.m3u8"
+        twitch_main.vod_manager = TwitchVODManager(CLIENT_ID, CLIENT_SECRET, **self.options)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    async def asyncTearDown(self):
+        await twitch_main.close_clients()
+        await self.hls.stop()
+        self.tmp.cleanup()
+        await super().asyncTearDown()
+
+    async def test_downloads_share_one_session(self):
+        sessions = []
+        for vod_id in ("3", "4"):
+            path = os.path.join(self.tmp.name, f"twitch_{vod_id}.ts")
+            self.assertTrue(await twitch_main.get_video_on_demand(vod_id, path))
+            sessions.append(twitch_main.get_downloader().session)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), b"".join(segment_bytes(number) for number in range(12)))
+        self.assertIs(sessions[0], sessions[1])
+        self.assertEqual(self.server.requests["usher"], 2)
+        # The source variant, not the audio-only one
+        self.assertEqual(self.hls.requests["/vod/chunked/index-dvr.m3u8"], 2)
+        self.assertFalse(await twitch_main.get_video_on_demand("5000", os.path.join(self.tmp.name, "missing.ts")))
+
+class TestTokenExpiry(HelixTestCase):
+    # Clients treat a token as stale a minute early: this one is usable for 0.1 s
+    server_options = {"token_ttl": 60.1}
+
+    async def test_token_is_renewed_before_it_expires(self):
+        self.client.cache_ttl = 0
+        await asyncio.gather(*(self.client.get_video("1") for _ in range(5)))
+        await self.client.get_video("1")
+        self.assertEqual(self.client.token_requests, 1)
+        await asyncio.sleep(0.15)
+        await self.client.get_video("1")
+        self.assertEqual(self.client.token_requests, 2)
+
+class TestTwitchVODManager(HelixTestCase):
+    async def test_vod_urls(self):
+        manager = TwitchVODManager(CLIENT_ID, CLIENT_SECRET, **self.options)
+        self.assertEqual(await manager.get_vod_url("3"), "https://www.twitch.tv/videos/3")
+        self.assertEqual(await manager.get_vod_urls(["4", "5000"]),
+                         {"4": "https://www.twitch.tv/videos/4", "5000": None})
+        self.server.fail = [400]
+        self.assertIsNone(await manager.get_vod_url("8"))
+        await manager.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from hls_download import HLSDownloader, HLSError, parse_media_playlist
+from hls_fixtures import HLSServer, segment_bytes
+
+def expected_vod(segments: int) -> bytes:
+    return b"".join(segment_bytes(number) for number in range(segments))
+
+class TestPlaylistParsing(unittest.TestCase):
+    def test_media_playlist(self):
+        playlist = parse_media_playlist(HLSServer(segments=3).media_playlist(),
+                                        "https://vod.example/abc/chunked/index-dvr.m3u8")
+        self.assertEqual([segment.url for segment in playlist.segments], [
+            "https://vod.example/abc/chunked/0.ts",
+            "https://vod.example/abc/chunked/1.ts",
+            "https://vod.example/abc/chunked/2.ts",
+        ])
+        self.assertEqual(playlist.duration, 24.5)
+
+    def test_init_section_and_unsupported_playlists(self):
+        playlist = parse_media_playlist('#EXTM3U\n#EXT-X-MAP:URI="init.mp4"\n#EXTINF:2,\nseg0.m4s\n',
+                                        "https://cdn.example/v/index.m3u8")
+        self.assertEqual([segment.url for segment in playlist.segments],
+                         ["https://cdn.example/v/init.mp4", "https://cdn.example/v/seg0.m4s"])
+        with self.assertRaises(HLSError):
+            parse_media_playlist('#EXTM3U\n#EXT-X-KEY:METHOD=AES-128,URI="k"\n#EXTINF:2,\na.ts\n', "https://x/")
+        with self.assertRaises(HLSError):
+            parse_media_playlist("<html></html>", "https://x/")
+
+class TestHLSDownloader(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = HLSServer(segments=40)
+        self.base_url = await self.server.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "vod.ts")
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+        self.tmp.cleanup()
+
+    async def test_parallel_ordered_download_with_retries(self):
+        self.server.fail_once = {0, 5, 39}
+        updates = []
+        async with HLSDownloader(concurrency=6, retry_delay=0.01) as downloader:
+            result = await downloader.download(f"{self.base_url}/vod/master.m3u8", self.output,
+                                               progress=lambda p: updates.append((p.segments_done, p.fraction)))
+
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(), expected_vod(40))
+        # The source variant, not the 720p one
+        self.assertNotIn("/vod/720p30/index-dvr.m3u8", self.server.requests)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 6)
+        self.assertEqual(self.server.segment_requests(), 43)
+        self.assertEqual((result.segments_done, result.seconds_done, result.bytes_written),
+                         (40, 394.5, len(expected_vod(40))))
+        self.assertEqual(updates[-1], (40, 1.0))
+        self.assertEqual([done for done, _ in updates], list(range(1, 41)))
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["vod.ts"])
+
+    async def test_resumes_after_a_failed_segment(self):
+        self.server.broken = {25}
+        async with HLSDownloader(concurrency=4, retries=1, retry_delay=0.01) as downloader:
+            with self.assertRaises(HLSError):
+                await downloader.download(f"{self.base_url}/vod/master.m3u8", self.output)
+        with open(f"{self.output}.part", "rb") as f:
+            self.assertEqual(f.read(), expected_vod(25))
+
+        self.server.broken = set()
+        self.server.requests.clear()
+        async with HLSDownloader(concurrency=4) as downloader:
+            result = await downloader.download(f"{self.base_url}/vod/master.m3u8", self.output)
+        self.assertEqual(result.resumed_from, 25)
+        self.assertEqual(self.server.segment_requests(), 15)
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(), expected_vod(40))
+
+    async def test_partial_file_is_trimmed_to_the_last_recorded_segment(self):
+        url = f"{self.base_url}/vod/chunked/index-dvr.m3u8"
+        self.server.broken = {10}
+        async with HLSDownloader(concurrency=2, retries=0) as downloader:
+            with self.assertRaises(HLSError):
+                await downloader.download(url, self.output)
+        # A crash mid-write: half a segment past the last index entry, and a torn index line
+        with open(f"{self.output}.part", "ab") as f:
+            f.write(segment_bytes(10)[:500])
+        with open(f"{self.output}.part.idx", "a") as f:
+            f.write("10 99")
+
+        self.server.broken = set()
+        async with HLSDownloader(concurrency=2) as downloader:
+            result = await downloader.download(url, self.output)
+        self.assertEqual(result.resumed_from, 10)
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(), expected_vod(40))
+
+    async def test_different_playlist_starts_over(self):
+        url = f"{self.base_url}/vod/chunked/index-dvr.m3u8"
+        self.server.broken = {10}
+        async with HLSDownloader(concurrency=2, retries=0) as downloader:
+            with self.assertRaises(HLSError):
+                await downloader.download(url, self.output)
+        self.server.broken = set()
+        self.server.segments = 12
+        async with HLSDownloader(concurrency=2) as downloader:
+            result = await downloader.download(url, self.output)
+        self.assertEqual(result.resumed_from, 0)
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(), expected_vod(12))
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+class TestRemux(unittest.IsolatedAsyncioTestCase):
+    async def test_fragmented_mp4_vod_is_remuxed_once(self):
+        from aiohttp import web
+        with tempfile.TemporaryDirectory() as tmp:
+            vod_dir = os.path.join(tmp, "vod")
+            os.mkdir(vod_dir)
+            subprocess.run([
+                "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=30",
+                "-f", "lavfi", "-i", "sine=frequency=440", "-t", "6", "-c:v", "libx264", "-g", "30",
+                "-c:a", "aac", "-f", "hls", "-hls_time", "2", "-hls_playlist_type", "vod",
+                "-hls_segment_type", "fmp4",
+                os.path.join(vod_dir, "index.m3u8"),
+            ], check=True)
+            app = web.Application()
+            app.router.add_static("/vod", vod_dir)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", 0).start()
+            try:
+                output = os.path.join(tmp, "vod.mp4")
+                async with HLSDownloader() as downloader:
+                    result = await downloader.download(
+                        f"http://127.0.0.1:{runner.addresses[0][1]}/vod/index.m3u8", output)
+            finally:
+                await runner.cleanup()
+            # The init section and three 2 s fragments
+            self.assertEqual((result.segments_done, result.seconds_total), (4, 6.0))
+            with open(output, "rb") as f:
+                self.assertEqual(f.read(12)[4:8], b"ftyp")
+            self.assertFalse(os.path.exists(f"{output}.part"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import unittest
+import twitch_main
+from aiohttp import web
+from helix_fixtures import CLIENT_ID, CLIENT_SECRET, HelixServer
+from hls_download import HLSDownloader, HLSError
+from hls_fixtures import HLSServer
+from submodules.pipeline import build_pipeline
+from twitch_api import TwitchVODManager
+from vod_stream import StreamError, copy_args, partial_path, stream_vod
+
+HAS_FFMPEG = shutil.which("ffmpeg") is not None
+
+def media_info(path: str):
+    """(duration, width, height) from `ffmpeg -i` (ffprobe may not be installed)"""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-i", path], capture_output=True, text=True)
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", result.stderr).groups()
+    width, height = re.search(r"Video: .*?, (\d+)x(\d+)", result.stderr).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds), int(width), int(height)
+
+@unittest.skipUnless(HAS_FFMPEG, "ffmpeg not installed")
+class TestStreamVOD(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A 4 s VOD as fragmented-MP4 HLS: an init section and four 1 s segments
+        cls.source = tempfile.TemporaryDirectory()
+        cls.vod_dir = os.path.join(cls.source.name, "vod")
+        os.mkdir(cls.vod_dir)
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=30",
+            "-f", "lavfi", "-i", "sine=frequency=440", "-t", "4",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "30", "-c:a", "aac",
+            "-f", "hls", "-hls_time", "1", "-hls_playlist_type", "vod", "-hls_segment_type", "fmp4",
+            os.path.join(cls.vod_dir, "index.m3u8"),
+        ], check=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.source.cleanup()
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "twitch", "2024-01-01", "vod.mp4")
+        app = web.Application()
+        app.router.add_static("/vod", self.vod_dir)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}/vod/index.m3u8"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        self.tmp.cleanup()
+
+    async def test_segments_are_piped_into_ffmpeg(self):
+        updates = []
+        result = await stream_vod(self.url, self.output, progress=lambda p: updates.append(p.segments_done))
+        duration, width, height = media_info(self.output)
+        self.assertAlmostEqual(duration, 4, delta=0.2)
+        self.assertEqual((width, height), (160, 120))
+        self.assertEqual(result.segments, 5)
+        self.assertEqual(updates, [1, 2, 3, 4, 5])
+        self.assertEqual(result.size, os.path.getsize(self.output))
+        self.assertEqual(os.listdir(os.path.dirname(self.output)), ["vod.mp4"])
+
+    async def test_vod_id_is_streamed_from_its_playlist(self):
+        helix = HelixServer(media_playlist_url=self.url)
+        base_url = await helix.start()
+        twitch_main.vod_manager = TwitchVODManager(
+            CLIENT_ID, CLIENT_SECRET, base_url=f"{base_url}/helix", token_url=f"{base_url}/oauth2/token",
+            gql_url=f"{base_url}/gql", usher_url=f"{base_url}/usher/vod")
+        try:
+            result = await twitch_main.stream_video_on_demand("3", self.output, copy_args)
+        finally:
+            await twitch_main.close_clients()
+            await helix.stop()
+        # Helix only knows the VOD's page; the segments came through the downloader
+        self.assertEqual(result.segments, 5)
+        self.assertEqual(helix.requests["usher"], 1)
+        self.assertAlmostEqual(media_info(self.output)[0], 4, delta=0.2)
+
+    async def test_processing_steps_run_in_the_same_pass(self):
+        stage = build_pipeline(["auto_fix_mobile", "remux"])[0]
+        async with HLSDownloader(concurrency=2) as downloader:
+            await stream_vod(self.url, self.output, stage.ffmpeg_args, downloader=downloader)
+            self.assertEqual(downloader.requests, 6)
+        # Rotated a quarter turn
+        self.assertEqual(media_info(self.output)[1:], (120, 160))
+
+    async def test_failed_download_leaves_nothing_behind(self):
+        missing = os.path.join(self.tmp.name, "index2.m4s")
+        shutil.move(os.path.join(self.vod_dir, "index2.m4s"), missing)
+        try:
+            async with HLSDownloader(retries=0) as downloader:
+                with self.assertRaises(HLSError):
+                    await stream_vod(self.url, self.output, downloader=downloader)
+        finally:
+            shutil.move(missing, os.path.join(self.vod_dir, "index2.m4s"))
+        self.assertFalse(os.path.exists(self.output))
+        self.assertFalse(partial_path(self.output).exists())
+
+    async def test_unreadable_input_is_an_error(self):
+        server = HLSServer(segments=5)
+        base_url = await server.start()
+        try:
+            # Segments of filler bytes, not video
+            with self.assertRaises(StreamError):
+                await stream_vod(f"{base_url}/vod/master.m3u8", self.output)
+        finally:
+            await server.stop()
+        self.assertEqual(os.listdir(os.path.dirname(self.output)), [])
+
+    async def test_other_sources_are_read_by_ffmpeg(self):
+        source = os.path.join(self.tmp.name, "source.mp4")
+        subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=30",
+                        "-t", "2", "-c:v", "libx264", "-preset", "ultrafast", source], check=True)
+        result = await stream_vod(source, self.output)
+        self.assertEqual(result.segments, 0)
+        self.assertAlmostEqual(media_info(self.output)[0], 2, delta=0.2)
+
+if __name__ == "__main__":
+    unittest.main()
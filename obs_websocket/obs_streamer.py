@@ -1,21 +1,36 @@
 import os
+import sys
 import asyncio
 import logging
+import shutil
 import subprocess
-import yaml
-import json
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Callable, Tuple
-from dataclasses import dataclass, field
+from typing import Optional, List, Dict
+from dataclasses import dataclass
 
 from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
-from obswebsocket import obsws, requests as obs_requests
-from twitchAPI.twitch import Twitch
-import aiohttp
-import pyudev
-from zeroconf import ServiceBrowser, Zeroconf
+# obswebsocket and pyudev are imported by the subsystem that
+# uses them, on first use, so startup neither waits for nor needs them
+
+# Shared clients live with the device manager's services, which import
+# each other flat from their own directories
+SERVICES = Path(__file__).resolve().parent.parent / "device-manager" / "services"
+for service in ("device_manager", "twitch"):
+    if str(SERVICES / service) not in sys.path:
+        sys.path.insert(0, str(SERVICES / service))
+
+from backfill import BackfillBatch, VODBackfill, channel_vod_ids, vod_filename
+from config_loader import ConfigWatcher
+from device_events import DeviceEvent, DeviceEventBridge, device_key
+from helix import HelixClient, HelixError
+from hls_download import HLSDownloader
+from obs_client import OBSClient
+from recording_catalog import RecordingCatalog
+from scene_state import SceneState
+from vod_stream import stream_vod
 
 # Initialize Logging
 logging.basicConfig(
@@ -24,20 +39,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger("StreamingServiceManager")
 
-# Configuration Loading
+# Configuration Loading (validated, immutable, reloaded when the file changes)
 CONFIG_PATH = "config.yaml"
-
-def load_config(path: str) -> Dict:
-    try:
-        with open(path, 'r') as f:
-            config = yaml.safe_load(f)
-            logger.info("Configuration loaded successfully.")
-            return config
-    except Exception as e:
-        logger.error(f"Failed to load configuration: {e}")
-        return {}
-
-config = load_config(CONFIG_PATH)
+config_watcher = ConfigWatcher(CONFIG_PATH)
 
 # OBS Manager
 class OBSManager:
@@ -46,10 +50,12 @@ class OBSManager:
         self.port = port
         self.password = password
         self.ws = None
-        self.connect()
+        self.client = None
+        self.scene_state = None
 
     def connect(self):
         try:
+            from obswebsocket import obsws
             self.ws = obsws(self.host, self.port, self.password)
             self.ws.connect()
             logger.info("Connected to OBS WebSocket.")
@@ -60,12 +66,13 @@ class OBSManager:
         if not self.ws:
             self.connect()
         try:
+            from obswebsocket import requests as obs_requests
             for source in scenes:
                 self.ws.call(obs_requests.CreateSource(
                     sourceName=source["name"],
                     sourceKind=source["type"],
                     sceneName="Master Scene",
-                    sourceSettings=source.get("settings", {})
+                    sourceSettings=dict(source.get("settings", {}))
                 ))
                 self.ws.call(obs_requests.SetSceneItemProperties(
                     item=source["name"],
@@ -77,48 +84,59 @@ class OBSManager:
         except Exception as e:
             logger.error(f"Error loading scenes into OBS: {e}")
 
-    def manage_scene(self, active_sources: List[str]):
-        if not self.ws:
-            self.connect()
+    async def manage_scene(self, active_sources: List[str], device: str = ""):
+        if self.client is None:
+            self.client = OBSClient(self.host, self.port, self.password)
+            self.scene_state = SceneState(self.client)
+            await self.client.start()
+        sent = self.client.requests_sent
         try:
-            # Set visibility based on active sources
-            all_sources = [source["name"] for source in config["obs"]["master_scene"]["sources"]]
-            for source in all_sources:
-                visible = source in active_sources
-                self.ws.call(obs_requests.SetSceneItemProperties(
-                    item=source,
-                    visible=visible
-                ))
+            # Set visibility based on active sources; unchanged items are not sent
+            master_scene = config_watcher.current.obs.get("master_scene", {})
+            all_sources = [source["name"] for source in master_scene.get("sources", ())]
+            await self.scene_state.set_visibility(
+                "Master Scene", {source: source in active_sources for source in all_sources}
+            )
             logger.info(f"Scene managed based on active sources: {active_sources}")
         except Exception as e:
             logger.error(f"Error managing scene in OBS: {e}")
+        if device:
+            logger.debug(f"Device event for {device} sent {self.client.requests_sent - sent} OBS requests")
 
 # Twitch VOD Manager
 class TwitchVODManager:
+    """VOD lookups through the shared Helix client (one session, a reused
+    app token, batched and cached lookups) and downloads through one
+    pooled HLS downloader"""
     def __init__(self, client_id: str, client_secret: str):
-        self.client_id = client_id
-        self.client_secret = client_secret
-        self.twitch = Twitch(client_id, client_secret)
-        self.twitch.authenticate_app([])
-        logger.info("Authenticated with Twitch API.")
+        self.helix = HelixClient(client_id, client_secret)
+        # One pooled session for every HLS download
+        self.downloader = HLSDownloader()
 
     async def get_vod_url(self, vod_id: str) -> Optional[str]:
+        """HLS playlist of a VOD; Helix's video URL is only its web page"""
         try:
-            vods = self.twitch.get_videos(video_id=vod_id)
-            if vods['data']:
-                return vods['data'][0]['url']
-            else:
-                logger.warning(f"No VOD found for ID: {vod_id}")
-                return None
-        except Exception as e:
+            vod_url = await self.helix.get_playlist_url(vod_id)
+        except HelixError as e:
             logger.error(f"Error fetching VOD URL: {e}")
             return None
+        if vod_url is None:
+            logger.warning(f"No playable VOD found for ID: {vod_id}")
+        return vod_url
+
+    async def close(self):
+        await self.helix.close()
+        await self.downloader.close()
 
     async def download_vod(self, vod_url: str, output_path: str) -> bool:
         try:
             logger.info(f"Starting download of VOD from {vod_url} to {output_path}")
+            if vod_url.split('?', 1)[0].endswith('.m3u8'):
+                # Parallel, resumable, and remuxed once at the end
+                await self.downloader.download(vod_url, output_path)
+                return True
             process = await asyncio.create_subprocess_exec(
-                'ffmpeg',
+                'ffmpeg', '-y',
                 '-i', vod_url,
                 '-c', 'copy',
                 output_path,
@@ -153,15 +171,30 @@ class ProcessingResult:
     output_path: Optional[str] = None
     errors: Optional[List[str]] = None
 
+# FFmpeg video filters for each post-processing step
+AUTO_FIX_MOBILE_FILTER = "transpose=1"
+PORTRAIT_IN_LANDSCAPE_FILTER = "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2"
+
+def single_pass_args(source: str, target: str) -> List[str]:
+    """FFmpeg arguments of process_video's filters, for vod_stream.stream_vod"""
+    return ["-i", source, "-vf", ",".join([AUTO_FIX_MOBILE_FILTER, PORTRAIT_IN_LANDSCAPE_FILTER]),
+            "-c:a", "copy", target]
+
+def run_ffmpeg_filters(input_path: str, output_path: str, filters: List[str]):
+    """Apply a chain of video filters with one decode and one encode.
+    Without filters the streams are copied, not re-encoded."""
+    if filters:
+        codec_args = ["-vf", ",".join(filters), "-c:a", "copy"]
+    else:
+        codec_args = ["-c", "copy"]
+    subprocess.run(["ffmpeg", "-y", "-i", input_path, *codec_args, output_path], check=True)
+
 def auto_fix_mobile_portrait(video: VideoMetadata) -> ProcessingResult:
     try:
         logger.info(f"Auto-fixing mobile portrait for {video.title}")
         output_path = video.input_path.replace(".mp4", "_fixed.mp4")
         # Example FFmpeg command to rotate video if needed
-        subprocess.run(
-            ["ffmpeg", "-i", video.input_path, "-vf", "transpose=1", output_path],
-            check=True
-        )
+        run_ffmpeg_filters(video.input_path, output_path, [AUTO_FIX_MOBILE_FILTER])
         return ProcessingResult(
             success=True,
             message="Mobile portrait fixed.",
@@ -180,10 +213,7 @@ def apply_portrait_in_landscape(video: VideoMetadata) -> ProcessingResult:
         logger.info(f"Applying portrait in landscape for {video.title}")
         output_path = video.input_path.replace(".mp4", "_landscape.mp4")
         # Example FFmpeg command to add padding for landscape
-        subprocess.run(
-            ["ffmpeg", "-i", video.input_path, "-vf", "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2", output_path],
-            check=True
-        )
+        run_ffmpeg_filters(video.input_path, output_path, [PORTRAIT_IN_LANDSCAPE_FILTER])
         return ProcessingResult(
             success=True,
             message="Portrait applied in landscape.",
@@ -197,113 +227,120 @@ def apply_portrait_in_landscape(video: VideoMetadata) -> ProcessingResult:
             errors=[str(e)]
         )
 
-def video_processing_queue(tasks: List[Tuple[Callable[[VideoMetadata], ProcessingResult], VideoMetadata]]) -> List[ProcessingResult]:
-    results = []
-    for func, video in tasks:
-        logger.info(f"Processing {video.title} with {func.__name__}")
-        result = func(video)
-        results.append(result)
-        if result.success and video.input_path:
-            try:
-                os.remove(video.input_path)
-                logger.info(f"Removed ephemeral file: {video.input_path}")
-            except Exception as e:
-                logger.error(f"Failed to remove file {video.input_path}: {e}")
-    return results
-
 def process_video(input_path: str) -> str:
-    video = VideoMetadata(
-        video_id="unknown",
-        title=os.path.basename(input_path),
-        input_path=input_path
-    )
-
-    queue = [
-        (auto_fix_mobile_portrait, video),
-        (apply_portrait_in_landscape, video),
-    ]
-
-    results = video_processing_queue(queue)
-
-    for result in reversed(results):
-        if result.success and result.output_path:
-            return result.output_path
+    """Fix orientation and fit into a landscape frame in a single FFmpeg pass."""
+    title = os.path.basename(input_path)
+    output_path = input_path.replace(".mp4", "_processed.mp4")
+    try:
+        logger.info(f"Processing {title}: auto_fix_mobile_portrait + apply_portrait_in_landscape")
+        run_ffmpeg_filters(input_path, output_path, [AUTO_FIX_MOBILE_FILTER, PORTRAIT_IN_LANDSCAPE_FILTER])
+    except subprocess.CalledProcessError as e:
+        raise Exception(f"Post-processing failed for {title}: {e}")
 
-    raise Exception("All post-processing steps failed.")
+    # Clean up ephemeral data
+    try:
+        os.remove(input_path)
+        logger.info(f"Removed ephemeral file: {input_path}")
+    except Exception as e:
+        logger.error(f"Failed to remove file {input_path}: {e}")
+    return output_path
 
-def save_to_persistence(processed_path: str, persistent_path: str):
+def save_to_persistence(processed_path: str, persistent_path: str) -> str:
+    """Rename into persistent storage, or copy atomically across filesystems."""
     try:
         video_file = Path(processed_path)
         date = datetime.now().strftime("%Y-%m-%d")
         dest_dir = Path(persistent_path) / date
         dest_dir.mkdir(parents=True, exist_ok=True)
         dest_path = dest_dir / video_file.name
-        subprocess.run(
-            ["mv", processed_path, str(dest_path)],
-            check=True
-        )
+        if video_file.stat().st_dev == dest_dir.stat().st_dev:
+            os.replace(video_file, dest_path)
+        else:
+            # copyfile uses sendfile; the temporary name keeps readers off partial files
+            tmp_path = dest_dir / f".{video_file.name}.partial"
+            shutil.copyfile(video_file, tmp_path)
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, dest_path)
+            video_file.unlink()
         logger.info(f"Saved processed video to {dest_path}")
-    except subprocess.CalledProcessError as e:
+        return str(dest_path)
+    except OSError as e:
         logger.error(f"Error saving to persistence: {e}")
         raise
 
 # Device Manager
 class DeviceManager:
-    def __init__(self):
-        self.context = pyudev.Context()
-        self.monitor = pyudev.Monitor.from_netlink(self.context)
-        self.monitor.filter_by(subsystem='video4linux')
+    def __init__(self, debounce: float = 0.5, max_delay: float = 2):
+        self.context = None
+        self.monitor = None
         self.observers = []
         self.active_sources = []
         self.obs_manager = None
+        # udev events are coalesced until `debounce` seconds pass without one
+        self.events = DeviceEventBridge(self.handle_device_events, debounce, max_delay)
 
     def set_obs_manager(self, obs_manager: OBSManager):
         self.obs_manager = obs_manager
 
     async def monitor_devices(self):
         logger.info("Starting device monitoring...")
-        observer = pyudev.MonitorObserver(self.monitor, callback=self.device_event)
+        import pyudev
+        self.context = pyudev.Context()
+        self.monitor = pyudev.Monitor.from_netlink(self.context)
+        self.monitor.filter_by(subsystem='video4linux')
+        self.events.bind()
+        observer = pyudev.MonitorObserver(self.monitor, callback=self.events.observe)
         observer.start()
         self.observers.append(observer)
 
-        # Initial device scan
-        for device in self.context.list_devices(subsystem='video4linux'):
-            self.handle_device_added(device)
+        # Initial device scan, applied as one burst
+        await self.handle_device_events([
+            DeviceEvent('add', device, device_key(device))
+            for device in self.context.list_devices(subsystem='video4linux')
+        ])
+        await self.events.run()
 
-    def device_event(self, action, device):
-        if action == 'add':
-            asyncio.create_task(self.handle_device_added(device))
-        elif action == 'remove':
-            asyncio.create_task(self.handle_device_removed(device))
-
-    async def handle_device_added(self, device):
-        try:
-            device_name = device.get('ID_MODEL') or device.get('NAME') or device.device_node
-            logger.info(f"Device added: {device_name}")
-            self.active_sources.append(device_name)
-            if self.obs_manager:
-                self.obs_manager.manage_scene(self.active_sources)
-        except Exception as e:
-            logger.error(f"Error handling device addition: {e}")
-
-    async def handle_device_removed(self, device):
-        try:
-            device_name = device.get('ID_MODEL') or device.get('NAME') or device.device_node
-            logger.info(f"Device removed: {device_name}")
-            if device_name in self.active_sources:
-                self.active_sources.remove(device_name)
-            if self.obs_manager:
-                self.obs_manager.manage_scene(self.active_sources)
-        except Exception as e:
-            logger.error(f"Error handling device removal: {e}")
+    async def handle_device_events(self, events: List[DeviceEvent]):
+        for event in events:
+            try:
+                device_name = event.device.get('ID_MODEL') or event.device.get('NAME') or event.key
+                if event.action == 'add':
+                    logger.info(f"Device added: {device_name}")
+                    if device_name not in self.active_sources:
+                        self.active_sources.append(device_name)
+                elif event.action == 'remove':
+                    logger.info(f"Device removed: {device_name}")
+                    if device_name in self.active_sources:
+                        self.active_sources.remove(device_name)
+            except Exception as e:
+                logger.error(f"Error handling device {event.action}: {e}")
+        # One scene update per burst
+        if self.obs_manager and events:
+            await self.obs_manager.manage_scene(self.active_sources, ", ".join(event.key for event in events))
 
 # Storage Manager
 class StorageManager:
-    def __init__(self, persistent_path: str, ephemeral_path: str):
+    def __init__(self, persistent_path: str, ephemeral_path: str, reconcile_interval: int = 600):
         self.persistent_path = Path(persistent_path)
         self.ephemeral_path = Path(ephemeral_path)
+        self.catalog = None
+        self.reconcile_interval = reconcile_interval
+
+    def prepare(self):
+        """Create the storage directories and open the catalog; run once at startup"""
         self.persistent_path.mkdir(parents=True, exist_ok=True)
         self.ephemeral_path.mkdir(parents=True, exist_ok=True)
+        self.catalog = RecordingCatalog(str(self.ephemeral_path / "recordings_catalog.sqlite"), str(self.persistent_path))
+
+    async def reconcile_catalog(self):
+        while True:
+            try:
+                listed = await asyncio.to_thread(self.catalog.reconcile)
+                logger.debug(f"Recording catalog reconciled ({listed} directories listed)")
+            except Exception as e:
+                logger.error(f"Error reconciling recording catalog: {e}")
+            await asyncio.sleep(self.reconcile_interval)
 
     async def monitor_storage(self):
         logger.info("Starting storage monitoring...")
@@ -315,45 +352,78 @@ class StorageManager:
 
                 if used_percent > 90:
                     logger.warning("Storage space critical. Initiating cleanup.")
-                    self.cleanup_old_recordings()
+                    await asyncio.to_thread(self.cleanup_old_recordings)
             except Exception as e:
                 logger.error(f"Error monitoring storage: {e}")
             await asyncio.sleep(300)  # Check every 5 minutes
 
-    def cleanup_old_recordings(self):
+    def cleanup_old_recordings(self, low_water_percent: float = 80):
+        """Delete the oldest recordings needed to reach low_water_percent, as one batch."""
         try:
-            recordings = sorted(
-                self.persistent_path.glob('**/*.mp4'),
-                key=lambda p: p.stat().st_mtime
-            )
-            while recordings:
-                oldest = recordings.pop(0)
-                oldest.unlink()
-                logger.info(f"Removed old recording: {oldest}")
-                # Recalculate usage
-                total, used, free = shutil.disk_usage(self.persistent_path)
-                used_percent = (used / total) * 100
-                if used_percent < 80:
-                    logger.info("Storage usage back to safe levels.")
+            total, used, free = shutil.disk_usage(self.persistent_path)
+            bytes_needed = used - total * low_water_percent / 100
+            victims, planned = [], 0
+            for recording in self.catalog.oldest():
+                if planned >= bytes_needed:
                     break
+                victims.append(recording.path)
+                planned += recording.size
+            for path in victims:
+                Path(path).unlink(missing_ok=True)
+            self.catalog.remove_many(victims)
+            logger.info(f"Removed {len(victims)} old recordings ({planned / 1024 ** 3:.2f} GiB).")
         except Exception as e:
             logger.error(f"Error cleaning up recordings: {e}")
 
+# Bulk VOD Backfill stages, run by backfill.VODBackfill
+async def backfill_download(video: dict) -> str:
+    ephemeral_path = str(Path(storage_manager.ephemeral_path) / vod_filename(video["id"]))
+    vod_url = await twitch_manager.get_vod_url(video["id"])
+    if not vod_url or not await twitch_manager.download_vod(vod_url, ephemeral_path):
+        raise RuntimeError(f"Failed to download VOD ID: {video['id']}")
+    return ephemeral_path
+
+async def backfill_process(video: dict, path: str) -> str:
+    return await asyncio.to_thread(process_video, path)
+
+async def backfill_persist(video: dict, path: str) -> str:
+    saved_path = await asyncio.to_thread(save_to_persistence, path,
+                                         str(Path(storage_manager.persistent_path) / "twitch"))
+    storage_manager.catalog.add(saved_path, source="twitch", vod_id=video["id"])
+    return saved_path
+
+def backfill_view(batch: BackfillBatch) -> dict:
+    return {
+        "batch_id": batch.batch_id,
+        "finished": batch.finished,
+        "counts": batch.counts(),
+        "vods": [
+            {"vod_id": item.vod_id, "status": item.status.value, "title": item.title,
+             "path": item.path, "error": item.error}
+            for item in batch.items.values()
+        ],
+    }
+
 # FastAPI Models
 class VideoRequest(BaseModel):
     vod_id: str
     output_name: str
 
+class BackfillRequest(BaseModel):
+    vod_ids: List[str] = []
+    channel: Optional[str] = None
+    started_after: Optional[datetime] = None
+    started_before: Optional[datetime] = None
+
 # Initialize Managers
-obs_config = config.get("obs", {})
+obs_config = config_watcher.current.obs
 obs_manager = OBSManager(
     host=obs_config.get("host", "localhost"),
     port=obs_config.get("port", 4444),
     password=obs_config.get("password", "your_password")
 )
-obs_manager.load_scenes(config["obs"]["master_scene"]["sources"])
 
-twitch_config = config.get("twitch", {})
+twitch_config = config_watcher.current.get("twitch", {})
 twitch_manager = TwitchVODManager(
     client_id=twitch_config.get("client_id", "your_client_id"),
     client_secret=twitch_config.get("client_secret", "your_client_secret")
@@ -362,17 +432,66 @@ twitch_manager = TwitchVODManager(
 device_manager = DeviceManager()
 device_manager.set_obs_manager(obs_manager)
 
-storage_config = config.get("storage", {})
+storage_config = config_watcher.current.storage
 storage_manager = StorageManager(
     persistent_path=storage_config.get("persistent", {}).get("mount_point", "/data/recordings"),
     ephemeral_path=storage_config.get("ephemeral", {}).get("temp_path", "/data/ephemeral")
 )
 
+vod_backfill = VODBackfill(
+    resolve=lambda vod_ids: twitch_manager.helix.get_videos(vod_ids),
+    download=backfill_download,
+    process=backfill_process,
+    persist=backfill_persist,
+    archived=lambda vod_ids: storage_manager.catalog.archived_vods(vod_ids, source="twitch"),
+    # Each FFmpeg encode already uses every core
+    process_limit=1,
+)
+
+# Startup and Shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up Streaming Service Manager...")
+    scene_sources = config_watcher.current.obs.get("master_scene", {}).get("sources")
+    if not scene_sources:
+        raise RuntimeError(f"No valid configuration with OBS scene sources at {CONFIG_PATH}")
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    # Storage must be ready before requests; OBS is brought up in the
+    # background, so a missing OBS delays nothing and fails nothing
+    await asyncio.to_thread(storage_manager.prepare)
+    tasks = [
+        asyncio.create_task(asyncio.to_thread(obs_manager.load_scenes, scene_sources)),
+        asyncio.create_task(device_manager.monitor_devices()),
+        asyncio.create_task(storage_manager.monitor_storage()),
+        asyncio.create_task(storage_manager.reconcile_catalog()),
+        asyncio.create_task(config_watcher.watch()),
+    ]
+    logger.info(f"Background tasks initiated in {(loop.time() - started) * 1000:.0f} ms.")
+    yield
+    logger.info("Shutting down Streaming Service Manager...")
+    await vod_backfill.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if obs_manager.ws:
+        obs_manager.ws.disconnect()
+        logger.info("Disconnected from OBS WebSocket.")
+    if obs_manager.client:
+        await obs_manager.client.close()
+    for observer in device_manager.observers:
+        observer.stop()
+    logger.info("Device monitoring stopped.")
+    await twitch_manager.close()
+    if storage_manager.catalog:
+        storage_manager.catalog.close()
+
 # Initialize FastAPI
 app = FastAPI(
     title="Streaming Service Manager",
     version="1.0",
-    description="A service for managing Twitch VODs, OBS scenes, and video post-processing."
+    description="A service for managing Twitch VODs, OBS scenes, and video post-processing.",
+    lifespan=lifespan
 )
 router = APIRouter()
 
@@ -392,7 +511,7 @@ async def connect_obs():
 @router.post("/obs/load-scenes", tags=["OBS"])
 async def load_obs_scenes():
     try:
-        obs_manager.load_scenes(config["obs"]["master_scene"]["sources"])
+        obs_manager.load_scenes(config_watcher.current.obs.get("master_scene", {}).get("sources", ()))
         return {"status": "Scenes loaded successfully into OBS"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -400,7 +519,7 @@ async def load_obs_scenes():
 @router.post("/obs/manage-scene", tags=["OBS"])
 async def manage_obs_scene(active_sources: List[str]):
     try:
-        obs_manager.manage_scene(active_sources)
+        await obs_manager.manage_scene(active_sources)
         return {"status": "Scene managed successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -413,6 +532,28 @@ async def fetch_and_process(video_request: VideoRequest, background_tasks: Backg
     background_tasks.add_task(handle_video_processing, video_request.vod_id, str(ephemeral_path), str(persistent_path))
     return {"message": f"Processing started for VOD ID: {video_request.vod_id}"}
 
+@router.post("/vods/backfill", tags=["VOD Management"], status_code=202)
+async def backfill_vods(request: BackfillRequest):
+    vod_ids = list(request.vod_ids)
+    if request.channel:
+        try:
+            vod_ids += await channel_vod_ids(twitch_manager.helix, request.channel,
+                                             request.started_after, request.started_before)
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except HelixError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+    if not vod_ids:
+        raise HTTPException(status_code=400, detail="No VODs to backfill")
+    return backfill_view(await vod_backfill.submit(vod_ids))
+
+@router.get("/vods/backfill/{batch_id}", tags=["VOD Management"])
+async def get_backfill(batch_id: str):
+    batch = vod_backfill.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Unknown backfill batch: {batch_id}")
+    return backfill_view(batch)
+
 async def handle_video_processing(vod_id: str, ephemeral_path: str, persistent_path: str):
     try:
         vod_url = await twitch_manager.get_vod_url(vod_id)
@@ -420,41 +561,26 @@ async def handle_video_processing(vod_id: str, ephemeral_path: str, persistent_p
             logger.error(f"VOD URL not found for ID: {vod_id}")
             return
 
+        if config_watcher.current.get("twitch", {}).get("stream_processing", True):
+            # Single pass: no download or intermediate file in ephemeral storage
+            name = Path(ephemeral_path).stem
+            output_path = Path(persistent_path) / datetime.now().strftime("%Y-%m-%d") / f"{name}_processed.mp4"
+            result = await stream_vod(vod_url, str(output_path), single_pass_args,
+                                      downloader=twitch_manager.downloader)
+            storage_manager.catalog.add(result.path, source="twitch", size=result.size, vod_id=vod_id)
+            return
+
         success = await twitch_manager.download_vod(vod_url, ephemeral_path)
         if not success:
             logger.error(f"Failed to download VOD ID: {vod_id}")
             return
 
-        processed_path = process_video(ephemeral_path)
-        save_to_persistence(processed_path, persistent_path)
+        # FFmpeg steps block on subprocess.run; keep them off the event loop
+        processed_path = await asyncio.to_thread(process_video, ephemeral_path)
+        saved_path = await asyncio.to_thread(save_to_persistence, processed_path, persistent_path)
+        storage_manager.catalog.add(saved_path, source="twitch", vod_id=vod_id)
     except Exception as e:
         logger.error(f"Error during video processing: {e}")
 
 # Add Router to App
 app.include_router(router)
-
-# Background Tasks
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up Streaming Service Manager...")
-    asyncio.create_task(device_manager.monitor_devices())
-    asyncio.create_task(storage_manager.monitor_storage())
-    logger.info("Background tasks initiated.")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down Streaming Service Manager...")
-    if obs_manager.ws:
-        obs_manager.ws.disconnect()
-        logger.info("Disconnected from OBS WebSocket.")
-    for observer in device_manager.observers:
-        observer.stop()
-    logger.info("Device monitoring stopped.")
-
-# Additional Dependencies for Storage Manager
-import shutil
-
-# Ensure Config Exists
-if not config:
-    logger.error("Configuration not found. Exiting application.")
-    exit(1)
\ No newline at end of file